@@ -0,0 +1,413 @@
+"""
+Cross-activity analytics on DuckDB.
+
+Questions over every sample of every activity ("heart rate at a given pace
+across all runs this year") are aggregations over millions of rows, which
+the ORM would have to load one Sample object at a time. This module runs
+them on an in-process DuckDB connection instead, with vectorized
+execution over the sample stores (see app/data/sample_store.py):
+
+- the samples table and activities are read in place: a SQLite database
+  is attached with DuckDB's sqlite extension, PostgreSQL with its
+  postgres extension. Where the extension is not installed and cannot be
+  downloaded (offline), or the backend has none, the activities and the
+  matching sample rows are read through SQLAlchemy into pandas instead
+- Arrow sidecar files are memory-mapped and scanned without a copy
+- columnar SampleChannel blobs are decoded with NumPy and registered
+
+The activity filters (sport, date range) are applied first, so only the
+samples of matching activities are read, and only the channels a query
+asks for are decoded. They all appear as one ``samples`` view
+(``activity_id``, ``timestamp`` and the SAMPLE_CHANNELS columns, NULL for
+missing values) next to an ``activities`` view, so ``query`` can run any
+SQL over them. The attached database is kept open per database URL; each
+query runs on its own cursor.
+
+duckdb is optional; without it ``open_analytics`` raises RuntimeError and
+the stats page hides the panel.
+"""
+
+from contextlib import closing
+from datetime import date, datetime
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+
+from .arrow_store import PYARROW_AVAILABLE, read_sample_file
+from .db import DatabaseConfig, get_db_config
+from .models import Activity, SAMPLE_CHANNELS, Sample, SampleChannel
+from .sample_store import TIMESTAMP_CHANNEL, read_sample_channels
+
+try:
+    import duckdb
+
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+
+# Paces outside this range (s/km) are standing still or GPS glitches, not running
+MIN_PACE_S_PER_KM = 150
+MAX_PACE_S_PER_KM = 600
+
+# Activity IDs per IN list when looking up samples
+ID_CHUNK = 500
+
+logger = logging.getLogger(__name__)
+
+# Per database URL: the DuckDB connection, and whether the database is attached to it as ``gd``
+_connections: Dict[str, Tuple["duckdb.DuckDBPyConnection", bool]] = {}
+_connections_lock = threading.Lock()
+
+
+def _sql_string(value: str) -> str:
+    """SQL string literal; DuckDB's ATTACH takes no parameters."""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _load_extension(con, name: str):
+    """Load a DuckDB extension, downloading it only if it is not installed yet."""
+    try:
+        con.load_extension(name)
+        return
+    except duckdb.Error:
+        pass
+    try:
+        con.install_extension(name)
+        con.load_extension(name)
+    except duckdb.Error as e:
+        raise RuntimeError(f"DuckDB's {name} extension is not installed and could not be downloaded ({e})") from e
+
+
+def _attach_database(con, database_url: str):
+    """Attach the application database read-only as ``gd``."""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        if not url.database or url.database == ":memory:":
+            raise RuntimeError("Analytics needs a file-backed SQLite database")
+        _load_extension(con, "sqlite")
+        con.execute(f"ATTACH {_sql_string(url.database)} AS gd (TYPE sqlite, READ_ONLY)")
+    elif backend == "postgresql":
+        _load_extension(con, "postgres")
+        dsn = url.set(drivername="postgresql").render_as_string(hide_password=False)
+        con.execute(f"ATTACH {_sql_string(dsn)} AS gd (TYPE postgres, READ_ONLY)")
+    else:
+        raise RuntimeError(f"Analytics does not support {backend} databases")
+
+
+def _cursor(database_url: str) -> Tuple["duckdb.DuckDBPyConnection", bool]:
+    """
+    New cursor on the cached DuckDB connection for a database.
+
+    Returns:
+        The cursor, and whether the database is attached (with an ``activities`` view);
+        if not, the caller registers the tables read through SQLAlchemy
+    """
+    with _connections_lock:
+        if database_url not in _connections:
+            con = duckdb.connect()
+            try:
+                _attach_database(con, database_url)
+                con.execute("CREATE VIEW activities AS SELECT * FROM gd.activities")
+                attached = True
+            except (RuntimeError, duckdb.Error) as e:
+                logger.info(f"Analytics reads the database through SQLAlchemy: {e}")
+                con.close()
+                con = duckdb.connect()
+                attached = False
+            _connections[database_url] = (con, attached)
+        con, attached = _connections[database_url]
+    return con.cursor(), attached
+
+
+def close_analytics():
+    """Close the cached DuckDB connections."""
+    with _connections_lock:
+        for con, _ in _connections.values():
+            con.close()
+        _connections.clear()
+
+
+def _chunks(values: List[int], size: int = ID_CHUNK) -> Iterator[List[int]]:
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def _activities_frame(session) -> pd.DataFrame:
+    """The activities table as a DataFrame, for connections without the database attached."""
+    result = session.execute(select(Activity.__table__))
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+def _row_samples(session, activity_ids: List[int], channels: Sequence[str]) -> pd.DataFrame:
+    """The activities' rows of the samples table with the requested channels, read through SQLAlchemy."""
+    names = ["activity_id", "timestamp", *channels]
+    columns = [Sample.__table__.c[name] for name in names]
+    frames = []
+    for chunk in _chunks(activity_ids):
+        rows = session.execute(select(*columns).where(Sample.activity_id.in_(chunk))).all()
+        if rows:
+            frames.append(pd.DataFrame(rows, columns=names))
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=names)
+    frame["activity_id"] = frame["activity_id"].astype(np.int64)
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"])
+    frame[list(channels)] = frame[list(channels)].astype(np.float64)  # None becomes NaN
+    return frame
+
+
+def _arrow_samples(session, activity_ids: List[int], channels: Sequence[str]):
+    """One pyarrow Table of the activities' Arrow sample files, with an ``activity_id`` column; None if none."""
+    if not PYARROW_AVAILABLE:
+        return None
+    import pyarrow as pa
+
+    tables = []
+    for activity_id in activity_ids:
+        table = read_sample_file(session, activity_id, ["timestamp", *channels])
+        if table is not None and table.num_rows:
+            column = pa.array(np.full(table.num_rows, activity_id, dtype=np.int64))
+            tables.append(table.add_column(0, "activity_id", column))
+    if not tables:
+        return None
+    return pa.concat_tables(tables, promote_options="default")
+
+
+def _columnar_samples(session, activity_ids: List[int], channels: Sequence[str]) -> Optional[pd.DataFrame]:
+    """The activities' requested channels decoded from the columnar store as one DataFrame; None if none."""
+    frames: List[pd.DataFrame] = []
+    for chunk in _chunks(activity_ids):
+        stored = session.execute(
+            select(SampleChannel.activity_id).where(
+                SampleChannel.channel == TIMESTAMP_CHANNEL, SampleChannel.activity_id.in_(chunk)
+            )
+        ).scalars()
+        for activity_id in stored:
+            arrays = read_sample_channels(session, activity_id, channels)
+            frame = pd.DataFrame({"timestamp": arrays.timestamp, **{name: arrays.columns[name] for name in channels}})
+            frame.insert(0, "activity_id", activity_id)
+            frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+
+def _sample_select(source: str, columns: Sequence[str], nan_gaps: bool = True) -> str:
+    """SELECT of the samples view columns from a source with ``columns``; channels it lacks are NULL."""
+    selected = []
+    for name in SAMPLE_CHANNELS:
+        if name not in columns:
+            selected.append(f"CAST(NULL AS DOUBLE) AS {name}")
+        elif nan_gaps:
+            selected.append(f"NULLIF(CAST({name} AS DOUBLE), 'NaN'::DOUBLE) AS {name}")
+        else:
+            selected.append(f"CAST({name} AS DOUBLE) AS {name}")
+    return f'SELECT activity_id, CAST("timestamp" AS TIMESTAMP) AS "timestamp", {", ".join(selected)} FROM {source}'
+
+
+def _activity_filter(sport: Optional[str], start_date: Optional[date], end_date: Optional[date]) -> tuple:
+    """WHERE clause fragment and parameters restricting activities ``a`` by sport and whole days."""
+    clauses, parameters = [], []
+    if sport:
+        clauses.append("a.sport = ?")
+        parameters.append(sport)
+    if start_date:
+        clauses.append("CAST(a.start_time_utc AS TIMESTAMP) >= ?")
+        parameters.append(datetime.combine(start_date, datetime.min.time()))
+    if end_date:
+        clauses.append("CAST(a.start_time_utc AS TIMESTAMP) <= ?")
+        parameters.append(datetime.combine(end_date, datetime.max.time()))
+    return "".join(f" AND {clause}" for clause in clauses), parameters
+
+
+def open_analytics(
+    db_config: Optional[DatabaseConfig] = None,
+    sport: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    channels: Optional[Sequence[str]] = None,
+):
+    """
+    Open a DuckDB cursor with ``activities`` and ``samples`` views over every sample store.
+
+    The ``samples`` view holds the samples of the activities matching the
+    filters only; those are applied before any sample is read or decoded.
+
+    Args:
+        db_config: Database to analyse; defaults to the global configuration
+        sport: Only samples of activities of this sport
+        start_date: Only samples of activities from this day on (inclusive)
+        end_date: Only samples of activities up to this day (inclusive)
+        channels: Sample channels the query reads; all by default, the others are NULL
+
+    Returns:
+        duckdb.DuckDBPyConnection; the caller closes it
+
+    Raises:
+        RuntimeError: If duckdb is not installed
+    """
+    if not DUCKDB_AVAILABLE:
+        raise RuntimeError("duckdb is not installed")
+    db_config = db_config or get_db_config()
+    channels = [name for name in SAMPLE_CHANNELS if channels is None or name in channels]
+
+    con, attached = _cursor(db_config.database_url)
+    try:
+        if not attached:
+            with db_config.session_scope() as session:
+                con.register("activities", _activities_frame(session))
+        where, parameters = _activity_filter(sport, start_date, end_date)
+        matched = con.execute(f"SELECT a.id FROM activities a WHERE true{where}", parameters).fetchall()
+        activity_ids = [activity_id for (activity_id,) in matched]
+        con.register("matched_activities", pd.DataFrame({"id": np.array(activity_ids, dtype=np.int64)}))
+
+        with db_config.session_scope() as session:
+            row_samples = None if attached else _row_samples(session, activity_ids, channels)
+            arrow_samples = _arrow_samples(session, activity_ids, channels)
+            columnar_samples = _columnar_samples(session, activity_ids, channels)
+        if attached:
+            rows = _sample_select("gd.samples", channels, nan_gaps=False)
+            sources = [f"{rows} WHERE activity_id IN (SELECT id FROM matched_activities)"]
+        else:
+            con.register("row_samples", row_samples)
+            sources = [_sample_select("row_samples", list(row_samples.columns))]
+        if arrow_samples is not None:
+            con.register("arrow_samples", arrow_samples)
+            sources.append(_sample_select("arrow_samples", arrow_samples.schema.names))
+        if columnar_samples is not None:
+            con.register("columnar_samples", columnar_samples)
+            sources.append(_sample_select("columnar_samples", list(columnar_samples.columns)))
+        con.execute(f"CREATE OR REPLACE TEMP VIEW samples AS {' UNION ALL BY NAME '.join(sources)}")
+    except Exception:
+        con.close()
+        raise
+    return con
+
+
+def query(
+    sql: str,
+    parameters: Optional[Sequence] = None,
+    db_config: Optional[DatabaseConfig] = None,
+    sport: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    channels: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """
+    Run SQL over the ``activities`` and ``samples`` views.
+
+    Args:
+        sql: DuckDB SQL
+        parameters: Values for ``?`` placeholders
+        db_config: Database to analyse; defaults to the global configuration
+        sport: Restrict ``samples`` to activities of this sport
+        start_date: Restrict ``samples`` to activities from this day on (inclusive)
+        end_date: Restrict ``samples`` to activities up to this day (inclusive)
+        channels: Sample channels the SQL reads; all by default
+
+    Returns:
+        Result as a DataFrame
+    """
+    with closing(open_analytics(db_config, sport, start_date, end_date, channels)) as con:
+        return con.execute(sql, parameters or []).df()
+
+
+def hr_by_pace(
+    sport: str = "running",
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    bin_s: int = 15,
+    db_config: Optional[DatabaseConfig] = None,
+) -> pd.DataFrame:
+    """
+    Average heart rate per pace bin over every sample of the matching activities.
+
+    Args:
+        sport: Activity sport
+        start_date: First day of activities to include (inclusive)
+        end_date: Last day of activities to include (inclusive)
+        bin_s: Width of the pace bins in seconds per km
+        db_config: Database to analyse; defaults to the global configuration
+
+    Returns:
+        DataFrame with pace_s_per_km (bin start), avg_hr, samples and activities, ordered by pace
+    """
+    sql = """
+        WITH paced AS (
+            SELECT activity_id, heart_rate, 1000.0 / speed_mps AS pace_s_per_km
+            FROM samples
+            WHERE speed_mps > 0 AND heart_rate > 0
+        )
+        SELECT
+            CAST(floor(pace_s_per_km / ?) * ? AS INTEGER) AS pace_s_per_km,
+            avg(heart_rate) AS avg_hr,
+            count(*) AS samples,
+            count(DISTINCT activity_id) AS activities
+        FROM paced
+        WHERE pace_s_per_km BETWEEN ? AND ?
+        GROUP BY 1
+        ORDER BY 1
+    """
+    return query(
+        sql,
+        [bin_s, bin_s, MIN_PACE_S_PER_KM, MAX_PACE_S_PER_KM],
+        db_config,
+        sport=sport,
+        start_date=start_date,
+        end_date=end_date,
+        channels=("heart_rate", "speed_mps"),
+    )
+
+
+def time_in_hr_zones(
+    zones: Sequence[int] = (120, 140, 155, 170),
+    sport: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db_config: Optional[DatabaseConfig] = None,
+) -> pd.DataFrame:
+    """
+    Time spent in each heart rate zone over every sample of the matching activities.
+
+    Each sample counts for the seconds until the next sample of its activity (at most 10 s).
+
+    Args:
+        zones: Lower bounds (bpm) of zones 2 and up; zone 1 is everything below the first
+        sport: Activity sport, or None for all
+        start_date: First day of activities to include (inclusive)
+        end_date: Last day of activities to include (inclusive)
+        db_config: Database to analyse; defaults to the global configuration
+
+    Returns:
+        DataFrame with zone (1-based) and minutes, ordered by zone
+    """
+    zone_case = " ".join(
+        f"WHEN heart_rate >= {int(bound)} THEN {number}"
+        for number, bound in sorted(enumerate(zones, start=2), key=lambda zone: -zone[1])
+    )
+    sql = f"""
+        WITH timed AS (
+            SELECT
+                heart_rate,
+                least(coalesce(lead(elapsed_time_s) OVER w - elapsed_time_s, 1), 10) AS seconds
+            FROM samples
+            WHERE heart_rate > 0
+            WINDOW w AS (PARTITION BY activity_id ORDER BY elapsed_time_s)
+        )
+        SELECT
+            CASE {zone_case} ELSE 1 END AS zone,
+            sum(greatest(seconds, 0)) / 60.0 AS minutes
+        FROM timed
+        GROUP BY 1
+        ORDER BY 1
+    """
+    return query(
+        sql,
+        db_config=db_config,
+        sport=sport,
+        start_date=start_date,
+        end_date=end_date,
+        channels=("heart_rate", "elapsed_time_s"),
+    )
@@ -0,0 +1,259 @@
+"""
+Arrow IPC sidecar files for activity samples.
+
+With ``SAMPLE_STORE=arrow`` an activity's samples are written to one
+uncompressed Arrow IPC file, ``<sample_dir>/<activity_id>.arrow``, instead
+of the database (see DatabaseConfig for the sample directory). Reading
+memory-maps the file and selects only the requested columns, so the chart
+data is handed to pandas without a copy, and several dashboard processes
+opening the same activity share the OS page cache instead of each
+materializing the samples from SQL.
+
+Channels are stored as float64 with NaN for missing values (no validity
+bitmaps) and the timestamps as timestamp[us]; channels without any value
+are left out.
+
+Files follow the database transaction: a write goes to a hidden staging
+file next to the final one and deletes are only recorded, so a committed
+file is never touched before the commit. When the session commits, the
+staged files are renamed over the final paths and the deleted ones are
+unlinked; a file that cannot be moved makes the commit raise
+SampleFileError. Rolling back the session, or a savepoint, drops the changes made
+inside it. Within the session, reads see its own staged changes.
+
+pyarrow is optional; without it the store cannot be selected.
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+import uuid
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .models import SAMPLE_CHANNELS, SampleArrays
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_FILE_SUFFIX = ".arrow"
+_STAGED_SUFFIX = ".staged"
+
+# session.info keys: sample directory, and the file changes of the current transaction
+SAMPLE_DIR_KEY = "sample_dir"
+_STAGED_KEY = "sample_files_staged"
+
+
+class SampleFileError(OSError):
+    """Raised by a commit whose staged sample files could not be moved into place."""
+
+
+def sample_file_path(sample_dir, activity_id: int) -> Path:
+    """Path of an activity's sample file."""
+    return Path(sample_dir) / f"{activity_id}{SAMPLE_FILE_SUFFIX}"
+
+
+def _session_sample_dir(session) -> Optional[Path]:
+    sample_dir = session.info.get(SAMPLE_DIR_KEY)
+    return Path(sample_dir) if sample_dir else None
+
+
+def _current_transaction(session):
+    """The innermost transaction of the session: the open savepoint, if any, else the root transaction."""
+    return session.get_nested_transaction() or session.get_transaction() or session.begin()
+
+
+def _stage(session, path: Path, staged_path: Optional[Path]):
+    """Record a file change of the current transaction; ``staged_path`` None deletes ``path`` on commit."""
+    session.info.setdefault(_STAGED_KEY, []).append((_current_transaction(session), path, staged_path))
+
+
+def _visible_path(session, activity_id: int) -> Optional[Path]:
+    """Path holding an activity's samples as this session sees them, or None if it has no file."""
+    sample_dir = _session_sample_dir(session)
+    if sample_dir is None:
+        return None
+    path = sample_file_path(sample_dir, activity_id)
+    for _, changed_path, staged_path in reversed(session.info.get(_STAGED_KEY, ())):
+        if changed_path == path:
+            return staged_path
+    return path if path.exists() else None
+
+
+def write_sample_file(session, activity_id: int, arrays: SampleArrays) -> int:
+    """
+    Write an activity's samples to its Arrow file, replacing any previous one.
+
+    Samples without a timestamp are dropped and a missing elapsed time is
+    stored as 0, as in the samples table (see SampleArrays.to_rows).
+
+    Args:
+        session: Active database session, configured with a sample directory
+        activity_id: ID of the stored Activity row
+        arrays: The activity's samples
+
+    Returns:
+        Number of samples written
+
+    Raises:
+        RuntimeError: If pyarrow is not installed or the session has no sample directory
+    """
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow is not installed")
+    sample_dir = _session_sample_dir(session)
+    if sample_dir is None:
+        raise RuntimeError("No sample directory configured for this session")
+
+    keep = ~np.isnat(arrays.timestamp)
+    if not keep.all():
+        arrays = arrays[np.flatnonzero(keep)]
+    if not len(arrays):
+        return 0
+
+    columns = {"timestamp": pa.array(arrays.timestamp, type=pa.timestamp("us"))}
+    for name in SAMPLE_CHANNELS:
+        values = arrays.columns[name]
+        if name == "elapsed_time_s":
+            values = np.where(np.isnan(values), 0.0, values)
+        elif np.isnan(values).all():
+            continue
+        # from_numpy keeps NaN as a value, so the column has no validity bitmap and maps zero-copy
+        columns[name] = pa.array(values, type=pa.float64(), from_pandas=False)
+    table = pa.table(columns)
+
+    path = sample_file_path(sample_dir, activity_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staged_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}{_STAGED_SUFFIX}")
+    with pa.OSFile(str(staged_path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    _stage(session, path, staged_path)
+    return len(arrays)
+
+
+def read_sample_file(session, activity_id: int, columns: Optional[Sequence[str]] = None):
+    """
+    Memory-map an activity's Arrow file.
+
+    Args:
+        session: Active database session, configured with a sample directory
+        activity_id: Activity ID
+        columns: Columns to return, where stored; all by default
+
+    Returns:
+        pyarrow Table backed by the mapped file, or None if the activity has no file
+        (or pyarrow is not installed)
+    """
+    if not PYARROW_AVAILABLE:
+        return None
+    path = _visible_path(session, activity_id)
+    if path is None:
+        return None
+    try:
+        source = pa.memory_map(str(path), "r")
+    except FileNotFoundError:
+        return None
+    table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select([name for name in columns if name in table.schema.names])
+    return table
+
+
+def sample_file_count(session, activity_ids: Iterable[int]) -> int:
+    """Number of samples in the Arrow files of the given activities, read from the file footers."""
+    if not PYARROW_AVAILABLE:
+        return 0
+    count = 0
+    for activity_id in activity_ids:
+        path = _visible_path(session, activity_id)
+        if path is None:
+            continue
+        try:
+            source = pa.memory_map(str(path), "r")
+        except FileNotFoundError:
+            continue
+        reader = pa.ipc.open_file(source)
+        count += sum(reader.get_batch(index).num_rows for index in range(reader.num_record_batches))
+    return count
+
+
+def has_sample_file(session, activity_id: int) -> bool:
+    """True if the activity has an Arrow sample file, as this session sees it."""
+    return _visible_path(session, activity_id) is not None
+
+
+def discard_sample_files(session, activity_ids: Iterable[int]):
+    """Delete the Arrow files of the given activities once the session commits."""
+    sample_dir = _session_sample_dir(session)
+    if sample_dir is None:
+        return
+    for activity_id in activity_ids:
+        _stage(session, sample_file_path(sample_dir, activity_id), None)
+
+
+def _unlink(paths: Iterable[Path]):
+    for path in paths:
+        try:
+            path.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Could not delete sample file {path}: {e}")
+
+
+def _within(transaction, ancestor) -> bool:
+    """True if ``transaction`` is ``ancestor`` or one of its savepoints."""
+    while transaction is not None:
+        if transaction is ancestor:
+            return True
+        transaction = transaction.parent
+    return False
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_sample_files(session):
+    latest = {}
+    superseded = []
+    for _, path, staged_path in session.info.pop(_STAGED_KEY, ()):
+        if path in latest and latest[path] is not None:
+            superseded.append(latest[path])
+        latest[path] = staged_path
+    _unlink(superseded)
+    failed = []
+    for path, staged_path in latest.items():
+        if staged_path is None:
+            _unlink([path])
+            continue
+        try:
+            os.replace(staged_path, path)
+        except OSError as e:
+            logger.error(f"Could not move sample file {staged_path} to {path}: {e}")
+            failed.append(path)
+    if failed:
+        # The rows are committed by now; surface the missing samples to whoever committed
+        raise SampleFileError(f"Sample files not stored after commit: {', '.join(map(str, failed))}")
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _revert_sample_files(session, previous_transaction):
+    # Drops the changes of the rolled back transaction or savepoint, and of savepoints inside it
+    staged = session.info.get(_STAGED_KEY)
+    if not staged:
+        return
+    kept = [entry for entry in staged if not _within(entry[0], previous_transaction)]
+    _unlink(entry[2] for entry in staged if entry[2] is not None and _within(entry[0], previous_transaction))
+    session.info[_STAGED_KEY] = kept
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_staged_sample_files(session, transaction):
+    # A session closed without commit or rollback leaves nothing staged behind
+    if transaction.parent is None:
+        _unlink(entry[2] for entry in session.info.pop(_STAGED_KEY, ()) if entry[2] is not None)
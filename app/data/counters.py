@@ -0,0 +1,85 @@
+"""
+Maintained row counts of the large tables.
+
+Database statistics (app startup, the settings page, gd-import status) used
+to run COUNT(*) over activities, samples, route points and laps, a full scan
+of tens of millions of sample rows. Instead, the ingest and delete paths
+(ingest/persist.py, ingest/duplicates.py) adjust a TableCount row per table
+in the transaction that inserts or deletes the rows, so a rollback undoes
+the adjustment too and reading the statistics is a primary key lookup.
+
+The samples count covers all three sample stores. ``recount`` replaces the
+counters with exact COUNT(*) values; it runs once when the counters table
+is new and on request (``gd-import status --recount``).
+"""
+
+import logging
+from typing import Dict, List
+
+from sqlalchemy import delete, func, insert, select, update
+
+from .arrow_store import sample_file_count
+from .models import Activity, Lap, RoutePoint, Sample, TableCount
+from .sample_store import columnar_sample_count
+
+logger = logging.getLogger(__name__)
+
+COUNTED_TABLES = ("activities", "samples", "route_points", "laps")
+
+
+def adjust_counts(session, **deltas: int):
+    """
+    Add row count changes to the counters, in the session's transaction.
+
+    Args:
+        session: Active database session that also inserts or deletes the rows
+        **deltas: Change per counted table, e.g. ``samples=3600``; zeros are skipped
+    """
+    for name, delta in deltas.items():
+        if delta:
+            session.execute(update(TableCount).where(TableCount.name == name).values(count=TableCount.count + delta))
+
+
+def stored_sample_count(session, activity_ids: List[int]) -> int:
+    """Number of samples of the given activities across the row, columnar and Arrow stores."""
+    rows = session.execute(select(func.count()).select_from(Sample).where(Sample.activity_id.in_(activity_ids)))
+    return rows.scalar() + columnar_sample_count(session, activity_ids) + sample_file_count(session, activity_ids)
+
+
+def exact_counts(session) -> Dict[str, int]:
+    """Count every counted table with COUNT(*) scans."""
+    activity_ids = session.execute(select(Activity.id)).scalars().all()
+    samples = session.query(Sample).count() + columnar_sample_count(session) + sample_file_count(session, activity_ids)
+    return {
+        "activities": len(activity_ids),
+        "samples": samples,
+        "route_points": session.query(RoutePoint).count(),
+        "laps": session.query(Lap).count(),
+    }
+
+
+def recount(session) -> Dict[str, int]:
+    """
+    Replace the counters with exact counts.
+
+    Returns:
+        The exact counts, keyed by table name
+    """
+    counts = exact_counts(session)
+    session.execute(delete(TableCount))
+    session.execute(insert(TableCount), [{"name": name, "count": count} for name, count in counts.items()])
+    logger.info(f"Recounted table rows: {counts}")
+    return counts
+
+
+def read_counts(session) -> Dict[str, int]:
+    """
+    Read the maintained counts, recounting first if a counter is missing.
+
+    Returns:
+        Row count per counted table
+    """
+    counts = dict(session.execute(select(TableCount.name, TableCount.count)).all())
+    if any(name not in counts for name in COUNTED_TABLES):
+        return recount(session)
+    return {name: counts[name] for name in COUNTED_TABLES}
@@ -9,11 +9,14 @@ with proper connection handling and performance optimization.
 from contextlib import contextmanager
 import logging
 import os
-from typing import TYPE_CHECKING, Generator, Optional
+import threading
+from typing import TYPE_CHECKING, Callable, Generator, Optional, TypeVar
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import UniqueConstraint, create_engine, event, inspect, select, text, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, scoped_session, sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import QueuePool, StaticPool
 
 if TYPE_CHECKING:
     from sqlalchemy.engine import Engine
@@ -26,70 +29,155 @@ else:
 
         Engine = engine.Engine
 
+from .arrow_store import PYARROW_AVAILABLE, SAMPLE_DIR_KEY
+from .counters import COUNTED_TABLES, read_counts, recount
 from .models import Base
+from .sample_store import DEFAULT_SAMPLE_STORE, SAMPLE_STORES
+from .writer import WRITE_TRANSACTION, DatabaseWriter
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+
+# Pooled SQLite connections: enough for the Dash callback threads, the sync thread and the writer
+SQLITE_POOL_SIZE = 8
+SQLITE_POOL_OVERFLOW = 16
+SQLITE_BUSY_TIMEOUT_S = 30
+
+
+def _is_memory_sqlite(database_url: str) -> bool:
+    database = make_url(database_url).database
+    return not database or database == ":memory:" or database.startswith("file::memory:")
+
+
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    """Per-connection SQLite setup, run when the pool opens a connection."""
+    # Let SQLAlchemy emit BEGIN (see _begin_sqlite_transaction) instead of pysqlite,
+    # whose implicit transactions break SAVEPOINT
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")  # Readers do not block the writer, nor it them
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA cache_size=10000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def _begin_sqlite_transaction(conn):
+    options = conn.get_execution_options()
+    if options.get("isolation_level") == "AUTOCOMMIT":
+        return
+    # The writer takes the write lock up front: a deferred transaction that read first
+    # cannot upgrade once another connection has committed, and busy_timeout does not help
+    conn.exec_driver_sql("BEGIN IMMEDIATE" if options.get(WRITE_TRANSACTION) else "BEGIN")
+
+
+def default_sample_dir(database_url: str) -> str:
+    """Directory for Arrow sample files: next to a SQLite database file, else ./samples."""
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:":
+        return f"{url.database}.samples"
+    return "samples"
+
 
 class DatabaseConfig:
     """Database configuration and connection management."""
 
-    def __init__(self, database_url: Optional[str] = None):
+    def __init__(
+        self, database_url: Optional[str] = None, sample_store: Optional[str] = None, sample_dir: Optional[str] = None
+    ):
         """
         Initialize database configuration.
 
         Args:
             database_url: SQLAlchemy database URL. Defaults to SQLite file.
+            sample_store: Where new samples are stored, 'rows', 'columnar' or 'arrow'
+                (see app/data/sample_store.py). Defaults to $SAMPLE_STORE, then 'rows'.
+            sample_dir: Directory of the Arrow sample files. Defaults to $SAMPLE_DIR, then
+                '<database file>.samples' next to a SQLite database, then 'samples'.
+
+        Raises:
+            ValueError: If sample_store is not a known store
+            RuntimeError: If the Arrow store is selected without pyarrow installed
         """
         # Use provided URL, then environment variable, then default
         self.database_url = database_url or os.getenv("DATABASE_URL") or "sqlite:///garmin_dashboard.db"
+        self.sample_store = sample_store or os.getenv("SAMPLE_STORE") or DEFAULT_SAMPLE_STORE
+        if self.sample_store not in SAMPLE_STORES:
+            raise ValueError(f"Unknown sample store {self.sample_store!r}; expected one of {SAMPLE_STORES}")
+        if self.sample_store == "arrow" and not PYARROW_AVAILABLE:
+            raise RuntimeError("SAMPLE_STORE=arrow needs pyarrow; pip install pyarrow")
+        self.sample_dir = sample_dir or os.getenv("SAMPLE_DIR") or default_sample_dir(self.database_url)
 
         logger.info(f"Database URL: {self.database_url}")
         self._engine: Optional[Engine] = None
         self._session_factory: Optional[sessionmaker] = None
         self._scoped_session: Optional[scoped_session] = None
+        self._writer: Optional[DatabaseWriter] = None
+        self._writer_lock = threading.Lock()
+        self._table_counts_ready = False
 
     @property
     def engine(self):
         """Get or create SQLAlchemy engine with optimized settings."""
         if self._engine is None:
             connect_args = {}
+            pool_options = {}
+            pooled_sqlite = False
 
             # SQLite-specific optimizations
             if self.database_url.startswith("sqlite"):
                 connect_args = {
-                    "check_same_thread": False,  # Allow multi-threading
+                    "check_same_thread": False,  # Pooled connections move between threads
+                    "timeout": SQLITE_BUSY_TIMEOUT_S,  # Wait for another process's write lock
                 }
-                # Enable Write-Ahead Logging for better concurrency
-                pool_class = StaticPool
-            else:
-                pool_class = None
+                if _is_memory_sqlite(self.database_url):
+                    # Every connection to :memory: is a separate database; share one
+                    pool_options = {"poolclass": StaticPool}
+                else:
+                    # One connection per concurrent session; WAL lets them read while the writer writes
+                    pooled_sqlite = True
+                    pool_options = {
+                        "poolclass": QueuePool,
+                        "pool_size": SQLITE_POOL_SIZE,
+                        "max_overflow": SQLITE_POOL_OVERFLOW,
+                    }
 
             self._engine = create_engine(
                 self.database_url,
                 connect_args=connect_args,
-                poolclass=pool_class,
                 echo=False,  # Set to True for SQL debugging
                 future=True,  # Use SQLAlchemy 2.0 style
+                **pool_options,
             )
 
-            # Set SQLite-specific pragmas for performance
-            if self.database_url.startswith("sqlite"):
-                with self._engine.connect() as conn:
-                    conn.execute(text("PRAGMA journal_mode=WAL"))
-                    conn.execute(text("PRAGMA synchronous=NORMAL"))
-                    conn.execute(text("PRAGMA cache_size=10000"))
-                    conn.execute(text("PRAGMA temp_store=MEMORY"))
-                    conn.commit()
+            # A shared :memory: connection cannot hold one explicit transaction per session
+            if pooled_sqlite:
+                event.listen(self._engine, "connect", _configure_sqlite_connection)
+                event.listen(self._engine, "begin", _begin_sqlite_transaction)
 
         return self._engine
 
+    @property
+    def writer(self) -> DatabaseWriter:
+        """Get the thread that runs every write job of this database (see app/data/writer.py)."""
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = DatabaseWriter(self.session_factory)
+        return self._writer
+
     @property
     def session_factory(self) -> sessionmaker:
         """Get session factory for creating database sessions."""
         if self._session_factory is None:
             self._session_factory = sessionmaker(
-                bind=self.engine, expire_on_commit=False, autoflush=True, autocommit=False, future=True
+                bind=self.engine,
+                expire_on_commit=False,
+                autoflush=True,
+                autocommit=False,
+                future=True,
+                info={"sample_store": self.sample_store, SAMPLE_DIR_KEY: self.sample_dir},
             )
         return self._session_factory
 
@@ -123,6 +211,137 @@ class DatabaseConfig:
             except Exception as recreate_error:
                 logger.error(f"Failed to recreate tables: {recreate_error}")
                 raise
+        # Outside the try: a failed upgrade must never fall through to drop_all
+        self.add_missing_columns()
+        self.add_missing_indexes()
+        self.add_missing_unique_constraints()
+        self.fill_start_buckets()
+        self.init_table_counts()
+
+    def add_missing_columns(self):
+        """
+        Add model columns that an existing database's tables lack.
+
+        ``create_all`` only creates missing tables, so columns added to a
+        model later (e.g. ``Activity.samples_hydrated``) are added here with
+        their server default, which also fills the existing rows.
+        """
+        inspector = inspect(self.engine)
+        existing_tables = set(inspector.get_table_names())
+        dialect = self.engine.dialect
+        with self.engine.begin() as conn:
+            for table in Base.metadata.sorted_tables:
+                if table.name not in existing_tables:
+                    continue
+                present = {column["name"] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in present:
+                        continue
+                    ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=dialect)}"
+                    if column.server_default is not None:
+                        default = column.server_default.arg
+                        if not isinstance(default, str):
+                            default = default.compile(dialect=dialect)
+                        ddl += f" DEFAULT {default}"
+                    logger.info(f"Adding column {table.name}.{column.name}")
+                    conn.execute(text(ddl))
+
+    def add_missing_indexes(self):
+        """Create model indexes, such as those of columns added by add_missing_columns, that existing tables lack."""
+        inspector = inspect(self.engine)
+        existing_tables = set(inspector.get_table_names())
+        with self.engine.begin() as conn:
+            for table in Base.metadata.sorted_tables:
+                if table.name not in existing_tables:
+                    continue
+                present = {index["name"] for index in inspector.get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name not in present:
+                        logger.info(f"Adding index {index.name}")
+                        index.create(conn)
+
+    def add_missing_unique_constraints(self):
+        """
+        Enforce model unique constraints that an existing database's tables lack.
+
+        Tables created before a constraint was declared (e.g.
+        ``uq_activity_file_hash``) get a unique index of the same name, which
+        conflict-handling inserts treat like the constraint. If the stored
+        rows already violate it, the index is skipped with a warning and
+        the table keeps working without it.
+        """
+        inspector = inspect(self.engine)
+        existing_tables = set(inspector.get_table_names())
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {constraint["name"] for constraint in inspector.get_unique_constraints(table.name)}
+            present.update(index["name"] for index in inspector.get_indexes(table.name))
+            for constraint in table.constraints:
+                # Only named constraints can be matched against an existing table
+                if not isinstance(constraint, UniqueConstraint) or not isinstance(constraint.name, str):
+                    continue
+                if constraint.name in present:
+                    continue
+                columns = ", ".join(column.name for column in constraint.columns)
+                try:
+                    with self.engine.begin() as conn:
+                        conn.execute(text(f"CREATE UNIQUE INDEX {constraint.name} ON {table.name} ({columns})"))
+                    logger.info(f"Added unique index {constraint.name} on {table.name} ({columns})")
+                except IntegrityError:
+                    logger.warning(
+                        f"Not enforcing {constraint.name}: {table.name} has rows with duplicate ({columns}); "
+                        "remove the duplicates and restart to enable it"
+                    )
+
+    def fill_start_buckets(self, batch_size: int = 5000) -> int:
+        """
+        Set ``Activity.start_bucket`` on rows stored before the column existed.
+
+        Args:
+            batch_size: Rows read and updated per round trip
+
+        Returns:
+            Number of activities updated
+        """
+        from .models import Activity, start_bucket
+
+        filled = 0
+        with self.session_scope() as session:
+            while True:
+                rows = session.execute(
+                    select(Activity.id, Activity.start_time_utc)
+                    .where(Activity.start_bucket.is_(None), Activity.start_time_utc.isnot(None))
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                session.execute(
+                    update(Activity),
+                    [{"id": activity_id, "start_bucket": start_bucket(start)} for activity_id, start in rows],
+                )
+                filled += len(rows)
+        if filled:
+            logger.info(f"Filled start buckets of {filled} activities")
+        return filled
+
+    def init_table_counts(self) -> bool:
+        """
+        Create and fill the maintained row counters if missing, e.g. on a database stored before them.
+
+        Returns:
+            True if the counters were (re)counted
+        """
+        from .models import TableCount
+
+        TableCount.__table__.create(self.engine, checkfirst=True)
+        self._table_counts_ready = True
+        with self.session_scope() as session:
+            names = set(session.execute(select(TableCount.name)).scalars())
+            if names.issuperset(COUNTED_TABLES):
+                return False
+            recount(session)
+        return True
 
     def drop_all_tables(self):
         """Drop all database tables (use with caution!)."""
@@ -156,28 +375,32 @@ class DatabaseConfig:
             session.close()
 
     def close_all_sessions(self):
-        """Close all active sessions (useful for cleanup)."""
+        """Close all active sessions and stop the writer thread (useful for cleanup)."""
         if self._scoped_session:
             self._scoped_session.remove()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
 
-    def get_database_info(self) -> dict:
-        """Get database information for debugging/monitoring."""
-        with self.session_scope() as session:
-            # Get table counts
-            from .models import Activity, Lap, RoutePoint, Sample
+    def get_database_info(self, exact: bool = False) -> dict:
+        """
+        Get database information for debugging/monitoring.
 
-            activity_count = session.query(Activity).count()
-            sample_count = session.query(Sample).count()
-            route_point_count = session.query(RoutePoint).count()
-            lap_count = session.query(Lap).count()
+        Row counts come from the maintained counters (see app/data/counters.py)
+        instead of COUNT(*) scans.
 
-            return {
-                "database_url": self.database_url,
-                "activities": activity_count,
-                "samples": sample_count,
-                "route_points": route_point_count,
-                "laps": lap_count,
-            }
+        Args:
+            exact: Recount every table and store the exact counts first
+
+        Returns:
+            Database URL and row counts of activities, samples, route points and laps
+        """
+        # Opened without create_all_tables, e.g. by `gd-import status` on a database stored before the counters
+        if not self._table_counts_ready:
+            self.init_table_counts()
+        with self.session_scope() as session:
+            counts = recount(session) if exact else read_counts(session)
+            return {"database_url": self.database_url, **counts}
 
 
 # Global database instance
@@ -192,18 +415,22 @@ def get_db_config() -> DatabaseConfig:
     return _db_config
 
 
-def init_database(database_url: Optional[str] = None) -> DatabaseConfig:
+def init_database(
+    database_url: Optional[str] = None, sample_store: Optional[str] = None, sample_dir: Optional[str] = None
+) -> DatabaseConfig:
     """
     Initialize the database with optional custom URL.
 
     Args:
         database_url: Custom database URL (optional)
+        sample_store: Store for new samples, 'rows', 'columnar' or 'arrow' (optional)
+        sample_dir: Directory of the Arrow sample files (optional)
 
     Returns:
         DatabaseConfig instance
     """
     global _db_config
-    _db_config = DatabaseConfig(database_url)
+    _db_config = DatabaseConfig(database_url, sample_store, sample_dir)
 
     # Import all models to ensure they're registered with Base.metadata
     from . import garmin_models  # This imports all wellness models
@@ -226,6 +453,19 @@ def session_scope() -> Generator[Session, None, None]:
         yield session
 
 
+def run_write(job: Callable[[Session], T]) -> T:
+    """
+    Run a write job on the global config's writer thread and wait for its commit.
+
+    Args:
+        job: Callable taking the writer's Session; it must not commit
+
+    Returns:
+        The job's return value
+    """
+    return get_db_config().writer.run(job)
+
+
 def close_database():
     """Close database connections and clean up."""
     global _db_config
@@ -50,7 +50,6 @@ class UserProfile(Base):
     retrieved_at = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
 
     __table_args__ = (
-        Index("ix_user_profile_user_id", "user_id"),
         Index("ix_user_profile_retrieved", "retrieved_at"),
     )
 
@@ -367,7 +366,6 @@ class TrainingStatus(Base):
     retrieved_at = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
 
     __table_args__ = (
-        Index("ix_training_status_date", "date"),
         Index("ix_training_status_key", "training_status_key"),
     )
 
@@ -397,7 +395,6 @@ class MaxMetrics(Base):
     retrieved_at = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
 
     __table_args__ = (
-        Index("ix_max_metrics_date", "date"),
         Index("ix_vo2_max", "vo2_max_value"),
         Index("ix_fitness_age", "fitness_age"),
     )
@@ -4,10 +4,26 @@ SQLAlchemy 2.0 models with type annotations for Garmin Dashboard.
 Enhanced with research-validated patterns for performance and relationships.
 """
 
-from datetime import datetime, timezone
-from typing import List, Optional
-
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, Text
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+    true,
+)
 from sqlalchemy.orm import declarative_base, relationship
 
 # Support for both SQLAlchemy 1.4+ and 2.0+
@@ -34,6 +50,19 @@ except ImportError:
         return Column(*args, **kwargs)
 
 
+# Width of Activity.start_bucket; recordings of one workout start within a bucket of each other
+START_BUCKET_SECONDS = 60
+
+
+def start_bucket(start_time: Optional[datetime]) -> Optional[int]:
+    """Return the START_BUCKET_SECONDS bucket of a start time since the Unix epoch; naive times are UTC."""
+    if start_time is None:
+        return None
+    if start_time.tzinfo is None:
+        start_time = start_time.replace(tzinfo=timezone.utc)
+    return int(start_time.timestamp()) // START_BUCKET_SECONDS
+
+
 class Activity(Base):
     """
     Main activity model storing workout/exercise data from various sources.
@@ -47,8 +76,8 @@ class Activity(Base):
     # Primary key and identifiers
     id = mapped_column(Integer, primary_key=True)
     external_id = mapped_column(String(100), index=True)
-    garmin_activity_id = mapped_column(String(50), index=True)  # Garmin Connect activity ID
-    file_hash = mapped_column(String(64))  # For deduplication
+    garmin_activity_id = mapped_column(String(50))  # Garmin Connect activity ID (unique)
+    file_hash = mapped_column(String(64))  # SHA-256 of the source file (unique, for deduplication)
 
     # Activity metadata
     source = mapped_column(String(20))  # 'fit', 'tcx', 'gpx', 'garmindb'
@@ -58,6 +87,8 @@ class Activity(Base):
 
     # Temporal data (research-validated timezone handling)
     start_time_utc = mapped_column(DateTime(timezone=True), index=True)
+    # start_bucket(start_time_utc); indexed lookup of the same workout recorded by another source
+    start_bucket = mapped_column(Integer, index=True)
     local_timezone = mapped_column(String(50))
     elapsed_time_s = mapped_column(Integer)
     moving_time_s = mapped_column(Integer)
@@ -77,20 +108,27 @@ class Activity(Base):
     # File tracking
     file_path = mapped_column(Text)
     ingested_on = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+    # False while only the summary and laps are stored; samples and route points are loaded on demand
+    samples_hydrated = mapped_column(Boolean, default=True, server_default=true())
+    hydration_error = mapped_column(Text)  # Why loading the samples failed; set activities are not retried on open
 
     # User annotations
     comments = mapped_column(Text)  # User-editable comments for this activity
 
     # Relationships
     samples = relationship("Sample", back_populates="activity", cascade="all, delete-orphan", lazy="select")
+    sample_channels = relationship(
+        "SampleChannel", back_populates="activity", cascade="all, delete-orphan", lazy="select"
+    )
     route_points = relationship("RoutePoint", back_populates="activity", cascade="all, delete-orphan", lazy="select")
     laps = relationship("Lap", back_populates="activity", cascade="all, delete-orphan", lazy="select")
 
-    # Enhanced indexing from research
+    # Enhanced indexing from research; the unique keys make inserts idempotent (see ingest/persist.py)
     __table_args__ = (
         Index("ix_activity_sport_date", "sport", "start_time_utc"),
-        Index("ix_activity_hash", "file_hash"),
         Index("ix_activity_source", "source"),
+        UniqueConstraint("file_hash", name="uq_activity_file_hash"),
+        UniqueConstraint("garmin_activity_id", name="uq_activity_garmin_activity_id"),
     )
 
     def to_dict(self) -> dict:
@@ -167,6 +205,30 @@ class Sample(Base):
     )
 
 
+class SampleChannel(Base):
+    """
+    One compressed time series channel of an activity (columnar sample store).
+
+    Holds a whole channel of the activity's samples as a compressed typed
+    array; see app/data/sample_store.py for the encodings.
+    """
+
+    __tablename__ = "sample_channels"
+
+    id = mapped_column(Integer, primary_key=True)
+    activity_id = mapped_column(Integer, ForeignKey("activities.id"), index=True)
+    channel = mapped_column(String(40), nullable=False)  # 'timestamp' or a SAMPLE_CHANNELS name
+    encoding = mapped_column(String(20), nullable=False)  # 'f32' or 'delta<bits>:<scale>'
+    count = mapped_column(Integer, nullable=False)  # Number of samples
+    data = mapped_column(LargeBinary, nullable=False)
+    mask = mapped_column(LargeBinary)  # Packed validity bitmap; NULL when no value is missing
+
+    # Relationship
+    activity = relationship("Activity", back_populates="sample_channels")
+
+    __table_args__ = (UniqueConstraint("activity_id", "channel", name="uq_sample_channel"),)
+
+
 class RoutePoint(Base):
     """
     Simplified GPS route points for map visualization.
@@ -224,6 +286,70 @@ class Lap(Base):
     __table_args__ = (Index("ix_lap_activity_index", "activity_id", "lap_index"),)
 
 
+class ImportManifest(Base):
+    """
+    Import outcome for every file gd-import has processed.
+
+    Keyed by path and validated by size and modification time, so files that
+    have not changed since the last run are skipped after a stat call,
+    without being re-read, re-hashed or looked up by hash.
+    """
+
+    __tablename__ = "import_manifest"
+
+    id = mapped_column(Integer, primary_key=True)
+    path = mapped_column(Text, nullable=False, unique=True)
+    size_bytes = mapped_column(BigInteger, nullable=False)
+    mtime_ns = mapped_column(BigInteger, nullable=False)
+    file_hash = mapped_column(String(64), index=True)
+
+    # 'imported', 'duplicate', 'parse_error' or 'no_data'
+    outcome = mapped_column(String(20), nullable=False)
+    detail = mapped_column(Text)
+    activity_id = mapped_column(Integer)
+    updated_at = mapped_column(
+        DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc)
+    )
+
+
+class ParseFailure(Base):
+    """
+    Negative cache of file contents the parsers rejected.
+
+    Keyed by file hash and parser version, so a copy or a touched file is
+    not parsed again only to fail again, while a parser upgrade (a new
+    PARSER_VERSION) retries every failure.
+    """
+
+    __tablename__ = "parse_failures"
+
+    id = mapped_column(Integer, primary_key=True)
+    file_hash = mapped_column(String(64), nullable=False)
+    parser_version = mapped_column(Integer, nullable=False)
+    reason = mapped_column(Text, nullable=False)
+    file_path = mapped_column(Text)  # Last path the contents were seen at
+    failed_at = mapped_column(
+        DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc)
+    )
+
+    __table_args__ = (UniqueConstraint("file_hash", "parser_version", name="uq_parse_failure_hash_version"),)
+
+
+class TableCount(Base):
+    """
+    Maintained row count of a large table.
+
+    Updated in the same transaction as the inserts and deletes it counts,
+    so database statistics are read without a COUNT(*) scan (see
+    app/data/counters.py). The samples count covers every sample store.
+    """
+
+    __tablename__ = "table_counts"
+
+    name = mapped_column(String(64), primary_key=True)
+    count = mapped_column(BigInteger, nullable=False, default=0)
+
+
 class ActivityData:
     """
     Data transfer object for parsed activity data.
@@ -249,10 +375,11 @@ class ActivityData:
         elevation_gain_m: Optional[float] = None,
         elevation_loss_m: Optional[float] = None,
         calories: Optional[int] = None,
-        samples: Optional[List["SampleData"]] = None,
+        samples: Optional[Union["SampleArrays", List["SampleData"]]] = None,
         route_points: Optional[List[tuple]] = None,  # [(lat, lon, alt), ...]
         laps: Optional[List["LapData"]] = None,
         hr_zones: Optional[dict] = None,
+        summary_only: bool = False,
     ):
         self.external_id = external_id
         self.sport = sport
@@ -274,6 +401,245 @@ class ActivityData:
         self.route_points = route_points or []
         self.laps = laps or []
         self.hr_zones = hr_zones or {}
+        # Parsed without samples or route points (see ActivityParser summary_only)
+        self.summary_only = summary_only
+
+    @property
+    def samples(self) -> "SampleArrays":
+        """Time series samples as a columnar SampleArrays container."""
+        return self._samples
+
+    @samples.setter
+    def samples(self, value: Optional[Union["SampleArrays", List["SampleData"]]]):
+        if isinstance(value, SampleArrays):
+            self._samples = value
+        else:
+            self._samples = SampleArrays.from_samples(value or [])
+
+
+# Sample channels in Sample column order; every channel is stored as float64 with NaN for missing values
+SAMPLE_CHANNELS = (
+    "elapsed_time_s",
+    "latitude",
+    "longitude",
+    "altitude_m",
+    "heart_rate",
+    "power_w",
+    "cadence_rpm",
+    "speed_mps",
+    "temperature_c",
+    "vertical_oscillation_mm",
+    "vertical_ratio",
+    "ground_contact_time_ms",
+    "ground_contact_balance_pct",
+    "step_length_mm",
+    "air_power_w",
+    "form_power_w",
+    "leg_spring_stiffness",
+    "impact_loading_rate",
+    "stryd_temperature_c",
+    "stryd_humidity_pct",
+)
+
+# Channels backed by Integer columns in the samples table
+INTEGER_SAMPLE_CHANNELS = frozenset({"elapsed_time_s", "heart_rate", "cadence_rpm"})
+
+# int64 encoding of NaT, and the origin/unit SampleArraysBuilder stores timestamps in
+_NAT_INT64 = np.iinfo(np.int64).min
+_UNIX_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Normalise a datetime to naive UTC so it can be stored in a datetime64 array."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class SampleArrays:
+    """
+    Columnar (struct-of-arrays) container for activity time series.
+
+    Holds one float64 NumPy array per channel in SAMPLE_CHANNELS, with NaN
+    marking missing values, plus a datetime64[us] timestamp array in naive
+    UTC (NaT when missing). Parsers fill it through SampleArraysBuilder and
+    persistence reads whole columns, so no per-record objects are created.
+    Indexing or iterating still yields SampleData views for callers that
+    need a single record.
+    """
+
+    def __init__(self, timestamp: Optional[np.ndarray] = None, **channels: np.ndarray):
+        unknown = set(channels) - set(SAMPLE_CHANNELS)
+        if unknown:
+            raise ValueError(f"Unknown sample channels: {sorted(unknown)}")
+
+        if timestamp is None:
+            lengths = {len(values) for values in channels.values()}
+            length = lengths.pop() if lengths else 0
+            timestamp = np.full(length, np.datetime64("NaT"), dtype="datetime64[us]")
+        self.timestamp = np.asarray(timestamp, dtype="datetime64[us]")
+
+        length = len(self.timestamp)
+        self.columns: Dict[str, np.ndarray] = {}
+        for name in SAMPLE_CHANNELS:
+            values = channels.get(name)
+            if values is None:
+                self.columns[name] = np.full(length, np.nan)
+            else:
+                column = np.asarray(values, dtype=np.float64)
+                if len(column) != length:
+                    raise ValueError(f"Channel {name} has {len(column)} values, expected {length}")
+                self.columns[name] = column
+
+    @classmethod
+    def from_samples(cls, samples: Iterable["SampleData"]) -> "SampleArrays":
+        """Build columnar arrays from SampleData records."""
+        builder = SampleArraysBuilder()
+        for sample in samples:
+            builder.append(sample.timestamp, **{name: getattr(sample, name) for name in SAMPLE_CHANNELS})
+        return builder.build()
+
+    def __len__(self) -> int:
+        """Number of samples."""
+        return len(self.timestamp)
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        """Channel column by name, e.g. ``arrays.heart_rate``."""
+        columns = self.__dict__.get("columns")
+        if columns is not None and name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def __getitem__(self, index):
+        """Select rows: a SampleArrays for a slice, mask or index list, one SampleData for an integer."""
+        if isinstance(index, (slice, np.ndarray, list)):
+            return SampleArrays(self.timestamp[index], **{name: column[index] for name, column in self.columns.items()})
+        return self._record(index)
+
+    def __iter__(self) -> Iterator["SampleData"]:
+        """Iterate the samples as SampleData records."""
+        for index in range(len(self)):
+            yield self._record(index)
+
+    def _record(self, index: int) -> "SampleData":
+        """Materialise a single SampleData view of row ``index``."""
+        timestamp = self.timestamp[index]
+        values = {}
+        for name, column in self.columns.items():
+            value = column[index]
+            if np.isnan(value):
+                values[name] = None
+            elif name in INTEGER_SAMPLE_CHANNELS:
+                values[name] = int(value)
+            else:
+                values[name] = float(value)
+        return SampleData(timestamp=None if np.isnat(timestamp) else timestamp.item(), **values)
+
+    def has_channel(self, name: str) -> bool:
+        """Return True if the channel has at least one non-null value."""
+        return bool(len(self)) and not np.isnan(self.columns[name]).all()
+
+    def python_column(self, name: str) -> list:
+        """Return a channel as a list of Python values with None for nulls, ready for DBAPI binding."""
+        if name == "timestamp":
+            return self.timestamp.astype(object).tolist()
+
+        column = self.columns[name]
+        missing = np.isnan(column)
+        if missing.all():
+            return [None] * len(column)
+
+        if name in INTEGER_SAMPLE_CHANNELS:
+            values = np.where(missing, 0, column).astype(np.int64).astype(object)
+        else:
+            values = column.astype(object)
+        values[missing] = None
+        return values.tolist()
+
+    def route_points(self) -> List[tuple]:
+        """Return (lat, lon, alt) tuples for every sample with a GPS fix."""
+        has_fix = ~(np.isnan(self.columns["latitude"]) | np.isnan(self.columns["longitude"]))
+        with_fix = self if has_fix.all() else self[np.flatnonzero(has_fix)]
+        return list(
+            zip(
+                with_fix.python_column("latitude"),
+                with_fix.python_column("longitude"),
+                with_fix.python_column("altitude_m"),
+            )
+        )
+
+    def to_rows(self, activity_id: int) -> List[dict]:
+        """
+        Build insert parameter rows for the samples table.
+
+        Rows without a timestamp are dropped and a missing elapsed time is
+        stored as 0, matching the row-by-row importers.
+        """
+        return [row for chunk in self.iter_row_chunks(activity_id, max(len(self), 1)) for row in chunk]
+
+    def iter_row_chunks(self, activity_id: int, chunk_rows: int) -> Iterator[List[dict]]:
+        """
+        Yield the rows of ``to_rows`` in lists of at most ``chunk_rows``.
+
+        Each chunk is converted from array views when it is requested, so only
+        one chunk of per-row dicts exists at a time however long the activity is.
+        """
+        keep = ~np.isnat(self.timestamp)
+        arrays = self if keep.all() else self[np.flatnonzero(keep)]
+
+        names = ("timestamp",) + SAMPLE_CHANNELS
+        for start in range(0, len(arrays), chunk_rows):
+            chunk = arrays[start : start + chunk_rows]
+            columns = [chunk.python_column(name) for name in names]
+            rows = [dict(zip(names, values), activity_id=activity_id) for values in zip(*columns)]
+            for row in rows:
+                if row["elapsed_time_s"] is None:
+                    row["elapsed_time_s"] = 0
+            yield rows
+
+
+class SampleArraysBuilder:
+    """
+    Append-only builder that parsers use to fill SampleArrays record by record.
+
+    Values are appended straight into compact ``array('d')`` buffers (None
+    becomes NaN) and timestamps into an ``array('q')`` of microseconds since
+    the Unix epoch, so the parser never keeps a per-record object.
+    """
+
+    def __init__(self):
+        self._timestamps = array("q")
+        self._columns = {name: array("d") for name in SAMPLE_CHANNELS}
+
+    def __len__(self) -> int:
+        """Number of records appended so far."""
+        return len(self._timestamps)
+
+    def append(self, timestamp: Optional[datetime], **values):
+        """Append one record; channels not given are stored as missing."""
+        timestamp = _to_utc_naive(timestamp)
+        if isinstance(timestamp, datetime):
+            self._timestamps.append((timestamp - _UNIX_EPOCH) // _MICROSECOND)
+        else:
+            self._timestamps.append(_NAT_INT64)
+        for name, column in self._columns.items():
+            value = values.get(name)
+            if value is None:
+                column.append(np.nan)
+                continue
+            try:
+                column.append(value)
+            except TypeError:
+                # Non-numeric values (e.g. array-valued FIT fields) are not representable
+                column.append(np.nan)
+
+    def build(self) -> SampleArrays:
+        """Freeze the buffered records into a SampleArrays container."""
+        timestamps = np.frombuffer(self._timestamps, dtype=np.int64).view("datetime64[us]")
+        return SampleArrays(
+            timestamps, **{name: np.frombuffer(column, dtype=np.float64) for name, column in self._columns.items()}
+        )
 
 
 class SampleData:
@@ -0,0 +1,257 @@
+"""
+Columnar, compressed storage for activity samples.
+
+The ``samples`` table holds one row per record with twenty mostly-NULL
+columns. The columnar store keeps one SampleChannel row per (activity,
+channel) instead, holding the whole channel as a compressed typed array:
+
+- timestamps, elapsed time, heart rate and cadence as delta-encoded
+  integers; latitude and longitude as delta-encoded integers in 1e-7
+  degrees (about 1 cm). Deltas use the narrowest of int8/int16/int32/int64
+  that fits, so 1 Hz time and slowly changing values mostly take a byte.
+- every other channel as float32 (NaN for missing values)
+- all arrays zlib-compressed; channels with no values are not stored
+
+Missing values of delta-encoded channels are kept in a packed bitmap.
+Reading decodes the arrays straight into a SampleArrays, without building a
+row per record. Route points and laps are unaffected.
+
+Which store new samples go to is chosen per database with the
+``SAMPLE_STORE`` environment variable ('rows', 'columnar' or 'arrow' for
+the sidecar files of app/data/arrow_store.py; see DatabaseConfig). Reads
+check the other stores before the samples table, so a database can be
+migrated activity by activity (``gd-import migrate-samples``).
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+import zlib
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+
+from .arrow_store import has_sample_file, write_sample_file
+from .models import SAMPLE_CHANNELS, Sample, SampleArrays, SampleChannel, _to_utc_naive
+
+SAMPLE_STORES = ("rows", "columnar", "arrow")
+DEFAULT_SAMPLE_STORE = "rows"
+
+# Name of the SampleChannel row holding the timestamps; its ``count`` is the number of samples
+TIMESTAMP_CHANNEL = "timestamp"
+
+# Channels stored as delta-encoded integers, with their scale factor; the rest are float32
+DELTA_SCALES: Dict[str, int] = {
+    TIMESTAMP_CHANNEL: 1,  # microseconds since the Unix epoch
+    "elapsed_time_s": 1,
+    "heart_rate": 1,
+    "cadence_rpm": 1,
+    "latitude": 10_000_000,
+    "longitude": 10_000_000,
+}
+
+COMPRESSION_LEVEL = 6
+_INTEGER_DTYPES = ("<i1", "<i2", "<i4", "<i8")
+
+
+def sample_store(session) -> str:
+    """Return the store new samples written through ``session`` go to (one of SAMPLE_STORES)."""
+    return session.info.get("sample_store", DEFAULT_SAMPLE_STORE)
+
+
+def encode_channel(name: str, values: np.ndarray) -> Tuple[str, bytes, Optional[bytes]]:
+    """
+    Compress one channel.
+
+    Args:
+        name: Channel name; DELTA_SCALES channels are delta-encoded
+        values: float64 values with NaN for missing, or int64 for timestamps
+
+    Returns:
+        (encoding, data, mask); mask is the packed validity bitmap, or None if no value is missing
+    """
+    if name not in DELTA_SCALES:
+        return "f32", zlib.compress(values.astype("<f4").tobytes(), COMPRESSION_LEVEL), None
+
+    scale = DELTA_SCALES[name]
+    mask = None
+    if values.dtype.kind == "f":
+        valid = ~np.isnan(values)
+        if not valid.all():
+            mask = zlib.compress(np.packbits(valid).tobytes(), COMPRESSION_LEVEL)
+            # Repeat the previous value over gaps so they cost a zero delta
+            previous = np.maximum.accumulate(np.where(valid, np.arange(len(values)), 0))
+            values = np.where(valid[previous], values[previous], 0.0)
+        values = np.rint(values * scale).astype(np.int64)
+
+    deltas = np.diff(values, prepend=np.int64(0)) if len(values) else values.astype(np.int64)
+    low, high = (int(deltas.min()), int(deltas.max())) if len(deltas) else (0, 0)
+    for dtype in _INTEGER_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            break
+    data = zlib.compress(deltas.astype(dtype).tobytes(), COMPRESSION_LEVEL)
+    return f"delta{np.dtype(dtype).itemsize * 8}:{scale}", data, mask
+
+
+def decode_channel(encoding: str, data: bytes, mask: Optional[bytes], count: int) -> np.ndarray:
+    """
+    Decompress one channel written by encode_channel.
+
+    Returns:
+        float64 array with NaN for missing values; int64 for unscaled delta channels without gaps
+    """
+    raw = zlib.decompress(data)
+    if encoding == "f32":
+        return np.frombuffer(raw, dtype="<f4").astype(np.float64)
+
+    bits, _, scale = encoding.partition(":")
+    deltas = np.frombuffer(raw, dtype=f"<i{int(bits[len('delta'):]) // 8}")
+    values = np.cumsum(deltas, dtype=np.int64)
+    if scale != "1" or mask is not None:
+        values = values / float(scale)
+    if mask is not None:
+        valid = np.unpackbits(np.frombuffer(zlib.decompress(mask), dtype=np.uint8), count=count).astype(bool)
+        values[~valid] = np.nan
+    return values
+
+
+def channel_rows(activity_id: int, arrays: SampleArrays) -> List[dict]:
+    """
+    Build SampleChannel insert rows for an activity's samples.
+
+    Samples without a timestamp are dropped and a missing elapsed time is
+    stored as 0, as in the samples table (see SampleArrays.to_rows).
+    """
+    keep = ~np.isnat(arrays.timestamp)
+    if not keep.all():
+        arrays = arrays[np.flatnonzero(keep)]
+    count = len(arrays)
+    if not count:
+        return []
+
+    channels = {TIMESTAMP_CHANNEL: arrays.timestamp.view(np.int64)}
+    for name in SAMPLE_CHANNELS:
+        values = arrays.columns[name]
+        if name == "elapsed_time_s":
+            values = np.where(np.isnan(values), 0.0, values)
+        elif np.isnan(values).all():
+            continue
+        channels[name] = values
+
+    rows = []
+    for name, values in channels.items():
+        encoding, data, mask = encode_channel(name, values)
+        rows.append(
+            {
+                "activity_id": activity_id,
+                "channel": name,
+                "encoding": encoding,
+                "count": count,
+                "data": data,
+                "mask": mask,
+            }
+        )
+    return rows
+
+
+def write_sample_channels(session, activity_id: int, arrays: SampleArrays) -> int:
+    """
+    Store an activity's samples in the columnar store.
+
+    Args:
+        session: Active database session
+        activity_id: ID of the stored Activity row
+        arrays: The activity's samples
+
+    Returns:
+        Number of samples stored
+    """
+    rows = channel_rows(activity_id, arrays)
+    if rows:
+        session.execute(insert(SampleChannel), rows)
+    return rows[0]["count"] if rows else 0
+
+
+def read_sample_channels(
+    session, activity_id: int, channels: Optional[Sequence[str]] = None
+) -> Optional[SampleArrays]:
+    """
+    Decode an activity's samples from the columnar store.
+
+    Args:
+        session: Active database session
+        activity_id: Activity ID
+        channels: Channels to decode; all by default. The others are left missing.
+
+    Returns:
+        The samples in record order, or None if the activity has none in this store
+    """
+    statement = select(
+        SampleChannel.channel, SampleChannel.encoding, SampleChannel.data, SampleChannel.mask, SampleChannel.count
+    ).where(SampleChannel.activity_id == activity_id)
+    if channels is not None:
+        statement = statement.where(SampleChannel.channel.in_([TIMESTAMP_CHANNEL, *channels]))
+    rows = session.execute(statement).all()
+    if not rows:
+        return None
+
+    decoded = {channel: decode_channel(encoding, data, mask, count) for channel, encoding, data, mask, count in rows}
+    timestamp = decoded.pop(TIMESTAMP_CHANNEL).astype(np.int64).view("datetime64[us]")
+    return SampleArrays(timestamp, **{name: values for name, values in decoded.items() if name in SAMPLE_CHANNELS})
+
+
+def read_sample_rows(session, activity_id: int) -> SampleArrays:
+    """Read an activity's samples from the samples table into a SampleArrays, in insertion order."""
+    result = session.execute(
+        select(Sample.timestamp, *(getattr(Sample, name) for name in SAMPLE_CHANNELS))
+        .where(Sample.activity_id == activity_id)
+        .order_by(Sample.id)
+    )
+    columns = list(zip(*result.all())) or [()] * (len(SAMPLE_CHANNELS) + 1)
+    timestamps = np.array(
+        [
+            np.datetime64(_to_utc_naive(value), "us") if isinstance(value, datetime) else np.datetime64("NaT")
+            for value in columns[0]
+        ],
+        dtype="datetime64[us]",
+    )
+    return SampleArrays(
+        timestamps, **{name: np.array(values, dtype=np.float64) for name, values in zip(SAMPLE_CHANNELS, columns[1:])}
+    )
+
+
+def migrate_activity_samples(session, activity_id: int, store: str = "columnar") -> int:
+    """
+    Move one activity's samples from the samples table to the columnar or Arrow store.
+
+    Activities already in the target store are left alone.
+
+    Returns:
+        Number of samples moved
+    """
+    if store == "arrow":
+        if has_sample_file(session, activity_id):
+            return 0
+        moved = write_sample_file(session, activity_id, read_sample_rows(session, activity_id))
+    else:
+        stored = select(SampleChannel.id).where(SampleChannel.activity_id == activity_id).limit(1)
+        if session.execute(stored).first():
+            return 0
+        moved = write_sample_channels(session, activity_id, read_sample_rows(session, activity_id))
+    session.execute(delete(Sample).where(Sample.activity_id == activity_id))
+    return moved
+
+
+def activities_with_sample_rows(session) -> List[int]:
+    """Return the IDs of activities that still have samples in the samples table."""
+    return list(session.execute(select(Sample.activity_id).distinct().order_by(Sample.activity_id)).scalars())
+
+
+def columnar_sample_count(session, activity_ids: Optional[List[int]] = None) -> int:
+    """Number of samples held in the columnar store, in total or of the given activities."""
+    statement = select(func.coalesce(func.sum(SampleChannel.count), 0)).where(
+        SampleChannel.channel == TIMESTAMP_CHANNEL
+    )
+    if activity_ids is not None:
+        statement = statement.where(SampleChannel.activity_id.in_(activity_ids))
+    return session.execute(statement).scalar()
@@ -11,11 +11,12 @@ from typing import Any, Dict, List, Optional
 
 from markupsafe import escape
 import pandas as pd
-from sqlalchemy import desc, func, or_, text
+from sqlalchemy import desc, func, or_, select, text
 from sqlalchemy.exc import SQLAlchemyError
 
 from ..utils import get_logger, log_error
-from .db import session_scope
+from .arrow_store import read_sample_file
+from .db import run_write, session_scope
 from .garmin_models import (
     DailyBodyBattery,
     DailyHeartRate,
@@ -28,7 +29,8 @@ from .garmin_models import (
     MaxMetrics,
     PersonalRecords,
 )
-from .models import Activity, Lap, Sample
+from .models import Activity, Lap, SAMPLE_CHANNELS, Sample
+from .sample_store import read_sample_channels
 
 logger = get_logger(__name__)
 
@@ -324,12 +326,41 @@ def get_activity_by_id(activity_id: int) -> Optional[Dict[str, Any]]:
         }
 
 
+# Sample columns and the DataFrame names the activity charts expect
+SAMPLE_FRAME_COLUMNS = (
+    Sample.elapsed_time_s,
+    Sample.latitude.label("position_lat"),
+    Sample.longitude.label("position_long"),
+    Sample.altitude_m,
+    Sample.heart_rate.label("heart_rate_bpm"),
+    Sample.power_w,
+    Sample.cadence_rpm,
+    Sample.speed_mps,
+    Sample.temperature_c,
+    # Advanced running dynamics
+    Sample.vertical_oscillation_mm,
+    Sample.vertical_ratio,
+    Sample.ground_contact_time_ms,
+    Sample.ground_contact_balance_pct,
+    Sample.step_length_mm,
+    Sample.air_power_w,
+    Sample.form_power_w,
+    Sample.leg_spring_stiffness,
+    Sample.impact_loading_rate,
+    Sample.stryd_temperature_c,
+    Sample.stryd_humidity_pct,
+)
+# Channels SAMPLE_FRAME_COLUMNS renames, for frames built from the columnar sample store
+SAMPLE_FRAME_NAMES = {"latitude": "position_lat", "longitude": "position_long", "heart_rate": "heart_rate_bpm"}
+
+
 def get_activity_samples(activity_id: int) -> Optional[pd.DataFrame]:
     """
     Get time series samples for activity charts and maps.
 
     Research-validated pattern for time series data preparation
-    with pandas DataFrame conversion for Plotly integration.
+    with pandas DataFrame conversion for Plotly integration. Activities
+    imported summary-only have their samples loaded on first call.
 
     Args:
         activity_id: Activity database ID
@@ -337,46 +368,59 @@ def get_activity_samples(activity_id: int) -> Optional[pd.DataFrame]:
     Returns:
         DataFrame with time series data or None if not found
     """
+    with session_scope() as session:
+        state = session.execute(
+            select(Activity.samples_hydrated, Activity.hydration_error).where(Activity.id == activity_id)
+        ).first()
+    if state is None:
+        return None
+
+    if state.samples_hydrated is False and state.hydration_error is None:
+        # Imported summary-only: decode the samples from the source file on first open, on the
+        # writer thread; a failure is recorded on the activity so later opens don't read the source again
+        from ingest.hydrate import HydrationError, hydrate_activity
+
+        def hydrate(session):
+            activity = session.get(Activity, activity_id)
+            if activity is None:
+                return
+            try:
+                hydrate_activity(session, activity)
+            except HydrationError as e:
+                logger.warning(f"Could not load samples for activity {activity_id}: {e}")
+
+        run_write(hydrate)
+
     with session_scope() as session:
         # Check if activity exists
         activity = session.query(Activity).filter(Activity.id == activity_id).first()
         if not activity:
             return None
 
-        # Get samples ordered by time
-        samples = session.query(Sample).filter(Sample.activity_id == activity_id).order_by(Sample.elapsed_time_s).all()
+        arrays = read_sample_channels(session, activity_id)
+        table = read_sample_file(session, activity_id, SAMPLE_CHANNELS) if arrays is None else None
+        if arrays is not None:
+            # Columnar store: decoded arrays become the frame's columns directly
+            df = pd.DataFrame({SAMPLE_FRAME_NAMES.get(name, name): arrays.columns[name] for name in SAMPLE_CHANNELS})
+            df = df.sort_values("elapsed_time_s", kind="stable", ignore_index=True)
+        elif table is not None:
+            # Arrow store: NaN-filled float64 columns of the mapped file convert without a copy
+            df = table.to_pandas(split_blocks=True).rename(columns=SAMPLE_FRAME_NAMES)
+            df = df.reindex(columns=[SAMPLE_FRAME_NAMES.get(name, name) for name in SAMPLE_CHANNELS], copy=False)
+            if not df["elapsed_time_s"].is_monotonic_increasing:
+                df = df.sort_values("elapsed_time_s", kind="stable", ignore_index=True)
+        else:
+            # Select sample columns directly into a DataFrame, skipping ORM object construction
+            result = session.execute(
+                select(*SAMPLE_FRAME_COLUMNS)
+                .where(Sample.activity_id == activity_id)
+                .order_by(Sample.elapsed_time_s)
+            )
+            df = pd.DataFrame(result.all(), columns=list(result.keys()))
 
-        if not samples:
+        if df.empty:
             return pd.DataFrame()  # Return empty DataFrame
 
-        data = [
-            {
-                "elapsed_time_s": sample.elapsed_time_s,
-                "position_lat": sample.latitude,
-                "position_long": sample.longitude,
-                "altitude_m": sample.altitude_m,
-                "heart_rate_bpm": sample.heart_rate,
-                "power_w": sample.power_w,
-                "cadence_rpm": sample.cadence_rpm,
-                "speed_mps": sample.speed_mps,
-                "temperature_c": sample.temperature_c,
-                # Advanced running dynamics
-                "vertical_oscillation_mm": sample.vertical_oscillation_mm,
-                "vertical_ratio": sample.vertical_ratio,
-                "ground_contact_time_ms": sample.ground_contact_time_ms,
-                "ground_contact_balance_pct": sample.ground_contact_balance_pct,
-                "step_length_mm": sample.step_length_mm,
-                "air_power_w": sample.air_power_w,
-                "form_power_w": sample.form_power_w,
-                "leg_spring_stiffness": sample.leg_spring_stiffness,
-                "impact_loading_rate": sample.impact_loading_rate,
-                "stryd_temperature_c": sample.stryd_temperature_c,
-                "stryd_humidity_pct": sample.stryd_humidity_pct,
-            }
-            for sample in samples
-        ]
-        df = pd.DataFrame(data)
-
         # Add computed columns
         if not df.empty:
             # Convert elapsed time to datetime for plotting
@@ -537,17 +581,20 @@ def update_activity_name(activity_id: int, new_name: str) -> bool:
     # Escape any remaining unsafe characters
     sanitized_name = escape(sanitized_name)
 
+    def rename(session) -> bool:
+        activity = session.query(Activity).filter(Activity.id == activity_id).first()
+        if not activity:
+            logger.warning(f"Activity {activity_id} not found for name update")
+            return False
+
+        activity.name = sanitized_name.strip() or None
+        return True
+
     try:
-        with session_scope() as session:
-            activity = session.query(Activity).filter(Activity.id == activity_id).first()
-            if not activity:
-                logger.warning(f"Activity {activity_id} not found for name update")
-                return False
-
-            activity.name = sanitized_name.strip() or None
-            session.commit()
-            logger.info(f"Updated activity {activity_id} name to: {sanitized_name}")
-            return True
+        if not run_write(rename):
+            return False
+        logger.info(f"Updated activity {activity_id} name to: {sanitized_name}")
+        return True
 
     except (SQLAlchemyError, ValueError, TypeError) as e:
         logger.error(f"Failed to update activity name for activity_id={activity_id}: {e}", exc_info=True)
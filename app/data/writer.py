@@ -0,0 +1,141 @@
+"""
+Single writer thread for database writes.
+
+SQLite in WAL mode lets any number of connections read while one writes,
+but only one transaction can write at a time. Instead of letting Dash
+callback threads, the Garmin sync thread and imports compete for the
+write lock, writes are submitted as jobs to one DatabaseWriter thread:
+
+- a job is a callable taking a Session; it must not commit, the writer does
+- jobs queued while the writer is busy are run together in one
+  transaction, each inside a savepoint, so a failing job is rolled back
+  alone and the batch pays for a single commit
+- the job's Future resolves after its batch committed, with the job's
+  return value or exception
+
+Readers keep using session_scope() with their own pooled connection.
+"""
+
+from concurrent.futures import Future
+import logging
+import queue
+import threading
+from typing import Callable, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.orm import Session, sessionmaker
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Jobs at most per transaction; bounds how long one commit keeps later callers waiting
+MAX_BATCH_JOBS = 50
+
+# Execution option marking the writer's connection; on SQLite it begins with BEGIN IMMEDIATE (see db.py)
+WRITE_TRANSACTION = "write_transaction"
+
+_STOP = object()
+
+
+class DatabaseWriter:
+    """Thread owning every write transaction of a DatabaseConfig."""
+
+    def __init__(self, session_factory: sessionmaker, max_batch: int = MAX_BATCH_JOBS):
+        """
+        Args:
+            session_factory: Factory of the sessions the jobs run in
+            max_batch: Jobs at most per transaction
+        """
+        self._session_factory = session_factory
+        self._max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+        self._local = threading.local()
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, job: Callable[[Session], T]) -> "Future[T]":
+        """
+        Queue a write job.
+
+        Args:
+            job: Callable run with the writer's Session; must not commit
+
+        Returns:
+            Future resolving to the job's return value once its transaction committed
+        """
+        future: "Future[T]" = Future()
+        if not self._thread.is_alive():
+            future.set_exception(RuntimeError("Database writer is closed"))
+            return future
+        self._queue.put((job, future))
+        return future
+
+    def run(self, job: Callable[[Session], T]) -> T:
+        """
+        Run a write job and wait for its commit.
+
+        Called from within a job, the nested job joins the running transaction.
+
+        Raises:
+            Exception: Whatever the job or the commit raised
+        """
+        session = getattr(self._local, "session", None)
+        if session is not None:
+            return job(session)
+        return self.submit(job).result()
+
+    def close(self, timeout: Optional[float] = None):
+        """Finish the queued jobs and stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _next_batch(self) -> Tuple[List[tuple], bool]:
+        """Block for one job, then take whatever else is already queued; also report a stop request."""
+        batch = [self._queue.get()]
+        while len(batch) < self._max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        stop = any(entry is _STOP for entry in batch)
+        return [entry for entry in batch if entry is not _STOP], stop
+
+    def _run(self):
+        while True:
+            batch, stop = self._next_batch()
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: List[tuple]):
+        """Run one batch of jobs in a single transaction and resolve their futures after the commit."""
+        done = []
+        session = self._session_factory()
+        self._local.session = session
+        try:
+            session.connection(execution_options={WRITE_TRANSACTION: True})
+            for job, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with session.begin_nested():
+                        result = job(session)
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    done.append((future, result))
+            session.commit()
+        except Exception as e:
+            logger.error(f"Write transaction of {len(done)} jobs failed: {e}")
+            session.rollback()
+            for future, _ in done:
+                future.set_exception(e)
+            return
+        finally:
+            self._local.session = None
+            session.close()
+
+        for future, result in done:
+            future.set_result(result)
@@ -4,19 +4,14 @@ Fixed version that processes files immediately on upload (proper Dash pattern).
 """
 
 import base64
-from datetime import datetime
-import hashlib
 import io
 from pathlib import Path
-import tempfile
 
 from dash import Input, Output, State, dcc, html
 import dash_bootstrap_components as dbc
 
-from app.data.db import session_scope
-from app.data.models import Activity, Lap, RoutePoint, Sample
 from app.utils import get_logger
-from ingest.parser import ActivityParser, CorruptFileError, FileNotSupportedError
+from ingest.pipeline import IngestStats, ingest_content
 
 logger = get_logger(__name__)
 
@@ -260,126 +255,21 @@ def register_callbacks(app):
 
 
 def import_file_from_content(file_content: io.BytesIO, filename: str, force_reimport: bool = False) -> dict:
-    """Import a single file from its content."""
+    """Import a single file from its content through the shared ingest pipeline."""
     try:
-        # Calculate file hash for deduplication
         file_content.seek(0)
         content_bytes = file_content.read()
         file_content.seek(0)
 
-        file_hash = hashlib.md5(content_bytes).hexdigest()
-
-        with session_scope() as session:
-            # Check for existing import (unless forcing reimport)
-            if not force_reimport:
-                existing = session.query(Activity).filter_by(file_hash=file_hash).first()
-                if existing:
-                    logger.debug(f"Skipping duplicate: {filename}")
-                    return {"success": False, "reason": "duplicate"}
-
-            # Create a temporary file for parsing
-            with tempfile.NamedTemporaryFile(suffix=Path(filename).suffix) as temp_file:
-                temp_file.write(content_bytes)
-                temp_file.flush()
-
-                # Parse the activity file using existing parser
-                activity_data = ActivityParser.parse_activity_file(Path(temp_file.name))
-                if not activity_data:
-                    return {"success": False, "reason": "no_data"}
-
-            # Create Activity object (similar to CLI import logic)
-            activity = Activity(
-                external_id=activity_data.external_id or Path(filename).stem,
-                file_hash=file_hash,
-                source=Path(filename).suffix[1:].lower(),
-                sport=activity_data.sport or "unknown",
-                sub_sport=activity_data.sub_sport,
-                start_time_utc=activity_data.start_time_utc or datetime.now(),
-                elapsed_time_s=activity_data.elapsed_time_s or 0,
-                moving_time_s=activity_data.moving_time_s,
-                distance_m=activity_data.distance_m,
-                avg_speed_mps=activity_data.avg_speed_mps,
-                avg_pace_s_per_km=activity_data.avg_pace_s_per_km,
-                avg_hr=activity_data.avg_hr,
-                max_hr=activity_data.max_hr,
-                avg_power_w=activity_data.avg_power_w,
-                max_power_w=activity_data.max_power_w,
-                elevation_gain_m=activity_data.elevation_gain_m,
-                elevation_loss_m=activity_data.elevation_loss_m,
-                calories=activity_data.calories,
-                file_path=filename,  # Store original filename
-            )
-
-            session.add(activity)
-            session.flush()  # Get the activity ID
-
-            # Add samples if present
-            if activity_data.samples:
-                for sample_data in activity_data.samples:
-                    if sample_data.timestamp:
-                        sample = Sample(
-                            activity_id=activity.id,
-                            timestamp=sample_data.timestamp,
-                            elapsed_time_s=sample_data.elapsed_time_s or 0,
-                            latitude=sample_data.latitude,
-                            longitude=sample_data.longitude,
-                            altitude_m=sample_data.altitude_m,
-                            heart_rate=sample_data.heart_rate,
-                            power_w=sample_data.power_w,
-                            cadence_rpm=sample_data.cadence_rpm,
-                            speed_mps=sample_data.speed_mps,
-                            temperature_c=sample_data.temperature_c,
-                            # Advanced running dynamics
-                            vertical_oscillation_mm=sample_data.vertical_oscillation_mm,
-                            vertical_ratio=sample_data.vertical_ratio,
-                            ground_contact_time_ms=sample_data.ground_contact_time_ms,
-                            ground_contact_balance_pct=sample_data.ground_contact_balance_pct,
-                            step_length_mm=sample_data.step_length_mm,
-                            air_power_w=sample_data.air_power_w,
-                            form_power_w=sample_data.form_power_w,
-                            leg_spring_stiffness=sample_data.leg_spring_stiffness,
-                            impact_loading_rate=sample_data.impact_loading_rate,
-                            stryd_temperature_c=sample_data.stryd_temperature_c,
-                            stryd_humidity_pct=sample_data.stryd_humidity_pct,
-                        )
-                        session.add(sample)
-
-            # Add route points if present
-            if activity_data.route_points:
-                for i, (lat, lon, alt) in enumerate(activity_data.route_points):
-                    if lat is not None and lon is not None:
-                        route_point = RoutePoint(
-                            activity_id=activity.id, sequence=i, latitude=lat, longitude=lon, altitude_m=alt
-                        )
-                        session.add(route_point)
-
-            # Add laps if present
-            if activity_data.laps:
-                for lap_data in activity_data.laps:
-                    lap = Lap(
-                        activity_id=activity.id,
-                        lap_index=lap_data.lap_index,
-                        start_time_utc=lap_data.start_time_utc,
-                        elapsed_time_s=lap_data.elapsed_time_s or 0,
-                        moving_time_s=lap_data.elapsed_time_s,
-                        distance_m=lap_data.distance_m,
-                        avg_speed_mps=lap_data.avg_speed_mps,
-                        avg_hr=lap_data.avg_hr,
-                        max_hr=lap_data.max_hr,
-                        avg_power_w=lap_data.avg_power_w,
-                        max_power_w=lap_data.max_power_w,
-                    )
-                    session.add(lap)
-
-            # Commit all changes
-            session.commit()
+        stats = IngestStats()
+        result = ingest_content(filename, content_bytes, force_reimport=force_reimport, stats=stats)
+        if not result.imported:
+            logger.debug(f"Skipping {filename}: {result.reason}")
+            return {"success": False, "reason": result.reason}
 
-            logger.info(f"Successfully imported {filename}")
-            return {"success": True, "activity_id": activity.id}
+        logger.info(f"Successfully imported {filename}: {stats.summary()}")
+        return {"success": True, "activity_id": result.activity_id, "rows_per_second": stats.persist.rows_per_second}
 
-    except (FileNotSupportedError, CorruptFileError) as e:
-        logger.debug(f"Parse error for {filename}: {e}")
-        return {"success": False, "reason": f"parse_error: {e}"}
     except Exception as e:
         logger.error(f"Import error for {filename}: {e}")
         return {"success": False, "reason": f"import_error: {e}"}
@@ -9,6 +9,7 @@ import dash_bootstrap_components as dbc
 import pandas as pd
 import plotly.graph_objects as go
 
+from app.data.analytics import DUCKDB_AVAILABLE, hr_by_pace
 from app.data.web_queries import (
     get_activity_statistics,
     get_activity_trends,
@@ -110,6 +111,18 @@ def layout():
                                 ],
                                 className="mb-4",
                             ),
+                            # Cross-activity sample analytics (DuckDB)
+                            dbc.Card(
+                                [
+                                    dbc.CardHeader([html.H5("Heart Rate by Pace", className="mb-0")]),
+                                    dbc.CardBody(
+                                        [
+                                            html.Div(id="hr-pace-chart"),
+                                        ]
+                                    ),
+                                ],
+                                className="mb-4",
+                            ),
                             # Wellness Statistics Header
                             html.H2([html.I(className="fas fa-heart me-3"), "Wellness Data"], className="mb-4 mt-5"),
                             # Real-time wellness charts with date filtering
@@ -466,6 +479,52 @@ def register_callbacks(app):
             logger.error(f"Error updating trends chart: {e}")
             return dbc.Alert("Error loading trends data. Please try refreshing the page.", color="danger")
 
+    @app.callback(
+        Output("hr-pace-chart", "children"),
+        [Input("stats-date-range", "start_date"), Input("stats-date-range", "end_date")],
+    )
+    def update_hr_pace_chart(start_date, end_date):
+        """Average heart rate per pace bin across every run sample in the date range."""
+        if not DUCKDB_AVAILABLE:
+            return dbc.Alert(
+                [html.I(className="fas fa-info-circle me-2"), "Install duckdb to enable cross-activity analytics."],
+                color="info",
+            )
+        try:
+            df = hr_by_pace(
+                start_date=date.fromisoformat(start_date) if start_date else None,
+                end_date=date.fromisoformat(end_date) if end_date else None,
+            )
+            if df.empty:
+                return dbc.Alert(
+                    [html.I(className="fas fa-info-circle me-2"), "No runs with heart rate and speed in this range."],
+                    color="info",
+                )
+
+            pace_labels = [f"{pace // 60}:{pace % 60:02d}" for pace in df["pace_s_per_km"]]
+            fig = go.Figure(
+                go.Scatter(
+                    x=pace_labels,
+                    y=df["avg_hr"],
+                    mode="lines+markers",
+                    marker=dict(size=(df["samples"] / df["samples"].max() * 20).clip(lower=4)),
+                    customdata=df[["samples", "activities"]],
+                    hovertemplate="%{x} /km: %{y:.0f} bpm<br>%{customdata[0]} samples, %{customdata[1]} runs",
+                    name="Avg HR",
+                    line=dict(color="red", width=2),
+                )
+            )
+            fig.update_layout(
+                xaxis=dict(title="Pace (min/km)", autorange="reversed"),
+                yaxis=dict(title="Heart Rate (bpm)"),
+                height=400,
+                hovermode="x unified",
+            )
+            return dcc.Graph(figure=fig)
+        except Exception as e:
+            logger.error(f"Error updating heart rate by pace chart: {e}")
+            return dbc.Alert("Error loading heart rate by pace. Please try refreshing the page.", color="danger")
+
     @app.callback(Output("wellness-stats-container", "children"), Input("wellness-stats-container", "id"))
     def update_wellness_stats(_):
         """Update wellness statistics cards."""
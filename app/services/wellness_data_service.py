@@ -10,7 +10,7 @@ from datetime import date, datetime, timedelta, timezone
 import logging
 from typing import Any, Dict, List, Optional
 
-from app.data.db import session_scope
+from app.data.db import run_write, session_scope
 from app.data.garmin_models import (
     DailyBodyBattery,
     DailyHeartRate,
@@ -31,7 +31,7 @@ class WellnessDataService:
     def persist_user_profile(self, profile_data: Dict[str, Any]) -> bool:
         """Persist user profile data to database."""
         try:
-            with session_scope() as session:
+            def write(session) -> bool:
                 # Check if profile exists
                 existing = (
                     session.query(UserProfile).filter_by(user_id=str(profile_data.get("userProfileId", ""))).first()
@@ -69,6 +69,8 @@ class WellnessDataService:
                 logger.info("Successfully persisted user profile data")
                 return True
 
+            return run_write(write)
+
         except Exception as e:
             logger.error(f"Failed to persist user profile: {e}")
             return False
@@ -76,7 +78,7 @@ class WellnessDataService:
     def persist_sleep_data(self, sleep_records: List[Dict[str, Any]]) -> bool:
         """Persist sleep data to database."""
         try:
-            with session_scope() as session:
+            def write(session) -> bool:
                 persisted_count = 0
 
                 for sleep_data in sleep_records:
@@ -119,6 +121,8 @@ class WellnessDataService:
                 logger.info(f"Successfully persisted {persisted_count} sleep records")
                 return persisted_count > 0
 
+            return run_write(write)
+
         except Exception as e:
             logger.error(f"Failed to persist sleep data: {e}")
             return False
@@ -126,7 +130,7 @@ class WellnessDataService:
     def persist_steps_data(self, steps_records: List[Dict[str, Any]]) -> bool:
         """Persist steps data to database."""
         try:
-            with session_scope() as session:
+            def write(session) -> bool:
                 persisted_count = 0
 
                 for steps_data in steps_records:
@@ -176,6 +180,8 @@ class WellnessDataService:
                 logger.info(f"Successfully persisted {persisted_count} steps records")
                 return persisted_count > 0
 
+            return run_write(write)
+
         except Exception as e:
             logger.error(f"Failed to persist steps data: {e}")
             return False
@@ -183,7 +189,7 @@ class WellnessDataService:
     def persist_heart_rate_data(self, hr_records: List[Dict[str, Any]]) -> bool:
         """Persist heart rate data to database."""
         try:
-            with session_scope() as session:
+            def write(session) -> bool:
                 persisted_count = 0
 
                 for hr_data in hr_records:
@@ -235,6 +241,8 @@ class WellnessDataService:
                 logger.info(f"Successfully persisted {persisted_count} heart rate records")
                 return persisted_count > 0
 
+            return run_write(write)
+
         except Exception as e:
             logger.error(f"Failed to persist heart rate data: {e}")
             return False
@@ -242,7 +250,7 @@ class WellnessDataService:
     def persist_body_battery_data(self, bb_records: List[Dict[str, Any]]) -> bool:
         """Persist Body Battery data to database."""
         try:
-            with session_scope() as session:
+            def write(session) -> bool:
                 persisted_count = 0
 
                 for bb_data in bb_records:
@@ -286,6 +294,8 @@ class WellnessDataService:
                 logger.info(f"Successfully persisted {persisted_count} Body Battery records")
                 return persisted_count > 0
 
+            return run_write(write)
+
         except Exception as e:
             logger.error(f"Failed to persist Body Battery data: {e}")
             return False
@@ -293,7 +303,7 @@ class WellnessDataService:
     def persist_training_readiness_data(self, tr_records: List[Dict[str, Any]]) -> bool:
         """Persist Training Readiness data to database."""
         try:
-            with session_scope() as session:
+            def write(session) -> bool:
                 persisted_count = 0
 
                 for tr_data in tr_records:
@@ -341,6 +351,8 @@ class WellnessDataService:
                 logger.info(f"Successfully persisted {persisted_count} Training Readiness records")
                 return persisted_count > 0
 
+            return run_write(write)
+
         except Exception as e:
             logger.error(f"Failed to persist Training Readiness data: {e}")
             return False
@@ -348,7 +360,7 @@ class WellnessDataService:
     def persist_stress_data(self, stress_records: List[Dict[str, Any]]) -> bool:
         """Persist stress data to database."""
         try:
-            with session_scope() as session:
+            def write(session) -> bool:
                 persisted_count = 0
 
                 for stress_data in stress_records:
@@ -398,6 +410,8 @@ class WellnessDataService:
                 logger.info(f"Successfully persisted {persisted_count} stress records")
                 return persisted_count > 0
 
+            return run_write(write)
+
         except Exception as e:
             logger.error(f"Failed to persist stress data: {e}")
             return False
@@ -428,7 +442,7 @@ class WellnessDataService:
             bool: True if persistence was successful
         """
         try:
-            with session_scope() as session:
+            def write(session) -> bool:
                 persisted_count = 0
                 for pr_data in pr_records:
                     try:
@@ -475,10 +489,11 @@ class WellnessDataService:
                         logger.warning(f"Failed to persist personal record: {e}")
                         continue
 
-                session.commit()
                 logger.info(f"Successfully persisted {persisted_count} personal records")
                 return persisted_count > 0
 
+            return run_write(write)
+
         except Exception as e:
             logger.error(f"Failed to persist personal records data: {e}")
             return False
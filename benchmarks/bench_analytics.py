@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark cross-activity analytics: DuckDB against SQLAlchemy.
+
+Imports synthetic runs into a SQLite database and times "average heart
+rate per pace bin across every run" three ways:
+
+- orm: loading every Sample through the ORM and aggregating in pandas
+- sql: the same aggregation as one SQLAlchemy GROUP BY query on SQLite
+- duckdb: app.data.analytics.hr_by_pace, vectorized over the attached database
+
+Usage:
+    python benchmarks/bench_analytics.py [--activities N] [--samples N] [--repeat N] [--store rows|columnar|arrow]
+"""
+
+import argparse
+from pathlib import Path
+import sys
+import tempfile
+
+import pandas as pd
+from sqlalchemy import Integer, cast, distinct, func, select
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.data.analytics import MAX_PACE_S_PER_KM, MIN_PACE_S_PER_KM, close_analytics, hr_by_pace  # noqa: E402
+from app.data.db import close_database, init_database, session_scope  # noqa: E402
+from app.data.models import Activity, Sample  # noqa: E402
+from benchmarks.bench_sample_store import best_of, synthetic_activity  # noqa: E402
+from ingest.persist import build_activity, persist_activity  # noqa: E402
+
+BIN_S = 15
+
+
+def hr_by_pace_orm() -> pd.DataFrame:
+    """Load every running Sample object and aggregate in pandas."""
+    with session_scope() as session:
+        samples = session.query(Sample).join(Activity).filter(Activity.sport == "running").all()
+        df = pd.DataFrame(
+            {
+                "activity_id": [sample.activity_id for sample in samples],
+                "heart_rate": [sample.heart_rate for sample in samples],
+                "speed_mps": [sample.speed_mps for sample in samples],
+            }
+        )
+    df = df[(df["speed_mps"] > 0) & (df["heart_rate"] > 0)]
+    df = df.assign(pace_s_per_km=1000.0 / df["speed_mps"])
+    df = df[df["pace_s_per_km"].between(MIN_PACE_S_PER_KM, MAX_PACE_S_PER_KM)]
+    df["pace_s_per_km"] = (df["pace_s_per_km"] // BIN_S * BIN_S).astype(int)
+    return df.groupby("pace_s_per_km").agg(
+        avg_hr=("heart_rate", "mean"), samples=("heart_rate", "size"), activities=("activity_id", "nunique")
+    )
+
+
+def hr_by_pace_sql() -> list:
+    """The same aggregation as one SQLAlchemy GROUP BY query."""
+    pace = 1000.0 / Sample.speed_mps
+    pace_bin = (cast(pace / BIN_S, Integer) * BIN_S).label("pace_s_per_km")
+    statement = (
+        select(pace_bin, func.avg(Sample.heart_rate), func.count(), func.count(distinct(Sample.activity_id)))
+        .join(Activity, Activity.id == Sample.activity_id)
+        .where(Activity.sport == "running", Sample.speed_mps > 0, Sample.heart_rate > 0)
+        .where(pace.between(MIN_PACE_S_PER_KM, MAX_PACE_S_PER_KM))
+        .group_by(pace_bin)
+        .order_by(pace_bin)
+    )
+    with session_scope() as session:
+        return session.execute(statement).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--activities", type=int, default=50)
+    parser.add_argument("--samples", type=int, default=3600, help="samples per activity (1 Hz)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--store", default="rows", help="sample store the activities are imported into")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_config = init_database(f"sqlite:///{Path(tmp_dir) / 'analytics.db'}", sample_store=args.store)
+        try:
+            for index in range(args.activities):
+                activity_data = synthetic_activity(index, args.samples)
+                with session_scope() as session:
+                    activity = build_activity(activity_data, f"bench-{index}", "fit", f"bench-{index}.fit", "bench")
+                    persist_activity(session, activity, activity_data)
+
+            print(f"{args.activities} runs of {args.samples} samples, {args.store} store\n")
+            timings = {"duckdb": best_of(args.repeat, lambda: hr_by_pace(bin_s=BIN_S))}
+            if args.store == "rows":
+                timings["sql"] = best_of(args.repeat, hr_by_pace_sql)
+                timings["orm"] = best_of(args.repeat, hr_by_pace_orm)
+            for name, seconds in timings.items():
+                print(f"  {name:<7} {seconds * 1000:9.1f} ms   (x{seconds / timings['duckdb']:.1f})")
+        finally:
+            close_analytics()
+            db_config.engine.dispose()
+            close_database()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Benchmark FIT parse throughput of ActivityParser.
+
+Compares three ways of parsing the same file: the original implementation,
+which walked fitparse's decoded messages once per message type and looked
+every field up by name; the single-pass dispatcher over fitparse; and the
+vectorised decoder in ingest/fit_fast.py. Extraction time on already-decoded
+messages is reported separately, because fitparse's own decoding dominates
+the fitparse-based totals.
+
+Usage:
+    python benchmarks/bench_fit_parser.py [FIT files...] [--repeat N]
+
+Without arguments it uses tests/test_data/*.fit; empty placeholder files are
+skipped and synthetic activities from tests/fit_factory.py are used instead.
+"""
+
+import argparse
+from pathlib import Path
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+import fitparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.data.models import ActivityData, LapData, SampleArraysBuilder  # noqa: E402
+from ingest.parser import ActivityParser, SEMICIRCLES_TO_DEGREES, _FitActivityBuilder  # noqa: E402
+from tests.fit_factory import build_activity_fit  # noqa: E402
+
+
+def legacy_extract(fitfile, file_path: Path) -> ActivityData:
+    """Multi-pass extraction as implemented before the single-pass dispatcher."""
+    activity_data = ActivityData()
+    samples = SampleArraysBuilder()
+    laps = []
+
+    for session in fitfile.get_messages("session"):
+        activity_data.sport = session.get_value("sport") or "unknown"
+        activity_data.sub_sport = session.get_value("sub_sport")
+        activity_data.start_time_utc = session.get_value("start_time")
+        activity_data.elapsed_time_s = session.get_value("total_elapsed_time")
+        activity_data.moving_time_s = session.get_value("total_timer_time")
+        activity_data.distance_m = session.get_value("total_distance")
+        activity_data.avg_hr = session.get_value("avg_heart_rate")
+        activity_data.max_hr = session.get_value("max_heart_rate")
+        activity_data.avg_power_w = session.get_value("avg_power")
+        activity_data.max_power_w = session.get_value("max_power")
+        activity_data.elevation_gain_m = session.get_value("total_ascent")
+        activity_data.elevation_loss_m = session.get_value("total_descent")
+        activity_data.calories = session.get_value("total_calories")
+        break
+
+    for file_id in fitfile.get_messages("file_id"):
+        activity_data.external_id = str(file_id.get_value("serial_number") or file_path.stem)
+        break
+
+    elapsed_time = 0
+    for record in fitfile.get_messages("record"):
+        timestamp = record.get_value("timestamp")
+        if not timestamp:
+            continue
+        lat = record.get_value("position_lat")
+        lon = record.get_value("position_long")
+        if lat is not None and lon is not None:
+            lat = lat * SEMICIRCLES_TO_DEGREES
+            lon = lon * SEMICIRCLES_TO_DEGREES
+        ground_contact_time = record.get_value("stance_time")
+        if ground_contact_time is None:
+            ground_contact_time = record.get_value("Ground Time")
+        samples.append(
+            timestamp,
+            elapsed_time_s=elapsed_time,
+            latitude=lat,
+            longitude=lon,
+            altitude_m=record.get_value("enhanced_altitude") or record.get_value("altitude"),
+            heart_rate=record.get_value("heart_rate"),
+            power_w=record.get_value("power"),
+            cadence_rpm=record.get_value("cadence"),
+            speed_mps=record.get_value("enhanced_speed") or record.get_value("speed"),
+            temperature_c=record.get_value("temperature"),
+            vertical_oscillation_mm=record.get_value("vertical_oscillation"),
+            vertical_ratio=record.get_value("vertical_ratio"),
+            ground_contact_time_ms=ground_contact_time,
+            ground_contact_balance_pct=record.get_value("stance_time_balance"),
+            step_length_mm=record.get_value("step_length"),
+            air_power_w=record.get_value("Air Power"),
+            form_power_w=record.get_value("Form Power"),
+            leg_spring_stiffness=record.get_value("Leg Spring Stiffness"),
+            impact_loading_rate=record.get_value("Impact Loading Rate"),
+            stryd_temperature_c=record.get_value("Stryd Temperature"),
+            stryd_humidity_pct=record.get_value("Stryd Humidity"),
+        )
+        elapsed_time += 1
+
+    for lap_idx, lap in enumerate(fitfile.get_messages("lap")):
+        avg_speed_mps = lap.get_value("avg_speed")
+        if not avg_speed_mps:
+            distance = lap.get_value("total_distance")
+            elapsed = lap.get_value("total_elapsed_time")
+            if distance and elapsed and elapsed > 0:
+                avg_speed_mps = distance / elapsed
+        laps.append(
+            LapData(
+                lap_index=lap_idx,
+                start_time_utc=lap.get_value("start_time"),
+                elapsed_time_s=lap.get_value("total_elapsed_time"),
+                distance_m=lap.get_value("total_distance"),
+                avg_speed_mps=avg_speed_mps,
+                avg_hr=lap.get_value("avg_heart_rate"),
+                max_hr=lap.get_value("max_heart_rate"),
+                avg_power_w=lap.get_value("avg_power"),
+                max_power_w=lap.get_value("max_power"),
+            )
+        )
+
+    activity_data.samples = samples.build()
+    activity_data.route_points = activity_data.samples.route_points()
+    activity_data.laps = laps
+    return activity_data
+
+
+def single_pass_extract(fitfile, file_path: Path) -> ActivityData:
+    """Extraction through the single-pass dispatcher used by ActivityParser."""
+    builder = _FitActivityBuilder(file_path)
+    for message in fitfile.get_messages():
+        builder.dispatch(message)
+    return builder.finish()
+
+
+def best_of(repeat: int, func: Callable[[], object]) -> float:
+    """Best wall-clock time of ``repeat`` runs."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def benchmark_file(file_path: Path, repeat: int):
+    """Print parse and extraction timings for one file."""
+    decoded = fitparse.FitFile(str(file_path))
+    decoded.parse()
+    records = sum(1 for _ in decoded.get_messages("record"))
+
+    def legacy_total():
+        legacy_extract(fitparse.FitFile(str(file_path)), file_path)
+
+    legacy_parse = best_of(repeat, legacy_total)
+    current_parse = best_of(repeat, lambda: ActivityParser.parse_fit_file(file_path, fast_path=False))
+    fast_parse = best_of(repeat, lambda: ActivityParser.parse_fit_file(file_path))
+    fast_supported = ActivityParser._decode_fit_fast(file_path.read_bytes(), file_path) is not None
+    legacy_extraction = best_of(repeat, lambda: legacy_extract(decoded, file_path))
+    current_extraction = best_of(repeat, lambda: single_pass_extract(decoded, file_path))
+
+    print(f"{file_path.name}: {records} records, {file_path.stat().st_size / 1024:.0f} KiB")
+    print(
+        f"  full parse   legacy {legacy_parse * 1000:8.1f} ms   single-pass {current_parse * 1000:8.1f} ms"
+        f"   ({records / current_parse:,.0f} records/s, x{legacy_parse / current_parse:.2f})"
+    )
+    print(
+        f"  fast path    {fast_parse * 1000:8.1f} ms   ({records / fast_parse:,.0f} records/s,"
+        f" x{current_parse / fast_parse:.1f} vs single-pass)"
+        + ("" if fast_supported else "   [fell back to fitparse]")
+    )
+    print(
+        f"  extraction   legacy {legacy_extraction * 1000:8.1f} ms   single-pass {current_extraction * 1000:8.1f} ms"
+        f"   (x{legacy_extraction / current_extraction:.2f})"
+    )
+
+
+def synthetic_files(directory: Path) -> List[Path]:
+    """Write representative synthetic activities for benchmarking."""
+    specs = {
+        "synthetic_ride_2h.fit": dict(n_records=7200, sport=2),
+        "synthetic_run_stryd_1h.fit": dict(n_records=3600, running_dynamics=True, developer_fields=True),
+    }
+    paths = []
+    for name, kwargs in specs.items():
+        path = directory / name
+        path.write_bytes(build_activity_fit(**kwargs))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", type=Path)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    files = args.files or sorted((Path(__file__).resolve().parent.parent / "tests" / "test_data").glob("*.fit"))
+    files = [path for path in files if path.stat().st_size > 0]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if not files:
+            print("No non-empty FIT files given; using synthetic activities.\n")
+            files = synthetic_files(Path(tmp_dir))
+        for file_path in files:
+            benchmark_file(file_path, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
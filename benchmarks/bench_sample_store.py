@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark the row, columnar and Arrow sample stores.
+
+Imports the same synthetic activities into one SQLite database per store
+(see app/data/sample_store.py) and reports the write time, the storage size
+(database file plus any Arrow sample files) and the time
+get_activity_samples takes to load one activity into a DataFrame, as the
+activity page does. The Arrow store is skipped without pyarrow.
+
+Usage:
+    python benchmarks/bench_sample_store.py [--activities N] [--samples N] [--repeat N]
+"""
+
+import argparse
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import sys
+import tempfile
+import time
+from typing import Callable
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.data.arrow_store import PYARROW_AVAILABLE  # noqa: E402
+from app.data.db import close_database, init_database, session_scope  # noqa: E402
+from app.data.models import ActivityData, SampleArrays  # noqa: E402
+from app.data.sample_store import SAMPLE_STORES  # noqa: E402
+from app.data.web_queries import get_activity_samples  # noqa: E402
+from ingest.persist import build_activity, persist_activity  # noqa: E402
+
+
+def best_of(repeat: int, func: Callable[[], object]) -> float:
+    """Best wall-clock time of ``repeat`` runs."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def synthetic_activity(index: int, n_samples: int) -> ActivityData:
+    """A 1 Hz run with GPS, heart rate, cadence, power and running dynamics, and a few sensor dropouts."""
+    rng = np.random.default_rng(index)
+    start = datetime(2024, 1, 1, 7, tzinfo=timezone.utc) + timedelta(days=index)
+    elapsed = np.arange(n_samples, dtype=np.float64)
+    speed = 3.0 + np.cumsum(rng.normal(0, 0.02, n_samples)).clip(-1, 1)
+    heading = np.cumsum(rng.normal(0, 0.01, n_samples))
+    heart_rate = np.rint(140 + 10 * np.sin(elapsed / 600) + rng.normal(0, 1, n_samples))
+    heart_rate[rng.random(n_samples) < 0.01] = np.nan
+    channels = dict(
+        elapsed_time_s=elapsed,
+        latitude=52.5 + np.cumsum(speed * np.cos(heading)) / 111_320,
+        longitude=13.4 + np.cumsum(speed * np.sin(heading)) / 67_800,
+        altitude_m=35 + np.cumsum(rng.normal(0, 0.1, n_samples)),
+        heart_rate=heart_rate,
+        cadence_rpm=np.rint(88 + rng.normal(0, 1, n_samples)),
+        speed_mps=speed,
+        power_w=np.rint(250 + rng.normal(0, 15, n_samples)),
+        vertical_oscillation_mm=np.round(85 + rng.normal(0, 3, n_samples), 1),
+        ground_contact_time_ms=np.round(240 + rng.normal(0, 5, n_samples), 1),
+        step_length_mm=np.round(1100 + rng.normal(0, 20, n_samples), 1),
+    )
+    timestamps = np.datetime64(start.replace(tzinfo=None), "us") + (elapsed * 1e6).astype("timedelta64[us]")
+    activity_data = ActivityData(
+        external_id=f"bench-{index}", sport="running", start_time_utc=start, distance_m=float(speed.sum())
+    )
+    activity_data.samples = SampleArrays(timestamps, **channels)
+    return activity_data
+
+
+def benchmark_store(store: str, directory: Path, n_activities: int, n_samples: int, repeat: int):
+    """Print write time, file size and load time for one sample store."""
+    db_path = directory / f"{store}.db"
+    db_config = init_database(f"sqlite:///{db_path}", sample_store=store)
+    try:
+        start = time.perf_counter()
+        for index in range(n_activities):
+            activity_data = synthetic_activity(index, n_samples)
+            with session_scope() as session:
+                activity = build_activity(activity_data, f"bench-{index}", "fit", f"bench-{index}.fit", "bench")
+                persist_activity(session, activity, activity_data)
+                activity_id = activity.id
+        write_seconds = time.perf_counter() - start
+
+        with db_config.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.exec_driver_sql("VACUUM")
+        sample_files = Path(db_config.sample_dir).glob("*.arrow")
+        size_mb = (db_path.stat().st_size + sum(path.stat().st_size for path in sample_files)) / 1e6
+        load_seconds = best_of(repeat, lambda: get_activity_samples(activity_id))
+    finally:
+        db_config.engine.dispose()
+        close_database()
+
+    print(
+        f"  {store:<9} write {write_seconds:7.2f} s   size {size_mb:8.2f} MB"
+        f"   ({size_mb * 1e6 / (n_activities * n_samples):5.1f} B/sample)   load {load_seconds * 1000:7.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--activities", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=3600, help="samples per activity (1 Hz)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.activities} activities of {args.samples} samples\n")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for store in SAMPLE_STORES:
+            if store == "arrow" and not PYARROW_AVAILABLE:
+                print(f"  {store:<9} skipped (pyarrow is not installed)")
+                continue
+            benchmark_store(store, Path(tmp_dir), args.activities, args.samples, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
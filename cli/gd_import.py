@@ -5,10 +5,14 @@ Typer-based CLI with Rich progress bars following PRP specifications.
 Supports FIT, TCX, GPX files with comprehensive error handling and deduplication.
 """
 
-from datetime import datetime, timezone
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
 import logging
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 
 from rich.console import Console
 from rich.logging import RichHandler
@@ -27,8 +31,29 @@ import typer
 
 # Import our modules
 from app.data.db import get_db_config, init_database, session_scope
-from app.data.models import Activity, ImportResult, Lap, RoutePoint, Sample
-from ingest.parser import ActivityParser, CorruptFileError, FileNotSupportedError, calculate_file_hash
+from app.data.models import ImportResult
+from app.data.sample_store import activities_with_sample_rows, migrate_activity_samples
+from ingest.archive import ARCHIVE_SUFFIXES, is_archive, iter_archive_members
+from ingest.cache import DEFAULT_CACHE_DIRNAME, ParsedActivityCache
+from ingest.duplicates import dedupe_activities
+from ingest.hydrate import hydrate_pending
+from ingest.manifest import FileSignature, find_unchanged_files
+from ingest.pipeline import (
+    IngestItem,
+    IngestStats,
+    STAGES,
+    dedupe_stage,
+    derive_stage,
+    drop_known_failures,
+    hash_item,
+    hash_stage,
+    parse_item,
+    persist_stage,
+    record_manifest,
+)
+from ingest.scan import ScannedFile, walk_activity_files
+from ingest.schedule import order_newest_first
+from ingest.watch import DEFAULT_POLL_INTERVAL_S, INOTIFY_AVAILABLE, InotifyWatcher, open_watcher
 
 # Initialize Rich console
 console = Console()
@@ -42,6 +67,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Directory imports commit once a batch reaches either limit
+COMMIT_BATCH_ACTIVITIES = 50
+COMMIT_BATCH_SAMPLES = 250_000
+
+# Directory walks and archives are planned and imported this many files at a time
+IMPORT_BATCH_FILES = 200
+
+# Watch mode imports at most this many files per batch, and waits this long for more to arrive
+WATCH_BATCH_FILES = 20
+WATCH_SETTLE_S = 2.0
+
 # Create Typer app
 app = typer.Typer(
     name="gd-import",
@@ -54,9 +90,9 @@ app = typer.Typer(
 def import_activities(
     data_dir: Path = typer.Argument(
         ...,
-        help="📁 Directory containing activity files (FIT/TCX/GPX)",
+        help="📁 Directory or archive (.zip, .tar, .tar.gz) containing activity files (FIT/TCX/GPX)",
         exists=True,
-        file_okay=False,
+        file_okay=True,
         dir_okay=True,
         readable=True,
     ),
@@ -69,17 +105,38 @@ def import_activities(
         dir_okay=False,
         readable=True,
     ),
-    force_reimport: bool = typer.Option(False, "--force", help="🔄 Reimport all files, ignoring duplicates"),
+    force_reimport: bool = typer.Option(
+        False, "--force", help="🔄 Reimport all files, replacing stored copies and ignoring the import manifest"
+    ),
+    retry_failed: bool = typer.Option(
+        False, "--retry-failed", help="🩹 Parse files again that this parser version already failed to read"
+    ),
     verbose: bool = typer.Option(False, "--verbose", "-v", help="📝 Enable verbose logging"),
     database_url: Optional[str] = typer.Option(
         None, "--database-url", help="🗄️ Custom database URL (default: sqlite:///garmin_dashboard.db)"
     ),
     dry_run: bool = typer.Option(False, "--dry-run", help="🧪 Preview what would be imported without making changes"),
+    jobs: int = typer.Option(1, "--jobs", "-j", min=1, help="⚡ Number of parallel parser processes"),
+    cache_dir: Optional[Path] = typer.Option(
+        None, "--cache-dir", help=f"🗃️ Parsed-activity cache directory (default: <data_dir>/{DEFAULT_CACHE_DIRNAME})"
+    ),
+    no_cache: bool = typer.Option(
+        False, "--no-cache", help="🚫 Always parse files, without reading or filling the cache"
+    ),
+    summary_only: bool = typer.Option(
+        False,
+        "--summary-only",
+        help="⏩ Import summaries and laps only; samples load on first open or with 'gd-import hydrate'",
+    ),
+    newest_first: bool = typer.Option(
+        False, "--newest-first", help="🆕 Walk the whole directory first, then import the most recent activities first"
+    ),
 ):
     """
     Import activity files from directory with progress tracking and error handling.
 
     🎯 Supports FIT, TCX, and GPX files with automatic parsing and deduplication.
+    📦 Archives such as Garmin's account export are read in place, without extraction.
     ⚡ Features Rich progress bars and comprehensive error reporting.
     """
 
@@ -88,20 +145,29 @@ def import_activities(
         logging.getLogger().setLevel(logging.DEBUG)
         logger.debug("Verbose logging enabled")
 
+    cache = open_parse_cache(data_dir, cache_dir, no_cache or dry_run)
+
     # Display welcome message
     console.print(
         Panel.fit(
             f"🏃 [bold blue]Garmin Dashboard Activity Importer[/bold blue]\n"
             f"📂 Source: [green]{data_dir}[/green]\n"
             f"🔄 Force reimport: [yellow]{force_reimport}[/yellow]\n"
-            f"🧪 Dry run: [yellow]{dry_run}[/yellow]",
+            f"🧪 Dry run: [yellow]{dry_run}[/yellow]\n"
+            f"⚡ Parser processes: [yellow]{jobs}[/yellow]\n"
+            f"🗃️ Parse cache: [yellow]{cache.root if cache else 'disabled'}[/yellow]\n"
+            f"⏩ Summary only: [yellow]{summary_only}[/yellow]",
             title="Import Configuration",
         )
     )
 
     # Validate data directory
-    if not data_dir.exists() or not data_dir.is_dir():
-        console.print(f"❌ [red]Error:[/red] Directory {data_dir} does not exist or is not a directory")
+    from_archive = data_dir.is_file()
+    if not data_dir.exists() or (from_archive and not is_archive(data_dir)):
+        console.print(
+            f"❌ [red]Error:[/red] {data_dir} is neither a directory nor a supported archive "
+            f"({', '.join(ARCHIVE_SUFFIXES)})"
+        )
         raise typer.Exit(1)
 
     # Initialize database (skip if dry run)
@@ -115,28 +181,57 @@ def import_activities(
     else:
         console.print("🧪 [yellow]Dry run mode - no database operations[/yellow]")
 
-    # Scan for activity files
+    if summary_only:
+        # Activities keep their source path for hydration, so it must not depend on the working directory
+        data_dir = data_dir.resolve()
+
+    if from_archive:
+        if dry_run:
+            display_scan_results(analyze_archive(data_dir))
+            console.print("\n🧪 [yellow]Dry run complete - no files imported[/yellow]")
+            raise typer.Exit(0)
+        display_import_results(
+            import_archive_with_progress(
+                data_dir, force_reimport, jobs=jobs, cache=cache, retry_failed=retry_failed, summary_only=summary_only
+            )
+        )
+        if summary_only:
+            display_hydration_hint()
+        return
+
+    # Walk the directory once; files are imported in batches while the walk continues
     console.print("\n🔍 [bold]Scanning for activity files...[/bold]")
-    activity_files = scan_activity_files(data_dir)
+    if dry_run:
+        file_stats = analyze_files(walk_activity_files(data_dir))
+        import_results = None
+    else:
+        import_results = import_directory_with_progress(
+            data_dir,
+            force_reimport,
+            jobs=jobs,
+            cache=cache,
+            retry_failed=retry_failed,
+            summary_only=summary_only,
+            newest_first=newest_first,
+        )
+        file_stats = import_results["scan"]
 
-    if not activity_files:
+    if not file_stats["total"]:
         console.print(f"⚠️ [yellow]No activity files found in {data_dir}[/yellow]")
         console.print("📝 Supported formats: .fit, .tcx, .gpx")
         raise typer.Exit(0)
 
     # Display scan results
-    file_stats = analyze_files(activity_files)
     display_scan_results(file_stats)
 
     if dry_run:
         console.print("\n🧪 [yellow]Dry run complete - no files imported[/yellow]")
         raise typer.Exit(0)
 
-    # Import files with progress tracking
-    import_results = import_files_with_progress(activity_files, force_reimport=force_reimport)
-
     # Display final results
     display_import_results(import_results)
+    if summary_only:
+        display_hydration_hint()
 
     # Optional: Handle GarminDB integration
     if garmin_db:
@@ -144,75 +239,82 @@ def import_activities(
         console.print(f"📝 Planned for future release: {garmin_db}")
 
 
-def scan_activity_files(data_dir: Path) -> List[Path]:
+def open_parse_cache(data_dir: Path, cache_dir: Optional[Path], disabled: bool) -> Optional[ParsedActivityCache]:
     """
-    Recursively scan directory for supported activity files.
+    Open the parsed-activity cache for an import, dropping entries from older parser versions.
 
     Args:
-        data_dir: Directory to scan
+        data_dir: Imported directory or archive; the cache defaults to a hidden directory
+            inside the directory, or next to the archive
+        cache_dir: Explicit cache directory, if any
+        disabled: Return None instead of a cache
 
     Returns:
-        List of activity file paths
+        ParsedActivityCache or None
     """
-    supported_extensions = {".fit", ".tcx", ".gpx"}
-    activity_files = []
+    if disabled:
+        return None
+    default_root = (data_dir.parent if data_dir.is_file() else data_dir) / DEFAULT_CACHE_DIRNAME
+    cache = ParsedActivityCache(cache_dir or default_root)
+    if removed := cache.prune():
+        logger.info(f"🗑️ Removed parse cache entries from {removed} older parser version(s)")
+    return cache
 
-    with Progress(
-        SpinnerColumn(), TextColumn("[progress.description]{task.description}"), console=console, transient=True
-    ) as progress:
-        scan_task = progress.add_task("Scanning files...", total=None)
 
-        for extension in supported_extensions:
-            pattern = f"*{extension}"
-            files = list(data_dir.rglob(pattern))
-            activity_files.extend(files)
-
-            # Also check uppercase extensions
-            pattern_upper = f"*{extension.upper()}"
-            files_upper = list(data_dir.rglob(pattern_upper))
-            activity_files.extend(files_upper)
+def analyze_files(scanned_files: Iterable[ScannedFile]) -> dict:
+    """
+    Analyze file types and sizes from the signatures taken during the scan.
 
-        progress.update(scan_task, description=f"Found {len(activity_files)} files")
+    Args:
+        scanned_files: Files from walk_activity_files
 
-    return sorted(activity_files)
+    Returns:
+        Dictionary with file statistics
+    """
+    stats = _new_file_stats()
+    for scanned in scanned_files:
+        _count_file(stats, scanned.path, scanned.signature.size_bytes)
+    return stats
 
 
-def analyze_files(files: List[Path]) -> dict:
+def analyze_archive(archive_path: Path) -> dict:
     """
-    Analyze file types and sizes.
+    Analyze the activity files inside an archive, like analyze_files.
 
     Args:
-        files: List of file paths
+        archive_path: Path to a ZIP or tar archive
 
     Returns:
-        Dictionary with file statistics
+        Dictionary with file statistics; ``largest_file`` is the member path
     """
-    stats = {"total": len(files), "by_type": {}, "total_size": 0, "largest_file": None, "largest_size": 0}
-
-    for file_path in files:
-        try:
-            size = file_path.stat().st_size
-            stats["total_size"] += size
+    stats = _new_file_stats()
+    for member in iter_archive_members(archive_path):
+        _count_file(stats, Path(member.path), len(member.data))
+    return stats
 
-            if size > stats["largest_size"]:
-                stats["largest_file"] = file_path
-                stats["largest_size"] = size
 
-            ext = file_path.suffix.lower()
-            stats["by_type"][ext] = stats["by_type"].get(ext, 0) + 1
+def _new_file_stats() -> dict:
+    return {"total": 0, "by_type": {}, "total_size": 0, "largest_file": None, "largest_size": 0}
 
-        except OSError:
-            continue
 
-    return stats
+def _count_file(stats: dict, file_path: Path, size: int):
+    """Add one file to the statistics built by analyze_files."""
+    stats["total"] += 1
+    stats["total_size"] += size
+    if size > stats["largest_size"]:
+        stats["largest_file"] = file_path
+        stats["largest_size"] = size
+    ext = file_path.suffix.lower()
+    stats["by_type"][ext] = stats["by_type"].get(ext, 0) + 1
 
 
-def display_scan_results(stats: dict):
+def display_scan_results(stats: dict, plan: Optional["ImportPlan"] = None):
     """
     Display file scan results in formatted table.
 
     Args:
         stats: File statistics dictionary
+        plan: Optional ImportPlan whose new, duplicate and failure counts are shown
     """
     table = Table(title="📊 Scan Results")
     table.add_column("File Type", style="cyan", no_wrap=True)
@@ -234,183 +336,540 @@ def display_scan_results(stats: dict):
         largest_mb = stats["largest_size"] / (1024 * 1024)
         console.print(f"📄 Largest file: [bold]{stats['largest_file'].name}[/bold] ({largest_mb:.1f} MB)")
 
+    if plan is not None:
+        console.print(f"🆕 New files: [bold]{len(plan.new)}[/bold]")
+        console.print(f"🔄 Duplicates: [bold]{len(plan.duplicates)}[/bold]")
+        console.print(f"💤 Unchanged since last import: [bold]{len(plan.unchanged)}[/bold]")
+        if plan.failed:
+            console.print(f"🚫 Known parse failures (skipped): [bold]{len(plan.failed)}[/bold]")
+        if plan.errors:
+            console.print(f"❌ Unreadable: [bold]{len(plan.errors)}[/bold]")
+
+
+@dataclass
+class ImportPlan:
+    """Files sorted by the hash and dedupe stages, before anything is parsed."""
+
+    new: List[IngestItem] = field(default_factory=list)
+    duplicates: List[IngestItem] = field(default_factory=list)
+    unchanged: List[Path] = field(default_factory=list)
+    failed: List[IngestItem] = field(default_factory=list)
+    errors: List[IngestItem] = field(default_factory=list)
+    stats: IngestStats = field(default_factory=IngestStats)
+
+
+def parse_file_for_import(file_path: Path) -> IngestItem:
+    """
+    Hash and parse a single activity file without touching the database.
+
+    Args:
+        file_path: Path to activity file
+
+    Returns:
+        IngestItem with the hash and parsed data, or the reason parsing failed
+    """
+    return parse_item(hash_item(IngestItem(file_path=file_path)))
+
+
+def plan_import(
+    files: List[Path], force_reimport: bool = False, jobs: int = 1, retry_failed: bool = False
+) -> ImportPlan:
+    """
+    Hash the scanned files and sort out the ones that need parsing.
+
+    Unchanged files are dropped using the import manifest, the rest go
+    through the pipeline's hash and dedupe stages. Contents the current
+    parser version already failed to parse are set aside as well.
+
+    Args:
+        files: Scanned activity file paths
+        force_reimport: Treat every file as new, bypassing the manifest and duplicate checks
+        jobs: Number of hashing threads
+        retry_failed: Parse known failures again instead of skipping them
+
+    Returns:
+        ImportPlan with new, duplicate, unchanged, known-failure and unreadable files
+    """
+    with Progress(
+        SpinnerColumn(), TextColumn("[progress.description]{task.description}"), console=console, transient=True
+    ) as progress:
+        progress.add_task(f"Hashing {len(files)} files...", total=None)
+        return plan_files(ImportPlan(), files, force_reimport, jobs, retry_failed)
+
+
+def plan_files(
+    plan: ImportPlan,
+    files: List[Path],
+    force_reimport: bool = False,
+    jobs: int = 1,
+    retry_failed: bool = False,
+    known_signatures: Optional[Dict[Path, FileSignature]] = None,
+) -> ImportPlan:
+    """
+    Add files to ``plan``: the manifest check, then the hash and dedupe stages.
+
+    Args:
+        plan: ImportPlan to fill
+        files: Activity file paths
+        force_reimport: Treat every file as new, bypassing the manifest and duplicate checks
+        jobs: Number of hashing threads
+        retry_failed: Parse known failures again instead of skipping them
+        known_signatures: Signatures taken during the directory walk, reused instead of stat'ing again
 
-def import_files_with_progress(files: List[Path], force_reimport: bool = False) -> dict:
+    Returns:
+        ``plan``
+    """
+    known_signatures = known_signatures or {}
+    if not force_reimport:
+        with session_scope() as session:
+            files, unchanged = find_unchanged_files(session, files, retry_failed, known_signatures)
+        plan.unchanged.extend(unchanged)
+
+    items = [IngestItem(file_path=file_path, signature=known_signatures.get(file_path)) for file_path in files]
+    hash_stage(items, plan.stats, jobs=jobs)
+    return sort_hashed_items(plan, items, force_reimport, retry_failed)
+
+
+def sort_hashed_items(
+    plan: ImportPlan, items: List[IngestItem], force_reimport: bool = False, retry_failed: bool = False
+) -> ImportPlan:
+    """
+    Sort hashed items into the plan's new, duplicate, known-failure and unreadable lists.
+
+    Args:
+        plan: ImportPlan to fill; its stats record the dedupe stage
+        items: Items after the hash stage
+        force_reimport: Treat every readable item as new, replacing stored copies
+        retry_failed: Keep known parse failures among the new items
+
+    Returns:
+        ``plan``
+    """
+    plan.errors.extend(item for item in items if item.error)
+    with session_scope() as session:
+        if force_reimport:
+            new = [item for item in items if not item.error]
+            for item in new:
+                item.replace = True
+        else:
+            new, duplicates = dedupe_stage(session, items, plan.stats)
+            plan.duplicates.extend(duplicates)
+        if not retry_failed:
+            new, failed = drop_known_failures(session, new, plan.stats)
+            plan.failed.extend(failed)
+    plan.new.extend(new)
+    return plan
+
+
+def import_files_with_progress(
+    files: List[Path],
+    force_reimport: bool = False,
+    jobs: int = 1,
+    cache: Optional[ParsedActivityCache] = None,
+    retry_failed: bool = False,
+) -> dict:
     """
     Import files with Rich progress bars and error handling.
 
     Args:
         files: List of file paths to import
-        force_reimport: Whether to force reimport of duplicates
+        force_reimport: Reimport stored files, replacing them and bypassing the manifest
+        jobs: Number of parser processes; values above 1 parse in a process pool
+        cache: Optional parsed-activity cache consulted before parsing
+        retry_failed: Parse files again that the current parser version already failed on
 
     Returns:
         Dictionary with import results
     """
-    results = {"imported": 0, "skipped": 0, "errors": 0, "duplicates": 0, "error_details": []}
+    return import_plan_with_progress(plan_import(files, force_reimport, jobs, retry_failed), jobs, cache)
 
-    with Progress(
-        TextColumn("[progress.description]{task.description}"),
-        BarColumn(),
-        MofNCompleteColumn(),
-        TaskProgressColumn(),
-        TimeElapsedColumn(),
-        console=console,
-    ) as progress:
-        import_task = progress.add_task("Importing activities...", total=len(files))
 
-        for file_path in files:
-            try:
-                # Update progress with current file
-                progress.update(import_task, description=f"Importing {file_path.name}...")
+def import_plan_with_progress(plan: ImportPlan, jobs: int = 1, cache: Optional[ParsedActivityCache] = None) -> dict:
+    """
+    Parse, derive and persist the new files of an import plan.
 
-                # Import the file
-                result = import_single_file(file_path, force_reimport)
+    Files whose size and modification time match their import manifest entry
+    were already left out of the plan and are never opened; duplicates and
+    known parse failures are only recorded in the manifest.
 
-                # Update counters
-                if result.imported:
-                    results["imported"] += 1
-                elif result.reason == "duplicate":
-                    results["duplicates"] += 1
-                else:
-                    results["skipped"] += 1
+    Args:
+        plan: ImportPlan from plan_import
+        jobs: Number of parser processes; values above 1 parse in a process pool
+        cache: Optional parsed-activity cache; files whose hash is cached are not parsed again
 
-            except Exception as e:
-                results["errors"] += 1
-                results["error_details"].append({"file": str(file_path), "error": str(e)})
-                logger.warning(f"⚠️ Error importing {file_path.name}: {e}")
+    Returns:
+        Dictionary with import results
+    """
+    results = _new_results(plan.stats)
+    writer = ImportWriter(results)
+
+    with _import_progress() as progress:
+        import_task = progress.add_task("Importing activities...", total=len(plan.new))
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                _run_plan(plan, writer, progress, import_task, cache, executor, jobs)
+        else:
+            _run_plan(plan, writer, progress, import_task, cache)
+
+        writer.flush()
+        progress.update(import_task, description="Import complete!")
 
-            progress.advance(import_task)
+    return results
+
+
+def import_directory_with_progress(
+    data_dir: Path,
+    force_reimport: bool = False,
+    jobs: int = 1,
+    cache: Optional[ParsedActivityCache] = None,
+    retry_failed: bool = False,
+    summary_only: bool = False,
+    newest_first: bool = False,
+) -> dict:
+    """
+    Walk a directory and import its activity files while the walk is still running.
+
+    The tree is walked once (ingest/scan.py). Every IMPORT_BATCH_FILES files
+    found are checked against the manifest with the signatures from the walk,
+    hashed, deduplicated and imported before the walk continues, so parsing
+    starts long before a slow network mount has been fully listed. With
+    ``newest_first`` the walk completes first and files are imported in
+    order of recency instead (see order_scan_newest_first).
+
+    Args:
+        data_dir: Directory to import
+        force_reimport: Import every file, bypassing the manifest and duplicate checks
+        jobs: Number of hashing threads and parser processes
+        cache: Optional parsed-activity cache consulted before parsing
+        retry_failed: Parse files again that the current parser version already failed on
+        summary_only: Store summaries and laps only, leaving the activities unhydrated
+        newest_first: Import the most recent activities first
+
+    Returns:
+        Dictionary with import results; ``scan`` holds the analyze_files statistics
+    """
+    stats = IngestStats()
+    results = _new_results(stats)
+    results["scan"] = _new_file_stats()
+    writer = ImportWriter(results)
+    scanned_files = walk_activity_files(data_dir)
+    if newest_first:
+        scanned_files = iter(order_scan_newest_first(scanned_files, force_reimport, jobs, retry_failed))
+
+    with _import_progress() as progress, ExitStack() as stack:
+        executor = stack.enter_context(ProcessPoolExecutor(max_workers=jobs)) if jobs > 1 else None
+        import_task = progress.add_task(f"Scanning {data_dir.name}...", total=0)
+
+        while batch := list(islice(scanned_files, IMPORT_BATCH_FILES)):
+            for scanned in batch:
+                _count_file(results["scan"], scanned.path, scanned.signature.size_bytes)
+            plan = plan_files(
+                ImportPlan(stats=stats),
+                [scanned.path for scanned in batch],
+                force_reimport,
+                jobs,
+                retry_failed,
+                known_signatures={scanned.path: scanned.signature for scanned in batch},
+            )
+            progress.update(import_task, total=progress.tasks[import_task].total + len(plan.new))
+            _run_plan(plan, writer, progress, import_task, cache, executor, jobs, summary_only)
+            # Commit before the next batch is deduplicated, so copies across batches are caught
+            writer.flush()
 
         progress.update(import_task, description="Import complete!")
 
     return results
 
 
-def import_single_file(file_path: Path, force_reimport: bool = False) -> ImportResult:
+def order_scan_newest_first(
+    scanned_files: Iterable[ScannedFile], force_reimport: bool = False, jobs: int = 1, retry_failed: bool = False
+) -> List[ScannedFile]:
     """
-    Import a single activity file with comprehensive error handling.
+    Order a complete directory walk for a newest-first import.
+
+    Files unchanged since their manifest entry come first, unordered, as
+    they are skipped without being opened. The rest are ordered by the
+    activity start peeked from their first few kilobytes (ingest/schedule.py).
 
     Args:
-        file_path: Path to activity file
-        force_reimport: Whether to force reimport of duplicates
+        scanned_files: Files from walk_activity_files
+        force_reimport: Order every file, without consulting the manifest
+        jobs: Threads reading file heads
+        retry_failed: Treat files that failed to parse as changed
 
     Returns:
-        ImportResult indicating success/failure
+        Scanned files in import order
     """
-    try:
-        # Calculate file hash for deduplication
-        file_hash = calculate_file_hash(file_path)
+    scanned_files = list(scanned_files)
+    if force_reimport:
+        return order_newest_first(scanned_files, jobs)
+
+    signatures = {scanned.path: scanned.signature for scanned in scanned_files}
+    with session_scope() as session:
+        changed, _ = find_unchanged_files(session, list(signatures), retry_failed, signatures)
+    changed = set(changed)
+    unchanged = [scanned for scanned in scanned_files if scanned.path not in changed]
+    return unchanged + order_newest_first([scanned for scanned in scanned_files if scanned.path in changed], jobs)
+
+
+def import_archive_with_progress(
+    archive_path: Path,
+    force_reimport: bool = False,
+    jobs: int = 1,
+    cache: Optional[ParsedActivityCache] = None,
+    retry_failed: bool = False,
+    summary_only: bool = False,
+) -> dict:
+    """
+    Import the activity files inside a ZIP or tar archive without extracting it.
 
+    Members are read IMPORT_BATCH_FILES at a time, hashed and deduplicated
+    in memory, and their bytes are handed straight to the parser (or to the
+    parser worker processes), so memory stays bounded for exports with
+    thousands of files. Archive members have no import manifest entries;
+    re-importing an archive skips its activities by hash.
+
+    Args:
+        archive_path: Path to a .zip, .tar or compressed tar archive
+        force_reimport: Import members again, replacing activities stored from the same contents
+        jobs: Number of hashing threads and parser processes
+        cache: Optional parsed-activity cache consulted before parsing
+        retry_failed: Parse members again that the current parser version already failed on
+        summary_only: Store summaries and laps only, leaving the activities unhydrated; member
+            paths then start with the full archive path, so hydration can find them again
+
+    Returns:
+        Dictionary with import results
+    """
+    stats = IngestStats()
+    results = _new_results(stats)
+    writer = ImportWriter(results)
+    members = iter_archive_members(archive_path, name=str(archive_path) if summary_only else "")
+
+    with _import_progress() as progress, ExitStack() as stack:
+        executor = stack.enter_context(ProcessPoolExecutor(max_workers=jobs)) if jobs > 1 else None
+        import_task = progress.add_task(f"Reading {archive_path.name}...", total=0)
+
+        while batch := list(islice(members, IMPORT_BATCH_FILES)):
+            items = [IngestItem(file_path=Path(member.path), content=member.data) for member in batch]
+            plan = ImportPlan(stats=stats)
+            sort_hashed_items(plan, hash_stage(items, stats, jobs=jobs), force_reimport, retry_failed)
+            progress.update(import_task, total=progress.tasks[import_task].total + len(plan.new))
+            _run_plan(plan, writer, progress, import_task, cache, executor, jobs, summary_only)
+            # Commit before the next batch is deduplicated, so copies across batches are caught
+            writer.flush()
+
+        progress.update(import_task, description="Import complete!")
+
+    return results
+
+
+def _new_results(stats: IngestStats) -> dict:
+    """Empty import results sharing ``stats``."""
+    return {
+        "imported": 0,
+        "skipped": 0,
+        "errors": 0,
+        "duplicates": 0,
+        "unchanged": 0,
+        "known_failures": 0,
+        "error_details": [],
+        "failure_details": [],
+        "stats": stats,
+    }
+
+
+def _import_progress() -> Progress:
+    return Progress(
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TaskProgressColumn(),
+        TimeElapsedColumn(),
+        console=console,
+    )
+
+
+def _run_plan(
+    plan: ImportPlan,
+    writer: "ImportWriter",
+    progress: Progress,
+    import_task,
+    cache: Optional[ParsedActivityCache] = None,
+    executor: Optional[ProcessPoolExecutor] = None,
+    jobs: int = 1,
+    summary_only: bool = False,
+):
+    """
+    Account for a plan's skipped files and feed its new files to the writer.
+
+    Parsing happens in ``executor`` when one is given, otherwise in this
+    process. The caller flushes the writer. ``summary_only`` files are
+    parsed without their samples.
+    """
+    results = writer.results
+    results["duplicates"] += len(plan.duplicates)
+    results["unchanged"] += len(plan.unchanged)
+    results["known_failures"] += len(plan.failed)
+
+    for item in plan.errors:
+        _record_error(results, item.file_path, RuntimeError(item.error))
+
+    if plan.duplicates or plan.failed:
         with session_scope() as session:
-            # Check for existing import (unless forcing reimport)
-            if not force_reimport:
-                if existing := session.query(Activity).filter_by(file_hash=file_hash).first():  # noqa: F841
-                    logger.debug(f"Skipping duplicate: {file_path.name}")
-                    return ImportResult(imported=False, reason="duplicate")
+            for item in plan.duplicates:
+                record_manifest(session, item, ImportResult(imported=False, reason="duplicate"))
+            for item in plan.failed:
+                _record_failure(results, item.file_path, item.reason, known=True)
+                record_manifest(session, item, ImportResult(imported=False, reason=item.reason))
+
+    for item in plan.new:
+        item.summary_only = summary_only
+
+    if executor is not None:
+        _import_files_parallel(plan.new, executor, jobs, writer, progress, import_task, cache)
+    else:
+        for item in plan.new:
+            # Update progress with current file
+            progress.update(import_task, description=f"Importing {item.file_path.name}...")
+
+            # Parse the file; the writer commits it with the next batch
+            writer.add(parse_item(item, cache))
+            progress.advance(import_task)
+
 
-            # Parse the activity file
+def _import_files_parallel(
+    files: List[IngestItem],
+    executor: ProcessPoolExecutor,
+    jobs: int,
+    writer: "ImportWriter",
+    progress: Progress,
+    import_task,
+    cache: Optional[ParsedActivityCache] = None,
+):
+    """
+    Parse files in a process pool while this process remains the single database writer.
+
+    Submissions are capped at a small multiple of the worker count so that parsed
+    activities waiting to be written never pile up in memory.
+    """
+    max_in_flight = jobs * 2
+    pending_files = iter(files)
+    in_flight = {}
+
+    def submit_next() -> bool:
+        item = next(pending_files, None)
+        if item is None:
+            return False
+        in_flight[executor.submit(parse_item, item, cache)] = item.file_path
+        return True
+
+    while len(in_flight) < max_in_flight and submit_next():
+        pass
+
+    while in_flight:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            file_path = in_flight.pop(future)
+            progress.update(import_task, description=f"Importing {file_path.name}...")
             try:
-                activity_data = ActivityParser.parse_activity_file(file_path)
-                if not activity_data:
-                    return ImportResult(imported=False, reason="no_data")
-
-            except (FileNotSupportedError, CorruptFileError) as e:
-                logger.debug(f"Parse error for {file_path}: {e}")
-                return ImportResult(imported=False, reason=f"parse_error: {e}")
-
-            # Create Activity object
-            activity = Activity(
-                external_id=activity_data.external_id or file_path.stem,
-                file_hash=file_hash,
-                source=file_path.suffix[1:].lower(),  # Remove dot and lowercase
-                sport=activity_data.sport or "unknown",
-                sub_sport=activity_data.sub_sport,
-                start_time_utc=activity_data.start_time_utc or datetime.now(timezone.utc),
-                elapsed_time_s=activity_data.elapsed_time_s or 0,
-                moving_time_s=activity_data.moving_time_s,
-                distance_m=activity_data.distance_m,
-                avg_speed_mps=activity_data.avg_speed_mps,
-                avg_pace_s_per_km=activity_data.avg_pace_s_per_km,
-                avg_hr=activity_data.avg_hr,
-                max_hr=activity_data.max_hr,
-                avg_power_w=activity_data.avg_power_w,
-                max_power_w=activity_data.max_power_w,
-                elevation_gain_m=activity_data.elevation_gain_m,
-                elevation_loss_m=activity_data.elevation_loss_m,
-                calories=activity_data.calories,
-                file_path=str(file_path),
-            )
+                writer.add(future.result())
+            except Exception as e:
+                _record_error(writer.results, file_path, e)
+
+            progress.advance(import_task)
+            submit_next()
 
-            session.add(activity)
-            session.flush()  # Get the activity ID
-
-            # Add samples if present
-            if activity_data.samples:
-                for sample_data in activity_data.samples:
-                    if sample_data.timestamp:  # Only add samples with timestamps
-                        sample = Sample(
-                            activity_id=activity.id,
-                            timestamp=sample_data.timestamp,
-                            elapsed_time_s=sample_data.elapsed_time_s or 0,
-                            latitude=sample_data.latitude,
-                            longitude=sample_data.longitude,
-                            altitude_m=sample_data.altitude_m,
-                            heart_rate=sample_data.heart_rate,
-                            power_w=sample_data.power_w,
-                            cadence_rpm=sample_data.cadence_rpm,
-                            speed_mps=sample_data.speed_mps,
-                            temperature_c=sample_data.temperature_c,
-                            # Advanced running dynamics
-                            vertical_oscillation_mm=sample_data.vertical_oscillation_mm,
-                            vertical_ratio=sample_data.vertical_ratio,
-                            ground_contact_time_ms=sample_data.ground_contact_time_ms,
-                            ground_contact_balance_pct=sample_data.ground_contact_balance_pct,
-                            step_length_mm=sample_data.step_length_mm,
-                            air_power_w=sample_data.air_power_w,
-                            form_power_w=sample_data.form_power_w,
-                            leg_spring_stiffness=sample_data.leg_spring_stiffness,
-                            impact_loading_rate=sample_data.impact_loading_rate,
-                            stryd_temperature_c=sample_data.stryd_temperature_c,
-                            stryd_humidity_pct=sample_data.stryd_humidity_pct,
-                        )
-                        session.add(sample)
-
-            # Add route points if present
-            if activity_data.route_points:
-                for i, (lat, lon, alt) in enumerate(activity_data.route_points):
-                    if lat is not None and lon is not None:
-                        route_point = RoutePoint(
-                            activity_id=activity.id, sequence=i, latitude=lat, longitude=lon, altitude_m=alt
-                        )
-                        session.add(route_point)
-
-            # Add laps if present
-            if activity_data.laps:
-                for lap_data in activity_data.laps:
-                    lap = Lap(
-                        activity_id=activity.id,
-                        lap_index=lap_data.lap_index,
-                        start_time_utc=lap_data.start_time_utc,
-                        elapsed_time_s=lap_data.elapsed_time_s or 0,
-                        moving_time_s=lap_data.elapsed_time_s,  # Use elapsed as fallback
-                        distance_m=lap_data.distance_m,
-                        avg_speed_mps=lap_data.avg_speed_mps,
-                        avg_hr=lap_data.avg_hr,
-                        max_hr=lap_data.max_hr,
-                        avg_power_w=lap_data.avg_power_w,
-                        max_power_w=lap_data.max_power_w,
-                    )
-                    session.add(lap)
-
-            # Commit all changes
-            session.commit()
-
-            logger.debug(f"Successfully imported {file_path.name}")
-            return ImportResult(imported=True, activity_id=activity.id)
 
-    except Exception as e:
-        logger.error(f"Import error for {file_path}: {e}")
-        return ImportResult(imported=False, reason=f"import_error: {e}")
+def _record_result(results: dict, result: ImportResult, file_path: Optional[Path] = None):
+    """Update the results counters from a single ImportResult."""
+    if result.imported:
+        results["imported"] += 1
+    elif result.reason == "duplicate":
+        results["duplicates"] += 1
+    else:
+        results["skipped"] += 1
+        if file_path is not None and result.reason.startswith("parse_error: "):
+            _record_failure(results, file_path, result.reason)
+
+
+def _record_failure(results: dict, file_path: Path, reason: str, known: bool = False):
+    """Record a file the parsers rejected; ``known`` failures were skipped without parsing."""
+    results["failure_details"].append(
+        {"file": str(file_path), "reason": reason.partition(": ")[2] or reason, "known": known}
+    )
+
+
+def _record_error(results: dict, file_path: Path, error: Exception):
+    """Record an unexpected import error for the final report."""
+    results["errors"] += 1
+    results["error_details"].append({"file": str(file_path), "error": str(error)})
+    logger.warning(f"⚠️ Error importing {file_path.name}: {error}")
+
+
+class ImportWriter:
+    """
+    Run the derive and persist stages for parsed files, several activities per transaction.
+
+    A batch is committed once it holds ``batch_activities`` activities or
+    ``batch_samples`` samples. If a batch fails, its files are written again
+    one transaction each, so a single bad file only loses itself.
+    """
+
+    def __init__(
+        self, results: dict, batch_activities: int = COMMIT_BATCH_ACTIVITIES, batch_samples: int = COMMIT_BATCH_SAMPLES
+    ):
+        self.results = results
+        self.stats: IngestStats = results["stats"]
+        self.batch_activities = batch_activities
+        self.batch_samples = batch_samples
+        self.pending: List[IngestItem] = []
+        self.pending_samples = 0
+
+    def add(self, item: IngestItem):
+        """Queue a parsed file, committing the batch when it is full."""
+        # Parsing may have happened in a worker process; account for it here
+        self.stats.record_parse(item)
+        if item.error:
+            _record_error(self.results, item.file_path, RuntimeError(item.error))
+            return
+
+        self.pending.append(item)
+        if item.activity_data is not None:
+            self.pending_samples += len(item.activity_data.samples)
+        if len(self.pending) >= self.batch_activities or self.pending_samples >= self.batch_samples:
+            self.flush()
+
+    def flush(self):
+        """Commit all queued files."""
+        if not self.pending:
+            return
+        batch, self.pending, self.pending_samples = self.pending, [], 0
+
+        try:
+            batch_results = self._write(batch)
+        except Exception as e:
+            logger.debug(f"Batch of {len(batch)} files failed ({e}); retrying one file per transaction")
+            batch_results = []
+            for item in batch:
+                item.activity = None  # rolled back with the batch
+                try:
+                    batch_results.extend(self._write([item]))
+                except Exception as item_error:
+                    logger.error(f"Import error for {item.file_path}: {item_error}")
+                    batch_results.append(ImportResult(imported=False, reason=f"import_error: {item_error}"))
+
+        for item, result in zip(batch, batch_results):
+            _record_result(self.results, result, item.file_path)
+
+    def _write(self, items: List[IngestItem]) -> List[ImportResult]:
+        """Derive and persist items in one transaction; stats only count committed work."""
+        attempt_stats = IngestStats()
+        derive_stage(items, attempt_stats)
+        with session_scope() as session:
+            batch_results = persist_stage(session, items, attempt_stats)
+        self.stats.merge(attempt_stats)
+        return batch_results
 
 
 def display_import_results(results: dict):
@@ -432,10 +891,38 @@ def display_import_results(results: dict):
     table.add_row("✅ Imported", str(results["imported"]))
     table.add_row("⏭️ Skipped", str(results["skipped"]))
     table.add_row("🔄 Duplicates", str(results["duplicates"]))
+    table.add_row("💤 Unchanged", str(results.get("unchanged", 0)))
+    table.add_row("🚫 Known failures", str(results.get("known_failures", 0)))
     table.add_row("❌ Errors", str(results["errors"]))
 
     console.print(table)
 
+    stats = results.get("stats")
+    if stats is not None:
+        timings = Table(title="⏱️ Pipeline Stages")
+        timings.add_column("Stage", style="cyan", no_wrap=True)
+        timings.add_column("Files", justify="right", style="magenta")
+        timings.add_column("Time", justify="right", style="green")
+        for stage in STAGES:
+            if stats.items[stage]:
+                timings.add_row(stage, str(stats.items[stage]), f"{stats.seconds[stage]:.2f}s")
+        console.print(timings)
+        if stats.cache_hits:
+            console.print(f"🗃️ Read from parse cache: [bold]{stats.cache_hits}[/bold] of {stats.items['parse']} files")
+        if stats.persist.rows:
+            console.print(f"⚡ Write throughput: [bold]{stats.persist.summary()}[/bold]")
+
+    failures = results.get("failure_details", [])
+    if failures:
+        console.print(f"\n🚫 [yellow]{len(failures)} files could not be parsed:[/yellow]")
+        for failure in failures[:10]:
+            note = " [dim](known, not retried)[/dim]" if failure["known"] else ""
+            console.print(f"  • {Path(failure['file']).name}: {failure['reason']}{note}")
+        if len(failures) > 10:
+            console.print(f"  ... and {len(failures) - 10} more")
+        if any(failure["known"] for failure in failures):
+            console.print("  Run again with [bold]--retry-failed[/bold] to parse known failures again")
+
     # Display errors if any
     if results["errors"] > 0:
         console.print(f"\n⚠️ [yellow]{results['errors']} errors occurred:[/yellow]")
@@ -459,13 +946,277 @@ def display_import_results(results: dict):
 
 
 @app.command()
-def status():
+def watch(
+    data_dir: Path = typer.Argument(
+        ...,
+        help="📁 Directory to watch for activity files (FIT/TCX/GPX)",
+        exists=True,
+        file_okay=False,
+        dir_okay=True,
+        readable=True,
+    ),
+    database_url: Optional[str] = typer.Option(
+        None, "--database-url", help="🗄️ Custom database URL (default: sqlite:///garmin_dashboard.db)"
+    ),
+    jobs: int = typer.Option(1, "--jobs", "-j", min=1, help="⚡ Number of parallel parser processes"),
+    batch_size: int = typer.Option(WATCH_BATCH_FILES, "--batch-size", min=1, help="📦 Maximum files per import batch"),
+    interval: float = typer.Option(
+        DEFAULT_POLL_INTERVAL_S, "--interval", min=0.1, help="⏱️ Seconds between directory scans when polling"
+    ),
+    poll: bool = typer.Option(False, "--poll", help="🔁 Scan the directory periodically instead of using inotify"),
+    cache_dir: Optional[Path] = typer.Option(
+        None, "--cache-dir", help=f"🗃️ Parsed-activity cache directory (default: <data_dir>/{DEFAULT_CACHE_DIRNAME})"
+    ),
+    no_cache: bool = typer.Option(
+        False, "--no-cache", help="🚫 Always parse files, without reading or filling the cache"
+    ),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="📝 Enable verbose logging"),
+):
+    """
+    👀 Watch a directory and import new or modified activity files as they arrive.
+
+    Files already in the directory are caught up first; unchanged ones cost a
+    single stat call thanks to the import manifest. Stop with Ctrl+C.
+    """
+    if verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    try:
+        db_config = init_database(database_url)
+    except Exception as e:
+        console.print(f"❌ [red]Database Error:[/red] {e}")
+        raise typer.Exit(1) from e
+
+    watcher = open_watcher(data_dir, interval, use_inotify=False if poll else None)
+    mode = "inotify" if isinstance(watcher, InotifyWatcher) else f"polling every {interval:g}s"
+    console.print(
+        Panel.fit(
+            f"👀 [bold blue]Watching[/bold blue] [green]{data_dir}[/green]\n"
+            f"🗄️ Database: [green]{db_config.database_url}[/green]\n"
+            f"🔔 Change detection: [yellow]{mode}[/yellow]"
+            + ("" if INOTIFY_AVAILABLE or poll else " (install inotify_simple for event-driven watching)"),
+            title="Watch Mode",
+        )
+    )
+
+    cache = open_parse_cache(data_dir, cache_dir, no_cache)
+    totals = watch_and_import(data_dir, watcher, jobs=jobs, batch_size=batch_size, cache=cache)
+    console.print(
+        f"\n👋 Stopped watching. Imported {totals['imported']}, duplicates {totals['duplicates']}, "
+        f"errors {totals['errors']}."
+    )
+
+
+def watch_and_import(
+    data_dir: Path,
+    watcher,
+    jobs: int = 1,
+    batch_size: int = WATCH_BATCH_FILES,
+    catch_up: bool = True,
+    max_batches: Optional[int] = None,
+    cache: Optional[ParsedActivityCache] = None,
+) -> dict:
+    """
+    Feed files reported by a watcher through the import pipeline in small batches.
+
+    A batch is imported once no further changes arrive within WATCH_SETTLE_S
+    seconds, or as soon as it holds ``batch_size`` files.
+
+    Args:
+        data_dir: Watched directory
+        watcher: InotifyWatcher or PollingWatcher from ingest.watch
+        jobs: Number of parser processes
+        batch_size: Maximum files per batch
+        catch_up: Import files already in the directory before watching
+        max_batches: Stop after this many watched batches (for tests); None runs until interrupted
+        cache: Optional parsed-activity cache
+
+    Returns:
+        Totals of the import counters over all batches
+    """
+    totals = {"imported": 0, "duplicates": 0, "unchanged": 0, "skipped": 0, "errors": 0}
+
+    def add_results(label: str, results: dict):
+        for key in totals:
+            totals[key] += results[key]
+        console.print(
+            f"📥 [{datetime.now():%H:%M:%S}] {label}: imported {results['imported']}, "
+            f"duplicates {results['duplicates']}, unchanged {results['unchanged']}, "
+            f"skipped {results['skipped']}, errors {results['errors']}"
+        )
+
+    def run_batch(files: List[Path]):
+        add_results(f"{len(files)} files", import_files_with_progress(files, jobs=jobs, cache=cache))
+
+    pending = {}
+    batches = 0
+    try:
+        if catch_up:
+            results = import_directory_with_progress(data_dir, jobs=jobs, cache=cache)
+            if results["scan"]["total"]:
+                add_results(f"{results['scan']['total']} existing files", results)
+
+        while max_batches is None or batches < max_batches:
+            changed = watcher.changes(timeout=WATCH_SETTLE_S if pending else None)
+            pending.update(dict.fromkeys(changed))
+            if pending and (not changed or len(pending) >= batch_size):
+                batch = list(pending)[:batch_size]
+                for file_path in batch:
+                    del pending[file_path]
+                run_batch(batch)
+                batches += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+    return totals
+
+
+def display_hydration_hint():
+    """Explain how the samples of a summary-only import get loaded."""
+    console.print(
+        "\n⏩ [yellow]Imported summaries only.[/yellow] Samples load when an activity is first opened; "
+        "run [bold]gd-import hydrate[/bold] to load them all now."
+    )
+
+
+@app.command()
+def hydrate(
+    database_url: Optional[str] = typer.Option(
+        None, "--database-url", help="🗄️ Custom database URL (default: sqlite:///garmin_dashboard.db)"
+    ),
+    limit: Optional[int] = typer.Option(None, "--limit", min=1, help="🔢 Hydrate at most this many activities"),
+    retry_failed: bool = typer.Option(
+        False, "--retry-failed", help="🔁 Also retry activities whose samples could not be loaded before"
+    ),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="📝 Enable verbose logging"),
+):
+    """
+    💧 Load the samples of activities imported with --summary-only, newest first.
+    """
+    if verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    try:
+        init_database(database_url)
+    except Exception as e:
+        console.print(f"❌ [red]Database Error:[/red] {e}")
+        raise typer.Exit(1) from e
+
+    with Progress(
+        SpinnerColumn(), TextColumn("[progress.description]{task.description}"), console=console, transient=True
+    ) as progress:
+        progress.add_task("Loading samples...", total=None)
+        results = hydrate_pending(limit, retry_failed)
+
+    console.print(f"💧 Hydrated [bold]{results.hydrated}[/bold] activities")
+    if results.stats.rows:
+        console.print(f"⚡ Write throughput: [bold]{results.stats.summary()}[/bold]")
+    if results.failures:
+        console.print(f"\n⚠️ [yellow]{len(results.failures)} activities could not be hydrated:[/yellow]")
+        for activity_id, reason in results.failures[:10]:
+            console.print(f"  • Activity {activity_id}: {reason}")
+        if len(results.failures) > 10:
+            console.print(f"  ... and {len(results.failures) - 10} more")
+
+
+@app.command()
+def dedupe(
+    database_url: Optional[str] = typer.Option(
+        None, "--database-url", help="🗄️ Custom database URL (default: sqlite:///garmin_dashboard.db)"
+    ),
+    dry_run: bool = typer.Option(False, "--dry-run", help="🧪 List the duplicates without removing them"),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="📝 Enable verbose logging"),
+):
+    """
+    🧹 Remove activities stored twice, e.g. from a FIT file and from Garmin Connect.
+    """
+    if verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    try:
+        init_database(database_url)
+    except Exception as e:
+        console.print(f"❌ [red]Database Error:[/red] {e}")
+        raise typer.Exit(1) from e
+
+    with session_scope() as session:
+        results = dedupe_activities(session, dry_run=dry_run)
+
+    if not results.pairs:
+        console.print("✅ No duplicate activities found")
+        return
+    console.print(f"🔍 Found [bold]{len(results.pairs)}[/bold] duplicates of [bold]{results.groups}[/bold] activities")
+    for duplicate_id, keep_id in results.pairs[:10]:
+        console.print(f"  • Activity {duplicate_id} duplicates activity {keep_id}")
+    if len(results.pairs) > 10:
+        console.print(f"  ... and {len(results.pairs) - 10} more")
+    if dry_run:
+        console.print("\n🧪 [yellow]Dry run complete - no activities removed[/yellow]")
+    else:
+        console.print(f"\n🧹 Removed [bold]{results.removed}[/bold] duplicate activities")
+
+
+@app.command()
+def migrate_samples(
+    database_url: Optional[str] = typer.Option(
+        None, "--database-url", help="🗄️ Custom database URL (default: sqlite:///garmin_dashboard.db)"
+    ),
+    to: str = typer.Option("columnar", "--to", help="📦 Target store: 'columnar' or 'arrow' (sidecar files)"),
+    vacuum: bool = typer.Option(False, "--vacuum", help="🗜️ Reclaim the freed space afterwards (SQLite only)"),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="📝 Enable verbose logging"),
+):
+    """
+    🗜️ Move stored samples to the columnar or Arrow store, one activity per transaction.
+
+    Set SAMPLE_STORE to the same store so later imports write there as well.
+    """
+    if verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+    if to not in ("columnar", "arrow"):
+        console.print(f"❌ [red]Unknown sample store:[/red] {to}")
+        raise typer.Exit(1)
+
+    try:
+        db_config = init_database(database_url, sample_store=to)
+    except Exception as e:
+        console.print(f"❌ [red]Database Error:[/red] {e}")
+        raise typer.Exit(1) from e
+
+    with session_scope() as session:
+        activity_ids = activities_with_sample_rows(session)
+    if not activity_ids:
+        console.print("✅ No samples left in the row store")
+        return
+
+    moved = 0
+    with _import_progress() as progress:
+        task = progress.add_task("Migrating samples...", total=len(activity_ids))
+        for activity_id in activity_ids:
+            with session_scope() as session:
+                moved += migrate_activity_samples(session, activity_id, to)
+            progress.advance(task)
+
+    console.print(f"🗜️ Moved [bold]{moved:,}[/bold] samples of [bold]{len(activity_ids)}[/bold] activities")
+    if vacuum and db_config.database_url.startswith("sqlite"):
+        with db_config.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+        console.print("🧽 Database file compacted")
+
+
+@app.command()
+def status(
+    recount: bool = typer.Option(
+        False, "--recount", help="🔢 Count every table exactly and correct the maintained row counters"
+    ),
+):
     """
     📊 Show database status and statistics.
     """
     try:
         db_config = get_db_config()
-        db_info = db_config.get_database_info()
+        db_info = db_config.get_database_info(exact=recount)
 
         console.print(
             Panel.fit(
@@ -12,9 +12,10 @@ from pathlib import Path
 import tempfile
 from typing import Any, Dict, List, Optional
 
-from app.data.db import session_scope
-from app.data.models import Activity, Lap, RoutePoint, Sample
-from ingest.parser import ActivityParser
+from app.data.db import run_write, session_scope
+from app.data.models import Activity, ActivityData
+from ingest.duplicates import dedupe_activities
+from ingest.pipeline import IngestItem, IngestStats, derive_stage, hash_stage, parse_stage, persist_stage
 
 from .client import GarminAuthError, GarminConnectClient
 
@@ -42,9 +43,9 @@ class ActivityImportService:
             if not self.client.is_authenticated():
                 raise GarminAuthError("Client not authenticated")
 
-            # Check if activity already exists in database - Enhanced duplicate detection
+            # Known activities are skipped before anything is downloaded; the unique
+            # garmin_activity_id key catches the ones stored since (see below)
             with session_scope() as session:
-                # Primary check: by garmin_activity_id
                 if activity_id:
                     existing = session.query(Activity).filter_by(garmin_activity_id=str(activity_id)).first()
                     if existing:
@@ -66,108 +67,54 @@ class ActivityImportService:
             if not activity_summary:
                 return {"success": False, "error": f"Could not retrieve activity {activity_id} from Garmin Connect"}
 
-            # Secondary duplicate check: by activity characteristics if garmin_activity_id is missing/None
-            with session_scope() as session:
-                garmin_id_from_summary = activity_summary.get("activityId") or activity_summary.get("activityIdStr")
-                activity_name = activity_summary.get("activityName", "")
-                start_time_str = activity_summary.get("startTimeGMT") or activity_summary.get("startTimeLocal")
-                start_time = self._parse_datetime(start_time_str)
-
-                if not garmin_id_from_summary and start_time and activity_name:
-                    # Check for activities with same name and start time (within 1 minute)
-                    from datetime import timedelta
-
-                    time_window = timedelta(minutes=1)
-
-                    similar_activities = (
-                        session.query(Activity)
-                        .filter(
-                            Activity.name == activity_name,
-                            Activity.start_time_utc >= start_time - time_window,
-                            Activity.start_time_utc <= start_time + time_window,
-                        )
-                        .all()
-                    )
-
-                    if similar_activities:
-                        existing = similar_activities[0]
-                        logger.info(
-                            f"Activity with similar characteristics already exists (DB ID: {existing.id}) - Name: '{activity_name}', Start: {start_time}"
-                        )
-                        return {
-                            "success": True,
-                            "status": "already_exists",
-                            "activity_id": existing.id,
-                            "message": f"Activity with similar characteristics already exists: '{activity_name}' at {start_time}",
-                        }
-
-            # Download and parse FIT file if requested
-            parsed_data = None
+            # Download, hash and parse FIT file if requested
+            stats = IngestStats()
+            item = None
             if download_fit:
                 try:
-                    parsed_data = self._download_and_parse_fit(activity_id)
+                    item = self._download_and_parse_fit(activity_id, stats)
                 except Exception as e:
                     logger.warning(f"Failed to download/parse FIT for {activity_id}: {e}")
-
-            # Import to database with final duplicate check in transaction
-            with session_scope() as session:
-                # Final duplicate check within the same transaction to prevent race conditions
-                garmin_id_from_summary = activity_summary.get("activityId") or activity_summary.get("activityIdStr")
-                if garmin_id_from_summary:
-                    final_check = (
-                        session.query(Activity).filter_by(garmin_activity_id=str(garmin_id_from_summary)).first()
-                    )
-                    if final_check:
-                        logger.info(
-                            f"Activity {garmin_id_from_summary} already exists (caught in transaction) - ID: {final_check.id}"
-                        )
-                        return {
-                            "success": True,
-                            "status": "already_exists",
-                            "activity_id": final_check.id,
-                            "message": f"Activity {garmin_id_from_summary} already exists in database",
-                        }
-
-                activity = self._create_activity_record(activity_summary, parsed_data)
-                session.add(activity)
-                session.flush()  # Get the ID
-
-                activity_db_id = activity.id
-
-                # Add laps if available
-                if parsed_data and parsed_data.laps:
-                    for lap_data in parsed_data.laps:
-                        lap = self._create_lap_record(activity_db_id, lap_data)
-                        session.add(lap)
-
-                # Add samples if available
-                if parsed_data and parsed_data.samples:
-                    for sample_data in parsed_data.samples:
-                        sample = self._create_sample_record(activity_db_id, sample_data)
-                        session.add(sample)
-
-                # Add route points if available
-                if parsed_data and parsed_data.route_points:
-                    for point_data in parsed_data.route_points:
-                        point = self._create_route_point_record(activity_db_id, point_data)
-                        session.add(point)
-
-                samples_count = len(parsed_data.samples) if parsed_data and parsed_data.samples else 0
-                laps_count = len(parsed_data.laps) if parsed_data and parsed_data.laps else 0
-                route_points_count = len(parsed_data.route_points) if parsed_data and parsed_data.route_points else 0
-
-                logger.info(f"Successfully imported activity {activity_id} as database ID {activity_db_id}")
-
+            if item is None:
+                item = IngestItem(file_path=Path(f"{activity_id}.fit"))
+            parsed_data = item.activity_data
+
+            # The Garmin Connect summary provides the activity row; the FIT file adds its streams
+            item.activity = self._create_activity_record(activity_summary, parsed_data)
+            item.activity.file_hash = item.file_hash
+            derive_stage([item], stats)
+
+            # Import to database; an activity stored meanwhile (same Garmin ID, FIT file or workout) is not inserted
+            result = run_write(lambda session: persist_stage(session, [item], stats)[0])
+            if not result.imported:
+                logger.info(f"Activity {activity_id} already exists (caught on insert) - ID: {result.activity_id}")
                 return {
                     "success": True,
-                    "status": "imported",
-                    "activity_id": activity_db_id,
-                    "garmin_activity_id": activity_id,
-                    "samples": samples_count,
-                    "laps": laps_count,
-                    "route_points": route_points_count,
-                    "message": f"Activity {activity_id} imported successfully",
+                    "status": "already_exists",
+                    "activity_id": result.activity_id,
+                    "message": f"Activity {activity_id} already exists in database",
                 }
+            activity_db_id = result.activity_id
+
+            samples_count = len(parsed_data.samples) if parsed_data and parsed_data.samples else 0
+            laps_count = len(parsed_data.laps) if parsed_data and parsed_data.laps else 0
+            route_points_count = len(parsed_data.route_points) if parsed_data and parsed_data.route_points else 0
+
+            logger.info(
+                f"Successfully imported activity {activity_id} as database ID {activity_db_id}: {stats.summary()}"
+            )
+
+            return {
+                "success": True,
+                "status": "imported",
+                "activity_id": activity_db_id,
+                "garmin_activity_id": activity_id,
+                "samples": samples_count,
+                "laps": laps_count,
+                "route_points": route_points_count,
+                "rows_per_second": stats.persist.rows_per_second,
+                "message": f"Activity {activity_id} imported successfully",
+            }
 
         except Exception as e:
             logger.error(f"Failed to import activity {activity_id}: {e}")
@@ -271,21 +218,28 @@ class ActivityImportService:
             logger.error(f"Failed to get activity summary for {activity_id}: {e}")
             return None
 
-    def _download_and_parse_fit(self, activity_id: str) -> Optional[Dict[str, Any]]:
-        """Download FIT file and parse it."""
+    def _download_and_parse_fit(self, activity_id: str, stats: Optional[IngestStats] = None) -> Optional[IngestItem]:
+        """Download FIT file and run it through the pipeline's hash and parse stages."""
         try:
             with tempfile.TemporaryDirectory() as temp_dir:
                 fit_path = self.client.download_activity_fit(activity_id, Path(temp_dir))
 
                 if fit_path and fit_path.exists():
-                    return ActivityParser.parse_activity_file(fit_path)
+                    item = IngestItem(file_path=fit_path)
+                    hash_stage([item], stats)
+                    item.signature = None  # temporary download, not a file for the import manifest
+                    parse_stage([item], stats)
+                    if item.error or item.reason:
+                        logger.warning(f"Failed to parse FIT for {activity_id}: {item.error or item.reason}")
+                        return None
+                    return item
 
         except Exception as e:
             logger.warning(f"Failed to download/parse FIT for {activity_id}: {e}")
 
         return None
 
-    def _create_activity_record(self, summary: Dict[str, Any], parsed_data: Optional[Dict[str, Any]]) -> Activity:
+    def _create_activity_record(self, summary: Dict[str, Any], parsed_data: Optional[ActivityData]) -> Activity:
         """Create Activity database record from summary and parsed data."""
         # Extract Garmin activity ID with multiple fallbacks
         garmin_id = (
@@ -318,62 +272,6 @@ class ActivityImportService:
             ingested_on=datetime.now(timezone.utc),
         )
 
-    def _create_lap_record(self, activity_id: int, lap_data) -> Lap:
-        """Create Lap database record from LapData object."""
-        return Lap(
-            activity_id=activity_id,
-            lap_index=lap_data.lap_index,
-            start_time_utc=lap_data.start_time_utc,
-            elapsed_time_s=lap_data.elapsed_time_s,
-            distance_m=lap_data.distance_m,
-            avg_speed_mps=lap_data.avg_speed_mps,
-            avg_hr=lap_data.avg_hr,
-            max_hr=lap_data.max_hr,
-            avg_power_w=lap_data.avg_power_w,
-            max_power_w=lap_data.max_power_w,
-        )
-
-    def _create_sample_record(self, activity_id: int, sample_data) -> Sample:
-        """Create Sample database record from SampleData object."""
-        return Sample(
-            activity_id=activity_id,
-            timestamp=sample_data.timestamp,
-            elapsed_time_s=sample_data.elapsed_time_s,
-            latitude=sample_data.latitude,
-            longitude=sample_data.longitude,
-            altitude_m=sample_data.altitude_m,
-            heart_rate=sample_data.heart_rate,
-            cadence_rpm=sample_data.cadence_rpm,
-            power_w=sample_data.power_w,
-            speed_mps=sample_data.speed_mps,
-            temperature_c=sample_data.temperature_c,
-        )
-
-    def _create_route_point_record(self, activity_id: int, point_data) -> RoutePoint:
-        """Create RoutePoint database record from tuple (lat, lon, alt)."""
-        sequence = getattr(point_data, "sequence", 0) if hasattr(point_data, "sequence") else 0
-
-        # Handle tuple format (lat, lon, alt) from parser
-        if isinstance(point_data, tuple) and len(point_data) >= 2:
-            lat, lon = point_data[0], point_data[1]
-            alt = point_data[2] if len(point_data) > 2 else None
-            return RoutePoint(
-                activity_id=activity_id,
-                sequence=sequence,
-                latitude=lat,
-                longitude=lon,
-                altitude_m=alt,
-            )
-
-        # Handle object format (fallback)
-        return RoutePoint(
-            activity_id=activity_id,
-            sequence=sequence,
-            latitude=getattr(point_data, "latitude", None),
-            longitude=getattr(point_data, "longitude", None),
-            altitude_m=getattr(point_data, "altitude_m", None),
-        )
-
     def _parse_datetime(self, dt_str: Any) -> Optional[datetime]:
         """Parse datetime string to datetime object."""
         if not dt_str:
@@ -405,67 +303,25 @@ class ActivityImportService:
         return None
 
     def cleanup_duplicate_activities(self) -> Dict[str, Any]:
-        """Clean up duplicate activities in the database."""
+        """
+        Remove duplicate activities from the database.
+
+        Copies of one workout are found by start time, distance and duration
+        in a single window-function query (see ingest/duplicates.py), so FIT
+        uploads and Garmin Connect imports of the same run are merged too.
+        """
         try:
-            with session_scope() as session:
-                from sqlalchemy import func
-
-                # Find activities with duplicate garmin_activity_ids
-                duplicate_ids = (
-                    session.query(Activity.garmin_activity_id, func.count(Activity.garmin_activity_id))
-                    .filter(Activity.garmin_activity_id.isnot(None))
-                    .group_by(Activity.garmin_activity_id)
-                    .having(func.count(Activity.garmin_activity_id) > 1)
-                    .all()
-                )
-
-                removed_count = 0
-                for garmin_id, count in duplicate_ids:
-                    # Get all activities with this garmin_activity_id, keep the oldest one
-                    duplicates = (
-                        session.query(Activity)
-                        .filter_by(garmin_activity_id=garmin_id)
-                        .order_by(Activity.ingested_on.asc())
-                        .all()
-                    )
-
-                    # Keep the first (oldest) one, remove the rest
-                    for activity in duplicates[1:]:
-                        logger.info(
-                            f"Removing duplicate activity: ID {activity.id}, Garmin ID {garmin_id}, Name: '{activity.name}'"
-                        )
-                        session.delete(activity)
-                        removed_count += 1
-
-                # Find activities with similar characteristics but no garmin_activity_id
-                none_activities = session.query(Activity).filter(Activity.garmin_activity_id.is_(None)).all()
-                name_time_groups = {}
-
-                for activity in none_activities:
-                    if activity.name and activity.start_time_utc:
-                        key = (activity.name.strip().lower(), activity.start_time_utc.date())
-                        if key not in name_time_groups:
-                            name_time_groups[key] = []
-                        name_time_groups[key].append(activity)
-
-                # Remove duplicates from None activities
-                for key, activities in name_time_groups.items():
-                    if len(activities) > 1:
-                        # Keep the first one, remove others
-                        for activity in activities[1:]:
-                            logger.info(
-                                f"Removing duplicate activity with no Garmin ID: ID {activity.id}, Name: '{activity.name}'"
-                            )
-                            session.delete(activity)
-                            removed_count += 1
-
-                logger.info(f"Cleanup completed: removed {removed_count} duplicate activities")
-                return {
-                    "success": True,
-                    "removed_count": removed_count,
-                    "duplicate_garmin_ids": len(duplicate_ids),
-                    "message": f"Removed {removed_count} duplicate activities",
-                }
+            results = run_write(dedupe_activities)
+
+            logger.info(f"Cleanup completed: removed {results.removed} duplicate activities")
+            return {
+                "success": True,
+                "removed_count": results.removed,
+                "duplicate_groups": results.groups,
+                # Former key of the group count, kept for existing callers
+                "duplicate_garmin_ids": results.groups,
+                "message": f"Removed {results.removed} duplicate activities",
+            }
 
         except Exception as e:
             logger.error(f"Failed to cleanup duplicate activities: {e}")
@@ -40,8 +40,13 @@ except Exception:  # pragma: no cover
     GarminConnectConnectionError = Exception  # type: ignore
     GarminConnectTooManyRequestsError = Exception  # type: ignore
 
+from ingest.archive import iter_archive_members
+
 logger = logging.getLogger(__name__)
 
+# Member extensions taken from downloaded original-format ZIPs
+FIT_EXTENSIONS = frozenset({".fit"})
+
 
 def _to_iso(d: Union[str, date, datetime]) -> str:
     if isinstance(d, datetime):
@@ -418,28 +423,15 @@ class GarminConnectClient:
 
         # Check if it's a ZIP file
         if content.startswith(b"PK"):
-            # It's a ZIP file, extract the FIT file
-            import io
-            import zipfile
-
-            with zipfile.ZipFile(io.BytesIO(content)) as zip_file:
-                # Look for .FIT files in the ZIP
-                fit_files = [name for name in zip_file.namelist() if name.lower().endswith(".fit")]
-                if not fit_files:
-                    raise ValueError(f"No .FIT file found in downloaded ZIP for activity {activity_id}")
-
-                # Extract the first FIT file
-                fit_filename = fit_files[0]
-                fit_content = zip_file.read(fit_filename)
-
-                out = dest / f"{activity_id}.fit"
-                out.write_bytes(fit_content)
-                return out
-        else:
-            # It's already a FIT file
-            out = dest / f"{activity_id}.fit"
-            out.write_bytes(content)
-            return out
+            # It's a ZIP file; take the first FIT member, read in memory
+            member = next(iter_archive_members(content, name=str(activity_id), extensions=FIT_EXTENSIONS), None)
+            if member is None:
+                raise ValueError(f"No .FIT file found in downloaded ZIP for activity {activity_id}")
+            content = member.data
+
+        out = dest / f"{activity_id}.fit"
+        out.write_bytes(content)
+        return out
 
     def wellness_summary_for_day(self, d: Union[str, date, datetime]) -> Dict[str, Any]:
         """Get wellness data summary for a specific day."""
@@ -0,0 +1,174 @@
+"""
+Stream activity files out of ZIP and tar archives without extracting them.
+
+Garmin's account export is a ZIP whose activity files sit in nested ZIPs.
+``iter_archive_members`` walks such archives and yields each activity file
+as an in-memory ArchiveMember, ready to be hashed and parsed from its bytes
+(see ``ingest.pipeline``). Nothing is written to disk.
+
+ZIPs are read through their central directory. Tar archives (optionally
+gzip/bz2/xz compressed) are read as a forward-only stream, so compressed
+tarballs are decompressed exactly once. Nested archives are opened from
+memory. ``read_archive_member`` reads back a single member by the path
+stored at import, e.g. to hydrate a summary-only activity.
+"""
+
+import io
+import logging
+import os
+from pathlib import Path
+import tarfile
+from typing import BinaryIO, FrozenSet, Iterator, NamedTuple, Optional, Union
+import zipfile
+
+from ingest.parser import SUPPORTED_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Archive names gd-import accepts in place of a directory (compared lowercased)
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+ArchiveSource = Union[Path, str, bytes, BinaryIO]
+
+
+class ArchiveMember(NamedTuple):
+    """An activity file read from an archive."""
+
+    path: str  # Archive name and member path, e.g. 'export.zip/DI_CONNECT/123.fit'
+    data: bytes
+
+
+def is_archive(name: Union[str, Path]) -> bool:
+    """Whether a file name has a supported archive extension (case-insensitive)."""
+    return str(name).lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def iter_archive_members(
+    source: ArchiveSource, name: str = "", extensions: FrozenSet[str] = SUPPORTED_EXTENSIONS
+) -> Iterator[ArchiveMember]:
+    """
+    Yield the activity files inside a ZIP or tar archive, descending into nested archives.
+
+    Args:
+        source: Archive path, archive bytes, or a readable binary file object
+        name: Prefix for member paths; defaults to the archive's file name
+        extensions: Member extensions to yield (lowercase, with the dot)
+
+    Yields:
+        ArchiveMember objects, in archive order
+
+    Raises:
+        ValueError: If ``source`` is neither a ZIP nor a tar archive
+    """
+    if isinstance(source, (str, Path)):
+        name = name or Path(source).name
+        with open(source, "rb") as f:
+            yield from iter_archive_members(f, name, extensions)
+        return
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    if zipfile.is_zipfile(source):
+        source.seek(0)
+        yield from _iter_zip(source, name, extensions)
+        return
+
+    source.seek(0)
+    try:
+        archive = tarfile.open(fileobj=source, mode="r|*")
+    except tarfile.TarError as e:
+        raise ValueError(f"{name or 'source'} is not a ZIP or tar archive") from e
+    with archive:
+        yield from _iter_tar(archive, name, extensions)
+
+
+def read_archive_member(source: ArchiveSource, member_path: str) -> bytes:
+    """
+    Read one file out of an archive by its path, descending into nested archives.
+
+    ZIP members are looked up in the central directory, so nothing else is
+    decompressed. Tar archives are read forward until the member, skipping
+    the data of the entries before it.
+
+    Args:
+        source: Archive path, archive bytes, or a readable binary file object
+        member_path: Path inside the archive, e.g. 'DI_CONNECT/uploads.zip/123.fit'
+
+    Returns:
+        The member's contents
+
+    Raises:
+        KeyError: If the archive has no such member
+        ValueError: If ``source`` is neither a ZIP nor a tar archive
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            return read_archive_member(f, member_path)
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    if zipfile.is_zipfile(source):
+        source.seek(0)
+        with zipfile.ZipFile(source) as archive:
+            names = set(archive.namelist())
+            if member_path in names:
+                return archive.read(member_path)
+            nested = _nested_archive(member_path, names)
+            if nested is not None:
+                return read_archive_member(archive.read(nested), member_path[len(nested) + 1 :])
+        raise KeyError(member_path)
+
+    source.seek(0)
+    try:
+        archive = tarfile.open(fileobj=source, mode="r|*")
+    except tarfile.TarError as e:
+        raise ValueError("source is not a ZIP or tar archive") from e
+    with archive:
+        for info in archive:
+            if not info.isfile():
+                continue
+            if info.name == member_path:
+                return archive.extractfile(info).read()
+            if is_archive(info.name) and member_path.startswith(f"{info.name}/"):
+                return read_archive_member(archive.extractfile(info).read(), member_path[len(info.name) + 1 :])
+    raise KeyError(member_path)
+
+
+def _nested_archive(member_path: str, names) -> Optional[str]:
+    """The name among ``names`` of the nested archive ``member_path`` points into, if any."""
+    parts = member_path.split("/")
+    for end in range(len(parts) - 1, 0, -1):
+        prefix = "/".join(parts[:end])
+        if prefix in names and is_archive(prefix):
+            return prefix
+    return None
+
+
+def _iter_zip(fileobj: BinaryIO, name: str, extensions: FrozenSet[str]) -> Iterator[ArchiveMember]:
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            yield from _member(f"{name}/{info.filename}", lambda info=info: archive.read(info), extensions)
+
+
+def _iter_tar(archive: tarfile.TarFile, name: str, extensions: FrozenSet[str]) -> Iterator[ArchiveMember]:
+    for info in archive:
+        if not info.isfile():
+            continue
+
+        def read(info=info) -> bytes:
+            return archive.extractfile(info).read()
+
+        yield from _member(f"{name}/{info.name}", read, extensions)
+
+
+def _member(path: str, read, extensions: FrozenSet[str]) -> Iterator[ArchiveMember]:
+    """Yield one archive entry if it is an activity file, or the activity files inside it if it is an archive."""
+    if os.path.splitext(path)[1].lower() in extensions:
+        yield ArchiveMember(path, read())
+    elif is_archive(path):
+        try:
+            yield from iter_archive_members(read(), path, extensions)
+        except (ValueError, zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+            logger.warning(f"Skipping unreadable nested archive {path}: {e}")
@@ -0,0 +1,200 @@
+"""
+Content-addressed cache of parsed activities.
+
+Parsing (above all fitparse's FIT decoding) dominates the cost of
+re-importing an archive. The cache stores each file's parsed ActivityData,
+before derived metrics are filled in, under the SHA-256 of the file:
+
+    <root>/v<PARSER_VERSION>/<hash[:2]>/<hash>.npz
+
+Each entry is a compressed NumPy archive. It holds the sample columns, the
+route points as an (n, 3) float array, and a JSON document with the summary
+fields and laps. Entries are loaded with ``allow_pickle=False``.
+
+Bumping PARSER_VERSION moves lookups to a fresh directory, so entries
+written by an older parser are never read; ``prune`` deletes them.
+"""
+
+from datetime import datetime
+import json
+import logging
+import os
+from pathlib import Path
+import shutil
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+from app.data.models import ActivityData, LapData, SAMPLE_CHANNELS, SampleArrays
+from ingest.parser import PARSER_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Cache directory created inside the imported data directory by default
+DEFAULT_CACHE_DIRNAME = ".gd-cache"
+
+# ActivityData and LapData attributes stored in the JSON metadata
+SUMMARY_FIELDS = (
+    "external_id",
+    "sport",
+    "sub_sport",
+    "start_time_utc",
+    "elapsed_time_s",
+    "moving_time_s",
+    "distance_m",
+    "avg_speed_mps",
+    "avg_pace_s_per_km",
+    "avg_hr",
+    "max_hr",
+    "avg_power_w",
+    "max_power_w",
+    "elevation_gain_m",
+    "elevation_loss_m",
+    "calories",
+    "hr_zones",
+)
+LAP_FIELDS = (
+    "lap_index",
+    "start_time_utc",
+    "elapsed_time_s",
+    "distance_m",
+    "avg_speed_mps",
+    "avg_hr",
+    "max_hr",
+    "avg_power_w",
+    "max_power_w",
+)
+
+
+def _to_json(value):
+    """JSON encoder hook for datetimes and NumPy scalars."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def _from_json(fields: dict) -> dict:
+    """Restore the datetimes that _to_json wrote as ISO strings."""
+    if fields.get("start_time_utc") is not None:
+        fields["start_time_utc"] = datetime.fromisoformat(fields["start_time_utc"])
+    return fields
+
+
+class ParsedActivityCache:
+    """
+    On-disk cache of parsed ActivityData keyed by file hash and parser version.
+
+    Instances only hold the cache directory, so they can be passed to parser
+    worker processes.
+
+    Args:
+        root: Cache directory; created on the first store
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    @property
+    def version_dir(self) -> Path:
+        """Directory holding the entries written by the current parser version."""
+        return self.root / f"v{PARSER_VERSION}"
+
+    def path_for(self, file_hash: str) -> Path:
+        """Location of the entry for ``file_hash``."""
+        return self.version_dir / file_hash[:2] / f"{file_hash}.npz"
+
+    def load(self, file_hash: str) -> Optional[ActivityData]:
+        """
+        Read the parsed activity for ``file_hash``.
+
+        Args:
+            file_hash: SHA-256 of the activity file
+
+        Returns:
+            ActivityData without derived metrics, or None on a miss or an unreadable entry
+        """
+        path = self.path_for(file_hash)
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                meta = json.loads(str(entry["meta"]))
+                if meta.get("parser_version") != PARSER_VERSION:
+                    return None
+                samples = SampleArrays(
+                    entry["timestamp"], **{name: entry[f"sample_{name}"] for name in SAMPLE_CHANNELS}
+                )
+                route_points = entry["route_points"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.debug(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+
+        activity_data = ActivityData(**_from_json(meta["summary"]))
+        activity_data.samples = samples
+        activity_data.route_points = [
+            tuple(None if np.isnan(value) else float(value) for value in point) for point in route_points
+        ]
+        activity_data.laps = [LapData(**_from_json(lap)) for lap in meta["laps"]]
+        return activity_data
+
+    def store(self, file_hash: str, activity_data: ActivityData):
+        """
+        Write the parsed activity for ``file_hash``.
+
+        The entry is written to a temporary file and renamed into place, so
+        concurrent workers and interrupted imports never leave a partial entry.
+        Failures are logged and otherwise ignored; the cache is only an accelerator.
+
+        Args:
+            file_hash: SHA-256 of the activity file
+            activity_data: Parsed data, before derived metrics are filled in
+        """
+        path = self.path_for(file_hash)
+        meta = {
+            "parser_version": PARSER_VERSION,
+            "summary": {name: getattr(activity_data, name) for name in SUMMARY_FIELDS},
+            "laps": [{name: getattr(lap, name) for name in LAP_FIELDS} for lap in activity_data.laps],
+        }
+        samples = activity_data.samples
+        route_points = np.array(
+            [[np.nan if value is None else value for value in point] for point in activity_data.route_points],
+            dtype=np.float64,
+        ).reshape(-1, 3)
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.savez_compressed(
+                        f,
+                        meta=np.array(json.dumps(meta, default=_to_json)),
+                        timestamp=samples.timestamp,
+                        route_points=route_points,
+                        **{f"sample_{name}": samples.columns[name] for name in SAMPLE_CHANNELS},
+                    )
+                os.replace(temp_name, path)
+            except BaseException:
+                os.unlink(temp_name)
+                raise
+        except (OSError, TypeError, ValueError) as e:
+            logger.debug(f"Could not cache parsed activity {file_hash}: {e}")
+
+    def prune(self) -> int:
+        """
+        Delete entries written by other parser versions.
+
+        Returns:
+            Number of version directories removed
+        """
+        removed = 0
+        if not self.root.is_dir():
+            return removed
+        for child in self.root.iterdir():
+            if child.is_dir() and child.name.startswith("v") and child != self.version_dir:
+                shutil.rmtree(child, ignore_errors=True)
+                removed += 1
+        return removed
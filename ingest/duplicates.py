@@ -0,0 +1,347 @@
+"""
+Detection of the same workout stored from two sources.
+
+A run recorded on the watch often arrives twice: as a FIT file (source
+'fit') and through Garmin Connect (source 'garmin_connect'). The two copies
+have different file hashes, so the unique keys do not catch them. They are
+matched on start time instead, through the indexed ``Activity.start_bucket``
+column, and confirmed when the sport family is the same and distance and
+duration agree within tolerance. Sports are compared by family because the
+sources name them differently: Garmin Connect stores activity type keys such
+as 'road_biking' or 'treadmill_running', FIT files the sport ('cycling',
+'running'). A value that is unknown (missing or 0) on either
+side is not compared, but at least one of the two must be known on both:
+
+- at ingest, ``find_matching_activity`` looks at the three buckets around
+  the new activity's start (one indexed range lookup)
+- for the stored history, ``find_duplicate_activities`` runs one self-join
+  over the same bucket ranges; only the IDs of matching pairs are read
+
+Of a set of copies the one with a source file (and hence samples) is kept,
+then the oldest. The Garmin activity ID and name of removed copies move to
+the kept activity, so Garmin Connect syncs keep recognising it.
+"""
+
+from dataclasses import dataclass, field
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, case, delete, exists, func, or_, select, update
+from sqlalchemy.orm import aliased
+
+from app.data.arrow_store import discard_sample_files
+from app.data.counters import adjust_counts, stored_sample_count
+from app.data.models import Activity, ImportManifest, Lap, RoutePoint, Sample, SampleChannel, start_bucket
+
+logger = logging.getLogger(__name__)
+
+# Copies agree on distance within 2% or 100 m, and on elapsed time within 2% or 60 s
+DISTANCE_TOLERANCE = 0.02
+DISTANCE_TOLERANCE_M = 100.0
+DURATION_TOLERANCE = 0.02
+DURATION_TOLERANCE_S = 60.0
+
+# Activity IDs per IN clause when deleting removed copies
+DELETE_CHUNK = 500
+
+# Sport families and the name fragments that select them, checked in order; other sports are their own family
+SPORT_FAMILIES = (
+    ("swimming", ("swim",)),
+    ("cycling", ("cycl", "bik")),
+    ("running", ("run", "jog", "tread")),
+)
+
+
+@dataclass
+class DedupeResults:
+    """Outcome of a bulk deduplication: (removed, kept) activity ID pairs."""
+
+    pairs: List[Tuple[int, int]] = field(default_factory=list)
+    removed: int = 0
+
+    @property
+    def groups(self) -> int:
+        """Number of workouts that had copies."""
+        return len({keep_id for _, keep_id in self.pairs})
+
+
+def _agrees(a: Optional[float], b: Optional[float], relative: float, absolute: float) -> Optional[bool]:
+    """Whether two values differ by at most ``absolute`` or ``relative``; None if either is unknown (None or 0)."""
+    if not a or not b:
+        return None
+    difference = abs(a - b)
+    return difference <= absolute or difference <= relative * max(a, b)
+
+
+def _agrees_sql(a, b, relative: float, absolute: float):
+    """SQL form of _agrees for two column expressions, as (both known, within tolerance) conditions."""
+    known = and_(func.coalesce(a, 0) != 0, func.coalesce(b, 0) != 0)
+    difference = func.abs(a - b)
+    return known, or_(difference <= absolute, difference <= relative * a, difference <= relative * b)
+
+
+def is_same_workout(activity: Activity, distance_m: Optional[float], elapsed_time_s: Optional[float]) -> bool:
+    """
+    True if ``activity`` agrees with the given distance and elapsed time within tolerance.
+
+    At least one of the two must be known on both sides, and every known one must agree.
+    """
+    agreements = [
+        _agrees(activity.distance_m, distance_m, DISTANCE_TOLERANCE, DISTANCE_TOLERANCE_M),
+        _agrees(activity.elapsed_time_s, elapsed_time_s, DURATION_TOLERANCE, DURATION_TOLERANCE_S),
+    ]
+    known = [agrees for agrees in agreements if agrees is not None]
+    return bool(known) and all(known)
+
+
+def sport_family(sport: Optional[str]) -> str:
+    """
+    Map a sport name from any source onto its family.
+
+    Args:
+        sport: FIT sport or Garmin Connect activity type key, e.g. 'trail_running'
+
+    Returns:
+        'swimming', 'cycling' or 'running', else the lowercased sport itself
+    """
+    sport = (sport or "").lower()
+    for family, fragments in SPORT_FAMILIES:
+        if any(fragment in sport for fragment in fragments):
+            return family
+    return sport
+
+
+def _sport_family_sql(sport):
+    """SQL form of sport_family for a column expression."""
+    sport = func.lower(func.coalesce(sport, ""))
+    whens = [
+        (or_(*[sport.like(f"%{fragment}%") for fragment in fragments]), family) for family, fragments in SPORT_FAMILIES
+    ]
+    return case(*whens, else_=sport)
+
+
+def _fileless_sql(activity):
+    """1 for an activity without a source file (and hence samples), else 0."""
+    return case((activity.file_hash.is_(None), 1), else_=0)
+
+
+def _same_workout_sql(distance_m, other_distance_m, elapsed_time_s, other_elapsed_time_s):
+    """SQL form of is_same_workout for two pairs of column expressions."""
+    distance_known, distance_agrees = _agrees_sql(
+        distance_m, other_distance_m, DISTANCE_TOLERANCE, DISTANCE_TOLERANCE_M
+    )
+    duration_known, duration_agrees = _agrees_sql(
+        elapsed_time_s, other_elapsed_time_s, DURATION_TOLERANCE, DURATION_TOLERANCE_S
+    )
+    return and_(
+        or_(distance_known, duration_known),
+        or_(~distance_known, distance_agrees),
+        or_(~duration_known, duration_agrees),
+    )
+
+
+def find_matching_activity(session, activity: Activity):
+    """
+    Find a stored activity of the same sport family that is the same workout as an unsaved one.
+
+    Args:
+        session: Active database session
+        activity: Unsaved Activity row
+
+    Returns:
+        Row with ``id``, ``file_hash``, ``garmin_activity_id`` and ``name`` of
+        the oldest match, or None
+    """
+    bucket = start_bucket(activity.start_time_utc)
+    if bucket is None:
+        return None
+    candidates = session.execute(
+        select(
+            Activity.id,
+            Activity.file_hash,
+            Activity.garmin_activity_id,
+            Activity.name,
+            Activity.distance_m,
+            Activity.elapsed_time_s,
+        )
+        .where(
+            Activity.start_bucket.between(bucket - 1, bucket + 1),
+            _sport_family_sql(Activity.sport) == sport_family(activity.sport),
+        )
+        .order_by(Activity.id)
+    )
+    for candidate in candidates:
+        if is_same_workout(candidate, activity.distance_m, activity.elapsed_time_s):
+            return candidate
+    return None
+
+
+def adopt_keys(session, activity_id: int, activity: Activity):
+    """Copy the Garmin activity ID and name of a copy that is not stored onto the stored activity, where missing."""
+    if activity.garmin_activity_id:
+        taken = exists().where(Activity.garmin_activity_id == activity.garmin_activity_id)
+        session.execute(
+            update(Activity)
+            .where(Activity.id == activity_id, Activity.garmin_activity_id.is_(None), ~taken)
+            .values(garmin_activity_id=activity.garmin_activity_id)
+        )
+    if activity.name:
+        session.execute(
+            update(Activity)
+            .where(Activity.id == activity_id, or_(Activity.name.is_(None), Activity.name == ""))
+            .values(name=activity.name)
+        )
+
+
+def find_duplicate_activities(session) -> List[Tuple[int, int]]:
+    """
+    Find every stored activity that is another copy of a stored workout.
+
+    One self-join pairs each activity with every earlier one in the three
+    start buckets around it (the indexed range ``find_matching_activity``
+    looks at) that is the same workout; only the IDs of matching pairs are
+    read. Matching pairs are merged into groups of copies, and each group
+    keeps the activity with a source file, then the oldest. Activities
+    without a start bucket are ignored.
+
+    Args:
+        session: Active database session
+
+    Returns:
+        (duplicate_id, keep_id) pairs, ordered by keep_id
+    """
+    later, earlier = aliased(Activity), aliased(Activity)
+    rows = session.execute(
+        select(later.id, _fileless_sql(later), earlier.id, _fileless_sql(earlier))
+        .select_from(later)
+        .join(
+            earlier,
+            and_(
+                earlier.start_bucket.between(later.start_bucket - 1, later.start_bucket + 1),
+                earlier.id < later.id,
+            ),
+        )
+        .where(
+            _sport_family_sql(earlier.sport) == _sport_family_sql(later.sport),
+            _same_workout_sql(earlier.distance_m, later.distance_m, earlier.elapsed_time_s, later.elapsed_time_s),
+        )
+    )
+
+    # Union-find over the matching pairs
+    parent: Dict[int, int] = {}
+    fileless: Dict[int, int] = {}
+
+    def root(activity_id: int) -> int:
+        while parent[activity_id] != activity_id:
+            parent[activity_id] = parent[parent[activity_id]]
+            activity_id = parent[activity_id]
+        return activity_id
+
+    for later_id, later_fileless, earlier_id, earlier_fileless in rows:
+        for activity_id, is_fileless in ((later_id, later_fileless), (earlier_id, earlier_fileless)):
+            parent.setdefault(activity_id, activity_id)
+            fileless[activity_id] = is_fileless
+        parent[root(later_id)] = root(earlier_id)
+
+    groups: Dict[int, List[int]] = {}
+    for activity_id in parent:
+        groups.setdefault(root(activity_id), []).append(activity_id)
+    pairs = []
+    for members in groups.values():
+        # Activities with a source file carry samples; keep those first
+        keep_id = min(members, key=lambda activity_id: (fileless[activity_id], activity_id))
+        pairs.extend((activity_id, keep_id) for activity_id in members if activity_id != keep_id)
+    return sorted(pairs, key=lambda pair: (pair[1], pair[0]))
+
+
+def remove_duplicate_activities(session, pairs: List[Tuple[int, int]]) -> int:
+    """
+    Delete duplicate activities, moving their keys to the kept ones.
+
+    Samples, route points and laps are deleted with chunked Core deletes,
+    Arrow sample files once the session commits.
+    Import manifest entries of removed activities are pointed at the kept
+    activity as 'duplicate', so their files are not imported again.
+
+    Args:
+        session: Active database session
+        pairs: (duplicate_id, keep_id) pairs from find_duplicate_activities
+
+    Returns:
+        Number of activities deleted
+    """
+    if not pairs:
+        return 0
+    keep_for: Dict[int, int] = dict(pairs)
+    removed_ids = list(keep_for)
+
+    # Keys of the removed copies, read before they are deleted; the oldest copy wins
+    adopted: Dict[int, Dict[str, str]] = {}
+    for start in range(0, len(removed_ids), DELETE_CHUNK):
+        chunk = removed_ids[start : start + DELETE_CHUNK]
+        rows = session.execute(
+            select(Activity.id, Activity.garmin_activity_id, Activity.name)
+            .where(Activity.id.in_(chunk), or_(Activity.garmin_activity_id.isnot(None), Activity.name.isnot(None)))
+            .order_by(Activity.id)
+        )
+        for activity_id, garmin_activity_id, name in rows:
+            keys = adopted.setdefault(keep_for[activity_id], {})
+            if garmin_activity_id:
+                keys.setdefault("garmin_activity_id", garmin_activity_id)
+            if name:
+                keys.setdefault("name", name)
+
+    removed = 0
+    for start in range(0, len(removed_ids), DELETE_CHUNK):
+        chunk = removed_ids[start : start + DELETE_CHUNK]
+        samples = stored_sample_count(session, chunk)
+        deleted = {
+            model: session.execute(delete(model).where(model.activity_id.in_(chunk))).rowcount
+            for model in (Sample, SampleChannel, RoutePoint, Lap)
+        }
+        activities = session.execute(delete(Activity).where(Activity.id.in_(chunk))).rowcount
+        adjust_counts(
+            session,
+            activities=-activities,
+            samples=-samples,
+            route_points=-deleted[RoutePoint],
+            laps=-deleted[Lap],
+        )
+        removed += activities
+    discard_sample_files(session, removed_ids)
+
+    for keep_id, keys in adopted.items():
+        for column, value in keys.items():
+            attribute = getattr(Activity, column)
+            session.execute(
+                update(Activity)
+                .where(Activity.id == keep_id, or_(attribute.is_(None), attribute == ""))
+                .values({column: value})
+            )
+
+    session.execute(
+        update(ImportManifest.__table__)
+        .where(ImportManifest.activity_id == bindparam("removed_id"))
+        .values(activity_id=bindparam("keep_id"), outcome="duplicate"),
+        [{"removed_id": removed_id, "keep_id": keep_id} for removed_id, keep_id in pairs],
+    )
+    session.expire_all()
+    logger.info(f"Removed {removed} duplicate activities")
+    return removed
+
+
+def dedupe_activities(session, dry_run: bool = False) -> DedupeResults:
+    """
+    Find stored duplicates and, unless ``dry_run``, remove them.
+
+    Args:
+        session: Active database session
+        dry_run: Only report the duplicates
+
+    Returns:
+        DedupeResults with the (removed, kept) pairs
+    """
+    results = DedupeResults(pairs=find_duplicate_activities(session))
+    if not dry_run:
+        results.removed = remove_duplicate_activities(session, results.pairs)
+    return results
@@ -0,0 +1,547 @@
+"""
+Vectorised FIT decoder fast path for ActivityParser.
+
+fitparse decodes every field of every message in Python, which dominates
+parse time on long activities. Record messages in activity files share a
+handful of definition layouts, so this decoder walks the message headers
+once, then decodes each run of consecutive same-definition records with a
+single ``np.frombuffer`` call over a structured dtype. Invalid-value
+masking, scale/offset and semicircle conversion are applied to whole
+columns.
+
+Only the messages ActivityParser reads are decoded (record, file_id,
+session and lap, plus the developer field descriptions records refer to).
+Anything outside the understood subset raises FitFastPathUnsupported so the
+caller can fall back to fitparse: compressed timestamp headers, chained or
+truncated files, relative timestamps, and array-valued, subfield-resolved
+or accumulated fields feeding a value the parser reads. The file CRC is not
+verified on this path.
+"""
+
+from datetime import datetime, timedelta
+import struct
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+from fitparse.profile import MESSAGE_TYPES
+
+from app.data.models import SampleArrays
+
+# FIT date_time values count seconds from 1989-12-31T00:00:00Z
+FIT_EPOCH_S = 631065600
+# date_time values below this are relative to device power-on, not absolute
+FIT_MIN_ABSOLUTE_TIME = 0x10000000
+SEMICIRCLES_TO_DEGREES = 180 / (2**31)
+
+# Base type id -> (NumPy type code, invalid value); None marks NaN-invalid floats
+_BASE_TYPES = {
+    0x00: ("u1", 0xFF),  # enum
+    0x01: ("i1", 0x7F),  # sint8
+    0x02: ("u1", 0xFF),  # uint8
+    0x83: ("i2", 0x7FFF),  # sint16
+    0x84: ("u2", 0xFFFF),  # uint16
+    0x85: ("i4", 0x7FFFFFFF),  # sint32
+    0x86: ("u4", 0xFFFFFFFF),  # uint32
+    0x88: ("f4", None),  # float32
+    0x89: ("f8", None),  # float64
+    0x0A: ("u1", 0x00),  # uint8z
+    0x8B: ("u2", 0x0000),  # uint16z
+    0x8C: ("u4", 0x00000000),  # uint32z
+    0x8E: ("i8", 0x7FFFFFFFFFFFFFFF),  # sint64
+    0x8F: ("u8", 0xFFFFFFFFFFFFFFFF),  # uint64
+    0x90: ("u8", 0x0000000000000000),  # uint64z
+}
+_STRING = 0x07
+
+# Field names read from each summary message, mirroring _FitActivityBuilder
+SUMMARY_FIELDS = {
+    "file_id": ("serial_number",),
+    "session": (
+        "sport",
+        "sub_sport",
+        "start_time",
+        "total_elapsed_time",
+        "total_timer_time",
+        "total_distance",
+        "avg_heart_rate",
+        "max_heart_rate",
+        "avg_power",
+        "max_power",
+        "total_ascent",
+        "total_descent",
+        "total_calories",
+    ),
+    "lap": (
+        "start_time",
+        "total_elapsed_time",
+        "total_distance",
+        "avg_speed",
+        "avg_heart_rate",
+        "max_heart_rate",
+        "avg_power",
+        "max_power",
+    ),
+}
+
+# Record fields copied straight into a sample channel
+_RECORD_CHANNELS = {
+    "heart_rate": "heart_rate",
+    "power": "power_w",
+    "cadence": "cadence_rpm",
+    "temperature": "temperature_c",
+    "vertical_oscillation": "vertical_oscillation_mm",
+    "vertical_ratio": "vertical_ratio",
+    "stance_time_balance": "ground_contact_balance_pct",
+    "step_length": "step_length_mm",
+    "Air Power": "air_power_w",
+    "Form Power": "form_power_w",
+    "Leg Spring Stiffness": "leg_spring_stiffness",
+    "Impact Loading Rate": "impact_loading_rate",
+    "Stryd Temperature": "stryd_temperature_c",
+    "Stryd Humidity": "stryd_humidity_pct",
+}
+
+RECORD_FIELDS = (
+    "timestamp",
+    "position_lat",
+    "position_long",
+    "altitude",
+    "enhanced_altitude",
+    "speed",
+    "enhanced_speed",
+    "stance_time",
+    "Ground Time",
+) + tuple(_RECORD_CHANNELS)
+
+_WANTED_FIELDS = dict(SUMMARY_FIELDS, record=RECORD_FIELDS)
+
+
+class FitFastPathUnsupported(Exception):
+    """Raised when a file uses FIT features the fast path does not decode."""
+
+
+class _Source(NamedTuple):
+    """Where a named value lives in a data message and how to convert it."""
+
+    column: Optional[str]  # structured dtype field; None for non-numeric data
+    invalid: Optional[int]  # raw invalid value; None for floats
+    scale: Optional[float]
+    offset: Optional[float]
+    field: object  # profile field used to render enums and pick type processors
+    component: bool  # value expanded from a component of another field
+
+
+# Marks a name whose source depends on per-message subfield resolution
+_AMBIGUOUS = _Source(None, None, None, None, None, False)
+
+
+class _Definition:
+    """Decoded definition message with the structured dtype of its data messages."""
+
+    __slots__ = ("name", "size", "dtype", "layout", "sources", "runs")
+
+    def __init__(self, name: Optional[str], size: int, dtype: np.dtype, layout: dict, sources: dict):
+        self.name = name
+        self.size = size
+        self.dtype = dtype
+        # field_def_num -> (column, byte offset in message, size, base type id) for native fields
+        self.layout = layout
+        self.sources = sources
+        # (file offset, message count, sequence number of first record) per run
+        self.runs: List[Tuple[int, int, int]] = []
+
+
+class DecodedFit(NamedTuple):
+    """Fast-path decode result: summary messages in file order plus record samples."""
+
+    messages: List[Tuple[str, Dict[str, object]]]
+    samples: SampleArrays
+
+
+def decode_fit(data: Union[bytes, bytearray, memoryview], records: bool = True) -> DecodedFit:
+    """
+    Decode the activity content of a FIT file held in memory.
+
+    Args:
+        data: Complete FIT file contents
+        records: Decode record messages; when False only the summary
+            messages are read and ``samples`` is empty
+
+    Returns:
+        DecodedFit with file_id/session/lap values and the record samples
+
+    Raises:
+        FitFastPathUnsupported: If the file needs the full fitparse decoder
+    """
+    buf = bytes(data)
+    try:
+        return _FitDecoder(buf, records).decode()
+    except (struct.error, IndexError, KeyError, ValueError) as e:
+        raise FitFastPathUnsupported(f"malformed FIT data: {e}") from e
+
+
+class _FitDecoder:
+    """Single-file decoder state: definitions, developer fields and record runs."""
+
+    def __init__(self, buf: bytes, records: bool = True):
+        self.buf = buf
+        self.records = records
+        self.definitions: Dict[int, _Definition] = {}
+        # dev_data_index -> {field_def_num: (name, base type id)}
+        self.dev_fields: Dict[int, Dict[int, Tuple[str, int]]] = {}
+        self.record_definitions: List[_Definition] = []
+        self.messages: List[Tuple[str, Dict[str, object]]] = []
+        self.record_count = 0
+
+    def decode(self) -> DecodedFit:
+        buf = self.buf
+        if len(buf) < 12 or buf[8:12] != b".FIT":
+            raise FitFastPathUnsupported("missing FIT file header")
+        header_size = buf[0]
+        (data_size,) = struct.unpack_from("<I", buf, 4)
+        if header_size not in (12, 14):
+            raise FitFastPathUnsupported(f"unusual header size {header_size}")
+        data_end = header_size + data_size
+        if data_end + 2 != len(buf):
+            raise FitFastPathUnsupported("chained or truncated FIT file")
+
+        pos = header_size
+        while pos < data_end:
+            header = buf[pos]
+            if header & 0x80:
+                raise FitFastPathUnsupported("compressed timestamp header")
+            if header & 0x40:
+                pos = self._read_definition(pos, header)
+                continue
+
+            definition = self.definitions.get(header & 0x0F)
+            if definition is None:
+                raise FitFastPathUnsupported(f"data message for undefined local type {header & 0x0F}")
+            stride = definition.size + 1
+            count = min(self._run_length(pos, stride, data_end), (data_end - pos) // stride)
+            if count == 0:
+                raise FitFastPathUnsupported("data message overruns the data section")
+
+            if definition.name == "record":
+                if self.records:
+                    if not definition.runs:
+                        self.record_definitions.append(definition)
+                    definition.runs.append((pos, count, self.record_count))
+                    self.record_count += count
+            elif definition.name in SUMMARY_FIELDS:
+                for index in range(count):
+                    self.messages.append((definition.name, self._summary_values(definition, pos + index * stride)))
+            elif definition.name == "developer_data_id":
+                for index in range(count):
+                    self._register_developer(definition, pos + index * stride)
+            elif definition.name == "field_description":
+                for index in range(count):
+                    self._register_dev_field(definition, pos + index * stride)
+            pos += count * stride
+
+        if pos != data_end:
+            raise FitFastPathUnsupported("message overruns the data section")
+        return DecodedFit(self.messages, self._decode_records())
+
+    def _run_length(self, pos: int, stride: int, data_end: int) -> int:
+        """Count consecutive data messages with the same header byte as the one at ``pos``."""
+        headers = self.buf[pos:data_end:stride]
+        return len(headers) - len(headers.lstrip(headers[:1]))
+
+    def _read_definition(self, pos: int, header: int) -> int:
+        """Parse the definition message at ``pos``, register it and return the next offset."""
+        buf = self.buf
+        endian = ">" if buf[pos + 2] else "<"
+        global_num, num_fields = struct.unpack_from(endian + "HB", buf, pos + 3)
+        pos += 6
+        mesg_type = MESSAGE_TYPES.get(global_num)
+        name = mesg_type.name if mesg_type else None
+        # Without records, record layouts are only skipped over, so none of their fields matter
+        wanted = _WANTED_FIELDS.get(name, ()) if self.records or name != "record" else ()
+
+        names, formats, offsets = ["header"], ["u1"], [0]
+        layout = {}
+        sources = {}
+        message_offset = 1
+        for index in range(num_fields):
+            def_num, size, base_type_id = buf[pos], buf[pos + 1], buf[pos + 2]
+            pos += 3
+            column = _add_column(names, formats, offsets, f"f{index}", message_offset, size, base_type_id, endian)
+            layout.setdefault(def_num, (column, message_offset, size, base_type_id))
+            message_offset += size
+
+            field = mesg_type.fields.get(def_num) if mesg_type else None
+            if field is not None and wanted:
+                _add_field_sources(sources, mesg_type, field, column, base_type_id)
+
+        if header & 0x20:
+            num_dev_fields = buf[pos]
+            pos += 1
+            for index in range(num_dev_fields):
+                def_num, size, dev_index = buf[pos], buf[pos + 1], buf[pos + 2]
+                pos += 3
+                description = self.dev_fields.get(dev_index, {}).get(def_num)
+                if description is None:
+                    raise FitFastPathUnsupported(f"undescribed developer field {dev_index}:{def_num}")
+                dev_name, base_type_id = description
+                column = _add_column(names, formats, offsets, f"d{index}", message_offset, size, base_type_id, endian)
+                message_offset += size
+                if column is None:
+                    sources.setdefault(dev_name, _AMBIGUOUS)
+                else:
+                    invalid = _BASE_TYPES[base_type_id][1]
+                    sources.setdefault(dev_name, _Source(column, invalid, None, None, None, False))
+
+        # Keep only what the parser reads, and refuse values this decoder cannot reproduce
+        resolved = {}
+        for field_name in wanted:
+            source = sources.get(field_name)
+            if source is None:
+                continue
+            if source.column is None:
+                raise FitFastPathUnsupported(f"{name}.{field_name} needs full decoding")
+            resolved[field_name] = source
+
+        dtype = np.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": message_offset})
+        self.definitions[header & 0x0F] = _Definition(name, message_offset - 1, dtype, layout, resolved)
+        return pos
+
+    def _summary_values(self, definition: _Definition, pos: int) -> Dict[str, object]:
+        """Decode the parser's fields of one summary message into Python values."""
+        row = np.frombuffer(self.buf, dtype=definition.dtype, count=1, offset=pos)[0]
+        return {name: _python_value(row[source.column].item(), source) for name, source in definition.sources.items()}
+
+    def _raw_field(self, definition: _Definition, pos: int, def_num: int):
+        """Raw value of a native field in the message at ``pos`` (strings decoded), or None."""
+        entry = definition.layout.get(def_num)
+        if entry is None:
+            return None
+        column, offset, size, base_type_id = entry
+        if base_type_id == _STRING:
+            raw = self.buf[pos + offset : pos + offset + size].split(b"\x00", 1)[0]
+            return raw.decode("utf-8", errors="replace") or None
+        if column is None:
+            return None
+        value = np.frombuffer(self.buf, dtype=definition.dtype, count=1, offset=pos)[0][column].item()
+        return None if value == _BASE_TYPES[base_type_id][1] else value
+
+    def _register_developer(self, definition: _Definition, pos: int):
+        """Track a developer_data_id message; like fitparse, it resets that index's fields."""
+        dev_index = self._raw_field(definition, pos, 3)
+        self.dev_fields[dev_index] = {}
+
+    def _register_dev_field(self, definition: _Definition, pos: int):
+        """Record the name and base type from a field_description message."""
+        dev_index = self._raw_field(definition, pos, 0)
+        field_num = self._raw_field(definition, pos, 1)
+        base_type_id = self._raw_field(definition, pos, 2)
+        if dev_index not in self.dev_fields or base_type_id not in _BASE_TYPES:
+            raise FitFastPathUnsupported("field description the fast path cannot register")
+        name = self._raw_field(definition, pos, 3) or f"unnamed_dev_field_{field_num}"
+        self.dev_fields[dev_index][field_num] = (name, base_type_id)
+
+    def _decode_records(self) -> SampleArrays:
+        """Decode every record run and merge the definitions back into file order."""
+        parts = []
+        for definition in self.record_definitions:
+            tables = [
+                np.frombuffer(self.buf, dtype=definition.dtype, count=count, offset=offset)
+                for offset, count, _ in definition.runs
+            ]
+            order = np.concatenate([np.arange(seq, seq + count) for _, count, seq in definition.runs])
+            table = tables[0] if len(tables) == 1 else np.concatenate(tables)
+            parts.append((order, _record_columns(table, definition.sources)))
+
+        if not parts:
+            return SampleArrays()
+        if len(parts) == 1:
+            raw_timestamps, channels = parts[0][1]
+        else:
+            order = np.argsort(np.concatenate([part_order for part_order, _ in parts]), kind="stable")
+            raw_timestamps = np.concatenate([columns[0] for _, columns in parts])[order]
+            channels = {
+                name: np.concatenate([columns[1][name] for _, columns in parts])[order] for name in parts[0][1][1]
+            }
+
+        # Records without a timestamp are skipped, as in the fitparse path
+        keep = raw_timestamps > 0
+        if np.any(raw_timestamps[keep] < FIT_MIN_ABSOLUTE_TIME):
+            raise FitFastPathUnsupported("relative record timestamps")
+        timestamps = (raw_timestamps[keep] + FIT_EPOCH_S).astype("datetime64[s]").astype("datetime64[us]")
+        channels = {name: values[keep] for name, values in channels.items()}
+        channels["elapsed_time_s"] = np.arange(len(timestamps), dtype=np.float64)
+        return SampleArrays(timestamp=timestamps, **channels)
+
+
+def _add_column(names, formats, offsets, column, offset, size, base_type_id, endian) -> Optional[str]:
+    """Append a dtype entry for one field; returns the column name if it holds a single number."""
+    base_type = _BASE_TYPES.get(base_type_id)
+    if base_type is not None:
+        itemsize = np.dtype(base_type[0]).itemsize
+        if size % itemsize:
+            # fitparse rejects these outright; let it report the error
+            raise FitFastPathUnsupported(f"field size {size} is not a multiple of base type size {itemsize}")
+        if size == itemsize:
+            names.append(column)
+            formats.append(endian + base_type[0])
+            offsets.append(offset)
+            return column
+    if size:
+        # Strings, byte arrays and value arrays stay opaque
+        names.append(column)
+        formats.append(f"V{size}")
+        offsets.append(offset)
+    return None
+
+
+def _add_field_sources(sources, mesg_type, field, column, base_type_id):
+    """
+    Register the names a native field provides, in fitparse's field order.
+
+    fitparse emits a field's component expansions before the field itself,
+    and name lookups take the first match, so ``setdefault`` reproduces
+    which value a name resolves to.
+    """
+    if field.subfields:
+        # The value's name and scale depend on other fields of each message
+        sources.setdefault(field.name, _AMBIGUOUS)
+        for subfield in field.subfields:
+            sources.setdefault(subfield.name, _AMBIGUOUS)
+            for component in subfield.components or ():
+                sources.setdefault(mesg_type.fields[component.def_num].name, _AMBIGUOUS)
+        return
+
+    base_type = _BASE_TYPES.get(base_type_id)
+    invalid = base_type[1] if base_type else None
+    for component in field.components or ():
+        target = mesg_type.fields[component.def_num]
+        # Only whole-value, non-accumulating components of unsigned fields are plain copies
+        identity = (
+            column is not None
+            and base_type[0].startswith("u")
+            and not component.accumulate
+            and not component.bit_offset
+            and component.bits >= np.dtype(base_type[0]).itemsize * 8
+            and not target.subfields
+        )
+        sources.setdefault(
+            target.name,
+            _Source(column, invalid, component.scale, component.offset, target, True) if identity else _AMBIGUOUS,
+        )
+
+    if column is None:
+        sources.setdefault(field.name, _AMBIGUOUS)
+    else:
+        sources.setdefault(field.name, _Source(column, invalid, field.scale, field.offset, field, False))
+
+
+def _python_value(raw, source: _Source):
+    """Convert one raw value the way fitparse does: invalid check, render, scale/offset, type processor."""
+    if source.invalid is None:
+        if raw != raw:  # NaN
+            return None
+    elif raw == source.invalid:
+        return None
+
+    field = source.field
+    if source.component:
+        value = _scale_offset(raw, source)
+        value = field.render(value)
+    else:
+        value = field.render(raw) if field is not None else raw
+        if isinstance(value, (int, float)):
+            value = _scale_offset(value, source)
+
+    type_name = getattr(field.type, "name", None) if field is not None else None
+    if type_name == "date_time" and value >= FIT_MIN_ABSOLUTE_TIME:
+        return datetime(1970, 1, 1) + timedelta(seconds=FIT_EPOCH_S + value)
+    if type_name == "local_date_time":
+        return datetime(1970, 1, 1) + timedelta(seconds=FIT_EPOCH_S + value)
+    if type_name == "bool":
+        return bool(value)
+    if type_name == "localtime_into_day":
+        raise FitFastPathUnsupported("localtime_into_day values are not decoded")
+    return value
+
+
+def _scale_offset(value, source: _Source):
+    if source.scale:
+        value = float(value) / source.scale
+    if source.offset:
+        value = value - source.offset
+    return value
+
+
+def _numeric_column(table: np.ndarray, source: Optional[_Source]) -> Optional[np.ndarray]:
+    """Float64 column for a named record value with NaN for invalid data, or None if absent."""
+    if source is None:
+        return None
+    if source.field is not None and getattr(source.field.type, "values", None):
+        raise FitFastPathUnsupported("enumerated record values are not decoded")
+    raw = table[source.column]
+    values = raw.astype(np.float64)
+    if source.invalid is not None:
+        values[raw == source.invalid] = np.nan
+    if source.scale:
+        values /= source.scale
+    if source.offset:
+        values -= source.offset
+    return values
+
+
+def _truthy_or(first: Optional[np.ndarray], second: Optional[np.ndarray], length: int) -> Optional[np.ndarray]:
+    """Vector form of ``first or second`` with NaN standing in for None."""
+    if first is None:
+        return second
+    if second is None:
+        second = np.full(length, np.nan)
+    return np.where(~np.isnan(first) & (first != 0), first, second)
+
+
+def _first_present(first: Optional[np.ndarray], second: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    """Vector form of ``first if first is not None else second``."""
+    if first is None or second is None:
+        return first if second is None else second
+    return np.where(np.isnan(first), second, first)
+
+
+def _record_columns(table: np.ndarray, sources: Dict[str, _Source]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Convert one definition's decoded records to raw timestamps and sample channels.
+
+    Mirrors _FitActivityBuilder._on_record: enhanced speed/altitude are
+    preferred when truthy, positions are converted only when both are
+    present, and stance time falls back to the Stryd "Ground Time" field.
+    Raw timestamps are returned as int64 with 0 marking a missing value.
+    """
+    length = len(table)
+
+    timestamp_source = sources.get("timestamp")
+    if timestamp_source is None:
+        raw_timestamps = np.zeros(length, dtype=np.int64)
+    else:
+        if timestamp_source.component or getattr(timestamp_source.field.type, "name", None) != "date_time":
+            raise FitFastPathUnsupported("non-standard record timestamp")
+        raw = table[timestamp_source.column]
+        raw_timestamps = raw.astype(np.int64)
+        raw_timestamps[raw == timestamp_source.invalid] = 0
+
+    def column(name: str) -> Optional[np.ndarray]:
+        return _numeric_column(table, sources.get(name))
+
+    channels = {}
+    lat, lon = column("position_lat"), column("position_long")
+    if lat is not None and lon is not None:
+        both = ~np.isnan(lat) & ~np.isnan(lon)
+        lat = np.where(both, lat * SEMICIRCLES_TO_DEGREES, lat)
+        lon = np.where(both, lon * SEMICIRCLES_TO_DEGREES, lon)
+    channels["latitude"] = lat
+    channels["longitude"] = lon
+    channels["altitude_m"] = _truthy_or(column("enhanced_altitude"), column("altitude"), length)
+    channels["speed_mps"] = _truthy_or(column("enhanced_speed"), column("speed"), length)
+    channels["ground_contact_time_ms"] = _first_present(column("stance_time"), column("Ground Time"))
+    for field_name, channel in _RECORD_CHANNELS.items():
+        channels[channel] = column(field_name)
+
+    missing = np.full(length, np.nan)
+    return raw_timestamps, {name: missing if values is None else values for name, values in channels.items()}
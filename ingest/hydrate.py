@@ -0,0 +1,236 @@
+"""
+Load the samples of activities that were imported summary-only.
+
+``gd-import --summary-only`` parses just the summary messages of each file
+(FIT file_id/session/lap, or the accumulated GPX/TCX totals) and stores the
+Activity and Lap rows without samples or route points, leaving
+``Activity.samples_hydrated`` False. A first import of a large export then
+reaches the dashboard long before every sample row has been written.
+
+The samples are decoded later from the file the activity came from: when
+the activity is first opened (``web_queries.get_activity_samples``) or in
+bulk with ``gd-import hydrate``. The file is found again through
+``Activity.file_path``, which for archive members holds the archive path
+followed by the member name, so the member is read back directly instead of
+scanning the archive. Its contents must still hash to ``Activity.file_hash``.
+An activity that cannot be hydrated keeps the reason in
+``Activity.hydration_error`` and is not retried when opened again;
+``gd-import hydrate --retry-failed`` tries it again.
+"""
+
+from dataclasses import dataclass, field
+import logging
+from pathlib import Path
+import tarfile
+from typing import Dict, List, Optional, Tuple
+import zipfile
+
+from sqlalchemy import update
+
+from app.data.db import session_scope
+from app.data.models import Activity
+from ingest.archive import is_archive, iter_archive_members, read_archive_member
+from ingest.parser import ActivityParser, ParserError, calculate_buffer_hash
+from ingest.persist import PersistStats, persist_samples
+
+logger = logging.getLogger(__name__)
+
+
+class HydrationError(Exception):
+    """Raised when an activity's source file cannot be found, has changed or no longer parses."""
+
+
+@dataclass
+class HydrationResults:
+    """Outcome of hydrate_pending."""
+
+    hydrated: int = 0
+    failures: List[Tuple[int, str]] = field(default_factory=list)  # (activity ID, reason)
+    stats: PersistStats = field(default_factory=PersistStats)
+
+
+def containing_archive(file_path: Path) -> Optional[Path]:
+    """Return the archive an archive member path points into, or None."""
+    for parent in file_path.parents:
+        if is_archive(parent) and parent.is_file():
+            return parent
+    return None
+
+
+def read_activity_source(file_path: str) -> bytes:
+    """
+    Read the contents an activity was imported from.
+
+    Args:
+        file_path: ``Activity.file_path``; either a file on disk or an
+            archive member path such as '/exports/export.zip/DI_CONNECT/123.fit'
+
+    Returns:
+        File contents
+
+    Raises:
+        HydrationError: If neither the file nor the archive member exists
+    """
+    path = Path(file_path)
+    try:
+        if path.is_file():
+            return path.read_bytes()
+        archive = containing_archive(path)
+        if archive is not None:
+            return read_archive_member(archive, path.relative_to(archive).as_posix())
+    except KeyError:
+        pass
+    except (OSError, ValueError, zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+        raise HydrationError(f"Cannot read {file_path}: {e}") from e
+    raise HydrationError(f"Source file not found: {file_path}")
+
+
+def hydrate_from_contents(session, activity: Activity, data: bytes, stats: Optional[PersistStats] = None) -> bool:
+    """
+    Parse an activity's source contents and store its samples and route points.
+
+    The activity is marked hydrated with a conditional UPDATE before any
+    sample is written; if another writer got there first, nothing is stored.
+    The caller owns the transaction.
+
+    Args:
+        session: Active database session
+        activity: Activity imported summary-only
+        data: Contents of its source file
+        stats: Optional PersistStats updated with the inserted row counts
+
+    Returns:
+        True if the samples were stored, False if the activity was already hydrated
+
+    Raises:
+        HydrationError: If the contents changed since the import or no longer parse
+    """
+    if calculate_buffer_hash(data) != activity.file_hash:
+        raise HydrationError(f"{activity.file_path} changed since it was imported")
+    try:
+        activity_data = ActivityParser.parse_activity_buffer(data, Path(activity.file_path).name, derive=False)
+    except ParserError as e:
+        raise HydrationError(str(e)) from e
+
+    claimed = session.execute(
+        update(Activity)
+        .where(Activity.id == activity.id, Activity.samples_hydrated.is_(False))
+        .values(samples_hydrated=True, hydration_error=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    activity.samples_hydrated = True
+    activity.hydration_error = None
+    if not claimed:
+        return False
+    if activity_data is not None:
+        persist_samples(session, activity.id, activity_data, stats)
+    return True
+
+
+def hydrate_activity(session, activity: Activity, stats: Optional[PersistStats] = None) -> bool:
+    """
+    Load the samples of a summary-only activity from its source file.
+
+    A failure is recorded in ``activity.hydration_error`` before the error
+    is raised, so a caller that commits anyway keeps the reason.
+
+    Args:
+        session: Active database session; the caller commits
+        activity: Activity to hydrate
+        stats: Optional PersistStats updated with the inserted row counts
+
+    Returns:
+        True if samples were stored, False if the activity was already hydrated
+
+    Raises:
+        HydrationError: If the source file is missing, changed or no longer parses
+    """
+    if activity.samples_hydrated is not False:
+        return False
+    try:
+        return hydrate_from_contents(session, activity, read_activity_source(activity.file_path), stats)
+    except HydrationError as e:
+        activity.hydration_error = str(e)
+        raise
+
+
+def hydrate_pending(limit: Optional[int] = None, retry_failed: bool = False) -> HydrationResults:
+    """
+    Hydrate every summary-only activity, newest first, one transaction per activity.
+
+    Activities imported from the same archive are hydrated in a single pass
+    over that archive. Failures are recorded in ``Activity.hydration_error``.
+
+    Args:
+        limit: Hydrate at most this many activities
+        retry_failed: Also retry activities whose hydration failed before
+
+    Returns:
+        HydrationResults with counts, failures and row statistics
+    """
+    results = HydrationResults()
+    with session_scope() as session:
+        query = (
+            session.query(Activity.id, Activity.file_path)
+            .filter(Activity.samples_hydrated.is_(False))
+            .order_by(Activity.start_time_utc.desc())
+        )
+        if not retry_failed:
+            query = query.filter(Activity.hydration_error.is_(None))
+        pending = query.limit(limit).all() if limit else query.all()
+
+    by_archive: Dict[Path, Dict[Path, int]] = {}
+    for activity_id, file_path in pending:
+        path = Path(file_path or "")
+        archive = None if path.is_file() else containing_archive(path)
+        if archive is None:
+            _hydrate_one(results, activity_id, lambda path=file_path: read_activity_source(path))
+        else:
+            by_archive.setdefault(archive, {})[path] = activity_id
+
+    for archive, members in by_archive.items():
+        try:
+            for member in iter_archive_members(archive, name=str(archive)):
+                activity_id = members.pop(Path(member.path), None)
+                if activity_id is not None:
+                    _hydrate_one(results, activity_id, lambda data=member.data: data)
+                if not members:
+                    break
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cannot read archive {archive}: {e}")
+        for activity_id in members.values():
+            _record_failure(results, activity_id, f"Source file not found in {archive}")
+
+    return results
+
+
+def _hydrate_one(results: HydrationResults, activity_id: int, read_contents):
+    """Hydrate one activity in its own transaction, recording the outcome in ``results``."""
+    try:
+        with session_scope() as session:
+            activity = session.get(Activity, activity_id)
+            stats = PersistStats()
+            with stats.timer():
+                stored = (
+                    activity is not None
+                    and activity.samples_hydrated is False
+                    and hydrate_from_contents(session, activity, read_contents(), stats)
+                )
+        if stored:
+            results.hydrated += 1
+            results.stats.merge(stats)
+    except HydrationError as e:
+        _record_failure(results, activity_id, str(e))
+
+
+def _record_failure(results: HydrationResults, activity_id: int, reason: str):
+    """Store why an activity could not be hydrated, in its own transaction."""
+    logger.warning(f"Could not hydrate activity {activity_id}: {reason}")
+    results.failures.append((activity_id, reason))
+    with session_scope() as session:
+        session.execute(
+            update(Activity)
+            .where(Activity.id == activity_id, Activity.samples_hydrated.is_(False))
+            .values(hydration_error=reason)
+            .execution_options(synchronize_session=False)
+        )
@@ -0,0 +1,243 @@
+"""
+Import manifest helpers for skipping unchanged files.
+
+Every file gd-import processes gets an ImportManifest row with its size,
+modification time, hash and outcome. On the next run a file whose size and
+mtime still match is skipped after a single stat call.
+
+Contents the parsers rejected are also recorded by hash and parser version
+in ParseFailure, so copies of a broken file are not parsed again either.
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import delete, exists, or_, select
+
+from app.data.models import Activity, ImportManifest, ParseFailure
+from ingest.parser import PARSER_VERSION
+
+# Paths or hashes per IN (...) query; stays under SQLite's default host-parameter limit
+MANIFEST_QUERY_CHUNK = 500
+
+# Outcomes that stay valid while the file is unchanged. Imports and duplicates
+# additionally need their activity to still exist, and parse errors a
+# ParseFailure row for the current parser version.
+FINAL_OUTCOMES = frozenset({"imported", "duplicate", "parse_error", "no_data"})
+ACTIVITY_OUTCOMES = frozenset({"imported", "duplicate"})
+FAILURE_OUTCOMES = frozenset({"parse_error"})
+
+
+class FileSignature(NamedTuple):
+    """Stat-derived identity of a file version."""
+
+    path: str
+    size_bytes: int
+    mtime_ns: int
+
+
+def file_signature(file_path: Path) -> FileSignature:
+    """
+    Stat a file for the manifest.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        FileSignature with the absolute path, size and mtime in nanoseconds
+
+    Raises:
+        OSError: If the file cannot be stat'ed
+    """
+    stat = os.stat(file_path)
+    return FileSignature(os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+
+def find_unchanged_files(
+    session,
+    files: Iterable[Path],
+    retry_failed: bool = False,
+    known_signatures: Optional[Dict[Path, FileSignature]] = None,
+) -> Tuple[List[Path], List[Path]]:
+    """
+    Split files into those that need importing and those unchanged since their last import.
+
+    Args:
+        session: Active database session
+        files: Candidate file paths
+        retry_failed: Treat files that failed to parse as changed
+        known_signatures: Signatures the caller already stat'ed (e.g. during the
+            directory walk); other files are stat'ed here
+
+    Returns:
+        (changed_or_new, unchanged) lists, each in input order
+    """
+    signatures: Dict[str, Tuple[Path, Optional[FileSignature]]] = {}
+    known_signatures = known_signatures or {}
+    for file_path in files:
+        try:
+            signature = known_signatures.get(file_path) or file_signature(file_path)
+        except OSError:
+            # Leave unreadable files to the import stage, which reports them
+            signature = None
+        key = signature.path if signature else os.path.abspath(file_path)
+        signatures[key] = (file_path, signature)
+
+    unchanged: Set[str] = set()
+    keys = list(signatures)
+    for start in range(0, len(keys), MANIFEST_QUERY_CHUNK):
+        chunk = keys[start : start + MANIFEST_QUERY_CHUNK]
+        # A cross-source duplicate is recorded with the ID of the activity it matched, not its own hash
+        activity_exists = exists().where(
+            or_(Activity.file_hash == ImportManifest.file_hash, Activity.id == ImportManifest.activity_id)
+        )
+        failure_exists = exists().where(
+            ParseFailure.file_hash == ImportManifest.file_hash, ParseFailure.parser_version == PARSER_VERSION
+        )
+        rows = session.execute(
+            select(
+                ImportManifest.path,
+                ImportManifest.size_bytes,
+                ImportManifest.mtime_ns,
+                ImportManifest.outcome,
+                activity_exists,
+                failure_exists,
+            ).where(ImportManifest.path.in_(chunk))
+        )
+        for path, size_bytes, mtime_ns, outcome, has_activity, has_failure in rows:
+            signature = signatures[path][1]
+            if signature is None or (size_bytes, mtime_ns) != (signature.size_bytes, signature.mtime_ns):
+                continue
+            if outcome not in FINAL_OUTCOMES or (outcome in ACTIVITY_OUTCOMES and not has_activity):
+                continue
+            if outcome in FAILURE_OUTCOMES and (retry_failed or not has_failure):
+                continue
+            unchanged.add(path)
+
+    changed = [file_path for key, (file_path, _) in signatures.items() if key not in unchanged]
+    skipped = [file_path for key, (file_path, _) in signatures.items() if key in unchanged]
+    return changed, skipped
+
+
+def find_existing_hashes(session, file_hashes: Iterable[str]) -> Set[str]:
+    """
+    Resolve which file hashes already belong to an imported activity.
+
+    Args:
+        session: Active database session
+        file_hashes: SHA-256 hashes to look up
+
+    Returns:
+        The subset of hashes with an existing Activity row
+    """
+    unique_hashes = list(dict.fromkeys(file_hashes))
+    existing: Set[str] = set()
+    for start in range(0, len(unique_hashes), MANIFEST_QUERY_CHUNK):
+        chunk = unique_hashes[start : start + MANIFEST_QUERY_CHUNK]
+        existing.update(session.execute(select(Activity.file_hash).where(Activity.file_hash.in_(chunk))).scalars())
+    return existing
+
+
+def find_parse_failures(session, file_hashes: Iterable[str]) -> Dict[str, str]:
+    """
+    Look up hashes whose contents the current parser version already rejected.
+
+    Args:
+        session: Active database session
+        file_hashes: SHA-256 hashes to look up
+
+    Returns:
+        Mapping of failed hash to the recorded error reason
+    """
+    unique_hashes = list(dict.fromkeys(file_hashes))
+    failures: Dict[str, str] = {}
+    for start in range(0, len(unique_hashes), MANIFEST_QUERY_CHUNK):
+        chunk = unique_hashes[start : start + MANIFEST_QUERY_CHUNK]
+        rows = session.execute(
+            select(ParseFailure.file_hash, ParseFailure.reason).where(
+                ParseFailure.file_hash.in_(chunk), ParseFailure.parser_version == PARSER_VERSION
+            )
+        )
+        failures.update((file_hash, reason) for file_hash, reason in rows)
+    return failures
+
+
+def record_parse_failure(session, file_hash: str, reason: str, file_path: Optional[str] = None) -> ParseFailure:
+    """
+    Insert or update the ParseFailure row of ``file_hash`` for the current parser version.
+
+    Args:
+        session: Active database session (the caller commits)
+        file_hash: SHA-256 of the rejected contents
+        reason: Parser error message
+        file_path: Path or upload name the contents were seen at
+
+    Returns:
+        The added or updated ParseFailure row
+    """
+    entry = session.execute(
+        select(ParseFailure).where(ParseFailure.file_hash == file_hash, ParseFailure.parser_version == PARSER_VERSION)
+    ).scalar_one_or_none()
+    if entry is None:
+        entry = ParseFailure(file_hash=file_hash, parser_version=PARSER_VERSION)
+        session.add(entry)
+
+    entry.reason = reason
+    entry.file_path = file_path
+    return entry
+
+
+def clear_parse_failures(session, file_hashes: Iterable[str]) -> int:
+    """
+    Forget recorded failures of hashes that have since been imported.
+
+    Args:
+        session: Active database session (the caller commits)
+        file_hashes: SHA-256 hashes of imported files
+
+    Returns:
+        Number of deleted rows
+    """
+    unique_hashes = list(dict.fromkeys(file_hashes))
+    deleted = 0
+    for start in range(0, len(unique_hashes), MANIFEST_QUERY_CHUNK):
+        chunk = unique_hashes[start : start + MANIFEST_QUERY_CHUNK]
+        deleted += session.execute(delete(ParseFailure).where(ParseFailure.file_hash.in_(chunk))).rowcount
+    return deleted
+
+
+def record_file_outcome(
+    session,
+    signature: FileSignature,
+    file_hash: Optional[str],
+    outcome: str,
+    detail: Optional[str] = None,
+    activity_id: Optional[int] = None,
+) -> ImportManifest:
+    """
+    Insert or update the manifest row for a file.
+
+    Args:
+        session: Active database session (the caller commits)
+        signature: FileSignature taken before the file was read
+        file_hash: SHA-256 of the file contents
+        outcome: Import outcome ('imported', 'duplicate', 'parse_error', 'no_data')
+        detail: Optional human-readable detail, e.g. the parse error
+        activity_id: ID of the imported activity, if any
+
+    Returns:
+        The added or updated ImportManifest row
+    """
+    entry = session.execute(select(ImportManifest).where(ImportManifest.path == signature.path)).scalar_one_or_none()
+    if entry is None:
+        entry = ImportManifest(path=signature.path)
+        session.add(entry)
+
+    entry.size_bytes = signature.size_bytes
+    entry.mtime_ns = signature.mtime_ns
+    entry.file_hash = file_hash
+    entry.outcome = outcome
+    entry.detail = detail
+    entry.activity_id = activity_id
+    return entry
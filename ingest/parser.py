@@ -5,10 +5,14 @@ Research-based implementation supporting FIT, TCX, and GPX file formats
 with comprehensive error handling and data normalization.
 """
 
+from contextlib import contextmanager
 import hashlib
+import io
 import logging
+import mmap
+import os
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Iterator, Optional, Union
 
 # File format parsers (research-validated)
 try:
@@ -19,25 +23,38 @@ except ImportError:
     FITPARSE_AVAILABLE = False
     logging.warning("fitparse not available - FIT file support disabled")
 
+# Vectorised FIT decoder (needs the fitparse profile tables)
 try:
-    import tcxparser
+    from ingest.fit_fast import FitFastPathUnsupported, decode_fit
 
-    TCXPARSER_AVAILABLE = True
+    FIT_FAST_PATH_AVAILABLE = True
 except ImportError:
-    TCXPARSER_AVAILABLE = False
-    logging.warning("tcxparser not available - TCX file support disabled")
+    FIT_FAST_PATH_AVAILABLE = False
 
-try:
-    import gpxpy
+from app.data.models import ActivityData, LapData, SampleArrays, SampleArraysBuilder
+from ingest.streaming import parse_gpx_stream, parse_tcx_stream
 
-    GPXPY_AVAILABLE = True
-except ImportError:
-    GPXPY_AVAILABLE = False
-    logging.warning("gpxpy not available - GPX file support disabled")
+logger = logging.getLogger(__name__)
 
-from app.data.models import ActivityData, LapData, SampleData
+# Version of the parsed output; bump when a parser change alters ActivityData,
+# so cached parses (see ingest/cache.py) from older versions are not reused
+PARSER_VERSION = 1
 
-logger = logging.getLogger(__name__)
+# File extensions ActivityParser can read (compared lowercased)
+SUPPORTED_EXTENSIONS = frozenset({".fit", ".tcx", ".gpx"})
+
+# FIT messages a summary-only parse reads
+SUMMARY_MESSAGES = ("file_id", "session", "lap")
+
+# FIT stores positions as semicircles: 2^31 semicircles = 180 degrees
+SEMICIRCLES_TO_DEGREES = 180 / (2**31)
+
+# Read size for hashing; files at least HASH_MMAP_THRESHOLD bytes are hashed through mmap
+HASH_BUFFER_SIZE = 1024 * 1024
+HASH_MMAP_THRESHOLD = 32 * 1024 * 1024
+
+# In-memory file contents accepted by the buffer parsers
+FileBuffer = Union[bytes, bytearray, memoryview, mmap.mmap]
 
 
 class ParserError(Exception):
@@ -74,20 +91,30 @@ class ActivityParser:
         sha256_hash = hashlib.sha256()
         try:
             with open(file_path, "rb") as f:
-                # Read file in chunks to handle large files efficiently
-                for chunk in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(chunk)
+                if os.fstat(f.fileno()).st_size >= HASH_MMAP_THRESHOLD:
+                    # Hash large files straight from the page cache, without copies
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        sha256_hash.update(mapped)
+                else:
+                    # Read into one reusable buffer to handle large files efficiently
+                    buffer = bytearray(HASH_BUFFER_SIZE)
+                    view = memoryview(buffer)
+                    while size := f.readinto(buffer):
+                        sha256_hash.update(view[:size])
             return sha256_hash.hexdigest()
         except (OSError, IOError) as e:
             raise CorruptFileError(f"Cannot read file {file_path}: {e}") from e
 
     @staticmethod
-    def parse_activity_file(file_path: Path) -> Optional[ActivityData]:
+    def parse_activity_file(file_path: Path, derive: bool = True, summary_only: bool = False) -> Optional[ActivityData]:
         """
         Parse activity file based on extension with unified error handling.
 
         Args:
             file_path: Path to activity file
+            derive: Fill derived metrics (speed, pace, moving time); the ingest
+                pipeline does this in its own derive stage
+            summary_only: Read only the summary values and laps, without samples
 
         Returns:
             ActivityData object or None if parsing fails
@@ -99,15 +126,54 @@ class ActivityParser:
         if not file_path.exists():
             raise CorruptFileError(f"File does not exist: {file_path}")
 
+        return ActivityParser._parse_routed(file_path, derive, summary_only=summary_only)
+
+    @staticmethod
+    def parse_activity_buffer(
+        data: FileBuffer, file_name: str, derive: bool = True, summary_only: bool = False
+    ) -> Optional[ActivityData]:
+        """
+        Parse activity file contents that are already in memory.
+
+        Lets callers hash and parse from one read of the file, e.g. an
+        upload's bytes or a buffer from ``map_file``.
+
+        Args:
+            data: File contents as bytes, memoryview or mmap
+            file_name: Original file name; its extension selects the format
+                and its stem is the fallback external ID
+            derive: Fill derived metrics (speed, pace, moving time)
+            summary_only: Read only the summary values and laps, without samples
+
+        Returns:
+            ActivityData object or None if parsing fails
+
+        Raises:
+            FileNotSupportedError: If file format is not supported
+            CorruptFileError: If the contents are corrupt
+        """
+        return ActivityParser._parse_routed(Path(file_name), derive, data, summary_only)
+
+    @staticmethod
+    def _parse_routed(
+        file_path: Path, derive: bool, data: Optional[FileBuffer] = None, summary_only: bool = False
+    ) -> Optional[ActivityData]:
+        """Dispatch to the per-format parser by extension, from ``data`` when given."""
         suffix = file_path.suffix.lower()
+        # Only pass optional arguments when set, so the per-format parsers keep their file-only call shape
+        kwargs = {"derive": derive}
+        if data is not None:
+            kwargs["data"] = data
+        if summary_only:
+            kwargs["summary_only"] = True
 
         try:
             if suffix == ".fit":
-                return ActivityParser.parse_fit_file(file_path)
+                return ActivityParser.parse_fit_file(file_path, **kwargs)
             elif suffix == ".tcx":
-                return ActivityParser.parse_tcx_file(file_path)
+                return ActivityParser.parse_tcx_file(file_path, **kwargs)
             elif suffix == ".gpx":
-                return ActivityParser.parse_gpx_file(file_path)
+                return ActivityParser.parse_gpx_file(file_path, **kwargs)
             else:
                 raise FileNotSupportedError(
                     f"Unsupported file format: {suffix}. " "Supported formats: .fit, .tcx, .gpx"
@@ -119,15 +185,27 @@ class ActivityParser:
             raise CorruptFileError(f"Parse error: {e}") from e
 
     @staticmethod
-    def parse_fit_file(file_path: Path) -> Optional[ActivityData]:
+    def parse_fit_file(
+        file_path: Path,
+        fast_path: bool = True,
+        derive: bool = True,
+        data: Optional[FileBuffer] = None,
+        summary_only: bool = False,
+    ) -> Optional[ActivityData]:
         """
         Parse FIT file using fitparse library.
 
         Research-validated implementation extracting message-based data
-        with units and proper error handling.
+        with units and proper error handling. Files the vectorised decoder
+        understands are decoded by it; everything else goes through fitparse.
 
         Args:
-            file_path: Path to FIT file
+            file_path: Path to FIT file (or its original name when ``data`` is given)
+            fast_path: Try the vectorised decoder before fitparse
+            derive: Fill derived metrics
+            data: File contents already in memory; read from ``file_path`` when None
+            summary_only: Read only the file_id, session and lap messages; record
+                messages are skipped without being decoded
 
         Returns:
             ActivityData object or None
@@ -136,135 +214,29 @@ class ActivityParser:
             raise FileNotSupportedError("fitparse library not available")
 
         try:
-            # Load FIT file with fitparse
-            fitfile = fitparse.FitFile(str(file_path))
-
-            # Extract session/activity metadata
-            activity_data = ActivityData()
-            samples = []
-            laps = []
-            route_points = []
-
-            # Parse session messages for activity metadata
-            for session in fitfile.get_messages("session"):
-                activity_data.sport = session.get_value("sport") or "unknown"
-                activity_data.sub_sport = session.get_value("sub_sport")
-                activity_data.start_time_utc = session.get_value("start_time")
-                activity_data.elapsed_time_s = session.get_value("total_elapsed_time")
-                activity_data.moving_time_s = session.get_value("total_timer_time")
-                activity_data.distance_m = session.get_value("total_distance")
-                activity_data.avg_hr = session.get_value("avg_heart_rate")
-                activity_data.max_hr = session.get_value("max_heart_rate")
-                activity_data.avg_power_w = session.get_value("avg_power")
-                activity_data.max_power_w = session.get_value("max_power")
-                activity_data.elevation_gain_m = session.get_value("total_ascent")
-                activity_data.elevation_loss_m = session.get_value("total_descent")
-                activity_data.calories = session.get_value("total_calories")
-                break  # Use first session
-
-            # Parse file_id for external_id
-            for file_id in fitfile.get_messages("file_id"):
-                activity_data.external_id = str(file_id.get_value("serial_number") or file_path.stem)
-                break
-
-            # Parse record messages for time series data
-            elapsed_time = 0
-            for record in fitfile.get_messages("record"):
-                timestamp = record.get_value("timestamp")
-                if not timestamp:
-                    continue
-
-                # GPS coordinates (convert from semicircles to degrees)
-                lat = record.get_value("position_lat")
-                lon = record.get_value("position_long")
-                if lat is not None and lon is not None:
-                    # Convert from semicircles to degrees
-                    lat = lat * (180 / (2**31))
-                    lon = lon * (180 / (2**31))
-
-                # Extract advanced running dynamics
-                vertical_oscillation = record.get_value("vertical_oscillation")
-                if vertical_oscillation is not None:
-                    # Convert from mm to mm (already in correct units)
-                    vertical_oscillation_mm = float(vertical_oscillation)
-                else:
-                    vertical_oscillation_mm = None
-
-                # Ground contact time (stance_time) - convert from ms to ms
-                ground_contact_time = record.get_value("stance_time")
-                if ground_contact_time is not None:
-                    ground_contact_time_ms = float(ground_contact_time)
-                else:
-                    # Try Ground Time field (from Stryd)
-                    ground_time = record.get_value("Ground Time")
-                    ground_contact_time_ms = float(ground_time) if ground_time is not None else None
-
-                # Get speed and altitude, preferring enhanced values
-                speed = record.get_value("enhanced_speed") or record.get_value("speed")
-                altitude = record.get_value("enhanced_altitude") or record.get_value("altitude")
-
-                sample = SampleData(
-                    timestamp=timestamp,
-                    elapsed_time_s=elapsed_time,
-                    latitude=lat,
-                    longitude=lon,
-                    altitude_m=altitude,
-                    heart_rate=record.get_value("heart_rate"),
-                    power_w=record.get_value("power"),
-                    cadence_rpm=record.get_value("cadence"),
-                    speed_mps=speed,
-                    temperature_c=record.get_value("temperature"),
-                    # Advanced running dynamics
-                    vertical_oscillation_mm=vertical_oscillation_mm,
-                    vertical_ratio=record.get_value("vertical_ratio"),
-                    ground_contact_time_ms=ground_contact_time_ms,
-                    ground_contact_balance_pct=record.get_value("stance_time_balance"),
-                    step_length_mm=record.get_value("step_length"),
-                    air_power_w=record.get_value("Air Power"),
-                    form_power_w=record.get_value("Form Power"),
-                    leg_spring_stiffness=record.get_value("Leg Spring Stiffness"),
-                    impact_loading_rate=record.get_value("Impact Loading Rate"),
-                    stryd_temperature_c=record.get_value("Stryd Temperature"),
-                    stryd_humidity_pct=record.get_value("Stryd Humidity"),
-                )
-                samples.append(sample)
-
-                # Add to route points if GPS data available
-                if lat is not None and lon is not None:
-                    route_points.append((lat, lon, sample.altitude_m))
-
-                elapsed_time += 1  # Increment for each record
-
-            # Parse lap messages
-            for lap_idx, lap in enumerate(fitfile.get_messages("lap")):
-                # Get lap speed or calculate from distance/time
-                avg_speed_mps = lap.get_value("avg_speed")
-                if not avg_speed_mps:
-                    # Calculate from distance and time if not provided
-                    distance = lap.get_value("total_distance")
-                    time = lap.get_value("total_elapsed_time")
-                    if distance and time and time > 0:
-                        avg_speed_mps = distance / time
-
-                lap_data = LapData(
-                    lap_index=lap_idx,
-                    start_time_utc=lap.get_value("start_time"),
-                    elapsed_time_s=lap.get_value("total_elapsed_time"),
-                    distance_m=lap.get_value("total_distance"),
-                    avg_speed_mps=avg_speed_mps,
-                    avg_hr=lap.get_value("avg_heart_rate"),
-                    max_hr=lap.get_value("max_heart_rate"),
-                    avg_power_w=lap.get_value("avg_power"),
-                    max_power_w=lap.get_value("max_power"),
-                )
-                laps.append(lap_data)
-
-            activity_data.samples = samples
-            activity_data.route_points = route_points
-            activity_data.laps = laps
+            if data is None:
+                # Read once; the fast path and the fitparse fallback share the bytes
+                data = file_path.read_bytes()
+
+            activity_data = None
+            if fast_path and FIT_FAST_PATH_AVAILABLE:
+                activity_data = ActivityParser._decode_fit_fast(data, file_path, summary_only)
+
+            if activity_data is None:
+                # Load FIT file with fitparse and route every message in a single pass.
+                # fitparse closes its file object, so it gets a private copy rather than a shared mmap.
+                fitfile = fitparse.FitFile(io.BytesIO(data))
+                builder = _FitActivityBuilder(file_path)
+                messages = fitfile.get_messages(list(SUMMARY_MESSAGES)) if summary_only else fitfile.get_messages()
+                for message in messages:
+                    builder.dispatch(message)
+
+                activity_data = builder.finish()
+                activity_data.summary_only = summary_only
 
             # Derive missing metrics if not present
-            ActivityParser._derive_metrics(activity_data)
+            if derive:
+                ActivityParser._derive_metrics(activity_data)
 
             return activity_data
 
@@ -273,89 +245,47 @@ class ActivityParser:
             raise CorruptFileError(f"FIT parse error: {e}") from e
 
     @staticmethod
-    def parse_tcx_file(file_path: Path) -> Optional[ActivityData]:
+    def _decode_fit_fast(data: FileBuffer, file_path: Path, summary_only: bool = False) -> Optional[ActivityData]:
+        """Decode in-memory FIT contents with the vectorised decoder; None if they need fitparse."""
+        try:
+            decoded = decode_fit(data, records=not summary_only)
+        except FitFastPathUnsupported as e:
+            logger.debug(f"FIT fast path not used for {file_path}: {e}")
+            return None
+
+        builder = _FitActivityBuilder(file_path)
+        for name, values in decoded.messages:
+            builder.dispatch_values(name, values)
+        activity_data = builder.finish(decoded.samples)
+        activity_data.summary_only = summary_only
+        return activity_data
+
+    @staticmethod
+    def parse_tcx_file(
+        file_path: Path, derive: bool = True, data: Optional[FileBuffer] = None, summary_only: bool = False
+    ) -> Optional[ActivityData]:
         """
-        Parse TCX file using tcxparser library.
+        Parse TCX file with the streaming parser.
 
-        Research-validated implementation with direct property access
-        and HR zone analysis capabilities.
+        Trackpoints are read incrementally (see ingest/streaming.py), so
+        memory does not grow with the size of the XML document.
 
         Args:
-            file_path: Path to TCX file
+            file_path: Path to TCX file (or its original name when ``data`` is given)
+            derive: Fill derived metrics
+            data: File contents already in memory; streamed from ``file_path`` when None
+            summary_only: Accumulate the summary values without keeping samples
 
         Returns:
             ActivityData object or None
         """
-        if not TCXPARSER_AVAILABLE:
-            raise FileNotSupportedError("tcxparser library not available")
-
         try:
-            # Parse TCX file
-            tcx = tcxparser.TCXParser(str(file_path))
-
-            # Extract activity data using direct properties (research pattern)
-            activity_data = ActivityData(
-                external_id=file_path.stem,  # Use filename as external ID
-                sport=tcx.activity_type or "unknown",
-                start_time_utc=tcx.started_at,
-                elapsed_time_s=int(tcx.duration) if tcx.duration else None,
-                distance_m=tcx.distance,
-                avg_hr=int(tcx.hr_avg) if tcx.hr_avg else None,
-                max_hr=int(tcx.hr_max) if tcx.hr_max else None,
-                calories=int(tcx.calories) if tcx.calories else None,
-            )
-
-            # Get HR zones using research-validated method
-            if hasattr(tcx, "hr_percent_in_zones") and tcx.hr_max:
-                try:
-                    hr_zones = tcx.hr_percent_in_zones(
-                        {
-                            "Z1": (0, int(tcx.hr_max * 0.7)),
-                            "Z2": (int(tcx.hr_max * 0.7), int(tcx.hr_max * 0.8)),
-                            "Z3": (int(tcx.hr_max * 0.8), int(tcx.hr_max * 0.9)),
-                            "Z4": (int(tcx.hr_max * 0.9), int(tcx.hr_max * 0.95)),
-                            "Z5": (int(tcx.hr_max * 0.95), int(tcx.hr_max * 1.1)),
-                        }
-                    )
-                    activity_data.hr_zones = hr_zones
-                except Exception:
-                    logger.debug("Could not calculate HR zones")
-
-            # Parse trackpoints for time series data
-            samples = []
-            route_points = []
-
-            if hasattr(tcx, "trackpoints"):
-                for i, point in enumerate(tcx.trackpoints):
-                    try:
-                        sample = SampleData(
-                            timestamp=point.time if hasattr(point, "time") else None,
-                            elapsed_time_s=i,  # Use index as elapsed time approximation
-                            latitude=float(point.latitude) if hasattr(point, "latitude") and point.latitude else None,
-                            longitude=(
-                                float(point.longitude) if hasattr(point, "longitude") and point.longitude else None
-                            ),
-                            altitude_m=(
-                                float(point.elevation) if hasattr(point, "elevation") and point.elevation else None
-                            ),
-                            heart_rate=int(point.hr_value) if hasattr(point, "hr_value") and point.hr_value else None,
-                            speed_mps=float(point.speed) if hasattr(point, "speed") and point.speed else None,
-                        )
-                        samples.append(sample)
-
-                        # Add to route if GPS available
-                        if sample.latitude and sample.longitude:
-                            route_points.append((sample.latitude, sample.longitude, sample.altitude_m))
-
-                    except (ValueError, AttributeError) as e:
-                        logger.debug(f"Skipping trackpoint {i}: {e}")
-                        continue
-
-            activity_data.samples = samples
-            activity_data.route_points = route_points
+            source = file_path if data is None else _open_buffer(data)
+            activity_data = parse_tcx_stream(source, external_id=file_path.stem, samples_wanted=not summary_only)
 
             # Derive missing metrics
-            ActivityParser._derive_metrics(activity_data)
+            if derive:
+                ActivityParser._derive_metrics(activity_data)
 
             return activity_data
 
@@ -364,96 +294,31 @@ class ActivityParser:
             raise CorruptFileError(f"TCX parse error: {e}") from e
 
     @staticmethod
-    def parse_gpx_file(file_path: Path) -> Optional[ActivityData]:
+    def parse_gpx_file(
+        file_path: Path, derive: bool = True, data: Optional[FileBuffer] = None, summary_only: bool = False
+    ) -> Optional[ActivityData]:
         """
-        Parse GPX file using gpxpy library.
+        Parse GPX file with the streaming parser.
 
-        Research-validated implementation with track/segment/point hierarchy
-        and GPS statistics calculation.
+        Track points are read incrementally and distance and elapsed time
+        are accumulated on the fly (see ingest/streaming.py).
 
         Args:
-            file_path: Path to GPX file
+            file_path: Path to GPX file (or its original name when ``data`` is given)
+            derive: Fill derived metrics
+            data: File contents already in memory; streamed from ``file_path`` when None
+            summary_only: Accumulate the summary values without keeping samples
 
         Returns:
             ActivityData object or None
         """
-        if not GPXPY_AVAILABLE:
-            raise FileNotSupportedError("gpxpy library not available")
-
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                gpx = gpxpy.parse(f)
-
-            # Initialize activity data
-            activity_data = ActivityData(
-                external_id=file_path.stem,
-                sport="unknown",  # GPX doesn't specify sport type
-                start_time_utc=None,
-                distance_m=None,
-            )
-
-            samples = []
-            route_points = []
-            all_points = []
-
-            # Extract all track points (research pattern: track/segment/point hierarchy)
-            for track in gpx.tracks:
-                for segment in track.segments:
-                    for point in segment.points:
-                        all_points.append(point)
-
-                        # Convert to route point tuple
-                        route_points.append((point.latitude, point.longitude, point.elevation))
-
-            if all_points:
-                # Set start time from first point
-                if all_points[0].time:
-                    activity_data.start_time_utc = all_points[0].time
-
-                # Convert points to samples
-                start_time = all_points[0].time
-                for point in all_points:
-                    elapsed_time_s = 0
-                    if point.time and start_time:
-                        elapsed_time_s = int((point.time - start_time).total_seconds())
-
-                    sample = SampleData(
-                        timestamp=point.time,
-                        elapsed_time_s=elapsed_time_s,
-                        latitude=point.latitude,
-                        longitude=point.longitude,
-                        altitude_m=point.elevation,
-                        # GPX typically doesn't have HR/power data
-                        heart_rate=None,
-                        power_w=None,
-                        speed_mps=None,
-                    )
-                    samples.append(sample)
-
-            # Calculate distance using gpxpy built-in methods
-            if gpx.tracks:
-                try:
-                    # Use gpxpy's built-in distance calculation
-                    total_distance = 0
-                    for track in gpx.tracks:
-                        if track_distance := track.length_2d():
-                            total_distance += track_distance
-
-                    activity_data.distance_m = total_distance
-
-                    # Calculate elapsed time
-                    if all_points and len(all_points) > 1 and (all_points[0].time and all_points[-1].time):
-                        elapsed = all_points[-1].time - all_points[0].time
-                        activity_data.elapsed_time_s = int(elapsed.total_seconds())
-
-                except Exception as e:
-                    logger.debug(f"Could not calculate GPX statistics: {e}")
-
-            activity_data.samples = samples
-            activity_data.route_points = route_points
+            source = file_path if data is None else _open_buffer(data)
+            activity_data = parse_gpx_stream(source, external_id=file_path.stem, samples_wanted=not summary_only)
 
             # Derive missing metrics
-            ActivityParser._derive_metrics(activity_data)
+            if derive:
+                ActivityParser._derive_metrics(activity_data)
 
             return activity_data
 
@@ -494,6 +359,246 @@ class ActivityParser:
             logger.debug(f"Could not derive metrics: {e}")
 
 
+class _FieldIndex:
+    """
+    Field-name-to-position map for one FIT definition message.
+
+    fitparse's ``get_value`` scans the message's fields by name on every call.
+    Messages sharing a definition share a field layout, so positions are
+    resolved once and each lookup becomes a list index plus a name check.
+    """
+
+    __slots__ = ("positions",)
+
+    def __init__(self, message):
+        self.positions = {}
+        for position, field_data in enumerate(message.fields):
+            for field in (field_data.field, field_data.parent_field):
+                if field is not None:
+                    self.positions.setdefault(field.name, position)
+
+    def get(self, message, name: str):
+        """Return the value of ``name`` in ``message``, or None if the definition lacks it."""
+        position = self.positions.get(name)
+        if position is None:
+            return None
+        fields = message.fields
+        if position < len(fields):
+            field_data = fields[position]
+            if field_data.is_named(name):
+                return field_data.value
+        # Layout differs from the cached one (e.g. a resolved subfield); fall back to a scan
+        return message.get_value(name)
+
+
+class _ValueIndex:
+    """Field lookup for messages already decoded into a name-to-value dict (the FIT fast path)."""
+
+    @staticmethod
+    def get(message: dict, name: str):
+        """Return the value of ``name`` in ``message``, or None if absent."""
+        return message.get(name)
+
+
+class _FitActivityBuilder:
+    """
+    Single-pass FIT message dispatcher that assembles ActivityData.
+
+    Each data message is routed to a handler by message type; the route and
+    the field index are cached per definition message.
+    """
+
+    def __init__(self, file_path: Path):
+        self.file_path = file_path
+        self.activity_data = ActivityData()
+        self.samples = SampleArraysBuilder()
+        self.laps = []
+        self.elapsed_time = 0
+        self._has_session = False
+        self._has_file_id = False
+        self._handlers = {
+            "session": self._on_session,
+            "file_id": self._on_file_id,
+            "record": self._on_record,
+            "lap": self._on_lap,
+        }
+        self._routes = {}
+
+    def dispatch(self, message):
+        """Route one decoded data message to its handler."""
+        key = (message.def_mesg, len(message.fields))
+        route = self._routes.get(key)
+        if route is None:
+            handler = self._handlers.get(message.name)
+            route = self._routes[key] = (handler, _FieldIndex(message) if handler else None)
+
+        handler, index = route
+        if handler is not None:
+            handler(message, index)
+
+    def dispatch_values(self, name: str, values: dict):
+        """Route one message decoded elsewhere, given as a field-name-to-value dict, to its handler."""
+        handler = self._handlers.get(name)
+        if handler is not None:
+            handler(values, _ValueIndex)
+
+    def finish(self, samples: Optional[SampleArrays] = None) -> ActivityData:
+        """Attach the collected (or already decoded) samples, route points and laps."""
+        activity_data = self.activity_data
+        activity_data.samples = self.samples.build() if samples is None else samples
+        activity_data.route_points = activity_data.samples.route_points()
+        activity_data.laps = self.laps
+        return activity_data
+
+    def _on_session(self, session, index):
+        # Use first session
+        if self._has_session:
+            return
+        self._has_session = True
+
+        activity_data = self.activity_data
+        activity_data.sport = index.get(session, "sport") or "unknown"
+        activity_data.sub_sport = index.get(session, "sub_sport")
+        activity_data.start_time_utc = index.get(session, "start_time")
+        activity_data.elapsed_time_s = index.get(session, "total_elapsed_time")
+        activity_data.moving_time_s = index.get(session, "total_timer_time")
+        activity_data.distance_m = index.get(session, "total_distance")
+        activity_data.avg_hr = index.get(session, "avg_heart_rate")
+        activity_data.max_hr = index.get(session, "max_heart_rate")
+        activity_data.avg_power_w = index.get(session, "avg_power")
+        activity_data.max_power_w = index.get(session, "max_power")
+        activity_data.elevation_gain_m = index.get(session, "total_ascent")
+        activity_data.elevation_loss_m = index.get(session, "total_descent")
+        activity_data.calories = index.get(session, "total_calories")
+
+    def _on_file_id(self, file_id, index):
+        # Parse first file_id for external_id
+        if self._has_file_id:
+            return
+        self._has_file_id = True
+        self.activity_data.external_id = str(index.get(file_id, "serial_number") or self.file_path.stem)
+
+    def _on_record(self, record, index: _FieldIndex):
+        get = index.get
+        timestamp = get(record, "timestamp")
+        if not timestamp:
+            return
+
+        # GPS coordinates (convert from semicircles to degrees)
+        lat = get(record, "position_lat")
+        lon = get(record, "position_long")
+        if lat is not None and lon is not None:
+            lat = lat * SEMICIRCLES_TO_DEGREES
+            lon = lon * SEMICIRCLES_TO_DEGREES
+
+        # Ground contact time (stance_time), or the Stryd "Ground Time" developer field
+        ground_contact_time = get(record, "stance_time")
+        if ground_contact_time is None:
+            ground_contact_time = get(record, "Ground Time")
+
+        self.samples.append(
+            timestamp,
+            elapsed_time_s=self.elapsed_time,
+            latitude=lat,
+            longitude=lon,
+            # Prefer enhanced speed and altitude values
+            altitude_m=get(record, "enhanced_altitude") or get(record, "altitude"),
+            heart_rate=get(record, "heart_rate"),
+            power_w=get(record, "power"),
+            cadence_rpm=get(record, "cadence"),
+            speed_mps=get(record, "enhanced_speed") or get(record, "speed"),
+            temperature_c=get(record, "temperature"),
+            # Advanced running dynamics
+            vertical_oscillation_mm=get(record, "vertical_oscillation"),
+            vertical_ratio=get(record, "vertical_ratio"),
+            ground_contact_time_ms=ground_contact_time,
+            ground_contact_balance_pct=get(record, "stance_time_balance"),
+            step_length_mm=get(record, "step_length"),
+            air_power_w=get(record, "Air Power"),
+            form_power_w=get(record, "Form Power"),
+            leg_spring_stiffness=get(record, "Leg Spring Stiffness"),
+            impact_loading_rate=get(record, "Impact Loading Rate"),
+            stryd_temperature_c=get(record, "Stryd Temperature"),
+            stryd_humidity_pct=get(record, "Stryd Humidity"),
+        )
+
+        self.elapsed_time += 1  # Increment for each record
+
+    def _on_lap(self, lap, index):
+        # Get lap speed or calculate from distance/time
+        avg_speed_mps = index.get(lap, "avg_speed")
+        distance = index.get(lap, "total_distance")
+        elapsed = index.get(lap, "total_elapsed_time")
+        if not avg_speed_mps and distance and elapsed and elapsed > 0:
+            # Calculate from distance and time if not provided
+            avg_speed_mps = distance / elapsed
+
+        self.laps.append(
+            LapData(
+                lap_index=len(self.laps),
+                start_time_utc=index.get(lap, "start_time"),
+                elapsed_time_s=elapsed,
+                distance_m=distance,
+                avg_speed_mps=avg_speed_mps,
+                avg_hr=index.get(lap, "avg_heart_rate"),
+                max_hr=index.get(lap, "max_heart_rate"),
+                avg_power_w=index.get(lap, "avg_power"),
+                max_power_w=index.get(lap, "max_power"),
+            )
+        )
+
+
+def _open_buffer(data: FileBuffer) -> BinaryIO:
+    """File object over in-memory contents; an mmap is rewound and read in place instead of copied."""
+    if isinstance(data, mmap.mmap):
+        data.seek(0)
+        return data
+    return io.BytesIO(data)
+
+
+@contextmanager
+def map_file(file_path: Path) -> Iterator[FileBuffer]:
+    """
+    Map a file read-only for hashing and parsing from a single read.
+
+    Args:
+        file_path: Path to the file
+
+    Yields:
+        mmap of the file, or ``b""`` for an empty file (which cannot be mapped)
+
+    Raises:
+        CorruptFileError: If the file cannot be opened or mapped
+    """
+    try:
+        with open(file_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                mapped = None
+            else:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise CorruptFileError(f"Cannot read file {file_path}: {e}") from e
+
+    if mapped is None:
+        yield b""
+        return
+    with mapped:
+        yield mapped
+
+
+def calculate_buffer_hash(data: FileBuffer) -> str:
+    """
+    SHA-256 of in-memory file contents; matches calculate_file_hash for the same bytes.
+
+    Args:
+        data: File contents as bytes, memoryview or mmap
+
+    Returns:
+        SHA-256 hex hash
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
 def calculate_file_hash(file_path: Path) -> str:
     """
     Convenience function to calculate file hash.
@@ -0,0 +1,368 @@
+"""
+Bulk persistence of parsed activities.
+
+Shared by the gd-import CLI, the web upload page and the Garmin Connect
+importer. The Activity row is inserted with a conflict-ignoring insert
+against its unique keys (file hash, Garmin activity ID), so a duplicate
+costs no lookup beforehand and concurrent importers cannot store the same
+activity twice; the row is then attached to the session as if loaded.
+Samples, route points and laps are written with Core ``insert()``
+executemany batches instead of one ORM object per row. Sample and route
+point parameter rows are built one batch at a time from the columnar
+arrays, so peak memory does not grow with the length of the activity.
+Sessions configured for the columnar or Arrow sample store write samples
+as compressed channels or sidecar files instead (see app/data/sample_store.py).
+Every insert and delete adjusts the table row counters in the same
+transaction (see app/data/counters.py).
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import time
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.data.models import Activity, ActivityData, Lap, RoutePoint, Sample, SampleChannel, start_bucket
+from app.data.arrow_store import discard_sample_files, write_sample_file
+from app.data.counters import adjust_counts, stored_sample_count
+from app.data.sample_store import sample_store, write_sample_channels
+
+# Rows per executemany call; keeps parameter lists bounded for long activities
+INSERT_BATCH_ROWS = 5000
+
+
+@dataclass
+class PersistStats:
+    """Row counts and time spent writing, for rows/sec reporting."""
+
+    activities: int = 0
+    samples: int = 0
+    route_points: int = 0
+    laps: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows(self) -> int:
+        """Total rows written across all tables."""
+        return self.activities + self.samples + self.route_points + self.laps
+
+    @property
+    def rows_per_second(self) -> float:
+        """Write throughput; 0 before any time was recorded."""
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    @contextmanager
+    def timer(self) -> Iterator[None]:
+        """Add the wall-clock time of the enclosed block (typically a whole transaction) to ``seconds``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def merge(self, other: "PersistStats"):
+        """Add another PersistStats' counts and time to this one."""
+        self.activities += other.activities
+        self.samples += other.samples
+        self.route_points += other.route_points
+        self.laps += other.laps
+        self.seconds += other.seconds
+
+    def summary(self) -> str:
+        """One-line report of rows written, time and throughput."""
+        return f"{self.rows:,} rows in {self.seconds:.2f}s ({self.rows_per_second:,.0f} rows/s)"
+
+
+def build_activity(
+    activity_data: ActivityData, file_hash: str, source: str, file_path: str, default_external_id: str
+) -> Activity:
+    """
+    Build the Activity row for a parsed activity file.
+
+    Args:
+        activity_data: Parsed activity data
+        file_hash: SHA-256 hash of the file contents
+        source: Source format, e.g. 'fit'
+        file_path: Path or original filename stored with the activity
+        default_external_id: External ID used when the file does not carry one
+
+    Returns:
+        Unsaved Activity
+    """
+    return Activity(
+        external_id=activity_data.external_id or default_external_id,
+        file_hash=file_hash,
+        source=source,
+        sport=activity_data.sport or "unknown",
+        sub_sport=activity_data.sub_sport,
+        start_time_utc=activity_data.start_time_utc or datetime.now(timezone.utc),
+        elapsed_time_s=activity_data.elapsed_time_s or 0,
+        moving_time_s=activity_data.moving_time_s,
+        distance_m=activity_data.distance_m,
+        avg_speed_mps=activity_data.avg_speed_mps,
+        avg_pace_s_per_km=activity_data.avg_pace_s_per_km,
+        avg_hr=activity_data.avg_hr,
+        max_hr=activity_data.max_hr,
+        avg_power_w=activity_data.avg_power_w,
+        max_power_w=activity_data.max_power_w,
+        elevation_gain_m=activity_data.elevation_gain_m,
+        elevation_loss_m=activity_data.elevation_loss_m,
+        calories=activity_data.calories,
+        file_path=file_path,
+        samples_hydrated=not activity_data.summary_only,
+    )
+
+
+def route_point_rows(activity_id: int, route_points: Sequence[tuple], start: int = 0) -> List[dict]:
+    """
+    Insert rows for (lat, lon, alt) route points; points without a fix are dropped but keep their sequence.
+
+    ``start`` is the sequence number of the first point, for routes written in slices.
+    """
+    return [
+        {"activity_id": activity_id, "sequence": i, "latitude": lat, "longitude": lon, "altitude_m": alt}
+        for i, (lat, lon, alt) in enumerate(route_points, start)
+        if lat is not None and lon is not None
+    ]
+
+
+def iter_route_point_chunks(
+    activity_id: int, route_points: Sequence[tuple], chunk_rows: int = INSERT_BATCH_ROWS
+) -> Iterator[List[dict]]:
+    """Yield the rows of ``route_point_rows`` built ``chunk_rows`` points at a time."""
+    for start in range(0, len(route_points), chunk_rows):
+        yield route_point_rows(activity_id, route_points[start : start + chunk_rows], start)
+
+
+def lap_rows(activity_id: int, laps) -> List[dict]:
+    """Insert rows for LapData objects; elapsed time doubles as moving time."""
+    return [
+        {
+            "activity_id": activity_id,
+            "lap_index": lap.lap_index,
+            "start_time_utc": lap.start_time_utc,
+            "elapsed_time_s": lap.elapsed_time_s or 0,
+            "moving_time_s": lap.elapsed_time_s,
+            "distance_m": lap.distance_m,
+            "avg_speed_mps": lap.avg_speed_mps,
+            "avg_hr": lap.avg_hr,
+            "max_hr": lap.max_hr,
+            "avg_power_w": lap.avg_power_w,
+            "max_power_w": lap.max_power_w,
+        }
+        for lap in laps
+    ]
+
+
+def insert_rows(session, model, rows: List[dict], batch_size: int = INSERT_BATCH_ROWS) -> int:
+    """
+    Insert rows with Core executemany in batches of ``batch_size``.
+
+    Args:
+        session: Active database session
+        model: Mapped class whose table receives the rows
+        rows: Parameter dictionaries, all with the same keys
+        batch_size: Rows per executemany call
+
+    Returns:
+        Number of rows inserted
+    """
+    batches = (rows[start : start + batch_size] for start in range(0, len(rows), batch_size))
+    return insert_chunks(session, model, batches)
+
+
+def insert_chunks(session, model, chunks: Iterable[List[dict]]) -> int:
+    """
+    Insert rows with one Core executemany call per chunk.
+
+    Chunks are consumed as they are written, so a generator keeps only one
+    chunk of parameter rows in memory.
+
+    Args:
+        session: Active database session
+        model: Mapped class whose table receives the rows
+        chunks: Lists of parameter dictionaries, all with the same keys
+
+    Returns:
+        Number of rows inserted
+    """
+    statement = insert(model)
+    inserted = 0
+    for rows in chunks:
+        if rows:
+            session.execute(statement, rows)
+            inserted += len(rows)
+    return inserted
+
+
+def activity_values(activity: Activity) -> dict:
+    """Column values set on an unsaved Activity, keyed by attribute name, with its start bucket filled in."""
+    loaded = activity.__dict__
+    values = {prop.key: loaded[prop.key] for prop in Activity.__mapper__.column_attrs if prop.key in loaded}
+    if "start_time_utc" in values:
+        values["start_bucket"] = start_bucket(values["start_time_utc"])
+    return values
+
+
+def insert_activity(session, activity: Activity) -> Optional[int]:
+    """
+    Insert an Activity row unless it collides with a stored one on a unique key.
+
+    SQLite (3.35+, for RETURNING) and PostgreSQL use ``ON CONFLICT DO
+    NOTHING RETURNING id``; other databases run a plain insert in a
+    savepoint and treat an IntegrityError as the conflict.
+
+    Args:
+        session: Active database session
+        activity: Unsaved Activity row
+
+    Returns:
+        ID of the new row, or None if an activity with the same file hash or Garmin activity ID exists
+    """
+    values = activity_values(activity)
+    dialect = session.get_bind().dialect
+    if dialect.name in ("sqlite", "postgresql") and getattr(dialect, "insert_returning", False):
+        dialect_insert = sqlite.insert if dialect.name == "sqlite" else postgresql.insert
+        statement = dialect_insert(Activity).values(values).on_conflict_do_nothing().returning(Activity.id)
+        return session.execute(statement).scalar()
+
+    try:
+        with session.begin_nested():
+            result = session.execute(insert(Activity).values(values))
+    except IntegrityError:
+        return None
+    return result.inserted_primary_key[0]
+
+
+def find_conflicting_activity(session, activity: Activity) -> Optional[int]:
+    """Return the ID of the stored activity sharing ``activity``'s file hash or Garmin activity ID, if any."""
+    keys = []
+    if activity.file_hash:
+        keys.append(Activity.file_hash == activity.file_hash)
+    if activity.garmin_activity_id:
+        keys.append(Activity.garmin_activity_id == activity.garmin_activity_id)
+    if not keys:
+        return None
+    return session.execute(select(Activity.id).where(or_(*keys)).limit(1)).scalar()
+
+
+def replace_activity(session, activity_id: int, activity: Activity):
+    """
+    Overwrite a stored activity with the columns set on ``activity`` and drop its samples, route points and laps.
+
+    Columns ``activity`` leaves unset, such as user comments, keep their stored values.
+    """
+    values = activity_values(activity)
+    values.pop("id", None)
+    session.execute(update(Activity).where(Activity.id == activity_id).values(values))
+    samples = stored_sample_count(session, [activity_id])
+    deleted = {
+        model: session.execute(delete(model).where(model.activity_id == activity_id)).rowcount
+        for model in (Sample, SampleChannel, RoutePoint, Lap)
+    }
+    discard_sample_files(session, [activity_id])
+    adjust_counts(session, samples=-samples, route_points=-deleted[RoutePoint], laps=-deleted[Lap])
+
+
+def persist_activity(
+    session,
+    activity: Activity,
+    activity_data: Optional[ActivityData],
+    stats: Optional[PersistStats] = None,
+    replace: bool = False,
+    replace_id: Optional[int] = None,
+) -> Optional[Activity]:
+    """
+    Insert an activity and bulk-insert its samples, route points and laps.
+
+    The caller owns the transaction, so several activities can share one
+    commit. An activity whose file hash or Garmin activity ID is already
+    stored is not inserted; with ``replace`` the stored activity is
+    overwritten in place instead, keeping its ID. ``replace_id`` names the
+    stored activity to overwrite directly, e.g. the same workout recorded
+    by another source (see ingest/duplicates.py).
+
+    Args:
+        session: Active database session
+        activity: Unsaved Activity row
+        activity_data: Parsed data whose samples, route points and laps are stored, if any
+        stats: Optional PersistStats updated with the inserted row counts
+        replace: Overwrite a conflicting stored activity instead of skipping
+        replace_id: ID of a stored activity to overwrite instead of inserting
+
+    Returns:
+        The stored Activity row, attached to ``session``, or None if it was a duplicate
+    """
+    if replace_id is None:
+        activity_id = insert_activity(session, activity)
+        if activity_id is None and replace:
+            replace_id = find_conflicting_activity(session, activity)
+        if activity_id is None and replace_id is None:
+            return None
+    if replace_id is not None:
+        activity_id = replace_id
+        replace_activity(session, activity_id, activity)
+        # Drop a stale copy of the stored row so the attached one below takes its place
+        stored = session.identity_map.get(session.identity_key(Activity, activity_id))
+        if stored is not None:
+            session.expunge(stored)
+
+    activity.id = activity_id
+    make_transient_to_detached(activity)
+    session.add(activity)
+
+    laps = 0
+    if activity_data is not None:
+        persist_samples(session, activity.id, activity_data, stats)
+        if activity_data.laps:
+            laps = insert_rows(session, Lap, lap_rows(activity.id, activity_data.laps))
+    adjust_counts(session, activities=int(replace_id is None), laps=laps)
+
+    if stats is not None:
+        stats.activities += 1
+        stats.laps += laps
+    return activity
+
+
+def persist_samples(
+    session, activity_id: int, activity_data: ActivityData, stats: Optional[PersistStats] = None
+) -> int:
+    """
+    Bulk-insert the samples and route points of a parsed activity.
+
+    Used by persist_activity and to hydrate activities imported summary-only
+    (see ingest/hydrate.py). Samples go to the session's sample store.
+
+    Args:
+        session: Active database session
+        activity_id: ID of the stored Activity row
+        activity_data: Parsed data whose samples and route points are stored
+        stats: Optional PersistStats updated with the inserted row counts
+
+    Returns:
+        Number of samples inserted
+    """
+    store = sample_store(session)
+    if store == "columnar":
+        samples = write_sample_channels(session, activity_id, activity_data.samples)
+    elif store == "arrow":
+        samples = write_sample_file(session, activity_id, activity_data.samples)
+    else:
+        samples = insert_chunks(
+            session, Sample, activity_data.samples.iter_row_chunks(activity_id, INSERT_BATCH_ROWS)
+        )
+    route_points = insert_chunks(
+        session, RoutePoint, iter_route_point_chunks(activity_id, activity_data.route_points, INSERT_BATCH_ROWS)
+    )
+
+    adjust_counts(session, samples=samples, route_points=route_points)
+
+    if stats is not None:
+        stats.samples += samples
+        stats.route_points += route_points
+    return samples
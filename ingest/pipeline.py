@@ -0,0 +1,438 @@
+"""
+Activity ingest pipeline shared by the CLI, the upload page and the Garmin importer.
+
+Every activity goes through the same explicit stages:
+
+    hash -> dedupe -> parse -> derive -> persist
+
+Each stage takes a list of IngestItem objects, so callers can batch as
+much or as little as they like, and records its wall-clock time in an
+IngestStats. ``parse_item`` is the single-item parse step and is safe to
+run in worker processes. ``ingest_file`` and ``ingest_content`` run the
+whole pipeline for one file; a file on disk is mapped once and the same
+buffer is hashed and parsed.
+
+The dedupe stage only saves parsing files whose hash is already stored.
+Correctness does not depend on it: the unique file hash and Garmin
+activity ID keys make the persist stage's insert idempotent, so
+concurrent importers cannot store the same activity twice.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.data.db import run_write, session_scope
+from app.data.models import Activity, ActivityData, ImportResult
+from ingest.cache import ParsedActivityCache
+from ingest.manifest import (
+    FileSignature,
+    clear_parse_failures,
+    file_signature,
+    find_existing_hashes,
+    find_parse_failures,
+    record_file_outcome,
+    record_parse_failure,
+)
+from ingest.parser import (
+    ActivityParser,
+    CorruptFileError,
+    FileBuffer,
+    FileNotSupportedError,
+    calculate_buffer_hash,
+    calculate_file_hash,
+    map_file,
+)
+from ingest.duplicates import adopt_keys, find_matching_activity
+from ingest.persist import PersistStats, build_activity, find_conflicting_activity, persist_activity
+
+STAGES = ("hash", "dedupe", "parse", "derive", "persist")
+
+
+@dataclass
+class IngestItem:
+    """
+    One activity file moving through the pipeline.
+
+    Files on disk are identified by ``file_path``; uploaded files carry their
+    bytes in ``content`` and use ``file_path`` for the original filename only.
+    ``content`` also holds the mapped file while ``ingest_item`` runs.
+    ``summary_only`` items are parsed without samples; their activities are
+    stored unhydrated (see ingest/hydrate.py). ``replace`` items overwrite an
+    activity stored from the same contents instead of being duplicates.
+    """
+
+    file_path: Path
+    content: Optional[FileBuffer] = None
+    signature: Optional[FileSignature] = None
+    file_hash: Optional[str] = None
+    activity_data: Optional[ActivityData] = None
+    activity: Optional[Activity] = None
+    reason: str = ""
+    error: Optional[str] = None
+    parse_seconds: float = 0.0
+    cached: bool = False
+    known_failure: bool = False
+    summary_only: bool = False
+    replace: bool = False
+
+    @property
+    def source(self) -> str:
+        """File type taken from the extension, e.g. 'fit'."""
+        return self.file_path.suffix[1:].lower()
+
+
+@dataclass
+class IngestStats:
+    """Per-stage wall-clock time and item counts, plus persistence row counts and parse cache hits."""
+
+    seconds: Dict[str, float] = field(default_factory=lambda: dict.fromkeys(STAGES, 0.0))
+    items: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(STAGES, 0))
+    persist: PersistStats = field(default_factory=PersistStats)
+    cache_hits: int = 0
+
+    @contextmanager
+    def stage(self, name: str, items: int = 1) -> Iterator[None]:
+        """Time the enclosed block as ``items`` items of stage ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, items)
+
+    def record(self, name: str, seconds: float, items: int = 1):
+        """Add ``seconds`` and ``items`` to stage ``name``."""
+        self.seconds[name] += seconds
+        self.items[name] += items
+
+    def record_parse(self, item: "IngestItem"):
+        """Account for an item's parse step, which may have run in a worker process."""
+        self.record("parse", item.parse_seconds)
+        if item.cached:
+            self.cache_hits += 1
+
+    def merge(self, other: "IngestStats"):
+        """Add another IngestStats' totals to this one."""
+        for name in STAGES:
+            self.record(name, other.seconds[name], other.items[name])
+        self.persist.merge(other.persist)
+        self.cache_hits += other.cache_hits
+
+    def summary(self) -> str:
+        """One-line report of the time per stage and the persisted row throughput."""
+        stages = ", ".join(f"{name} {self.seconds[name] * 1000:.0f} ms" for name in STAGES if self.items[name])
+        return f"{stages}; {self.persist.summary()}" if self.persist.rows else stages
+
+
+def hash_item(item: IngestItem) -> IngestItem:
+    """
+    Stat and hash a single item.
+
+    Files on disk are stat'ed first (unless the directory walk already did),
+    so a write during the import invalidates their manifest entry. Content
+    already in memory is hashed in place.
+    """
+    try:
+        if item.content is not None:
+            item.file_hash = calculate_buffer_hash(item.content)
+        else:
+            if item.signature is None:
+                item.signature = file_signature(item.file_path)
+            item.file_hash = calculate_file_hash(item.file_path)
+    except (OSError, CorruptFileError) as e:
+        item.error = str(e)
+    return item
+
+
+def hash_stage(items: List[IngestItem], stats: Optional[IngestStats] = None, jobs: int = 1) -> List[IngestItem]:
+    """
+    Hash items, with ``jobs`` threads.
+
+    hashlib releases the GIL on large buffers, so threads overlap reads and
+    hashing.
+
+    Returns:
+        The same items with ``file_hash`` (or ``error``) set
+    """
+    stats = stats or IngestStats()
+    with stats.stage("hash", len(items)):
+        if jobs > 1 and len(items) > 1:
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                list(executor.map(hash_item, items))
+        else:
+            for item in items:
+                hash_item(item)
+    return items
+
+
+def dedupe_stage(
+    session, items: List[IngestItem], stats: Optional[IngestStats] = None
+) -> Tuple[List[IngestItem], List[IngestItem]]:
+    """
+    Split hashed items into new ones and duplicates.
+
+    All hashes are resolved against existing activities in chunked ``IN``
+    queries. Repeats of a hash within ``items`` are duplicates of its first
+    occurrence. Items whose hashing failed are dropped; callers report them
+    from ``item.error``.
+
+    Returns:
+        (new, duplicates); duplicates have ``reason`` set to 'duplicate'
+    """
+    stats = stats or IngestStats()
+    new, duplicates = [], []
+    with stats.stage("dedupe", len(items)):
+        known = find_existing_hashes(session, (item.file_hash for item in items if not item.error))
+        for item in items:
+            if item.error:
+                continue
+            if item.file_hash in known:
+                item.reason = "duplicate"
+                duplicates.append(item)
+            else:
+                known.add(item.file_hash)
+                new.append(item)
+    return new, duplicates
+
+
+def drop_known_failures(
+    session, items: List[IngestItem], stats: Optional[IngestStats] = None
+) -> Tuple[List[IngestItem], List[IngestItem]]:
+    """
+    Split hashed items into those to parse and those the current parser version already rejected.
+
+    Timed as part of the dedupe stage.
+
+    Returns:
+        (to_parse, failed); failed items carry the recorded 'parse_error: ...' reason
+    """
+    stats = stats or IngestStats()
+    to_parse, failed = [], []
+    with stats.stage("dedupe", 0):
+        failures = find_parse_failures(session, (item.file_hash for item in items if not item.error))
+        for item in items:
+            reason = failures.get(item.file_hash)
+            if reason is None:
+                to_parse.append(item)
+            else:
+                item.reason = f"parse_error: {reason}"
+                item.known_failure = True
+                failed.append(item)
+    return to_parse, failed
+
+
+def parse_item(item: IngestItem, cache: Optional[ParsedActivityCache] = None) -> IngestItem:
+    """
+    Parse a single item without touching the database.
+
+    Runs inside parser worker processes, so everything on the item must be
+    picklable. Derived metrics are left to the derive stage.
+
+    Args:
+        item: Hashed item
+        cache: Optional parsed-activity cache; a hit skips the parser and
+            a fresh parse is stored for next time. A hit on a summary-only
+            item yields the full activity; summary-only parses are not stored.
+    """
+    if item.error:
+        return item
+
+    start = time.perf_counter()
+    if cache is not None and item.file_hash:
+        item.activity_data = cache.load(item.file_hash)
+        if item.activity_data is not None:
+            item.cached = True
+            item.content = None
+            item.parse_seconds = time.perf_counter() - start
+            return item
+
+    try:
+        if item.content is not None:
+            item.activity_data = ActivityParser.parse_activity_buffer(
+                item.content, item.file_path.name, derive=False, summary_only=item.summary_only
+            )
+        else:
+            item.activity_data = ActivityParser.parse_activity_file(
+                item.file_path, derive=False, summary_only=item.summary_only
+            )
+    except (FileNotSupportedError, CorruptFileError) as e:
+        item.reason = f"parse_error: {e}"
+    except Exception as e:
+        item.error = str(e)
+    else:
+        if not item.activity_data:
+            item.activity_data = None
+            item.reason = "no_data"
+        elif cache is not None and item.file_hash and not item.activity_data.summary_only:
+            cache.store(item.file_hash, item.activity_data)
+    # Parsed; drop in-memory contents so items sent back from worker processes stay small
+    item.content = None
+    item.parse_seconds = time.perf_counter() - start
+    return item
+
+
+def parse_stage(
+    items: List[IngestItem], stats: Optional[IngestStats] = None, cache: Optional[ParsedActivityCache] = None
+) -> List[IngestItem]:
+    """Parse items in this process, reading and filling ``cache`` if given; returns the same items."""
+    stats = stats or IngestStats()
+    for item in items:
+        parse_item(item, cache)
+        stats.record_parse(item)
+    return items
+
+
+def derive_stage(items: List[IngestItem], stats: Optional[IngestStats] = None) -> List[IngestItem]:
+    """
+    Fill derived metrics and build the Activity row of every parsed item.
+
+    Items that already carry an Activity (e.g. one built from a Garmin
+    Connect summary) only get their parsed data's metrics derived.
+    """
+    stats = stats or IngestStats()
+    parsed = [item for item in items if item.activity_data is not None]
+    with stats.stage("derive", len(parsed)):
+        for item in parsed:
+            ActivityParser._derive_metrics(item.activity_data)
+            if item.activity is None:
+                item.activity = build_activity(
+                    item.activity_data,
+                    file_hash=item.file_hash,
+                    source=item.source,
+                    file_path=str(item.file_path),
+                    default_external_id=item.file_path.stem,
+                )
+    return items
+
+
+def persist_stage(session, items: List[IngestItem], stats: Optional[IngestStats] = None) -> List[ImportResult]:
+    """
+    Add derived items to the session and record their manifest entries and parse failures.
+
+    The caller owns the transaction, so several items can share one commit.
+    Items without an Activity produce a non-imported result carrying their
+    ``reason``; new parse errors are added to the ParseFailure negative cache.
+    An activity that collides with a stored one on its file hash or Garmin
+    activity ID is a 'duplicate' carrying the stored activity's ID, unless
+    the item is marked ``replace``. So is the same workout stored from
+    another source (ingest/duplicates.py), unless the stored copy has no
+    source file and this one does; it is then overwritten in place.
+
+    Returns:
+        One ImportResult per item, in order
+    """
+    stats = stats or IngestStats()
+    results = []
+    with stats.stage("persist", len(items)), stats.persist.timer():
+        for item in items:
+            if item.activity is None:
+                result = ImportResult(imported=False, reason=item.reason or "no_data")
+                if item.file_hash and not item.known_failure and result.reason.startswith("parse_error: "):
+                    record_parse_failure(session, item.file_hash, result.reason.partition(": ")[2], str(item.file_path))
+            else:
+                result = persist_item(session, item, stats)
+            record_manifest(session, item, result)
+            results.append(result)
+        # Contents that parse now (e.g. retried with --retry-failed) are no longer failures
+        clear_parse_failures(
+            session, (item.file_hash for item in items if item.activity is not None and item.file_hash)
+        )
+    return results
+
+
+def persist_item(session, item: IngestItem, stats: IngestStats) -> ImportResult:
+    """Store a derived item's activity; see persist_stage. ``item.activity`` is cleared if it was not stored."""
+    match = None if item.replace else find_matching_activity(session, item.activity)
+    if match is not None and (match.file_hash or item.activity_data is None):
+        # The same workout from another source, already stored with its samples
+        adopt_keys(session, match.id, item.activity)
+        item.activity = None
+        return ImportResult(imported=False, reason="duplicate", activity_id=match.id)
+
+    replace_id = match.id if match is not None else None
+    activity = persist_activity(session, item.activity, item.activity_data, stats.persist, item.replace, replace_id)
+    if activity is None:
+        existing_id = find_conflicting_activity(session, item.activity)
+        item.activity = None
+        return ImportResult(imported=False, reason="duplicate", activity_id=existing_id)
+    return ImportResult(imported=True, activity_id=activity.id)
+
+
+def record_manifest(session, item: IngestItem, result: ImportResult) -> ImportResult:
+    """Store the outcome of a file on disk in the import manifest; uploads have no manifest entry."""
+    if item.signature is not None:
+        outcome, _, detail = ("imported" if result.imported else result.reason).partition(": ")
+        record_file_outcome(session, item.signature, item.file_hash, outcome, detail or None, result.activity_id)
+    return result
+
+
+def ingest_item(
+    item: IngestItem, force_reimport: bool = False, stats: Optional[IngestStats] = None, retry_failed: bool = False
+) -> ImportResult:
+    """
+    Run every stage for one item; the writes go through the database writer thread.
+
+    A file on disk is stat'ed for the manifest, then mapped once; hashing
+    and parsing both read that mapping. Duplicates are not looked up
+    first; the conflict-ignoring insert reports them. Parsing and deriving
+    run before the write transaction starts, so it only holds the write
+    lock for the inserts.
+
+    Args:
+        item: Item to ingest
+        force_reimport: Replace the activity stored from the same contents, if any
+        stats: Optional IngestStats updated with stage timings
+        retry_failed: Parse contents the current parser version already rejected
+
+    Returns:
+        ImportResult indicating success/failure
+
+    Raises:
+        CorruptFileError: If the file cannot be read
+    """
+    stats = stats or IngestStats()
+    if item.content is None:
+        try:
+            item.signature = file_signature(item.file_path)
+        except OSError as e:
+            raise CorruptFileError(f"Cannot read file {item.file_path}: {e}") from e
+        with map_file(item.file_path) as data:
+            item.content = data
+            try:
+                return ingest_item(item, force_reimport, stats, retry_failed)
+            finally:
+                item.content = None
+
+    hash_stage([item], stats)
+    if item.error:
+        raise CorruptFileError(item.error)
+
+    # No duplicate lookup: the activity insert skips a stored hash (see persist_stage)
+    item.replace = force_reimport
+    if not retry_failed:
+        with session_scope() as session:
+            _, failed = drop_known_failures(session, [item], stats)
+        if failed:
+            result = ImportResult(imported=False, reason=item.reason)
+            return run_write(lambda session: record_manifest(session, item, result))
+
+    parse_stage([item], stats)
+    if item.error:
+        raise RuntimeError(item.error)
+    derive_stage([item], stats)
+    return run_write(lambda session: persist_stage(session, [item], stats)[0])
+
+
+def ingest_file(file_path: Path, force_reimport: bool = False, stats: Optional[IngestStats] = None) -> ImportResult:
+    """Ingest one activity file from disk; see ingest_item."""
+    return ingest_item(IngestItem(file_path=Path(file_path)), force_reimport, stats)
+
+
+def ingest_content(
+    filename: str, content: bytes, force_reimport: bool = False, stats: Optional[IngestStats] = None
+) -> ImportResult:
+    """Ingest an uploaded activity file from its bytes; see ingest_item."""
+    return ingest_item(IngestItem(file_path=Path(filename), content=content), force_reimport, stats)
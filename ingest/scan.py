@@ -0,0 +1,67 @@
+"""
+Single-pass discovery of activity files.
+
+The tree is walked once with ``os.scandir``. Extensions are matched
+case-insensitively, and each file's size and mtime come from the same
+pass, so the import manifest check needs no further stat calls. Files are
+yielded as they are found, which lets the import start before a walk of
+a slow network mount has finished.
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+from ingest.manifest import FileSignature
+from ingest.parser import SUPPORTED_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+
+class ScannedFile(NamedTuple):
+    """An activity file found by the walk, with the signature stat'ed during it."""
+
+    path: Path
+    signature: FileSignature
+
+
+def is_activity_file(name: str) -> bool:
+    """Whether a file name has a supported activity extension (case-insensitive)."""
+    return os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS
+
+
+def iter_activity_entries(root: Path) -> Iterator[os.DirEntry]:
+    """Walk ``root`` with os.scandir, yielding DirEntry objects for activity files."""
+    stack = [os.fspath(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file() and is_activity_file(entry.name):
+                            yield entry
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.debug(f"Cannot scan directory: {e}")
+
+
+def walk_activity_files(root: Path) -> Iterator[ScannedFile]:
+    """
+    Yield the activity files under ``root`` with their manifest signatures, as they are found.
+
+    Args:
+        root: Directory to walk
+
+    Yields:
+        ScannedFile objects in walk order; files that vanish mid-walk are skipped
+    """
+    for entry in iter_activity_entries(root):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        yield ScannedFile(Path(entry.path), FileSignature(os.path.abspath(entry.path), stat.st_size, stat.st_mtime_ns))
@@ -0,0 +1,379 @@
+"""
+Streaming GPX and TCX parsers.
+
+Both formats are read with ``xml.etree.ElementTree.iterparse``: each track
+point is turned into a sample as soon as its closing tag is seen and the
+element is then discarded, so no document tree is ever held in memory.
+Distance, elapsed time and heart-rate statistics are accumulated on the
+fly. Peak memory is therefore set by the compact sample columns rather than
+by the size of the XML.
+"""
+
+from datetime import datetime, timezone
+import math
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Union
+import xml.etree.ElementTree as ET
+
+from app.data.models import ActivityData, LapData, SampleArraysBuilder
+
+XmlSource = Union[str, Path, BinaryIO]
+
+# Same constants as gpxpy.geo, so GPX distances match what gpxpy reported
+EARTH_RADIUS_M = 6378137.0
+ONE_DEGREE_M = 2 * math.pi * EARTH_RADIUS_M / 360
+
+
+def _local_name(tag: str) -> str:
+    """Strip the ``{namespace}`` prefix ElementTree puts on tags."""
+    return tag.rpartition("}")[2]
+
+
+def _parse_time(text: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO 8601 timestamp; naive values are taken as UTC."""
+    if not text:
+        return None
+    try:
+        value = datetime.fromisoformat(text.strip())
+    except ValueError:
+        return None
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def _parse_float(text: Optional[str]) -> Optional[float]:
+    if text is None:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _parse_int(text: Optional[str]) -> Optional[int]:
+    value = _parse_float(text)
+    return int(value) if value is not None else None
+
+
+def distance_2d(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Distance in metres between two points, as computed by gpxpy.
+
+    Nearby points use an equirectangular approximation; points more than
+    0.2 degrees apart use the haversine formula.
+
+    Args:
+        lat1: Latitude of the first point in degrees
+        lon1: Longitude of the first point in degrees
+        lat2: Latitude of the second point in degrees
+        lon2: Longitude of the second point in degrees
+
+    Returns:
+        Distance in metres
+    """
+    if abs(lat1 - lat2) > 0.2 or abs(lon1 - lon2) > 0.2:
+        d_lon = math.radians(lon1 - lon2)
+        rlat1 = math.radians(lat1)
+        rlat2 = math.radians(lat2)
+        a = math.sin((rlat1 - rlat2) / 2) ** 2 + math.sin(d_lon / 2) ** 2 * math.cos(rlat1) * math.cos(rlat2)
+        return EARTH_RADIUS_M * 2 * math.asin(math.sqrt(a))
+
+    x = lat1 - lat2
+    y = (lon1 - lon2) * math.cos(math.radians(lat1))
+    return math.sqrt(x * x + y * y) * ONE_DEGREE_M
+
+
+class _HeartRateStats:
+    """Running heart-rate statistics kept as a histogram, so memory stays bounded."""
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.n = 0
+
+    def add(self, heart_rate: Optional[int]):
+        if heart_rate is None:
+            return
+        self.counts[heart_rate] = self.counts.get(heart_rate, 0) + 1
+        self.total += heart_rate
+        self.n += 1
+
+    @property
+    def average(self) -> Optional[int]:
+        return int(self.total / self.n) if self.n else None
+
+    @property
+    def maximum(self) -> Optional[int]:
+        return max(self.counts) if self.counts else None
+
+    def percent_in_zones(self, zones: Dict[str, tuple]) -> Dict[str, int]:
+        """Percentage of heart-rate readings inside each inclusive (low, high) zone."""
+        per_zone = dict.fromkeys(zones, 0)
+        for heart_rate, count in self.counts.items():
+            for name, (low, high) in zones.items():
+                if low <= heart_rate <= high:
+                    per_zone[name] += count
+        return {name: round(100 * count / self.n) for name, count in per_zone.items()}
+
+
+def parse_gpx_stream(source: XmlSource, external_id: str, samples_wanted: bool = True) -> ActivityData:
+    """
+    Parse a GPX document incrementally.
+
+    Track points (``trkpt``) become samples; routes and waypoints are
+    ignored. Distance is summed within each track segment. Heart rate,
+    cadence, temperature and power are read from track point extensions
+    (Garmin TrackPointExtension and the common ``power`` element) when
+    present.
+
+    Args:
+        source: Path or binary file object of the GPX document
+        external_id: External ID for the activity
+        samples_wanted: Keep samples; when False only the summary values
+            are accumulated and the result is marked ``summary_only``
+
+    Returns:
+        ActivityData with samples and route points
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the document is not well-formed
+    """
+    activity_data = ActivityData(external_id=external_id, sport="unknown", start_time_utc=None, distance_m=None)
+    samples = SampleArraysBuilder()
+    point_count = 0
+    first_time = last_time = None
+    seen_first_point = False
+    has_track = False
+    distance = 0.0
+    previous = None  # (lat, lon) of the previous point in the current segment
+    segment = None
+    point = None  # text of the current trkpt's child elements
+
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        name = _local_name(element.tag)
+        if event == "start":
+            if name == "trkseg":
+                segment = element
+                previous = None
+            elif name == "trk":
+                has_track = True
+            elif name == "trkpt":
+                point = {}
+            continue
+
+        if name == "trkpt":
+            timestamp = _parse_time(point.get("time"))
+            lat = _parse_float(element.get("lat"))
+            lon = _parse_float(element.get("lon"))
+            if not seen_first_point:
+                seen_first_point = True
+                first_time = timestamp
+                activity_data.start_time_utc = timestamp
+            last_time = timestamp
+
+            if lat is not None and lon is not None:
+                if previous is not None:
+                    distance += distance_2d(previous[0], previous[1], lat, lon)
+                previous = (lat, lon)
+
+            point_count += 1
+            if samples_wanted:
+                elapsed_time_s = 0
+                if timestamp and first_time:
+                    elapsed_time_s = int((timestamp - first_time).total_seconds())
+
+                samples.append(
+                    timestamp,
+                    elapsed_time_s=elapsed_time_s,
+                    latitude=lat,
+                    longitude=lon,
+                    altitude_m=_parse_float(point.get("ele")),
+                    heart_rate=_parse_int(point.get("hr")),
+                    cadence_rpm=_parse_int(point.get("cad")),
+                    temperature_c=_parse_float(point.get("atemp")),
+                    power_w=_parse_float(point.get("power")),
+                )
+            point = None
+            # Drop the finished point (and anything before it) from the tree
+            if segment is not None:
+                segment.clear()
+        elif point is not None and name in ("time", "ele", "hr", "cad", "atemp", "power"):
+            point.setdefault(name, element.text)
+
+    if has_track:
+        activity_data.distance_m = distance
+        if point_count > 1 and first_time and last_time:
+            activity_data.elapsed_time_s = int((last_time - first_time).total_seconds())
+
+    activity_data.samples = samples.build()
+    activity_data.route_points = activity_data.samples.route_points()
+    activity_data.summary_only = not samples_wanted
+    return activity_data
+
+
+# Trackpoint child elements whose text is collected, by local name
+_TCX_POINT_VALUES = frozenset(
+    {
+        "Time",
+        "LatitudeDegrees",
+        "LongitudeDegrees",
+        "AltitudeMeters",
+        "DistanceMeters",
+        "Cadence",
+        "RunCadence",
+        "Speed",
+        "Watts",
+    }
+)
+
+
+def parse_tcx_stream(source: XmlSource, external_id: str, samples_wanted: bool = True) -> ActivityData:
+    """
+    Parse a TCX document incrementally.
+
+    Only the first ``Activity`` is read. Summary values follow tcxparser's
+    definitions: duration and calories are summed over laps, distance is the
+    last trackpoint's cumulative distance, and the heart-rate average,
+    maximum and zone percentages come from the trackpoint readings.
+
+    Args:
+        source: Path or binary file object of the TCX document
+        external_id: External ID for the activity
+        samples_wanted: Keep samples; when False only the summary values
+            and laps are kept and the result is marked ``summary_only``
+
+    Returns:
+        ActivityData with samples, route points and laps
+
+    Raises:
+        xml.etree.ElementTree.ParseError: If the document is not well-formed
+    """
+    activity_data = ActivityData(external_id=external_id, sport="unknown")
+    samples = SampleArraysBuilder()
+    heart_rates = _HeartRateStats()
+    laps = []
+    duration = 0.0
+    calories = 0
+    distance = None
+    first_time = None
+    point_index = 0
+
+    activity_depth = 0  # > 0 while inside the first Activity
+    activities_seen = 0
+    track = None
+    point = None
+    lap = None
+    path = []
+
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        name = _local_name(element.tag)
+        if event == "start":
+            path.append(name)
+            if name == "Activity":
+                activities_seen += 1
+                if activities_seen == 1:
+                    activity_depth = len(path)
+                    activity_data.sport = (element.get("Sport") or "unknown").lower()
+            elif not activity_depth:
+                continue
+            elif name == "Lap":
+                lap = {"StartTime": element.get("StartTime")}
+            elif name == "Track":
+                track = element
+            elif name == "Trackpoint":
+                point = {}
+            continue
+
+        path.pop()
+        if not activity_depth:
+            continue
+
+        parent = path[-1] if path else None
+        if name == "Trackpoint":
+            timestamp = _parse_time(point.get("Time"))
+            if first_time is None:
+                first_time = timestamp
+            heart_rate = _parse_int(point.get("HeartRate"))
+            heart_rates.add(heart_rate)
+            if point.get("DistanceMeters") is not None:
+                distance = _parse_float(point["DistanceMeters"])
+
+            elapsed_time_s = point_index
+            if timestamp and first_time:
+                elapsed_time_s = int((timestamp - first_time).total_seconds())
+
+            if samples_wanted:
+                cadence = point.get("Cadence") or point.get("RunCadence")
+                samples.append(
+                    timestamp,
+                    elapsed_time_s=elapsed_time_s,
+                    latitude=_parse_float(point.get("LatitudeDegrees")),
+                    longitude=_parse_float(point.get("LongitudeDegrees")),
+                    altitude_m=_parse_float(point.get("AltitudeMeters")),
+                    heart_rate=heart_rate,
+                    cadence_rpm=_parse_int(cadence),
+                    speed_mps=_parse_float(point.get("Speed")),
+                    power_w=_parse_float(point.get("Watts")),
+                )
+            point_index += 1
+            point = None
+            if track is not None:
+                track.clear()
+        elif point is not None:
+            if name == "Value" and parent == "HeartRateBpm":
+                point["HeartRate"] = element.text
+            elif name in _TCX_POINT_VALUES:
+                point.setdefault(name, element.text)
+        elif name == "Lap" and lap is not None:
+            laps.append(_tcx_lap(len(laps), lap))
+            duration += _parse_float(lap.get("TotalTimeSeconds")) or 0.0
+            calories += _parse_int(lap.get("Calories")) or 0
+            lap = None
+            element.clear()
+        elif lap is not None and parent == "Lap":
+            # setdefault keeps heart-rate values stored by their Value child below
+            lap.setdefault(name, element.text)
+        elif lap is not None and name == "Value" and parent in ("AverageHeartRateBpm", "MaximumHeartRateBpm"):
+            lap[parent] = element.text
+        elif name == "Activity":
+            activity_depth = 0
+
+    if laps:
+        activity_data.start_time_utc = laps[0].start_time_utc
+        activity_data.elapsed_time_s = int(duration) if duration else None
+        activity_data.calories = calories or None
+    activity_data.distance_m = distance if distance is not None else sum(lap.distance_m or 0 for lap in laps) or None
+    activity_data.avg_hr = heart_rates.average
+    activity_data.max_hr = heart_rates.maximum
+    if heart_rates.maximum:
+        hr_max = heart_rates.maximum
+        activity_data.hr_zones = heart_rates.percent_in_zones(
+            {
+                "Z1": (0, int(hr_max * 0.7)),
+                "Z2": (int(hr_max * 0.7), int(hr_max * 0.8)),
+                "Z3": (int(hr_max * 0.8), int(hr_max * 0.9)),
+                "Z4": (int(hr_max * 0.9), int(hr_max * 0.95)),
+                "Z5": (int(hr_max * 0.95), int(hr_max * 1.1)),
+            }
+        )
+
+    activity_data.samples = samples.build()
+    activity_data.route_points = activity_data.samples.route_points()
+    activity_data.laps = laps
+    activity_data.summary_only = not samples_wanted
+    return activity_data
+
+
+def _tcx_lap(lap_index: int, values: Dict[str, Optional[str]]) -> LapData:
+    """Build LapData from the text values collected for one TCX ``Lap``."""
+    elapsed = _parse_float(values.get("TotalTimeSeconds"))
+    distance = _parse_float(values.get("DistanceMeters"))
+    avg_speed = distance / elapsed if distance and elapsed else None
+    return LapData(
+        lap_index=lap_index,
+        start_time_utc=_parse_time(values.get("StartTime")),
+        elapsed_time_s=elapsed,
+        distance_m=distance,
+        avg_speed_mps=avg_speed,
+        avg_hr=_parse_int(values.get("AverageHeartRateBpm")),
+        max_hr=_parse_int(values.get("MaximumHeartRateBpm")),
+    )
@@ -0,0 +1,192 @@
+"""
+Directory watchers for incremental imports.
+
+Two implementations share one interface, ``changes(timeout)``, which
+returns activity files that are new or were modified and have finished
+being written:
+
+* InotifyWatcher reacts to CLOSE_WRITE/MOVED_TO events through the optional
+  ``inotify_simple`` package (Linux only).
+* PollingWatcher walks the tree with ``os.scandir`` (ingest/scan.py) and
+  compares size and mtime with the previous walk. A file is reported only
+  once it has stopped changing between two walks, so half-synced files are
+  not imported early.
+
+``open_watcher`` picks inotify when it is available.
+"""
+
+import logging
+import os
+from pathlib import Path
+import time
+from typing import Dict, List, Optional, Tuple
+
+from ingest.scan import is_activity_file, iter_activity_entries
+
+try:
+    from inotify_simple import INotify, flags
+
+    INOTIFY_AVAILABLE = True
+except ImportError:
+    INOTIFY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL_S = 5.0
+
+
+class PollingWatcher:
+    """
+    Detect new and modified activity files by periodically re-walking the tree.
+
+    Args:
+        root: Directory to watch
+        interval: Seconds between walks
+        report_existing: Report files already present on the first walk
+    """
+
+    def __init__(self, root: Path, interval: float = DEFAULT_POLL_INTERVAL_S, report_existing: bool = False):
+        self.root = Path(root)
+        self.interval = interval
+        self._settled: Dict[str, Tuple[int, int]] = {}
+        self._pending: Dict[str, Tuple[int, int]] = {}
+        self._next_walk = 0.0
+        if not report_existing:
+            self._settled = self._walk()
+
+    def _walk(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for entry in iter_activity_entries(self.root):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def changes(self, timeout: Optional[float] = None) -> List[Path]:
+        """
+        Wait for the next walk and return the files that changed and have settled.
+
+        Args:
+            timeout: Maximum seconds to wait; defaults to the poll interval
+
+        Returns:
+            Paths of new or modified files, possibly empty
+        """
+        wait = self._next_walk - time.monotonic()
+        if wait > 0:
+            time.sleep(wait if timeout is None else min(wait, timeout))
+            if time.monotonic() < self._next_walk:
+                return []
+        self._next_walk = time.monotonic() + self.interval
+
+        changed = []
+        pending = {}
+        snapshot = self._walk()
+        # Forget deleted files, so a file restored with the same size and mtime is seen again
+        self._settled = {path: signature for path, signature in self._settled.items() if path in snapshot}
+        for path, signature in snapshot.items():
+            if self._settled.get(path) == signature:
+                continue
+            if self._pending.get(path) == signature:
+                # Unchanged since the previous walk: the writer has finished
+                self._settled[path] = signature
+                changed.append(Path(path))
+            else:
+                pending[path] = signature
+        self._pending = pending
+        return sorted(changed)
+
+    def close(self):
+        """Polling holds no resources; present for interface parity."""
+
+
+class InotifyWatcher:
+    """
+    Detect finished writes and moves into the tree with inotify.
+
+    New subdirectories are watched as they appear and scanned once, since
+    files can land in them before the watch is added.
+
+    Args:
+        root: Directory to watch
+    """
+
+    def __init__(self, root: Path):
+        if not INOTIFY_AVAILABLE:
+            raise RuntimeError("inotify_simple is not installed")
+        self.root = Path(root)
+        self._mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE | flags.ONLYDIR
+        self._inotify = INotify()
+        self._directories: Dict[int, str] = {}
+        self._add_tree(os.fspath(self.root))
+
+    def _add_tree(self, directory: str) -> List[Path]:
+        """Watch ``directory`` and its subdirectories; return activity files already inside them."""
+        found = []
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            try:
+                self._directories[self._inotify.add_watch(current, self._mask)] = current
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file() and is_activity_file(entry.name):
+                            found.append(Path(entry.path))
+            except OSError as e:
+                logger.debug(f"Cannot watch {current}: {e}")
+        return found
+
+    def changes(self, timeout: Optional[float] = DEFAULT_POLL_INTERVAL_S) -> List[Path]:
+        """
+        Wait up to ``timeout`` seconds for events and return the files that were written or moved in.
+
+        Args:
+            timeout: Maximum seconds to wait, None to block
+
+        Returns:
+            Paths of new or modified files, possibly empty
+        """
+        timeout_ms = None if timeout is None else int(timeout * 1000)
+        changed = set()
+        for event in self._inotify.read(timeout=timeout_ms, read_delay=50):
+            directory = self._directories.get(event.wd)
+            if directory is None or not event.name:
+                continue
+            path = os.path.join(directory, event.name)
+            if event.mask & flags.ISDIR:
+                if event.mask & (flags.CREATE | flags.MOVED_TO):
+                    changed.update(self._add_tree(path))
+            elif event.mask & (flags.CLOSE_WRITE | flags.MOVED_TO) and is_activity_file(event.name):
+                changed.add(Path(path))
+        return sorted(changed)
+
+    def close(self):
+        """Stop watching and release the inotify file descriptor."""
+        self._inotify.close()
+
+
+def open_watcher(root: Path, interval: float = DEFAULT_POLL_INTERVAL_S, use_inotify: Optional[bool] = None):
+    """
+    Create the best available watcher for ``root``.
+
+    Args:
+        root: Directory to watch
+        interval: Poll interval for the scandir fallback
+        use_inotify: Force (True) or disable (False) inotify; None picks it when available
+
+    Returns:
+        InotifyWatcher or PollingWatcher
+    """
+    if use_inotify is None:
+        use_inotify = INOTIFY_AVAILABLE
+    if use_inotify:
+        try:
+            return InotifyWatcher(root)
+        except OSError as e:
+            # e.g. the per-user watch limit is exhausted
+            logger.warning(f"inotify unavailable ({e}); falling back to polling")
+    return PollingWatcher(root, interval)
@@ -0,0 +1,295 @@
+"""
+Minimal FIT file writer for generating deterministic test activities.
+
+The checked-in files under tests/test_data are empty placeholders, so parser
+tests and benchmarks build real FIT binaries with this module instead. Only
+the subset of the protocol the parsers rely on is implemented: definition and
+data messages, developer fields, compressed timestamp headers and CRCs.
+"""
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import struct
+from typing import List, Optional, Sequence, Tuple
+
+FIT_EPOCH = datetime(1989, 12, 31, tzinfo=timezone.utc)
+
+# Base type id -> (struct format, invalid value)
+BASE_TYPES = {
+    0x00: ("B", 0xFF),  # enum
+    0x01: ("b", 0x7F),  # sint8
+    0x02: ("B", 0xFF),  # uint8
+    0x83: ("h", 0x7FFF),  # sint16
+    0x84: ("H", 0xFFFF),  # uint16
+    0x85: ("i", 0x7FFFFFFF),  # sint32
+    0x86: ("I", 0xFFFFFFFF),  # uint32
+    0x88: ("f", None),  # float32
+    0x8B: ("H", 0x0000),  # uint16z
+    0x8C: ("I", 0x00000000),  # uint32z
+}
+STRING = 0x07
+
+_CRC_TABLE = (
+    0x0000, 0xCC01, 0xD801, 0x1400, 0xF001, 0x3C00, 0x2800, 0xE401,
+    0xA001, 0x6C00, 0x7800, 0xB401, 0x5000, 0x9C01, 0x8801, 0x4400,
+)  # fmt: skip
+
+
+def fit_crc(data: bytes, crc: int = 0) -> int:
+    """Compute the FIT CRC-16 of ``data``."""
+    for byte in data:
+        tmp = _CRC_TABLE[crc & 0xF]
+        crc = ((crc >> 4) & 0x0FFF) ^ tmp ^ _CRC_TABLE[byte & 0xF]
+        tmp = _CRC_TABLE[crc & 0xF]
+        crc = ((crc >> 4) & 0x0FFF) ^ tmp ^ _CRC_TABLE[(byte >> 4) & 0xF]
+    return crc
+
+
+def fit_timestamp(value: datetime) -> int:
+    """Seconds since the FIT epoch for a timezone-aware datetime."""
+    return int((value - FIT_EPOCH).total_seconds())
+
+
+class FitBuilder:
+    """Accumulates FIT messages and serialises them to a complete file."""
+
+    def __init__(self, big_endian: bool = False):
+        self.big_endian = big_endian
+        self._body = bytearray()
+        self._definitions = {}
+
+    def define(
+        self,
+        local_num: int,
+        global_num: int,
+        fields: Sequence[Tuple[int, int]],
+        dev_fields: Sequence[Tuple[int, int, int]] = (),
+        string_sizes: Optional[dict] = None,
+    ):
+        """
+        Write a definition message.
+
+        Args:
+            local_num: Local message type (0-15)
+            global_num: Global message number from the FIT profile
+            fields: (field_def_num, base_type) pairs
+            dev_fields: (field_num, size, developer_data_index) triples
+            string_sizes: Byte size for STRING fields keyed by field_def_num
+        """
+        string_sizes = string_sizes or {}
+        header = 0x40 | local_num | (0x20 if dev_fields else 0)
+        endian = ">" if self.big_endian else "<"
+        self._body += struct.pack(endian + "BBBHB", header, 0, 1 if self.big_endian else 0, global_num, len(fields))
+        layout = []
+        for def_num, base_type in fields:
+            if base_type == STRING:
+                size = string_sizes[def_num]
+            else:
+                size = struct.calcsize(BASE_TYPES[base_type][0])
+            self._body += bytes((def_num, size, base_type))
+            layout.append((base_type, size))
+        if dev_fields:
+            self._body += bytes((len(dev_fields),))
+            for field_num, size, dev_index in dev_fields:
+                self._body += bytes((field_num, size, dev_index))
+        self._definitions[local_num] = (layout, [size for _, size, _ in dev_fields])
+
+    def data(
+        self,
+        local_num: int,
+        values: Sequence,
+        dev_values: Sequence[bytes] = (),
+        time_offset: Optional[int] = None,
+    ):
+        """
+        Write a data message for a previously defined local type.
+
+        ``None`` values are written as the base type's invalid value. With
+        ``time_offset`` the message uses a compressed timestamp header.
+        """
+        layout, dev_sizes = self._definitions[local_num]
+        endian = ">" if self.big_endian else "<"
+        if time_offset is None:
+            self._body += bytes((local_num,))
+        else:
+            self._body += bytes((0x80 | (local_num << 5) | (time_offset & 0x1F),))
+        for (base_type, size), value in zip(layout, values):
+            if base_type == STRING:
+                encoded = (value or "").encode("utf-8")[: size - 1]
+                self._body += encoded + b"\x00" * (size - len(encoded))
+                continue
+            fmt, invalid = BASE_TYPES[base_type]
+            if value is None:
+                if invalid is None:
+                    self._body += b"\xff" * size
+                    continue
+                value = invalid
+            self._body += struct.pack(endian + fmt, value)
+        for size, value in zip(dev_sizes, dev_values):
+            assert len(value) == size
+            self._body += value
+
+    def to_bytes(self) -> bytes:
+        """Serialise header, messages and CRC."""
+        header = struct.pack("<BBHI4s", 14, 0x20, 2132, len(self._body), b".FIT")
+        header += struct.pack("<H", fit_crc(header))
+        content = header + bytes(self._body)
+        return content + struct.pack("<H", fit_crc(content))
+
+
+def build_activity_fit(
+    n_records: int = 600,
+    start: datetime = datetime(2024, 1, 15, 10, 0, 0, tzinfo=timezone.utc),
+    sport: int = 1,
+    running_dynamics: bool = False,
+    developer_fields: bool = False,
+    interleave_events: bool = False,
+    compressed_timestamps: bool = False,
+    big_endian: bool = False,
+    n_laps: int = 2,
+    gps_gap: Optional[Tuple[int, int]] = None,
+) -> bytes:
+    """
+    Build a synthetic activity FIT file.
+
+    Args:
+        n_records: Number of 1 Hz record messages
+        start: Activity start time
+        sport: FIT sport enum (1 = running, 2 = cycling)
+        running_dynamics: Include stance time, vertical oscillation, etc.
+        developer_fields: Include Stryd-style developer fields
+        interleave_events: Write an event message between records every 50 s
+        compressed_timestamps: Use compressed timestamp headers for records
+        big_endian: Write big-endian definition messages
+        n_laps: Number of lap messages
+        gps_gap: (start, stop) record indices written without GPS position
+
+    Returns:
+        Complete FIT file contents
+    """
+    fit = FitBuilder(big_endian=big_endian)
+    start_ts = fit_timestamp(start)
+
+    # file_id: type, manufacturer, product, serial_number, time_created
+    fit.define(0, 0, [(0, 0x00), (1, 0x84), (2, 0x84), (3, 0x8C), (4, 0x86)])
+    fit.data(0, [4, 1, 3121, 3912345678, start_ts])
+
+    dev_fields = []
+    if developer_fields:
+        # developer_data_id: developer_data_index, application_version
+        fit.define(1, 207, [(3, 0x02), (4, 0x86)])
+        fit.data(1, [0, 100])
+        # field_description: developer_data_index, field_definition_number, fit_base_type_id, field_name, units
+        fit.define(
+            2,
+            206,
+            [(0, 0x02), (1, 0x02), (2, 0x02), (3, STRING), (8, STRING)],
+            string_sizes={3: 32, 8: 16},
+        )
+        for field_num, name, base_type, units in (
+            (0, "Air Power", 0x84, "Watts"),
+            (1, "Form Power", 0x84, "Watts"),
+            (2, "Leg Spring Stiffness", 0x88, "KN/m"),
+        ):
+            fit.data(2, [0, field_num, base_type, name, units])
+        dev_fields = [(0, 2, 0), (1, 2, 0), (2, 4, 0)]
+
+    record_fields = [
+        (253, 0x86),  # timestamp
+        (0, 0x85),  # position_lat
+        (1, 0x85),  # position_long
+        (2, 0x84),  # altitude (scale 5, offset 500)
+        (3, 0x02),  # heart_rate
+        (4, 0x02),  # cadence
+        (5, 0x86),  # distance (scale 100)
+        (6, 0x84),  # speed (scale 1000)
+        (7, 0x84),  # power
+        (13, 0x01),  # temperature
+    ]
+    if running_dynamics:
+        record_fields += [
+            (39, 0x84),  # vertical_oscillation (scale 10)
+            (41, 0x84),  # stance_time (scale 10)
+            (83, 0x84),  # vertical_ratio (scale 100)
+            (84, 0x84),  # stance_time_balance (scale 100)
+            (85, 0x84),  # step_length (scale 10)
+        ]
+    if compressed_timestamps:
+        record_fields = record_fields[1:]
+        # A full timestamp anchors the compressed offsets
+        fit.define(4, 20, [(253, 0x86)])
+        fit.data(4, [start_ts - 1])
+    fit.define(3, 20, record_fields, dev_fields=dev_fields)
+    if interleave_events:
+        # event: timestamp, event, event_type, data
+        fit.define(5, 21, [(253, 0x86), (0, 0x00), (1, 0x00), (3, 0x86)])
+
+    semicircle = 2**31 / 180
+    for i in range(n_records):
+        ts = start_ts + i
+        has_gps = not (gps_gap and gps_gap[0] <= i < gps_gap[1])
+        lat = int((52.5 + i * 1e-5) * semicircle) if has_gps else None
+        lon = int((13.4 + i * 1e-5) * semicircle) if has_gps else None
+        values = [
+            ts,
+            lat,
+            lon,
+            int((35.0 + (i % 40) * 0.2 + 500) * 5),
+            None if i % 97 == 5 else 120 + i % 50,
+            80 + i % 10,
+            i * 300,
+            3000 + (i % 20) * 10,
+            200 + i % 60,
+            18 + i % 3,
+        ]
+        if running_dynamics:
+            values += [850 + i % 30, 2400 + i % 50, 780 + i % 40, 5000 + i % 20, 11500 + i % 100]
+        if compressed_timestamps:
+            values = values[1:]
+        dev_values = []
+        if developer_fields:
+            dev_values = [
+                struct.pack("<H", 10 + i % 5),
+                struct.pack("<H", 60 + i % 7),
+                struct.pack("<f", 9.5 + (i % 4) * 0.25),
+            ]
+        fit.data(3, values, dev_values, time_offset=(ts & 0x1F) if compressed_timestamps else None)
+        if interleave_events and i % 50 == 25:
+            fit.data(5, [ts, 0, 0, i])
+
+    # lap: timestamp, start_time, total_elapsed_time, total_timer_time, total_distance,
+    #      avg_speed, avg_heart_rate, max_heart_rate, avg_power, max_power
+    fit.define(6, 19, [(253, 0x86), (2, 0x86), (7, 0x86), (8, 0x86), (9, 0x86), (13, 0x84), (15, 0x02), (16, 0x02), (19, 0x84), (20, 0x84)])
+    lap_length = max(n_records // max(n_laps, 1), 1)
+    for lap in range(n_laps):
+        lap_start = start_ts + lap * lap_length
+        fit.data(6, [lap_start + lap_length, lap_start, lap_length * 1000, lap_length * 1000, lap_length * 300, 3000, 140, 170, 230, 400])
+
+    # session: timestamp, start_time, total_elapsed_time, total_timer_time, total_distance, sport, sub_sport,
+    #          total_calories, avg_heart_rate, max_heart_rate, avg_power, max_power, total_ascent, total_descent
+    fit.define(
+        7,
+        18,
+        [
+            (253, 0x86), (2, 0x86), (7, 0x86), (8, 0x86), (9, 0x86), (5, 0x00), (6, 0x00),
+            (11, 0x84), (16, 0x02), (17, 0x02), (20, 0x84), (21, 0x84), (22, 0x84), (23, 0x84),
+        ],
+    )  # fmt: skip
+    fit.data(
+        7,
+        [start_ts + n_records, start_ts, n_records * 1000, (n_records - 5) * 1000, n_records * 300, sport, 0,
+         750, 145, 175, 230, 410, 120, 118],
+    )  # fmt: skip
+
+    return fit.to_bytes()
+
+
+def write_activity_fit(path: Path, **kwargs) -> Path:
+    """Write :func:`build_activity_fit` output to ``path`` and return the path."""
+    path.write_bytes(build_activity_fit(**kwargs))
+    return path
+
+
+def timestamps_for(n_records: int, start: datetime = datetime(2024, 1, 15, 10, 0, 0)) -> List[datetime]:
+    """Naive UTC timestamps matching the records written by build_activity_fit."""
+    return [start + timedelta(seconds=i) for i in range(n_records)]
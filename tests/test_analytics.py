@@ -0,0 +1,109 @@
+"""
+Tests for the DuckDB cross-activity analytics.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from app.data.analytics import DUCKDB_AVAILABLE, close_analytics, hr_by_pace, query, time_in_hr_zones
+from app.data.db import close_database, init_database, session_scope
+from app.data.models import Activity, ActivityData, SampleArrays
+from app.data.sample_store import read_sample_channels
+from ingest.persist import build_activity, persist_activity
+
+pytestmark = pytest.mark.skipif(not DUCKDB_AVAILABLE, reason="duckdb is not installed")
+
+START = datetime(2024, 6, 1, 7, 0, tzinfo=timezone.utc)
+
+
+def store_run(session, file_hash: str, speed_mps: float, heart_rate: float, sport="running", days=0, n=10):
+    start = START + timedelta(days=days)
+    elapsed = np.arange(n, dtype=np.float64)
+    timestamps = np.datetime64(start.replace(tzinfo=None), "us") + (elapsed * 1e6).astype("timedelta64[us]")
+    hr = np.full(n, heart_rate, dtype=float)
+    hr[-1] = np.nan  # no reading for the last sample
+    activity_data = ActivityData(sport=sport, start_time_utc=start)
+    activity_data.samples = SampleArrays(
+        timestamps, elapsed_time_s=elapsed, speed_mps=np.full(n, speed_mps), heart_rate=hr
+    )
+    activity = build_activity(activity_data, file_hash, "fit", f"{file_hash}.fit", file_hash)
+    persist_activity(session, activity, activity_data)
+
+
+@pytest.fixture(params=["rows", "columnar"])
+def analytics_db(request, tmp_path):
+    db_config = init_database(f"sqlite:///{tmp_path / 'analytics.db'}", sample_store=request.param)
+    with session_scope() as session:
+        store_run(session, "fast", speed_mps=4.0, heart_rate=150)
+        store_run(session, "easy", speed_mps=2.5, heart_rate=130)
+        store_run(session, "old", speed_mps=2.5, heart_rate=140, days=-400)
+        store_run(session, "ride", speed_mps=4.0, heart_rate=100, sport="cycling")
+    yield db_config
+    close_analytics()
+    db_config.engine.dispose()
+    close_database()
+
+
+@pytest.mark.database
+def test_hr_by_pace_aggregates_runs(analytics_db):
+    df = hr_by_pace(start_date=date(2024, 1, 1), bin_s=15)
+
+    # 4.0 m/s is 250 s/km, 2.5 m/s is 400 s/km; the sample without heart rate is left out
+    assert df["pace_s_per_km"].tolist() == [240, 390]
+    assert df["avg_hr"].tolist() == [150, 130]
+    assert df["samples"].tolist() == [9, 9]
+    assert df["activities"].tolist() == [1, 1]
+
+    all_time = hr_by_pace(bin_s=15)
+    assert all_time["avg_hr"].tolist() == [150, 135]
+
+
+@pytest.mark.database
+def test_time_in_hr_zones(analytics_db):
+    df = time_in_hr_zones(zones=(120, 140, 155), sport="running", start_date=date(2024, 1, 1))
+
+    assert df["zone"].tolist() == [2, 3]
+    assert df["minutes"].tolist() == pytest.approx([9 / 60, 9 / 60])
+
+
+@pytest.mark.database
+def test_query_sees_every_activity(analytics_db):
+    df = query("SELECT count(DISTINCT activity_id) AS activities, count(heart_rate) AS readings FROM samples")
+
+    assert df.iloc[0].tolist() == [4, 36]
+
+
+@pytest.mark.database
+def test_filters_apply_before_samples_are_decoded(analytics_db, monkeypatch):
+    decoded = []
+
+    def spy(session, activity_id, channels=None):
+        decoded.append((activity_id, set(channels)))
+        return read_sample_channels(session, activity_id, channels)
+
+    monkeypatch.setattr("app.data.analytics.read_sample_channels", spy)
+    hr_by_pace(start_date=date(2024, 1, 1))
+
+    with session_scope() as session:
+        recent = select(Activity.id).where(Activity.file_hash.in_(["fast", "easy"]))
+        recent_runs = set(session.execute(recent).scalars())
+    expected = recent_runs if analytics_db.sample_store == "columnar" else set()
+    assert {activity_id for activity_id, _ in decoded} == expected
+    assert all(channels == {"heart_rate", "speed_mps"} for _, channels in decoded)
+
+
+@pytest.mark.database
+def test_reads_the_database_through_sqlalchemy_without_the_extension(analytics_db, monkeypatch):
+    expected = hr_by_pace(bin_s=15)
+    close_analytics()
+
+    def unavailable(con, database_url):
+        raise RuntimeError("DuckDB's sqlite extension is not installed and could not be downloaded")
+
+    monkeypatch.setattr("app.data.analytics._attach_database", unavailable)
+
+    assert hr_by_pace(bin_s=15).equals(expected)
+    assert query("SELECT count(*) AS n FROM activities")["n"].tolist() == [4]
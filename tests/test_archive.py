@@ -0,0 +1,93 @@
+"""
+Tests for streaming activity files out of ZIP and tar archives.
+"""
+
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from ingest.archive import is_archive, iter_archive_members, read_archive_member
+
+
+def zip_bytes(members: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def write_tar(path, members: dict, mode: str = "w:gz"):
+    with tarfile.open(path, mode) as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return path
+
+
+def test_is_archive():
+    assert is_archive("export.ZIP")
+    assert is_archive("export.tar.gz")
+    assert not is_archive("run.fit")
+
+
+def test_nested_zip(tmp_path):
+    inner = zip_bytes({"1.fit": b"one", "2.FIT": b"two", "notes.txt": b"skip"})
+    archive_path = tmp_path / "export.zip"
+    archive_path.write_bytes(zip_bytes({"DI_CONNECT/uploads/part1.zip": inner, "root.gpx": b"<gpx/>"}))
+
+    members = list(iter_archive_members(archive_path))
+
+    assert [(member.path, member.data) for member in members] == [
+        ("export.zip/DI_CONNECT/uploads/part1.zip/1.fit", b"one"),
+        ("export.zip/DI_CONNECT/uploads/part1.zip/2.FIT", b"two"),
+        ("export.zip/root.gpx", b"<gpx/>"),
+    ]
+
+
+def test_compressed_tar_with_nested_zip(tmp_path):
+    archive_path = write_tar(
+        tmp_path / "export.tar.gz", {"a/run.tcx": b"<tcx/>", "b/more.zip": zip_bytes({"ride.fit": b"fit"})}
+    )
+
+    members = list(iter_archive_members(archive_path))
+
+    assert [member.path for member in members] == ["export.tar.gz/a/run.tcx", "export.tar.gz/b/more.zip/ride.fit"]
+
+
+def test_in_memory_zip_with_extension_filter():
+    content = zip_bytes({"123_ACTIVITY.fit": b"fit", "123.gpx": b"gpx"})
+
+    members = list(iter_archive_members(content, name="123", extensions=frozenset({".fit"})))
+
+    assert members == [("123/123_ACTIVITY.fit", b"fit")]
+
+
+def test_not_an_archive():
+    with pytest.raises(ValueError):
+        list(iter_archive_members(b"plain bytes", name="x"))
+
+
+def test_corrupt_nested_archive_is_skipped(tmp_path):
+    archive_path = tmp_path / "export.zip"
+    archive_path.write_bytes(zip_bytes({"broken.zip": b"PK not really", "ok.fit": b"fit"}))
+
+    assert [member.path for member in iter_archive_members(archive_path)] == ["export.zip/ok.fit"]
+
+
+@pytest.mark.parametrize("suffix", [".zip", ".tar.gz"])
+def test_read_archive_member(tmp_path, suffix):
+    members = {"a/run.tcx": b"<tcx/>", "b/more.zip": zip_bytes({"DI/ride.fit": b"fit"})}
+    archive_path = tmp_path / f"export{suffix}"
+    if suffix == ".zip":
+        archive_path.write_bytes(zip_bytes(members))
+    else:
+        write_tar(archive_path, members)
+
+    assert read_archive_member(archive_path, "a/run.tcx") == b"<tcx/>"
+    assert read_archive_member(archive_path, "b/more.zip/DI/ride.fit") == b"fit"
+    with pytest.raises(KeyError):
+        read_archive_member(archive_path, "b/more.zip/DI/missing.fit")
@@ -0,0 +1,61 @@
+"""
+Tests for the parsed-activity cache.
+"""
+
+import numpy as np
+import pytest
+
+from ingest.cache import ParsedActivityCache
+from ingest.parser import ActivityParser, calculate_file_hash
+from tests.fit_factory import write_activity_fit
+from tests.test_parser import GPX_DOCUMENT, TCX_DOCUMENT
+
+
+@pytest.fixture(params=["run.fit", "ride.tcx", "ride.gpx"])
+def activity_path(request, tmp_path):
+    path = tmp_path / request.param
+    if path.suffix == ".fit":
+        write_activity_fit(path, n_records=60, gps_gap=(10, 20))
+    else:
+        path.write_text(TCX_DOCUMENT if path.suffix == ".tcx" else GPX_DOCUMENT, encoding="utf-8")
+    return path
+
+
+def test_round_trip(tmp_path, activity_path):
+    cache = ParsedActivityCache(tmp_path / "cache")
+    parsed = ActivityParser.parse_activity_file(activity_path, derive=False)
+    file_hash = calculate_file_hash(activity_path)
+
+    assert cache.load(file_hash) is None
+    cache.store(file_hash, parsed)
+    cached = cache.load(file_hash)
+
+    for name in ("external_id", "sport", "start_time_utc", "elapsed_time_s", "distance_m", "avg_hr", "hr_zones"):
+        assert getattr(cached, name) == getattr(parsed, name)
+    np.testing.assert_array_equal(cached.samples.timestamp, parsed.samples.timestamp)
+    for name, column in parsed.samples.columns.items():
+        np.testing.assert_array_equal(cached.samples.columns[name], column)
+    assert cached.route_points == parsed.route_points
+    assert [vars(lap) for lap in cached.laps] == [vars(lap) for lap in parsed.laps]
+
+
+def test_parser_version_bump_invalidates(tmp_path, monkeypatch):
+    gpx_path = tmp_path / "ride.gpx"
+    gpx_path.write_text(GPX_DOCUMENT, encoding="utf-8")
+    cache = ParsedActivityCache(tmp_path / "cache")
+    cache.store("abc123", ActivityParser.parse_activity_file(gpx_path, derive=False))
+
+    monkeypatch.setattr("ingest.cache.PARSER_VERSION", 999)
+
+    assert cache.load("abc123") is None
+    assert cache.prune() == 1
+    assert [path.name for path in cache.root.iterdir()] == []
+
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = ParsedActivityCache(tmp_path / "cache")
+    path = cache.path_for("abc123")
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"not an npz file")
+
+    assert cache.load("abc123") is None
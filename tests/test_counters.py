@@ -0,0 +1,85 @@
+"""
+Tests for the maintained table row counters.
+"""
+
+import pytest
+
+from app.data.counters import exact_counts, read_counts
+from app.data.db import DatabaseConfig, close_database, get_db_config, init_database, session_scope
+from app.data.models import TableCount
+from ingest.duplicates import remove_duplicate_activities
+from ingest.persist import build_activity, persist_activity
+from tests.test_persist import make_activity_data
+
+
+@pytest.fixture(params=["rows", "columnar"])
+def db(request, tmp_path):
+    db_config = init_database(f"sqlite:///{tmp_path / 'counters.db'}", sample_store=request.param)
+    yield db_config
+    db_config.engine.dispose()
+    close_database()
+
+
+def store(file_hash: str, n_samples: int = 12, replace: bool = False) -> int:
+    activity_data = make_activity_data(n_samples)
+    with session_scope() as session:
+        activity = build_activity(activity_data, file_hash, "fit", f"{file_hash}.fit", file_hash)
+        return persist_activity(session, activity, activity_data, replace=replace).id
+
+
+def assert_counts_exact(expected: dict):
+    with session_scope() as session:
+        assert read_counts(session) == expected
+        assert exact_counts(session) == expected
+
+
+@pytest.mark.database
+def test_counters_follow_inserts_replacements_and_deletes(db):
+    first = store("a")
+    second = store("b")
+    # The route point without a position is not stored
+    assert_counts_exact({"activities": 2, "samples": 24, "route_points": 4, "laps": 4})
+
+    store("a", n_samples=5, replace=True)
+    assert_counts_exact({"activities": 2, "samples": 17, "route_points": 4, "laps": 4})
+
+    with session_scope() as session:
+        remove_duplicate_activities(session, [(second, first)])
+    assert_counts_exact({"activities": 1, "samples": 5, "route_points": 2, "laps": 2})
+
+
+@pytest.mark.database
+def test_rolled_back_import_leaves_counters(db):
+    with pytest.raises(RuntimeError):
+        with session_scope() as session:
+            activity_data = make_activity_data()
+            persist_activity(session, build_activity(activity_data, "a", "fit", "a.fit", "a"), activity_data)
+            raise RuntimeError("import failed")
+
+    assert_counts_exact({"activities": 0, "samples": 0, "route_points": 0, "laps": 0})
+
+
+@pytest.mark.database
+def test_database_info_creates_missing_counters(db):
+    store("a")
+    TableCount.__table__.drop(db.engine)
+    db.engine.dispose()
+
+    # A database stored before the counters, opened without create_all_tables
+    opened = DatabaseConfig(db.database_url, db.sample_store, db.sample_dir)
+    try:
+        assert opened.get_database_info()["activities"] == 1
+    finally:
+        opened.engine.dispose()
+        opened.close_all_sessions()
+
+
+@pytest.mark.database
+def test_database_info_recounts_on_request(db):
+    store("a")
+    with session_scope() as session:
+        session.query(TableCount).filter_by(name="samples").update({"count": 999})
+
+    assert get_db_config().get_database_info()["samples"] == 999
+    assert get_db_config().get_database_info(exact=True)["samples"] == 12
+    assert get_db_config().get_database_info()["samples"] == 12
@@ -0,0 +1,189 @@
+"""
+Tests for cross-source duplicate detection.
+"""
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+from app.data.db import close_database, get_db_config, init_database, session_scope
+from app.data.models import Activity, ImportManifest, Sample, start_bucket
+from ingest.duplicates import dedupe_activities, find_duplicate_activities, sport_family
+from ingest.manifest import FileSignature, record_file_outcome
+from ingest.persist import persist_activity
+from ingest.parser import ActivityParser
+from ingest.pipeline import IngestItem, ingest_file, persist_stage
+from tests.test_gd_import import write_gpx
+
+START = datetime(2024, 3, 10, 7, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def db(tmp_path):
+    db_config = init_database(f"sqlite:///{tmp_path / 'duplicates.db'}")
+    yield db_config
+    db_config.engine.dispose()
+    close_database()
+
+
+def store(
+    session, offset_s=0, distance_m=10000.0, elapsed_time_s=3600, start=START, sport="running", **columns
+) -> int:
+    activity = Activity(
+        sport=sport,
+        start_time_utc=start + timedelta(seconds=offset_s),
+        distance_m=distance_m,
+        elapsed_time_s=elapsed_time_s,
+        **columns,
+    )
+    return persist_activity(session, activity, None).id
+
+
+def test_start_bucket():
+    assert start_bucket(None) is None
+    assert start_bucket(START) == start_bucket(START.replace(tzinfo=None)) == int(START.timestamp()) // 60
+
+
+def test_sport_family():
+    assert sport_family("road_biking") == sport_family("indoor_cycling") == "cycling"
+    assert sport_family("treadmill_running") == sport_family("Running") == "running"
+    assert sport_family("lap_swimming") == "swimming"
+    assert sport_family("strength_training") == "strength_training"
+    assert sport_family(None) == ""
+
+
+@pytest.mark.database
+def test_bulk_dedupe_keeps_the_copy_with_a_file(db):
+    with session_scope() as session:
+        garmin = store(session, 20, 10050.0, 3610, source="garmin_connect", garmin_activity_id="99", name="Long Run")
+        fit = store(session, 0, file_hash="abc", source="fit")
+        other = store(session, 30, distance_m=5000.0, elapsed_time_s=1800, file_hash="def")
+        first = store(session, 86400, distance_m=None, garmin_activity_id="1")
+        second = store(session, 86400 + 70, distance_m=None)
+        store(session, 2 * 86400)
+        # A different sport at the same time, and copies with neither distance nor duration, are kept
+        store(session, 2 * 86400 + 10, sport="cycling")
+        store(session, 3 * 86400, distance_m=None, elapsed_time_s=0)
+        store(session, 3 * 86400 + 10, distance_m=None, elapsed_time_s=0)
+        record_file_outcome(session, FileSignature("/data/run.gpx", 1, 1), None, "imported", None, second)
+
+    with session_scope() as session:
+        assert find_duplicate_activities(session) == [(garmin, fit), (second, first)]
+        results = dedupe_activities(session)
+
+    assert (results.removed, results.groups) == (2, 2)
+    with session_scope() as session:
+        assert session.query(Activity).count() == 7
+        kept = session.get(Activity, fit)
+        assert (kept.garmin_activity_id, kept.name) == ("99", "Long Run")
+        assert session.get(Activity, other) is not None
+        manifest = session.query(ImportManifest).one()
+        assert (manifest.outcome, manifest.activity_id) == ("duplicate", first)
+        assert find_duplicate_activities(session) == []
+
+
+@pytest.mark.database
+def test_bulk_dedupe_matches_garmin_type_keys_across_other_activities(db):
+    with session_scope() as session:
+        ride = store(session, 0, 40000.0, 5400, sport="cycling", file_hash="ride", source="fit")
+        # An unrelated session starting in between must not split the copies apart
+        store(session, 10, None, 1800, sport="strength_training", source="garmin_connect", garmin_activity_id="1")
+        ride_copy = store(session, 20, 40050.0, 5410, sport="road_biking", source="garmin_connect")
+        run = store(session, 86400, 8000.0, 2400, sport="running", file_hash="run", source="fit")
+        run_copy = store(session, 86400 + 5, 8020.0, 2400, sport="treadmill_running", source="garmin_connect")
+        store(session, 2 * 86400, 1500.0, 1800, sport="swimming", file_hash="swim", source="fit")
+        store(session, 2 * 86400 + 5, 1500.0, 1800, sport="trail_running", source="garmin_connect")
+
+        assert find_duplicate_activities(session) == [(ride_copy, ride), (run_copy, run)]
+
+
+@pytest.mark.database
+def test_dry_run_removes_nothing(db):
+    with session_scope() as session:
+        store(session, 0, file_hash="abc")
+        store(session, 10)
+        results = dedupe_activities(session, dry_run=True)
+
+    assert len(results.pairs) == 1 and results.removed == 0
+    with session_scope() as session:
+        assert session.query(Activity).count() == 2
+
+
+@pytest.mark.database
+def test_ingest_skips_a_workout_stored_from_another_source(db, tmp_path):
+    gpx_path = write_gpx(tmp_path / "ride.gpx", day=2)
+    imported = ingest_file(gpx_path)
+    with session_scope() as session:
+        stored = session.get(Activity, imported.activity_id)
+        sport, elapsed_time_s = stored.sport, stored.elapsed_time_s
+    garmin_copy = Activity(
+        source="garmin_connect",
+        garmin_activity_id="123",
+        sport=sport,
+        elapsed_time_s=elapsed_time_s + 5,
+        start_time_utc=datetime(2024, 1, 2, 10, 0, 5, tzinfo=timezone.utc),
+    )
+
+    with session_scope() as session:
+        result = persist_stage(session, [IngestItem(file_path=Path("123.fit"), activity=garmin_copy)])[0]
+
+    assert not result.imported and result.reason == "duplicate"
+    assert result.activity_id == imported.activity_id
+    with session_scope() as session:
+        assert session.query(Activity).one().garmin_activity_id == "123"
+
+
+@pytest.mark.database
+def test_ingest_does_not_match_another_sport_or_unknown_metrics(db, tmp_path):
+    gpx_path = write_gpx(tmp_path / "ride.gpx", day=2)
+    imported = ingest_file(gpx_path)
+    with session_scope() as session:
+        stored = session.get(Activity, imported.activity_id)
+        sport, elapsed_time_s = stored.sport, stored.elapsed_time_s
+    start = datetime(2024, 1, 2, 10, 0, 5, tzinfo=timezone.utc)
+    copies = [
+        Activity(source="garmin_connect", sport="swimming", elapsed_time_s=elapsed_time_s, start_time_utc=start),
+        Activity(source="garmin_connect", sport=sport, start_time_utc=start),
+    ]
+
+    with session_scope() as session:
+        items = [IngestItem(file_path=Path(f"{index}.fit"), activity=copy) for index, copy in enumerate(copies)]
+        results = persist_stage(session, items)
+
+    assert all(result.imported for result in results)
+
+
+@pytest.mark.database
+def test_ingest_fills_a_stored_summary_without_file(db, tmp_path):
+    gpx_path = write_gpx(tmp_path / "ride.gpx", day=2)
+    parsed = ActivityParser.parse_activity_file(gpx_path)
+    with session_scope() as session:
+        summary_id = store(
+            session,
+            distance_m=None,
+            elapsed_time_s=parsed.elapsed_time_s,
+            sport=parsed.sport,
+            start=datetime(2024, 1, 2, 10, 0, tzinfo=timezone.utc),
+            source="garmin_connect",
+            garmin_activity_id="7",
+            name="Ride",
+        )
+
+    result = ingest_file(gpx_path)
+
+    assert result.imported and result.activity_id == summary_id
+    with session_scope() as session:
+        activity = session.query(Activity).one()
+        assert (activity.source, activity.garmin_activity_id, activity.name) == ("gpx", "7", "Ride")
+        assert session.query(Sample).count() == 10
+
+
+@pytest.mark.database
+def test_start_buckets_are_filled_for_old_rows(db):
+    with session_scope() as session:
+        session.add(Activity(sport="running", start_time_utc=START))
+
+    assert get_db_config().fill_start_buckets() == 1
+    with session_scope() as session:
+        assert session.query(Activity).one().start_bucket == start_bucket(START)
@@ -0,0 +1,95 @@
+"""
+Tests for the vectorised FIT decoder fast path.
+
+Every supported file must decode to the same ActivityData as the fitparse
+path; files using features outside the fast path must fall back cleanly.
+"""
+
+import numpy as np
+import pytest
+
+from ingest.fit_fast import FitFastPathUnsupported, decode_fit
+from ingest.parser import ActivityParser
+from tests.fit_factory import build_activity_fit, write_activity_fit
+
+SUMMARY_ATTRIBUTES = (
+    "sport",
+    "sub_sport",
+    "start_time_utc",
+    "elapsed_time_s",
+    "moving_time_s",
+    "distance_m",
+    "avg_hr",
+    "max_hr",
+    "avg_power_w",
+    "max_power_w",
+    "elevation_gain_m",
+    "elevation_loss_m",
+    "calories",
+    "external_id",
+    "avg_speed_mps",
+    "avg_pace_s_per_km",
+)
+
+
+def assert_same_activity(fast, slow):
+    for attribute in SUMMARY_ATTRIBUTES:
+        assert getattr(fast, attribute) == getattr(slow, attribute), attribute
+        assert type(getattr(fast, attribute)) is type(getattr(slow, attribute)), attribute
+
+    assert np.array_equal(fast.samples.timestamp, slow.samples.timestamp)
+    for channel, values in slow.samples.columns.items():
+        assert np.array_equal(fast.samples.columns[channel], values, equal_nan=True), channel
+    assert fast.route_points == slow.route_points
+    assert [vars(lap) for lap in fast.laps] == [vars(lap) for lap in slow.laps]
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"sport": 2, "n_records": 1800},
+        {"running_dynamics": True, "developer_fields": True},
+        {"interleave_events": True, "gps_gap": (40, 90), "n_laps": 3},
+        {"big_endian": True, "running_dynamics": True},
+    ],
+    ids=["basic", "ride", "dynamics", "interleaved", "big_endian"],
+)
+def test_fast_path_matches_fitparse(tmp_path, options):
+    fit_path = write_activity_fit(tmp_path / "activity.fit", **options)
+
+    fast = ActivityParser._decode_fit_fast(fit_path.read_bytes(), fit_path)
+    assert fast is not None
+    ActivityParser._derive_metrics(fast)
+
+    assert_same_activity(fast, ActivityParser.parse_fit_file(fit_path, fast_path=False))
+
+
+def test_decode_fit_reports_messages_in_file_order():
+    decoded = decode_fit(build_activity_fit(n_records=30, n_laps=3))
+
+    assert [name for name, _ in decoded.messages] == ["file_id", "lap", "lap", "lap", "session"]
+    assert decoded.messages[-1][1]["sport"] == "running"
+    assert len(decoded.samples) == 30
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"not a fit file at all",
+        build_activity_fit(n_records=20, compressed_timestamps=True),
+        build_activity_fit(n_records=20)[:-40],
+    ],
+    ids=["empty", "garbage", "compressed_timestamps", "truncated"],
+)
+def test_decode_fit_unsupported(data):
+    with pytest.raises(FitFastPathUnsupported):
+        decode_fit(data)
+
+
+def test_parse_fit_file_falls_back_to_fitparse(tmp_path):
+    fit_path = write_activity_fit(tmp_path / "compressed.fit", n_records=40, compressed_timestamps=True)
+
+    assert ActivityParser._decode_fit_fast(fit_path.read_bytes(), fit_path) is None
+    assert len(ActivityParser.parse_fit_file(fit_path).samples) == 41
@@ -0,0 +1,366 @@
+"""
+Tests for the gd-import CLI import stages.
+
+Uses small generated GPX files and a temporary SQLite database so the
+sequential and multi-process import paths can be compared end to end.
+"""
+
+import os
+from pathlib import Path
+import shutil
+import zipfile
+
+import pytest
+
+from app.data.db import close_database, get_db_config, init_database, session_scope
+from app.data.models import Activity, ParseFailure
+from cli.gd_import import (
+    import_archive_with_progress,
+    import_directory_with_progress,
+    import_files_with_progress,
+    parse_file_for_import,
+    plan_import,
+)
+from ingest.cache import ParsedActivityCache
+from ingest.manifest import record_parse_failure
+from ingest.parser import calculate_file_hash
+
+GPX_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk><name>{name}</name><trkseg>
+{points}
+  </trkseg></trk>
+</gpx>
+"""
+
+
+def write_gpx(path: Path, day: int, n_points: int = 10) -> Path:
+    """Write a small GPX track starting on the given day of January 2024."""
+    points = "\n".join(
+        f'    <trkpt lat="{52.5 + i * 0.0001:.6f}" lon="{13.4 + i * 0.0001:.6f}">'
+        f"<ele>{100 + i}</ele><time>2024-01-{day:02d}T10:00:{i:02d}Z</time></trkpt>"
+        for i in range(n_points)
+    )
+    path.write_text(GPX_TEMPLATE.format(name=path.stem, points=points), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def import_db(tmp_path):
+    """Initialise the global database config against a temporary SQLite file."""
+    db_config = init_database(f"sqlite:///{tmp_path / 'import.db'}")
+    yield db_config
+    db_config.engine.dispose()
+    close_database()
+
+
+@pytest.fixture
+def activity_dir(tmp_path):
+    """Directory with three distinct GPX files, one byte-identical copy and one corrupt file."""
+    data_dir = tmp_path / "activities"
+    data_dir.mkdir()
+    for day in (1, 2, 3):
+        write_gpx(data_dir / f"ride_{day}.gpx", day)
+    shutil.copy(data_dir / "ride_1.gpx", data_dir / "ride_1_copy.gpx")
+    (data_dir / "broken.gpx").write_text("<gpx><trk>", encoding="utf-8")
+    return data_dir
+
+
+class TestParseStage:
+    def test_parse_file_for_import_success(self, activity_dir):
+        parsed = parse_file_for_import(activity_dir / "ride_1.gpx")
+
+        assert parsed.error is None
+        assert parsed.file_hash
+        assert parsed.activity_data is not None
+        assert len(parsed.activity_data.samples) == 10
+
+    def test_parse_file_for_import_corrupt(self, activity_dir):
+        parsed = parse_file_for_import(activity_dir / "broken.gpx")
+
+        assert parsed.activity_data is None
+        assert parsed.reason.startswith("parse_error")
+
+
+@pytest.mark.database
+class TestPlanImport:
+    def test_plan_sorts_files_without_parsing(self, import_db, activity_dir, monkeypatch):
+        import_files_with_progress([activity_dir / "ride_1.gpx"])
+        shutil.copy(activity_dir / "ride_1.gpx", activity_dir / "ride_1_again.gpx")
+
+        def fail(*args, **kwargs):
+            raise AssertionError("file parsed during planning")
+
+        monkeypatch.setattr("ingest.pipeline.ActivityParser.parse_activity_file", fail)
+        plan = plan_import(sorted(activity_dir.glob("*.gpx")))
+
+        assert [item.file_path.name for item in plan.new] == ["broken.gpx", "ride_2.gpx", "ride_3.gpx"]
+        assert sorted(item.file_path.name for item in plan.duplicates) == ["ride_1_again.gpx", "ride_1_copy.gpx"]
+        assert [path.name for path in plan.unchanged] == ["ride_1.gpx"]
+
+    def test_force_plans_every_file_as_new(self, import_db, activity_dir):
+        import_files_with_progress(sorted(activity_dir.glob("*.gpx")))
+
+        plan = plan_import(sorted(activity_dir.glob("*.gpx")), force_reimport=True)
+
+        assert len(plan.new) == 4
+        assert [item.file_path.name for item in plan.failed] == ["broken.gpx"]
+        assert not plan.duplicates and not plan.unchanged
+
+        plan = plan_import(sorted(activity_dir.glob("*.gpx")), force_reimport=True, retry_failed=True)
+
+        assert len(plan.new) == 5
+        assert not plan.failed
+
+
+@pytest.mark.database
+class TestImportFilesWithProgress:
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_import_counts(self, import_db, activity_dir, jobs):
+        files = sorted(activity_dir.glob("*.gpx"))
+
+        results = import_files_with_progress(files, jobs=jobs)
+
+        assert results["imported"] == 3
+        assert results["duplicates"] == 1
+        assert results["skipped"] == 1
+        assert results["errors"] == 0
+
+        db_info = get_db_config().get_database_info()
+        assert db_info["activities"] == 3
+        assert db_info["samples"] == 30
+
+    def test_parallel_reimport_skips_unchanged_files(self, import_db, activity_dir):
+        files = sorted(activity_dir.glob("ride_*.gpx"))
+        import_files_with_progress(files, jobs=2)
+
+        results = import_files_with_progress(files, jobs=2)
+
+        assert results["imported"] == 0
+        assert results["duplicates"] == 0
+        assert results["unchanged"] == 4
+
+
+@pytest.mark.database
+class TestImportManifest:
+    def test_unchanged_files_are_not_read(self, import_db, activity_dir, monkeypatch):
+        files = sorted(activity_dir.glob("*.gpx"))
+        import_files_with_progress(files)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("unchanged file was hashed")
+
+        monkeypatch.setattr("ingest.pipeline.calculate_file_hash", fail)
+        results = import_files_with_progress(files)
+
+        # Parse errors are remembered too, so the broken file is not retried
+        assert results["unchanged"] == 5
+        assert results["errors"] == 0
+
+    def test_modified_file_is_rehashed(self, import_db, activity_dir):
+        files = sorted(activity_dir.glob("*.gpx"))
+        import_files_with_progress(files)
+
+        stat = (activity_dir / "ride_2.gpx").stat()
+        os.utime(activity_dir / "ride_2.gpx", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        write_gpx(activity_dir / "ride_3.gpx", day=4)
+
+        results = import_files_with_progress(files)
+
+        assert results["unchanged"] == 3
+        assert results["duplicates"] == 1
+        assert results["imported"] == 1
+
+    def test_deleted_activity_is_reimported(self, import_db, activity_dir):
+        files = [activity_dir / "ride_1.gpx"]
+        import_files_with_progress(files)
+
+        with session_scope() as session:
+            session.query(Activity).delete()
+
+        results = import_files_with_progress(files)
+
+        assert results["unchanged"] == 0
+        assert results["imported"] == 1
+
+    def test_force_bypasses_manifest(self, import_db, activity_dir):
+        files = [activity_dir / "ride_1.gpx", activity_dir / "broken.gpx"]
+        import_files_with_progress(files)
+
+        results = import_files_with_progress(files, force_reimport=True)
+
+        assert results["unchanged"] == 0
+        assert results["known_failures"] == 1
+        assert results["skipped"] == 0
+
+
+@pytest.mark.database
+class TestImportWriter:
+    def test_failed_batch_is_retried_per_file(self, import_db, activity_dir, monkeypatch):
+        import ingest.pipeline as pipeline
+
+        persist = pipeline.persist_activity
+
+        def persist_or_fail(session, activity, *args, **kwargs):
+            if activity.file_path.endswith("ride_2.gpx"):
+                raise RuntimeError("disk full")
+            return persist(session, activity, *args, **kwargs)
+
+        monkeypatch.setattr(pipeline, "persist_activity", persist_or_fail)
+        results = import_files_with_progress(sorted(activity_dir.glob("ride_*.gpx")))
+
+        assert results["imported"] == 2
+        assert results["skipped"] == 1
+        assert results["stats"].persist.activities == 2
+        assert results["stats"].items["persist"] == 2
+        assert get_db_config().get_database_info()["activities"] == 2
+
+
+@pytest.mark.database
+class TestParseCache:
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_force_reimport_reads_cache(self, import_db, activity_dir, tmp_path, monkeypatch, jobs):
+        cache = ParsedActivityCache(tmp_path / "cache")
+        files = sorted(activity_dir.glob("ride_?.gpx"))
+        first = import_files_with_progress(files, cache=cache)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("cached file parsed again")
+
+        monkeypatch.setattr("ingest.pipeline.ActivityParser.parse_activity_file", fail)
+        results = import_files_with_progress(files, force_reimport=True, jobs=jobs, cache=cache)
+
+        assert first["stats"].cache_hits == 0
+        assert results["imported"] == 3
+        assert results["stats"].cache_hits == 3
+        # Forced imports replace the stored activities in place, with the cached samples
+        info = get_db_config().get_database_info()
+        assert (info["activities"], info["samples"]) == (3, 30)
+
+
+@pytest.mark.database
+class TestParseFailures:
+    def test_copies_of_failed_files_are_not_parsed(self, import_db, activity_dir, monkeypatch):
+        first = import_files_with_progress([activity_dir / "broken.gpx"])
+        shutil.copy(activity_dir / "broken.gpx", activity_dir / "broken_copy.gpx")
+
+        def fail(*args, **kwargs):
+            raise AssertionError("known failure parsed again")
+
+        monkeypatch.setattr("ingest.pipeline.ActivityParser.parse_activity_file", fail)
+        results = import_files_with_progress([activity_dir / "broken.gpx", activity_dir / "broken_copy.gpx"])
+
+        assert first["skipped"] == 1
+        assert [failure["known"] for failure in first["failure_details"]] == [False]
+        assert results["unchanged"] == 1
+        assert results["known_failures"] == 1
+        assert results["failure_details"][0]["file"].endswith("broken_copy.gpx")
+
+    def test_retry_failed_parses_again(self, import_db, activity_dir):
+        files = [activity_dir / "broken.gpx"]
+        import_files_with_progress(files)
+
+        results = import_files_with_progress(files, retry_failed=True)
+
+        assert results["unchanged"] == 0
+        assert results["known_failures"] == 0
+        assert results["skipped"] == 1
+
+    def test_parser_version_bump_retries(self, import_db, activity_dir, monkeypatch):
+        files = [activity_dir / "broken.gpx"]
+        import_files_with_progress(files)
+
+        monkeypatch.setattr("ingest.manifest.PARSER_VERSION", 2)
+        results = import_files_with_progress(files)
+
+        assert results["unchanged"] == 0
+        assert results["skipped"] == 1
+
+    def test_imported_contents_clear_failure(self, import_db, activity_dir):
+        with session_scope() as session:
+            record_parse_failure(session, calculate_file_hash(activity_dir / "ride_1.gpx"), "stale")
+
+        results = import_files_with_progress([activity_dir / "ride_1.gpx"], retry_failed=True)
+
+        assert results["imported"] == 1
+        with session_scope() as session:
+            assert session.query(ParseFailure).count() == 0
+
+
+@pytest.mark.database
+class TestArchiveImport:
+    @pytest.fixture
+    def export_zip(self, activity_dir, tmp_path):
+        """Export-style ZIP with the activity directory inside a nested ZIP."""
+        inner = tmp_path / "part1.zip"
+        with zipfile.ZipFile(inner, "w", zipfile.ZIP_DEFLATED) as archive:
+            for path in sorted(activity_dir.glob("*.gpx")):
+                archive.write(path, f"UploadedFiles/{path.name}")
+        export = tmp_path / "export.zip"
+        with zipfile.ZipFile(export, "w") as archive:
+            archive.write(inner, "DI_CONNECT/DI-Connect-Uploaded-Files/part1.zip")
+        return export
+
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_import_from_nested_zip(self, import_db, export_zip, monkeypatch, jobs):
+        def fail(*args, **kwargs):
+            raise AssertionError("archive member extracted to a temporary file")
+
+        monkeypatch.setattr("tempfile.NamedTemporaryFile", fail)
+        results = import_archive_with_progress(export_zip, jobs=jobs)
+
+        assert results["imported"] == 3
+        assert results["duplicates"] == 1
+        assert results["skipped"] == 1
+        assert get_db_config().get_database_info()["samples"] == 30
+        with session_scope() as session:
+            paths = sorted(path for (path,) in session.query(Activity.file_path))
+        assert paths[0] == "export.zip/DI_CONNECT/DI-Connect-Uploaded-Files/part1.zip/UploadedFiles/ride_1.gpx"
+
+    def test_reimport_skips_by_hash(self, import_db, export_zip, monkeypatch):
+        import_archive_with_progress(export_zip)
+        monkeypatch.setattr("cli.gd_import.IMPORT_BATCH_FILES", 2)
+
+        results = import_archive_with_progress(export_zip)
+
+        assert results["imported"] == 0
+        assert results["duplicates"] == 4
+        assert results["known_failures"] == 1
+
+
+@pytest.mark.database
+class TestDirectoryImport:
+    def test_import_starts_before_walk_finishes(self, import_db, activity_dir, monkeypatch):
+        from ingest.scan import walk_activity_files
+
+        activities_seen = []
+
+        def slow_walk(root):
+            for scanned in sorted(walk_activity_files(root)):
+                with session_scope() as session:
+                    activities_seen.append(session.query(Activity).count())
+                yield scanned
+
+        monkeypatch.setattr("cli.gd_import.walk_activity_files", slow_walk)
+        monkeypatch.setattr("cli.gd_import.IMPORT_BATCH_FILES", 2)
+        results = import_directory_with_progress(activity_dir)
+
+        # broken, ride_1 | ride_1_copy, ride_2 | ride_3
+        assert activities_seen == [0, 0, 1, 1, 2]
+        assert results["imported"] == 3
+        assert results["duplicates"] == 1
+        assert results["scan"]["total"] == 5
+
+    def test_walk_signatures_are_reused(self, import_db, activity_dir, monkeypatch):
+        import_directory_with_progress(activity_dir)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("file stat'ed again after the walk")
+
+        monkeypatch.setattr("ingest.manifest.file_signature", fail)
+        monkeypatch.setattr("ingest.pipeline.file_signature", fail)
+        write_gpx(activity_dir / "ride_4.gpx", day=4)
+        results = import_directory_with_progress(activity_dir)
+
+        assert results["unchanged"] == 5
+        assert results["imported"] == 1
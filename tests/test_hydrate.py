@@ -0,0 +1,225 @@
+"""
+Tests for summary-only imports and lazy sample hydration.
+"""
+
+import sqlite3
+import threading
+import zipfile
+
+import pytest
+
+from app.data.db import close_database, init_database, session_scope
+from app.data.models import Activity, Lap, RoutePoint, Sample
+from app.data.web_queries import get_activity_samples
+from cli.gd_import import import_archive_with_progress, import_directory_with_progress
+import ingest.hydrate
+from ingest.hydrate import HydrationError, hydrate_activity, hydrate_pending
+from ingest.parser import ActivityParser
+from tests.fit_factory import write_activity_fit
+from tests.test_fit_fast import SUMMARY_ATTRIBUTES
+from tests.test_gd_import import write_gpx
+
+
+@pytest.fixture
+def hydrate_db(tmp_path):
+    db_config = init_database(f"sqlite:///{tmp_path / 'hydrate.db'}")
+    yield db_config
+    db_config.engine.dispose()
+    close_database()
+
+
+@pytest.fixture
+def fit_dir(tmp_path):
+    data_dir = tmp_path / "activities"
+    data_dir.mkdir()
+    write_activity_fit(data_dir / "run.fit", n_records=300, n_laps=3)
+    write_gpx(data_dir / "ride.gpx", day=2)
+    return data_dir
+
+
+def counts(activity_id):
+    with session_scope() as session:
+        return tuple(
+            session.query(model).filter(model.activity_id == activity_id).count() for model in (Sample, RoutePoint, Lap)
+        )
+
+
+@pytest.mark.parametrize("fast_path", [True, False])
+def test_summary_only_fit_matches_full_summary(tmp_path, fast_path):
+    fit_path = write_activity_fit(tmp_path / "run.fit", n_records=300, n_laps=3)
+
+    full = ActivityParser.parse_fit_file(fit_path, fast_path=fast_path)
+    summary = ActivityParser.parse_fit_file(fit_path, fast_path=fast_path, summary_only=True)
+
+    assert summary.summary_only and not full.summary_only
+    assert len(summary.samples) == 0 and summary.route_points == []
+    for attribute in SUMMARY_ATTRIBUTES:
+        assert getattr(summary, attribute) == getattr(full, attribute), attribute
+    assert [vars(lap) for lap in summary.laps] == [vars(lap) for lap in full.laps]
+
+
+def test_summary_only_gpx_keeps_totals(tmp_path):
+    gpx_path = write_gpx(tmp_path / "ride.gpx", day=2)
+
+    full = ActivityParser.parse_activity_file(gpx_path)
+    summary = ActivityParser.parse_activity_file(gpx_path, summary_only=True)
+
+    assert len(summary.samples) == 0
+    assert summary.distance_m == full.distance_m
+    assert summary.elapsed_time_s == full.elapsed_time_s
+    assert summary.start_time_utc == full.start_time_utc
+
+
+@pytest.mark.database
+def test_directory_import_hydrates_on_first_open(hydrate_db, fit_dir):
+    results = import_directory_with_progress(fit_dir, summary_only=True)
+
+    assert results["imported"] == 2
+    with session_scope() as session:
+        run = session.query(Activity).filter(Activity.source == "fit").one()
+        assert run.samples_hydrated is False
+        run_id = run.id
+    assert counts(run_id) == (0, 0, 3)
+
+    samples = get_activity_samples(run_id)
+
+    assert len(samples) == 300
+    assert counts(run_id) == (300, 300, 3)
+    with session_scope() as session:
+        assert session.get(Activity, run_id).samples_hydrated is True
+    # A second open reads the stored samples without parsing again
+    assert len(get_activity_samples(run_id)) == 300
+    assert counts(run_id) == (300, 300, 3)
+
+
+@pytest.mark.database
+def test_first_open_hydrates_on_the_writer_thread(hydrate_db, fit_dir, monkeypatch):
+    import_directory_with_progress(fit_dir, summary_only=True)
+    threads = []
+
+    def spy(session, activity, stats=None, hydrate=ingest.hydrate.hydrate_activity):
+        threads.append(threading.current_thread().name)
+        return hydrate(session, activity, stats)
+
+    monkeypatch.setattr("ingest.hydrate.hydrate_activity", spy)
+    with session_scope() as session:
+        run_id = session.query(Activity.id).filter(Activity.source == "fit").scalar()
+
+    assert len(get_activity_samples(run_id)) == 300
+    assert threads == ["db-writer"]
+
+
+@pytest.mark.database
+def test_hydrate_pending_reads_archive_members(hydrate_db, fit_dir, tmp_path):
+    export = tmp_path / "export.zip"
+    with zipfile.ZipFile(export, "w") as archive:
+        for path in fit_dir.iterdir():
+            archive.write(path, f"DI_CONNECT/{path.name}")
+
+    assert import_archive_with_progress(export, summary_only=True)["imported"] == 2
+    results = hydrate_pending()
+
+    assert results.hydrated == 2 and not results.failures
+    with session_scope() as session:
+        assert session.query(Activity).filter(Activity.samples_hydrated.is_(False)).count() == 0
+        assert session.query(Sample).count() == 310
+    assert hydrate_pending().hydrated == 0
+
+
+@pytest.mark.database
+def test_archive_member_is_read_directly_on_first_open(hydrate_db, fit_dir, tmp_path, monkeypatch):
+    export = tmp_path / "export.zip"
+    with zipfile.ZipFile(export, "w") as archive:
+        for path in fit_dir.iterdir():
+            archive.write(path, f"DI_CONNECT/{path.name}")
+    import_archive_with_progress(export, summary_only=True)
+
+    def scan(*args, **kwargs):
+        raise AssertionError("the archive was scanned")
+
+    monkeypatch.setattr("ingest.hydrate.iter_archive_members", scan)
+    with session_scope() as session:
+        run_id = session.query(Activity.id).filter(Activity.source == "fit").scalar()
+
+    assert len(get_activity_samples(run_id)) == 300
+
+
+@pytest.mark.database
+def test_failed_hydration_is_recorded_and_not_retried(hydrate_db, fit_dir, monkeypatch):
+    import_directory_with_progress(fit_dir, summary_only=True)
+    (fit_dir / "run.fit").unlink()
+    with session_scope() as session:
+        run_id = session.query(Activity.id).filter(Activity.source == "fit").scalar()
+
+    assert get_activity_samples(run_id).empty
+    with session_scope() as session:
+        assert "not found" in session.get(Activity, run_id).hydration_error
+
+    def read(file_path):
+        raise AssertionError("the source was read again")
+
+    monkeypatch.setattr("ingest.hydrate.read_activity_source", read)
+    assert get_activity_samples(run_id).empty
+    monkeypatch.undo()
+
+    assert hydrate_pending().failures == []
+    results = hydrate_pending(retry_failed=True)
+    assert [activity_id for activity_id, _ in results.failures] == [run_id]
+
+
+@pytest.mark.database
+def test_changed_source_is_not_hydrated(hydrate_db, fit_dir):
+    import_directory_with_progress(fit_dir, summary_only=True)
+    write_activity_fit(fit_dir / "run.fit", n_records=200)
+
+    with session_scope() as session:
+        run = session.query(Activity).filter(Activity.source == "fit").one()
+        with pytest.raises(HydrationError):
+            hydrate_activity(session, run)
+        assert run.samples_hydrated is False
+
+
+@pytest.mark.database
+def test_full_import_is_hydrated(hydrate_db, fit_dir):
+    import_directory_with_progress(fit_dir)
+
+    with session_scope() as session:
+        assert all(activity.samples_hydrated for activity in session.query(Activity))
+
+
+def test_missing_columns_are_added(tmp_path):
+    db_path = tmp_path / "old.db"
+    init_database(f"sqlite:///{db_path}").engine.dispose()
+    close_database()
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("ALTER TABLE activities DROP COLUMN samples_hydrated")
+        conn.execute("INSERT INTO activities (sport) VALUES ('running')")
+
+    db_config = init_database(f"sqlite:///{db_path}")
+    try:
+        with session_scope() as session:
+            assert session.query(Activity).one().samples_hydrated is True
+    finally:
+        db_config.engine.dispose()
+        close_database()
+
+
+def test_unique_keys_are_added_to_existing_tables(tmp_path, caplog):
+    db_path = tmp_path / "old.db"
+    init_database(f"sqlite:///{db_path}").engine.dispose()
+    close_database()
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("ALTER TABLE activities RENAME TO activities_new")
+        conn.execute("CREATE TABLE activities AS SELECT * FROM activities_new")
+        conn.execute("DROP TABLE activities_new")
+        conn.executemany("INSERT INTO activities (id, sport, garmin_activity_id) VALUES (?, 'running', '7')", [(1,), (2,)])
+
+    db_config = init_database(f"sqlite:///{db_path}")
+    db_config.engine.dispose()
+    close_database()
+    with sqlite3.connect(db_path) as conn:
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(activities)")}
+    assert "uq_activity_file_hash" in indexes
+    # Existing duplicates keep the database usable, without the constraint
+    assert "uq_activity_garmin_activity_id" not in indexes
+    assert "uq_activity_garmin_activity_id" in caplog.text
@@ -9,12 +9,111 @@ from datetime import datetime, timezone
 import hashlib
 from pathlib import Path
 import tempfile
-from unittest.mock import MagicMock, mock_open, patch
+from unittest.mock import MagicMock, patch
 
 import pytest
 
 from app.data.models import ActivityData, SampleData
-from ingest.parser import ActivityParser, CorruptFileError, FileNotSupportedError
+from ingest.parser import (
+    ActivityParser,
+    CorruptFileError,
+    FileNotSupportedError,
+    calculate_buffer_hash,
+    calculate_file_hash,
+    map_file,
+)
+from tests.fit_factory import write_activity_fit
+
+
+TCX_DOCUMENT = """<?xml version="1.0" encoding="UTF-8"?>
+<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2"
+    xmlns:ns3="http://www.garmin.com/xmlschemas/ActivityExtension/v2">
+  <Activities>
+    <Activity Sport="Biking">
+      <Id>2024-01-15T10:00:00Z</Id>
+      <Lap StartTime="2024-01-15T10:00:00Z">
+        <TotalTimeSeconds>1800</TotalTimeSeconds>
+        <DistanceMeters>25000</DistanceMeters>
+        <Calories>300</Calories>
+        <AverageHeartRateBpm><Value>150</Value></AverageHeartRateBpm>
+        <Track>
+          <Trackpoint>
+            <Time>2024-01-15T10:00:00Z</Time>
+            <Position><LatitudeDegrees>52.5200</LatitudeDegrees><LongitudeDegrees>13.4050</LongitudeDegrees></Position>
+            <AltitudeMeters>105.0</AltitudeMeters>
+            <DistanceMeters>0</DistanceMeters>
+            <HeartRateBpm><Value>150</Value></HeartRateBpm>
+          </Trackpoint>
+          <Trackpoint>
+            <Time>2024-01-15T10:05:00Z</Time>
+            <Position><LatitudeDegrees>52.5200</LatitudeDegrees><LongitudeDegrees>13.4050</LongitudeDegrees></Position>
+            <AltitudeMeters>105.0</AltitudeMeters>
+            <DistanceMeters>4000</DistanceMeters>
+            <HeartRateBpm><Value>155</Value></HeartRateBpm>
+            <Cadence>90</Cadence>
+            <Extensions><ns3:TPX><ns3:Speed>12.5</ns3:Speed><ns3:Watts>210</ns3:Watts></ns3:TPX></Extensions>
+          </Trackpoint>
+        </Track>
+      </Lap>
+      <Lap StartTime="2024-01-15T10:30:00Z">
+        <TotalTimeSeconds>1800</TotalTimeSeconds>
+        <DistanceMeters>25000</DistanceMeters>
+        <Calories>300</Calories>
+        <Track>
+          <Trackpoint>
+            <Time>2024-01-15T11:00:00Z</Time>
+            <Position><LatitudeDegrees>52.5300</LatitudeDegrees><LongitudeDegrees>13.4150</LongitudeDegrees></Position>
+            <DistanceMeters>50000</DistanceMeters>
+            <HeartRateBpm><Value>160</Value></HeartRateBpm>
+          </Trackpoint>
+        </Track>
+      </Lap>
+    </Activity>
+  </Activities>
+</TrainingCenterDatabase>
+"""
+
+GPX_DOCUMENT = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1"
+    xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v1">
+  <metadata><time>2023-12-31T00:00:00Z</time></metadata>
+  <trk><name>walk</name>
+    <trkseg>
+      <trkpt lat="52.5200" lon="13.4050"><ele>110.0</ele><time>2024-01-15T10:00:00Z</time></trkpt>
+      <trkpt lat="52.5210" lon="13.4050"><ele>110.0</ele><time>2024-01-15T10:00:10Z</time>
+        <extensions><gpxtpx:TrackPointExtension><gpxtpx:hr>121</gpxtpx:hr></gpxtpx:TrackPointExtension></extensions>
+      </trkpt>
+      <trkpt lat="52.5220" lon="13.4050"><ele>111.0</ele><time>2024-01-15T10:00:20Z</time></trkpt>
+    </trkseg>
+    <trkseg>
+      <trkpt lat="52.6000" lon="13.5000"><ele>112.0</ele><time>2024-01-15T10:00:30Z</time></trkpt>
+    </trkseg>
+  </trk>
+</gpx>
+"""
+
+
+class FakeFieldData:
+    """Minimal stand-in for fitparse.records.FieldData."""
+
+    def __init__(self, name, value):
+        self.field = MagicMock()
+        self.field.name = name
+        self.parent_field = None
+        self.value = value
+
+    def is_named(self, name):
+        return self.field.name == name
+
+
+def fake_fit_message(name, values, def_mesg=None):
+    """Build a fitparse-like DataMessage with ``values`` as its fields."""
+    message = MagicMock()
+    message.name = name
+    message.def_mesg = def_mesg if def_mesg is not None else object()
+    message.fields = [FakeFieldData(field_name, value) for field_name, value in values.items()]
+    message.get_value.side_effect = values.get
+    return message
 
 
 class TestActivityParser:
@@ -73,30 +172,6 @@ class TestActivityParser:
         finally:
             tmp_file_path.unlink()
 
-    @patch("ingest.parser.TCXPARSER_AVAILABLE", False)
-    def test_parse_tcx_file_library_unavailable(self):
-        """Test TCX parsing when tcxparser library is unavailable."""
-        with tempfile.NamedTemporaryFile(suffix=".tcx", delete=False) as tmp_file:
-            tmp_file_path = Path(tmp_file.name)
-
-        try:
-            with pytest.raises(FileNotSupportedError, match="tcxparser library not available"):
-                ActivityParser.parse_tcx_file(tmp_file_path)
-        finally:
-            tmp_file_path.unlink()
-
-    @patch("ingest.parser.GPXPY_AVAILABLE", False)
-    def test_parse_gpx_file_library_unavailable(self):
-        """Test GPX parsing when gpxpy library is unavailable."""
-        with tempfile.NamedTemporaryFile(suffix=".gpx", delete=False) as tmp_file:
-            tmp_file_path = Path(tmp_file.name)
-
-        try:
-            with pytest.raises(FileNotSupportedError, match="gpxpy library not available"):
-                ActivityParser.parse_gpx_file(tmp_file_path)
-        finally:
-            tmp_file_path.unlink()
-
     @patch("ingest.parser.fitparse")
     @patch("ingest.parser.FITPARSE_AVAILABLE", True)
     def test_parse_fit_file_success(self, mock_fitparse):
@@ -106,46 +181,49 @@ class TestActivityParser:
         mock_fitparse.FitFile.return_value = mock_fitfile
 
         # Mock session message
-        mock_session = MagicMock()
-        mock_session.get_value.side_effect = lambda key: {
-            "sport": "running",
-            "start_time": datetime(2024, 1, 15, 10, 0, 0, tzinfo=timezone.utc),
-            "total_elapsed_time": 3600,
-            "total_distance": 10000.0,
-            "avg_heart_rate": 150,
-            "max_heart_rate": 180,
-            "avg_power": 250.0,
-            "max_power": 300.0,
-            "total_ascent": 100.0,
-            "total_descent": 80.0,
-            "total_calories": 500,
-        }.get(key)
+        mock_session = fake_fit_message(
+            "session",
+            {
+                "sport": "running",
+                "start_time": datetime(2024, 1, 15, 10, 0, 0, tzinfo=timezone.utc),
+                "total_elapsed_time": 3600,
+                "total_distance": 10000.0,
+                "avg_heart_rate": 150,
+                "max_heart_rate": 180,
+                "avg_power": 250.0,
+                "max_power": 300.0,
+                "total_ascent": 100.0,
+                "total_descent": 80.0,
+                "total_calories": 500,
+            },
+        )
 
         # Mock file_id message
-        mock_file_id = MagicMock()
-        mock_file_id.get_value.return_value = 12345
-
-        # Mock record messages (samples)
-        mock_record = MagicMock()
-        mock_record.get_value.side_effect = lambda key: {
-            "timestamp": datetime(2024, 1, 15, 10, 5, 0, tzinfo=timezone.utc),
-            "position_lat": int(52.5200 * (2**31) / 180),  # Semicircles
-            "position_long": int(13.4050 * (2**31) / 180),  # Semicircles
-            "altitude": 100.0,
-            "heart_rate": 145,
-            "power": 240.0,
-            "cadence": 90,
-            "speed": 4.5,
-            "temperature": 15.0,
-        }.get(key)
-
-        # Configure mock to return messages
-        mock_fitfile.get_messages.side_effect = lambda msg_type: {
-            "session": [mock_session],
-            "file_id": [mock_file_id],
-            "record": [mock_record] * 5,  # 5 sample records
-            "lap": [],
-        }.get(msg_type, [])
+        mock_file_id = fake_fit_message("file_id", {"serial_number": 12345})
+
+        # Mock record messages (samples) sharing one definition
+        record_definition = object()
+        mock_records = [
+            fake_fit_message(
+                "record",
+                {
+                    "timestamp": datetime(2024, 1, 15, 10, 5, i, tzinfo=timezone.utc),
+                    "position_lat": int(52.5200 * (2**31) / 180),  # Semicircles
+                    "position_long": int(13.4050 * (2**31) / 180),  # Semicircles
+                    "altitude": 100.0,
+                    "heart_rate": 145,
+                    "power": 240.0,
+                    "cadence": 90,
+                    "speed": 4.5,
+                    "temperature": 15.0,
+                },
+                def_mesg=record_definition,
+            )
+            for i in range(5)
+        ]
+
+        # The parser makes a single pass over all messages
+        mock_fitfile.get_messages.return_value = [mock_file_id, *mock_records, mock_session]
 
         # Create temporary FIT file
         with tempfile.NamedTemporaryFile(suffix=".fit", delete=False) as tmp_file:
@@ -154,8 +232,10 @@ class TestActivityParser:
         try:
             result = ActivityParser.parse_fit_file(tmp_file_path)
 
+            mock_fitfile.get_messages.assert_called_once_with()
             assert result is not None
             assert isinstance(result, ActivityData)
+            assert result.external_id == "12345"
             assert result.sport == "running"
             assert result.distance_m == 10000.0
             assert result.avg_hr == 150
@@ -177,109 +257,71 @@ class TestActivityParser:
         finally:
             tmp_file_path.unlink()
 
-    @patch("ingest.parser.tcxparser")
-    @patch("ingest.parser.TCXPARSER_AVAILABLE", True)
-    def test_parse_tcx_file_success(self, mock_tcxparser):
+    def test_parse_tcx_file_success(self, tmp_path):
         """Test successful TCX file parsing."""
-        # Mock TCX parser
-        mock_tcx = MagicMock()
-        mock_tcx.activity_type = "cycling"
-        mock_tcx.started_at = datetime(2024, 1, 15, 10, 0, 0, tzinfo=timezone.utc)
-        mock_tcx.duration = 3600.0
-        mock_tcx.distance = 50000.0
-        mock_tcx.hr_avg = 155.0
-        mock_tcx.hr_max = 185.0
-        mock_tcx.calories = 600.0
-
-        # Mock trackpoints
-        mock_trackpoint = MagicMock()
-        mock_trackpoint.time = datetime(2024, 1, 15, 10, 5, 0, tzinfo=timezone.utc)
-        mock_trackpoint.latitude = 52.5200
-        mock_trackpoint.longitude = 13.4050
-        mock_trackpoint.elevation = 105.0
-        mock_trackpoint.hr_value = 150.0
-        mock_trackpoint.speed = 12.5
-
-        mock_tcx.trackpoints = [mock_trackpoint] * 3
-        mock_tcxparser.TCXParser.return_value = mock_tcx
-
-        # Create temporary TCX file
-        with tempfile.NamedTemporaryFile(suffix=".tcx", delete=False) as tmp_file:
-            tmp_file_path = Path(tmp_file.name)
-
-        try:
-            result = ActivityParser.parse_tcx_file(tmp_file_path)
-
-            assert result is not None
-            assert result.sport == "cycling"
-            assert result.elapsed_time_s == 3600
-            assert result.distance_m == 50000.0
-            assert result.avg_hr == 155
-            assert result.calories == 600
-            assert len(result.samples) == 3
-            assert len(result.route_points) == 3
-
-            # Check sample data
-            sample = result.samples[0]
-            assert sample.latitude == 52.5200
-            assert sample.longitude == 13.4050
-            assert sample.altitude_m == 105.0
-            assert sample.heart_rate == 150.0
-            assert sample.speed_mps == 12.5
-
-        finally:
-            tmp_file_path.unlink()
-
-    @patch("ingest.parser.gpxpy")
-    @patch("ingest.parser.GPXPY_AVAILABLE", True)
-    def test_parse_gpx_file_success(self, mock_gpxpy):
+        tcx_path = tmp_path / "ride.tcx"
+        tcx_path.write_text(TCX_DOCUMENT, encoding="utf-8")
+
+        result = ActivityParser.parse_tcx_file(tcx_path)
+
+        assert result is not None
+        assert result.sport == "biking"
+        assert result.start_time_utc == datetime(2024, 1, 15, 10, 0, 0, tzinfo=timezone.utc)
+        assert result.elapsed_time_s == 3600
+        assert result.distance_m == 50000.0
+        assert result.avg_hr == 155
+        assert result.max_hr == 160
+        assert result.calories == 600
+        assert len(result.samples) == 3
+        assert len(result.route_points) == 3
+        assert len(result.laps) == 2
+        assert result.laps[0].avg_hr == 150
+        assert result.laps[1].avg_speed_mps == pytest.approx(25000.0 / 1800.0)
+
+        # Check sample data
+        sample = result.samples[1]
+        assert sample.elapsed_time_s == 300
+        assert sample.latitude == 52.5200
+        assert sample.longitude == 13.4050
+        assert sample.altitude_m == 105.0
+        assert sample.heart_rate == 155
+        assert sample.cadence_rpm == 90
+        assert sample.speed_mps == 12.5
+        assert sample.power_w == 210.0
+
+    def test_parse_gpx_file_success(self, tmp_path):
         """Test successful GPX file parsing."""
-        # Mock GPX structure
-        mock_point = MagicMock()
-        mock_point.latitude = 52.5200
-        mock_point.longitude = 13.4050
-        mock_point.elevation = 110.0
-        mock_point.time = datetime(2024, 1, 15, 10, 5, 0, tzinfo=timezone.utc)
-
-        mock_segment = MagicMock()
-        mock_segment.points = [mock_point] * 4
-
-        mock_track = MagicMock()
-        mock_track.segments = [mock_segment]
-        mock_track.length_2d.return_value = 8000.0  # 8km distance
-
-        mock_gpx = MagicMock()
-        mock_gpx.tracks = [mock_track]
-
-        mock_gpxpy.parse.return_value = mock_gpx
-
-        # Mock file open
-        mock_file_content = "<gpx>mock content</gpx>"
-
-        with tempfile.NamedTemporaryFile(suffix=".gpx", delete=False) as tmp_file:
-            tmp_file_path = Path(tmp_file.name)
-
-        try:
-            with patch("builtins.open", mock_open(read_data=mock_file_content)):
-                result = ActivityParser.parse_gpx_file(tmp_file_path)
-
-            assert result is not None
-            assert result.distance_m == 8000.0
-            assert len(result.samples) == 4
-            assert len(result.route_points) == 4
-
-            # Check GPS coordinates
-            sample = result.samples[0]
-            assert sample.latitude == 52.5200
-            assert sample.longitude == 13.4050
-            assert sample.altitude_m == 110.0
-
-            # Check route points
-            route_point = result.route_points[0]
-            assert route_point == (52.5200, 13.4050, 110.0)
-
-        finally:
-            tmp_file_path.unlink()
+        gpx_path = tmp_path / "walk.gpx"
+        gpx_path.write_text(GPX_DOCUMENT, encoding="utf-8")
+
+        result = ActivityParser.parse_gpx_file(gpx_path)
+
+        assert result is not None
+        assert result.start_time_utc == datetime(2024, 1, 15, 10, 0, 0, tzinfo=timezone.utc)
+        assert result.elapsed_time_s == 30
+        # Two 0.001 degree latitude steps in the first segment; the jump to the second segment is not counted
+        assert result.distance_m == pytest.approx(2 * 111.3195, rel=1e-4)
+        assert len(result.samples) == 4
+        assert len(result.route_points) == 4
+
+        # Check GPS coordinates
+        sample = result.samples[1]
+        assert sample.latitude == 52.5210
+        assert sample.longitude == 13.4050
+        assert sample.altitude_m == 110.0
+        assert sample.elapsed_time_s == 10
+        assert sample.heart_rate == 121
+
+        # Check route points
+        route_point = result.route_points[0]
+        assert route_point == (52.5200, 13.4050, 110.0)
+
+    def test_parse_gpx_file_malformed(self, tmp_path):
+        gpx_path = tmp_path / "broken.gpx"
+        gpx_path.write_text("<gpx><trk>", encoding="utf-8")
+
+        with pytest.raises(CorruptFileError, match="GPX parse error"):
+            ActivityParser.parse_gpx_file(gpx_path)
 
     def test_derive_metrics_speed_calculation(self):
         """Test metric derivation calculations."""
@@ -365,6 +407,107 @@ class TestActivityParser:
             tmp_file_path.unlink()
 
 
+class TestFitFileParsing:
+    """Parse real FIT binaries generated by tests/fit_factory.py."""
+
+    def test_parse_generated_fit_file(self, tmp_path):
+        fit_path = write_activity_fit(tmp_path / "run.fit", n_records=120, gps_gap=(10, 20))
+
+        result = ActivityParser.parse_fit_file(fit_path)
+
+        assert result.sport == "running"
+        assert result.external_id == "3912345678"
+        assert result.start_time_utc == datetime(2024, 1, 15, 10, 0, 0)
+        assert result.elapsed_time_s == 120.0
+        assert result.distance_m == 360.0
+        assert len(result.samples) == 120
+        assert len(result.route_points) == 110
+        assert len(result.laps) == 2
+        assert result.laps[1].lap_index == 1
+
+        sample = result.samples[3]
+        assert sample.timestamp == datetime(2024, 1, 15, 10, 0, 3)
+        assert sample.elapsed_time_s == 3
+        assert sample.heart_rate == 123
+        assert sample.speed_mps == pytest.approx(3.03)
+        assert sample.altitude_m == pytest.approx(35.6)
+        assert sample.latitude == pytest.approx(52.50003, abs=1e-6)
+        assert result.samples[5].heart_rate is None
+
+    def test_parse_running_dynamics_and_developer_fields(self, tmp_path):
+        fit_path = write_activity_fit(
+            tmp_path / "stryd.fit", n_records=60, running_dynamics=True, developer_fields=True, interleave_events=True
+        )
+
+        sample = ActivityParser.parse_fit_file(fit_path).samples[1]
+
+        assert sample.ground_contact_time_ms == pytest.approx(240.1)
+        assert sample.vertical_oscillation_mm == pytest.approx(85.1)
+        assert sample.step_length_mm == pytest.approx(1150.1)
+        assert sample.air_power_w == 11
+        assert sample.form_power_w == 61
+        assert sample.leg_spring_stiffness == pytest.approx(9.75)
+
+    def test_parse_compressed_timestamps(self, tmp_path):
+        fit_path = write_activity_fit(tmp_path / "compressed.fit", n_records=90, compressed_timestamps=True)
+
+        samples = ActivityParser.parse_fit_file(fit_path).samples
+
+        # One anchoring timestamp-only record plus the compressed records
+        assert len(samples) == 91
+        assert samples[-1].timestamp == datetime(2024, 1, 15, 10, 1, 29)
+
+
+class TestParseActivityBuffer:
+    """Parsing from bytes, memoryviews and mapped files gives the same result as parsing the file."""
+
+    @pytest.fixture(params=["run.fit", "compressed.fit", "ride.tcx", "ride.gpx"])
+    def activity_path(self, request, tmp_path):
+        path = tmp_path / request.param
+        if request.param == "run.fit":
+            write_activity_fit(path, n_records=60)
+        elif request.param == "compressed.fit":
+            # Not handled by the fast path, so this exercises the fitparse fallback
+            write_activity_fit(path, n_records=40, compressed_timestamps=True)
+        else:
+            path.write_text(TCX_DOCUMENT if path.suffix == ".tcx" else GPX_DOCUMENT, encoding="utf-8")
+        return path
+
+    @pytest.mark.parametrize("wrap", [bytes, memoryview])
+    def test_buffer_matches_file(self, activity_path, wrap):
+        expected = ActivityParser.parse_activity_file(activity_path)
+
+        result = ActivityParser.parse_activity_buffer(wrap(activity_path.read_bytes()), activity_path.name)
+
+        assert result.external_id == expected.external_id
+        assert result.distance_m == expected.distance_m
+        assert result.avg_speed_mps == expected.avg_speed_mps
+        assert len(result.samples) == len(expected.samples)
+
+    def test_mapped_file_is_hashed_and_parsed_once(self, activity_path):
+        expected = ActivityParser.parse_activity_file(activity_path)
+
+        with map_file(activity_path) as data:
+            file_hash = calculate_buffer_hash(data)
+            result = ActivityParser.parse_activity_buffer(data, activity_path.name)
+
+        assert file_hash == calculate_file_hash(activity_path)
+        assert len(result.samples) == len(expected.samples)
+
+    def test_map_empty_file(self, tmp_path):
+        empty_path = tmp_path / "empty.gpx"
+        empty_path.touch()
+
+        with map_file(empty_path) as data:
+            assert data == b""
+            with pytest.raises(CorruptFileError):
+                ActivityParser.parse_activity_buffer(data, empty_path.name)
+
+    def test_buffer_unsupported_format(self):
+        with pytest.raises(FileNotSupportedError):
+            ActivityParser.parse_activity_buffer(b"data", "notes.txt")
+
+
 class TestParserIntegration:
     """Integration tests for parser with different file types."""
 
@@ -383,7 +526,7 @@ class TestParserIntegration:
 
             try:
                 ActivityParser.parse_activity_file(tmp_file_path)
-                mock_fit.assert_called_once_with(tmp_file_path)
+                mock_fit.assert_called_once_with(tmp_file_path, derive=True)
                 mock_tcx.assert_not_called()
                 mock_gpx.assert_not_called()
             finally:
@@ -400,7 +543,7 @@ class TestParserIntegration:
 
             try:
                 ActivityParser.parse_activity_file(tmp_file_path)
-                mock_tcx.assert_called_once_with(tmp_file_path)
+                mock_tcx.assert_called_once_with(tmp_file_path, derive=True)
                 mock_fit.assert_not_called()
                 mock_gpx.assert_not_called()
             finally:
@@ -0,0 +1,163 @@
+"""
+Tests for the shared bulk persistence routine.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.data.db import close_database, init_database, session_scope
+from app.data.models import Activity, ActivityData, Lap, LapData, RoutePoint, Sample, SampleArraysBuilder
+from ingest.persist import PersistStats, build_activity, insert_rows, persist_activity, persist_samples
+
+
+def make_activity_data(n_samples: int = 12) -> ActivityData:
+    start = datetime(2024, 5, 1, 8, 0, tzinfo=timezone.utc)
+    samples = SampleArraysBuilder()
+    for i in range(n_samples):
+        fix = i % 4 != 3  # every fourth sample has no GPS fix
+        samples.append(
+            start + timedelta(seconds=i),
+            elapsed_time_s=i,
+            latitude=52.5 + i * 1e-4 if fix else None,
+            longitude=13.4 + i * 1e-4 if fix else None,
+            heart_rate=120 + i,
+        )
+    activity_data = ActivityData(external_id="run-1", sport="running", start_time_utc=start, distance_m=1000.0)
+    activity_data.samples = samples.build()
+    activity_data.route_points = [(52.5, 13.4, 10.0), (None, None, None), (52.6, 13.5, None)]
+    activity_data.laps = [
+        LapData(lap_index=0, start_time_utc=start, elapsed_time_s=300, distance_m=1000.0),
+        LapData(lap_index=1, start_time_utc=start + timedelta(minutes=5), elapsed_time_s=None),
+    ]
+    return activity_data
+
+
+@pytest.fixture
+def db(tmp_path):
+    db_config = init_database(f"sqlite:///{tmp_path / 'persist.db'}")
+    yield db_config
+    db_config.engine.dispose()
+    close_database()
+
+
+@pytest.mark.database
+def test_persist_activity_writes_all_rows(db):
+    activity_data = make_activity_data()
+    stats = PersistStats()
+
+    with session_scope() as session:
+        activity = build_activity(activity_data, "abc", "fit", "run.fit", default_external_id="run")
+        persist_activity(session, activity, activity_data, stats)
+
+    with session_scope() as session:
+        assert session.query(Sample).filter_by(activity_id=activity.id).count() == 12
+        sequences = [row.sequence for row in session.query(RoutePoint).order_by(RoutePoint.sequence)]
+        assert sequences == [0, 2]
+        laps = session.query(Lap).order_by(Lap.lap_index).all()
+        assert [(lap.elapsed_time_s, lap.moving_time_s) for lap in laps] == [(300, 300), (0, None)]
+
+    assert (stats.activities, stats.samples, stats.route_points, stats.laps) == (1, 12, 2, 2)
+    assert stats.rows == 17
+
+
+@pytest.mark.database
+def test_insert_rows_batches_executemany(db, monkeypatch):
+    activity_data = make_activity_data(n_samples=25)
+    calls = []
+
+    with session_scope() as session:
+        activity = persist_activity(session, build_activity(activity_data, "abc", "fit", "run.fit", "run"), None)
+        execute = session.execute
+
+        def spy(statement, *args, **kw):
+            if args:  # executemany batches; statements without a parameter list, e.g. counter updates, are skipped
+                calls.append(len(args[0]))
+            return execute(statement, *args, **kw)
+
+        monkeypatch.setattr(session, "execute", spy)
+        inserted = insert_rows(session, Sample, activity_data.samples.to_rows(activity.id), batch_size=10)
+
+    assert inserted == 25
+    assert calls == [10, 10, 5]
+
+
+def test_persist_stats_rows_per_second():
+    stats = PersistStats(activities=1, samples=999, seconds=0.5)
+
+    assert stats.rows_per_second == 2000
+    assert PersistStats().rows_per_second == 0.0
+    assert "1,000 rows" in stats.summary()
+
+
+@pytest.mark.database
+def test_samples_are_built_and_written_in_chunks(db, monkeypatch):
+    activity_data = make_activity_data(n_samples=25)
+    activity_data.route_points = activity_data.samples.route_points()
+    calls = []
+
+    def fail(*args, **kwargs):
+        raise AssertionError("all sample rows built at once")
+
+    monkeypatch.setattr("ingest.persist.INSERT_BATCH_ROWS", 10)
+    monkeypatch.setattr("app.data.models.SampleArrays.to_rows", fail)
+    with session_scope() as session:
+        execute = session.execute
+
+        def spy(statement, *args, **kw):
+            if args:  # executemany batches; statements without a parameter list, e.g. counter updates, are skipped
+                calls.append(len(args[0]))
+            return execute(statement, *args, **kw)
+
+        monkeypatch.setattr(session, "execute", spy)
+        activity = build_activity(activity_data, "abc", "fit", "run.fit", "run")
+        session.add(activity)
+        session.flush()
+        calls.clear()
+        persist_samples(session, activity.id, activity_data)
+
+    # 25 samples, then the 19 route points with a GPS fix, 10 rows per call
+    assert calls == [10, 10, 5, 10, 9]
+    with session_scope() as session:
+        sequences = [row.sequence for row in session.query(RoutePoint).order_by(RoutePoint.sequence)]
+        assert sequences == list(range(19))
+
+
+@pytest.mark.database
+def test_duplicate_keys_are_not_inserted(db):
+    activity_data = make_activity_data()
+    with session_scope() as session:
+        first = persist_activity(session, build_activity(activity_data, "abc", "fit", "run.fit", "run"), activity_data)
+        first.garmin_activity_id = "42"
+
+    stats = PersistStats()
+    with session_scope() as session:
+        same_file = build_activity(activity_data, "abc", "fit", "copy.fit", "copy")
+        same_garmin_id = Activity(garmin_activity_id="42", file_hash="other", sport="running")
+        assert persist_activity(session, same_file, activity_data, stats) is None
+        assert persist_activity(session, same_garmin_id, None, stats) is None
+
+    assert stats.rows == 0
+    with session_scope() as session:
+        assert session.query(Activity).count() == 1
+        assert session.query(Sample).count() == 12
+
+
+@pytest.mark.database
+def test_replace_overwrites_stored_activity(db):
+    with session_scope() as session:
+        original = persist_activity(session, build_activity(make_activity_data(), "abc", "fit", "run.fit", "run"), None)
+        original.comments = "felt good"
+    original_id = original.id
+
+    activity_data = make_activity_data(n_samples=5)
+    with session_scope() as session:
+        replaced = build_activity(activity_data, "abc", "fit", "moved/run.fit", "run")
+        activity = persist_activity(session, replaced, activity_data, replace=True)
+        assert activity is replaced and activity.id == original_id
+
+    with session_scope() as session:
+        stored = session.query(Activity).one()
+        assert (stored.file_path, stored.comments) == ("moved/run.fit", "felt good")
+        assert session.query(Sample).count() == 5
+        assert session.query(Lap).count() == 2
@@ -0,0 +1,148 @@
+"""
+Tests for the shared ingest pipeline stages.
+"""
+
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from app.data.db import close_database, init_database, session_scope
+from app.data.models import Activity, ImportManifest
+from ingest.pipeline import (
+    IngestItem,
+    IngestStats,
+    dedupe_stage,
+    derive_stage,
+    hash_stage,
+    ingest_content,
+    ingest_file,
+    parse_stage,
+)
+from tests.test_parser import GPX_DOCUMENT
+
+
+@pytest.fixture
+def db(tmp_path):
+    db_config = init_database(f"sqlite:///{tmp_path / 'pipeline.db'}")
+    yield db_config
+    db_config.engine.dispose()
+    close_database()
+
+
+def test_stages_run_separately(tmp_path):
+    gpx_path = tmp_path / "morning.gpx"
+    gpx_path.write_text(GPX_DOCUMENT, encoding="utf-8")
+    stats = IngestStats()
+    items = [IngestItem(file_path=gpx_path)]
+
+    hash_stage(items, stats)
+    assert items[0].file_hash == hashlib.sha256(gpx_path.read_bytes()).hexdigest()
+    assert items[0].signature.size_bytes == gpx_path.stat().st_size
+
+    parse_stage(items, stats)
+    assert items[0].activity_data is not None
+    assert items[0].activity_data.avg_speed_mps is None  # left to the derive stage
+
+    derive_stage(items, stats)
+    assert items[0].activity_data.avg_speed_mps > 0
+    assert items[0].activity.source == "gpx"
+    assert items[0].activity.external_id == "morning"
+
+    assert [stats.items[name] for name in ("hash", "parse", "derive")] == [1, 1, 1]
+
+
+@pytest.mark.database
+def test_dedupe_stage_resolves_known_and_repeated_hashes(db):
+    with session_scope() as session:
+        session.add(Activity(file_hash="known", sport="running", source="fit"))
+    items = [
+        IngestItem(file_path=Path("a.fit"), file_hash="known"),
+        IngestItem(file_path=Path("b.fit"), file_hash="fresh"),
+        IngestItem(file_path=Path("c.fit"), file_hash="fresh"),
+        IngestItem(file_path=Path("d.fit"), error="unreadable"),
+    ]
+
+    with session_scope() as session:
+        new, duplicates = dedupe_stage(session, items)
+
+    assert [item.file_path.name for item in new] == ["b.fit"]
+    assert [item.file_path.name for item in duplicates] == ["a.fit", "c.fit"]
+
+
+@pytest.mark.database
+def test_uploads_and_files_share_sha256_dedupe(db, tmp_path):
+    gpx_path = tmp_path / "morning.gpx"
+    gpx_path.write_text(GPX_DOCUMENT, encoding="utf-8")
+    stats = IngestStats()
+
+    uploaded = ingest_content("upload.gpx", gpx_path.read_bytes(), stats=stats)
+    from_disk = ingest_file(gpx_path)
+
+    assert uploaded.imported
+    assert not from_disk.imported and from_disk.reason == "duplicate"
+    assert stats.persist.activities == 1 and stats.persist.samples > 0
+    with session_scope() as session:
+        activity = session.get(Activity, uploaded.activity_id)
+        assert activity.file_hash == hashlib.sha256(gpx_path.read_bytes()).hexdigest()
+        assert activity.file_path == "upload.gpx"
+
+
+@pytest.mark.database
+def test_ingest_content_reports_parse_errors(db):
+    result = ingest_content("broken.gpx", b"<gpx><trk>")
+
+    assert not result.imported
+    assert result.reason.startswith("parse_error")
+
+
+@pytest.mark.database
+def test_ingest_content_parses_without_temp_files(db, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("upload written to a temporary file")
+
+    monkeypatch.setattr("tempfile.NamedTemporaryFile", fail)
+    monkeypatch.setattr("tempfile.mkstemp", fail)
+    result = ingest_content("upload.gpx", GPX_DOCUMENT.encode("utf-8"))
+
+    assert result.imported
+
+
+@pytest.mark.database
+def test_ingest_file_hashes_and_parses_one_mapping(db, tmp_path, monkeypatch):
+    gpx_path = tmp_path / "morning.gpx"
+    gpx_path.write_text(GPX_DOCUMENT, encoding="utf-8")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file read a second time")
+
+    monkeypatch.setattr("ingest.pipeline.calculate_file_hash", fail)
+    monkeypatch.setattr("ingest.pipeline.ActivityParser.parse_activity_file", fail)
+    result = ingest_file(gpx_path)
+
+    assert result.imported
+    with session_scope() as session:
+        assert session.get(Activity, result.activity_id).file_hash == hashlib.sha256(gpx_path.read_bytes()).hexdigest()
+        manifest = session.query(ImportManifest).one()
+        assert manifest.size_bytes == gpx_path.stat().st_size
+        assert manifest.outcome == "imported"
+
+
+@pytest.mark.database
+def test_single_file_dedupe_happens_on_insert(db, tmp_path, monkeypatch):
+    gpx_path = tmp_path / "morning.gpx"
+    gpx_path.write_text(GPX_DOCUMENT, encoding="utf-8")
+    first = ingest_file(gpx_path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("duplicate looked up before insert")
+
+    monkeypatch.setattr("ingest.pipeline.find_existing_hashes", fail)
+    again = ingest_content("copy.gpx", gpx_path.read_bytes())
+    forced = ingest_content("copy.gpx", gpx_path.read_bytes(), force_reimport=True)
+
+    assert not again.imported and again.reason == "duplicate"
+    assert again.activity_id == first.activity_id
+    assert forced.imported and forced.activity_id == first.activity_id
+    with session_scope() as session:
+        assert session.query(Activity).one().file_path == "copy.gpx"
@@ -0,0 +1,227 @@
+"""
+Tests for the columnar sample store.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.data.arrow_store import read_sample_file, sample_file_count, sample_file_path, write_sample_file
+from app.data.db import DatabaseConfig, close_database, get_db_config, init_database, session_scope
+from app.data.models import Sample, SampleChannel
+from app.data.sample_store import (
+    activities_with_sample_rows,
+    decode_channel,
+    encode_channel,
+    migrate_activity_samples,
+    read_sample_channels,
+)
+from app.data.web_queries import get_activity_samples
+from ingest.persist import build_activity, persist_activity
+from tests.test_persist import make_activity_data
+
+
+@pytest.fixture
+def columnar_db(tmp_path):
+    db_config = init_database(f"sqlite:///{tmp_path / 'columnar.db'}", sample_store="columnar")
+    yield db_config
+    db_config.engine.dispose()
+    close_database()
+
+
+def round_trip(name, values):
+    encoding, data, mask = encode_channel(name, values)
+    return decode_channel(encoding, data, mask, len(values))
+
+
+def test_delta_channels_round_trip_with_gaps():
+    heart_rate = np.array([120, 121, np.nan, np.nan, 119, 180, np.nan])
+    latitude = np.array([52.5123456, 52.5123467, np.nan, -33.8688197])
+
+    np.testing.assert_array_equal(round_trip("heart_rate", heart_rate), heart_rate)
+    np.testing.assert_allclose(round_trip("latitude", latitude), latitude, atol=1e-7)
+    assert np.isnan(round_trip("latitude", latitude)[2])
+
+
+def test_delta_channels_use_the_narrowest_integer():
+    encoding, _, mask = encode_channel("elapsed_time_s", np.arange(3600, dtype=np.float64))
+    assert (encoding, mask) == ("delta8:1", None)
+
+    timestamps = np.arange(1_700_000_000_000_000, 1_700_000_010_000_000, 1_000_000, dtype=np.int64)
+    encoding, data, mask = encode_channel("timestamp", timestamps)
+    assert encoding == "delta64:1"
+    np.testing.assert_array_equal(decode_channel(encoding, data, mask, len(timestamps)), timestamps)
+
+
+def test_other_channels_are_float32():
+    power = np.array([250.5, np.nan, 1e-3])
+    encoding, _, mask = encode_channel("power_w", power)
+
+    assert (encoding, mask) == ("f32", None)
+    np.testing.assert_allclose(round_trip("power_w", power), power, rtol=1e-6)
+
+
+@pytest.mark.database
+def test_columnar_store_round_trips_activity_samples(columnar_db):
+    activity_data = make_activity_data()
+    with session_scope() as session:
+        activity = build_activity(activity_data, "abc", "fit", "run.fit", "run")
+        persist_activity(session, activity, activity_data)
+
+    with session_scope() as session:
+        assert session.query(Sample).count() == 0
+        channels = {row.channel for row in session.query(SampleChannel)}
+        assert channels == {"timestamp", "elapsed_time_s", "latitude", "longitude", "heart_rate"}
+        arrays = read_sample_channels(session, activity.id)
+
+    expected = activity_data.samples
+    np.testing.assert_array_equal(arrays.timestamp, expected.timestamp)
+    np.testing.assert_array_equal(arrays.heart_rate, expected.heart_rate)
+    np.testing.assert_allclose(arrays.latitude, expected.latitude, atol=1e-7)
+    assert np.isnan(arrays.power_w).all()
+    assert get_db_config().get_database_info()["samples"] == 12
+
+    df = get_activity_samples(activity.id)
+    assert len(df) == 12
+    assert list(df["heart_rate_bpm"]) == list(range(120, 132))
+    assert df["position_lat"].isna().sum() == 3
+
+
+@pytest.mark.database
+def test_migrate_moves_row_samples(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'migrate.db'}"
+    activity_data = make_activity_data()
+    init_database(database_url)
+    try:
+        with session_scope() as session:
+            persist_activity(session, build_activity(activity_data, "abc", "fit", "a.fit", "a"), None)
+            activity = build_activity(activity_data, "def", "fit", "b.fit", "b")
+            persist_activity(session, activity, activity_data)
+        rows_frame = get_activity_samples(activity.id)
+
+        with session_scope() as session:
+            assert activities_with_sample_rows(session) == [activity.id]
+            assert migrate_activity_samples(session, activity.id) == 12
+            assert migrate_activity_samples(session, activity.id) == 0
+
+        with session_scope() as session:
+            assert session.query(Sample).count() == 0
+            assert activities_with_sample_rows(session) == []
+        columnar_frame = get_activity_samples(activity.id)
+    finally:
+        get_db_config().engine.dispose()
+        close_database()
+
+    for column in ("elapsed_time_s", "heart_rate_bpm", "position_lat", "speed_kmh"):
+        np.testing.assert_allclose(
+            columnar_frame[column].astype(float), rows_frame[column].astype(float), atol=1e-7, equal_nan=True
+        )
+
+
+@pytest.fixture
+def arrow_db(tmp_path):
+    pytest.importorskip("pyarrow")
+    db_config = init_database(f"sqlite:///{tmp_path / 'arrow.db'}", sample_store="arrow")
+    yield db_config
+    db_config.engine.dispose()
+    close_database()
+
+
+@pytest.mark.database
+def test_arrow_store_maps_sample_files(arrow_db):
+    activity_data = make_activity_data()
+    with session_scope() as session:
+        activity = build_activity(activity_data, "abc", "fit", "run.fit", "run")
+        persist_activity(session, activity, activity_data)
+
+    assert sample_file_path(arrow_db.sample_dir, activity.id).exists()
+    with session_scope() as session:
+        assert session.query(Sample).count() == 0
+        table = read_sample_file(session, activity.id, ["heart_rate", "power_w"])
+        assert table.schema.names == ["heart_rate"]
+
+    df = get_activity_samples(activity.id)
+    assert len(df) == 12
+    assert list(df["heart_rate_bpm"]) == list(range(120, 132))
+    assert df["position_lat"].isna().sum() == 3
+    assert df["power_w"].isna().all()
+
+
+@pytest.mark.database
+def test_arrow_files_follow_the_transaction(arrow_db):
+    activity_data = make_activity_data()
+    with pytest.raises(RuntimeError):
+        with session_scope() as session:
+            activity = build_activity(activity_data, "abc", "fit", "run.fit", "run")
+            rolled_back_id = persist_activity(session, activity, activity_data).id
+            raise RuntimeError("import failed")
+    assert not sample_file_path(arrow_db.sample_dir, rolled_back_id).exists()
+    assert not list(Path(arrow_db.sample_dir).glob(".*"))  # no staged file left behind
+
+    with session_scope() as session:
+        activity = build_activity(activity_data, "abc", "fit", "run.fit", "run")
+        activity_id = persist_activity(session, activity, activity_data).id
+    path = sample_file_path(arrow_db.sample_dir, activity_id)
+    assert path.exists()
+
+    summary = make_activity_data()
+    summary.samples = []
+    with session_scope() as session:
+        replaced = build_activity(summary, "abc", "fit", "run.fit", "run")
+        persist_activity(session, replaced, summary, replace=True)
+        assert path.exists()
+    assert not path.exists()
+
+
+@pytest.mark.database
+def test_rolled_back_rewrite_keeps_the_committed_file(arrow_db):
+    activity_data = make_activity_data()
+    with session_scope() as session:
+        activity = build_activity(activity_data, "abc", "fit", "run.fit", "run")
+        activity_id = persist_activity(session, activity, activity_data).id
+
+    shorter = make_activity_data(n_samples=5)
+    with pytest.raises(RuntimeError):
+        with session_scope() as session:
+            rewritten = build_activity(shorter, "abc", "fit", "run.fit", "run")
+            persist_activity(session, rewritten, shorter, replace=True)
+            assert sample_file_count(session, [activity_id]) == 5  # the session sees its own rewrite
+            raise RuntimeError("import failed")
+
+    with session_scope() as session:
+        assert sample_file_count(session, [activity_id]) == 12
+        # A failed savepoint drops only the file it wrote
+        with pytest.raises(RuntimeError), session.begin_nested():
+            write_sample_file(session, activity_id, shorter.samples)
+            raise RuntimeError("job failed")
+        assert sample_file_count(session, [activity_id]) == 12
+    assert len(get_activity_samples(activity_id)) == 12
+    assert not list(Path(arrow_db.sample_dir).glob(".*"))
+
+
+@pytest.mark.database
+def test_rolled_back_savepoint_keeps_earlier_savepoint_files(arrow_db):
+    activity_data = make_activity_data()
+    with session_scope() as session:
+        first = persist_activity(session, build_activity(activity_data, "a", "fit", "a.fit", "a"), activity_data).id
+        second = persist_activity(session, build_activity(activity_data, "b", "fit", "b.fit", "b"), activity_data).id
+
+    shorter = make_activity_data(n_samples=5)
+    with session_scope() as session:
+        # Two writer jobs in one batch: the first succeeds, the second fails
+        with session.begin_nested():
+            write_sample_file(session, first, shorter.samples)
+        with pytest.raises(RuntimeError), session.begin_nested():
+            write_sample_file(session, second, shorter.samples)
+            raise RuntimeError("job failed")
+
+    with session_scope() as session:
+        assert sample_file_count(session, [first]) == 5
+        assert sample_file_count(session, [second]) == 12
+    assert not list(Path(arrow_db.sample_dir).glob(".*"))
+
+
+def test_unknown_sample_store_is_rejected():
+    with pytest.raises(ValueError, match="Unknown sample store"):
+        DatabaseConfig("sqlite:///:memory:", sample_store="parquet")
@@ -0,0 +1,37 @@
+"""
+Tests for the single-pass activity file scanner.
+"""
+
+import os
+
+from ingest.scan import walk_activity_files
+
+
+def test_walk_matches_extensions_case_insensitively(tmp_path):
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    for name in ("run.fit", "a/ride.GPX", "a/b/swim.Tcx", "a/notes.txt", "a/b/run.fit.bak"):
+        (tmp_path / name).write_bytes(b"x" * len(name))
+
+    found = {scanned.path.relative_to(tmp_path).as_posix(): scanned for scanned in walk_activity_files(tmp_path)}
+
+    assert sorted(found) == ["a/b/swim.Tcx", "a/ride.GPX", "run.fit"]
+    stat = os.stat(tmp_path / "a" / "ride.GPX")
+    signature = found["a/ride.GPX"].signature
+    assert signature.path == os.path.abspath(tmp_path / "a" / "ride.GPX")
+    assert (signature.size_bytes, signature.mtime_ns) == (stat.st_size, stat.st_mtime_ns)
+
+
+def test_walk_lists_each_directory_once(tmp_path, monkeypatch):
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    (tmp_path / "a" / "b" / "run.fit").write_bytes(b"x")
+    scanned_dirs = []
+    scandir = os.scandir
+
+    def counting_scandir(path):
+        scanned_dirs.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr("ingest.scan.os.scandir", counting_scandir)
+    assert len(list(walk_activity_files(tmp_path))) == 1
+
+    assert len(scanned_dirs) == len(set(scanned_dirs)) == 3
@@ -0,0 +1,80 @@
+"""
+Tests for newest-first import ordering.
+"""
+
+from datetime import datetime, timezone
+import os
+
+import pytest
+
+from app.data.db import close_database, init_database, session_scope
+from app.data.models import Activity
+from cli.gd_import import import_directory_with_progress
+from ingest.scan import walk_activity_files
+from ingest.schedule import filename_date, order_newest_first, peek_fit_time_created, peek_start_time
+from tests.fit_factory import build_activity_fit, write_activity_fit
+from tests.test_gd_import import write_gpx
+
+START = datetime(2023, 6, 1, 7, 30, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def schedule_db(tmp_path):
+    db_config = init_database(f"sqlite:///{tmp_path / 'schedule.db'}")
+    yield db_config
+    db_config.engine.dispose()
+    close_database()
+
+
+@pytest.mark.parametrize("big_endian", [False, True])
+def test_peek_fit_time_created(big_endian):
+    head = build_activity_fit(n_records=10, start=START, big_endian=big_endian)[:256]
+
+    assert peek_fit_time_created(head) == START
+
+
+def test_peek_fit_rejects_other_data():
+    assert peek_fit_time_created(b"") is None
+    assert peek_fit_time_created(b"<?xml version='1.0'?><gpx>") is None
+    assert peek_fit_time_created(build_activity_fit(n_records=10)[:14]) is None
+
+
+def test_peek_gpx_and_filename(tmp_path):
+    assert peek_start_time(write_gpx(tmp_path / "ride.gpx", day=3)) == datetime(2024, 1, 3, 10, tzinfo=timezone.utc)
+
+    empty = tmp_path / "2022-11-05-run.tcx"
+    empty.write_text("<TrainingCenterDatabase/>", encoding="utf-8")
+    assert peek_start_time(empty) == datetime(2022, 11, 5, tzinfo=timezone.utc)
+    assert filename_date("activity_20210302.fit") == datetime(2021, 3, 2, tzinfo=timezone.utc)
+    assert filename_date("12345678901.fit") is None
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_order_newest_first(tmp_path, jobs):
+    write_gpx(tmp_path / "a.gpx", day=1)
+    write_activity_fit(tmp_path / "b.fit", n_records=10, start=datetime(2024, 1, 5, tzinfo=timezone.utc))
+    write_gpx(tmp_path / "c.gpx", day=3)
+    unknown = tmp_path / "d.tcx"
+    unknown.write_text("<TrainingCenterDatabase/>", encoding="utf-8")
+    os.utime(unknown, (0, 0))
+
+    ordered = order_newest_first(walk_activity_files(tmp_path), jobs=jobs)
+
+    assert [scanned.path.name for scanned in ordered] == ["b.fit", "c.gpx", "a.gpx", "d.tcx"]
+
+
+@pytest.mark.database
+def test_directory_import_newest_first(schedule_db, tmp_path):
+    data_dir = tmp_path / "activities"
+    data_dir.mkdir()
+    for day in (1, 3, 2):
+        write_gpx(data_dir / f"run_{day}.gpx", day=day)
+
+    results = import_directory_with_progress(data_dir, newest_first=True)
+
+    assert results["imported"] == 3
+    with session_scope() as session:
+        names = [activity.file_path for activity in session.query(Activity).order_by(Activity.id)]
+    assert [os.path.basename(name) for name in names] == ["run_3.gpx", "run_2.gpx", "run_1.gpx"]
+    # A second run skips everything through the manifest before any file is peeked
+    assert import_directory_with_progress(data_dir, newest_first=True)["imported"] == 0
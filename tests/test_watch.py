@@ -0,0 +1,96 @@
+"""
+Tests for watch mode: directory watchers and incremental imports.
+"""
+
+import os
+
+import pytest
+
+from app.data.db import close_database, get_db_config, init_database
+from cli.gd_import import watch_and_import
+from ingest.watch import INOTIFY_AVAILABLE, InotifyWatcher, PollingWatcher, open_watcher
+from tests.test_gd_import import write_gpx
+
+
+def test_polling_watcher_reports_settled_files_once(tmp_path):
+    (tmp_path / "old.fit").write_bytes(b"old")
+    watcher = PollingWatcher(tmp_path, interval=0)
+
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "nested" / "new.GPX").write_bytes(b"<gpx/>")
+    (tmp_path / "notes.txt").write_text("ignored")
+
+    assert watcher.changes() == []  # first sighting: may still be syncing
+    assert watcher.changes() == [tmp_path / "nested" / "new.GPX"]
+    assert watcher.changes() == []
+
+
+def test_polling_watcher_waits_for_growing_files(tmp_path):
+    watcher = PollingWatcher(tmp_path, interval=0)
+    activity = tmp_path / "ride.tcx"
+
+    activity.write_bytes(b"<a")
+    assert watcher.changes() == []
+    with open(activity, "ab") as f:
+        f.write(b"/>")
+    assert watcher.changes() == []
+    assert watcher.changes() == [activity]
+
+    stat = activity.stat()
+    os.utime(activity, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    watcher.changes()
+    assert watcher.changes() == [activity]
+
+
+def test_polling_watcher_can_report_existing_files(tmp_path):
+    (tmp_path / "old.fit").write_bytes(b"old")
+    watcher = PollingWatcher(tmp_path, interval=0, report_existing=True)
+
+    watcher.changes()
+    assert watcher.changes() == [tmp_path / "old.fit"]
+
+
+def test_open_watcher_falls_back_to_polling(tmp_path):
+    assert isinstance(open_watcher(tmp_path, use_inotify=False), PollingWatcher)
+
+
+@pytest.mark.skipif(not INOTIFY_AVAILABLE, reason="inotify_simple not installed")
+def test_inotify_watcher_reports_closed_and_moved_files(tmp_path):
+    watcher = InotifyWatcher(tmp_path)
+    try:
+        (tmp_path / "ride.fit").write_bytes(b"data")
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "run.gpx").write_bytes(b"<gpx/>")
+        (tmp_path / "partial.tmp").write_bytes(b"data")
+        os.rename(tmp_path / "partial.tmp", tmp_path / "moved.tcx")
+
+        changed = set()
+        for _ in range(5):
+            changed.update(watcher.changes(timeout=0.2))
+        assert changed == {tmp_path / "ride.fit", tmp_path / "sub" / "run.gpx", tmp_path / "moved.tcx"}
+    finally:
+        watcher.close()
+
+
+@pytest.mark.database
+def test_watch_and_import_imports_new_files(tmp_path):
+    db_config = init_database(f"sqlite:///{tmp_path / 'watch.db'}")
+    try:
+        data_dir = tmp_path / "sync"
+        data_dir.mkdir()
+        write_gpx(data_dir / "existing.gpx", day=1)
+        watcher = PollingWatcher(data_dir, interval=0)
+        write_gpx(data_dir / "synced.gpx", day=2)
+
+        totals = watch_and_import(data_dir, watcher, catch_up=False, max_batches=1)
+
+        assert totals["imported"] == 1
+        assert get_db_config().get_database_info()["activities"] == 1
+
+        # A later catch-up only imports what the watcher has not seen
+        totals = watch_and_import(data_dir, PollingWatcher(data_dir, interval=0), max_batches=0)
+        assert totals["imported"] == 1
+        assert totals["unchanged"] == 1
+    finally:
+        db_config.engine.dispose()
+        close_database()
@@ -0,0 +1,84 @@
+"""
+Tests for the database writer thread.
+"""
+
+import threading
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.data.db import close_database, init_database, run_write, session_scope
+from app.data.models import Activity
+from app.data.writer import DatabaseWriter
+
+
+@pytest.fixture
+def db(tmp_path):
+    db_config = init_database(f"sqlite:///{tmp_path / 'writer.db'}")
+    yield db_config
+    db_config.engine.dispose()
+    close_database()
+
+
+def add_activity(file_hash: str):
+    def job(session):
+        activity = Activity(file_hash=file_hash, sport="running", source="fit")
+        session.add(activity)
+        session.flush()
+        return activity.id
+
+    return job
+
+
+def stored_hashes():
+    with session_scope() as session:
+        return sorted(session.execute(select(Activity.file_hash)).scalars().all())
+
+
+@pytest.mark.database
+def test_run_write_commits_and_returns_result(db):
+    activity_id = run_write(add_activity("a"))
+
+    assert activity_id is not None
+    assert stored_hashes() == ["a"]
+
+
+@pytest.mark.database
+def test_queued_jobs_share_one_transaction_and_fail_alone(db):
+    writer = DatabaseWriter(db.session_factory)
+    gate = threading.Event()
+    try:
+        # Keep the writer busy so the next jobs are queued and batched together
+        blocker = writer.submit(lambda session: gate.wait(5))
+        futures = [writer.submit(add_activity(file_hash)) for file_hash in ("b", "dup", "dup", "c")]
+        gate.set()
+
+        assert blocker.result() is True
+        with pytest.raises(IntegrityError):
+            futures[2].result()
+        assert all(futures[index].result() for index in (0, 1, 3))
+    finally:
+        writer.close()
+
+    assert stored_hashes() == ["b", "c", "dup"]
+
+
+@pytest.mark.database
+def test_nested_run_joins_the_running_job(db):
+    def outer(session):
+        return [run_write(add_activity("outer")), threading.current_thread().name]
+
+    _, thread_name = run_write(outer)
+
+    assert thread_name == "db-writer"
+    assert stored_hashes() == ["outer"]
+
+
+@pytest.mark.database
+def test_closed_writer_rejects_jobs(db):
+    writer = DatabaseWriter(db.session_factory)
+    writer.close()
+
+    with pytest.raises(RuntimeError):
+        writer.run(add_activity("late"))
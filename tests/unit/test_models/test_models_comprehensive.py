@@ -7,12 +7,16 @@ with complete coverage including calculated properties, edge cases, and error ha
 
 from datetime import datetime, timezone
 
+import numpy as np
+
 from app.data.models import (
     Activity,
     Sample,
     RoutePoint,
     Lap,
     ActivityData,
+    SampleArrays,
+    SampleArraysBuilder,
     SampleData,
     LapData,
     ImportResult,
@@ -290,7 +294,9 @@ class TestActivityData:
         assert activity_data.elevation_gain_m == 100.0
         assert activity_data.elevation_loss_m == 50.0
         assert activity_data.calories == 500
-        assert activity_data.samples == sample_data
+        assert isinstance(activity_data.samples, SampleArrays)
+        assert len(activity_data.samples) == 1
+        assert activity_data.samples[0].heart_rate == 140
         assert activity_data.route_points == route_points
         assert activity_data.laps == lap_data
         assert activity_data.hr_zones == hr_zones
@@ -302,7 +308,7 @@ class TestActivityData:
         # All parameters should be None except collections
         assert activity_data.external_id is None
         assert activity_data.sport is None
-        assert activity_data.samples == []  # Default empty list
+        assert len(activity_data.samples) == 0  # Default empty arrays
         assert activity_data.route_points == []  # Default empty list
         assert activity_data.laps == []  # Default empty list
         assert activity_data.hr_zones == {}  # Default empty dict
@@ -312,7 +318,7 @@ class TestActivityData:
         activity_data = ActivityData(samples=None, route_points=None, laps=None, hr_zones=None)
 
         # Should convert None to empty collections
-        assert activity_data.samples == []
+        assert len(activity_data.samples) == 0
         assert activity_data.route_points == []
         assert activity_data.laps == []
         assert activity_data.hr_zones == {}
@@ -383,6 +389,68 @@ class TestSampleData:
         assert sample_data.vertical_oscillation_mm is None
 
 
+class TestSampleArrays:
+    """Test suite for the columnar SampleArrays container."""
+
+    def _build(self):
+        builder = SampleArraysBuilder()
+        builder.append(
+            datetime(2024, 1, 15, 10, 0, 0, tzinfo=timezone.utc),
+            elapsed_time_s=0,
+            latitude=52.52,
+            longitude=13.405,
+            heart_rate=140,
+        )
+        builder.append(datetime(2024, 1, 15, 10, 0, 1), elapsed_time_s=1, heart_rate=None, power_w=250.5)
+        builder.append(None, elapsed_time_s=2, heart_rate=150)
+        return builder.build()
+
+    def test_builder_fills_columns_with_nan_for_missing(self):
+        samples = self._build()
+
+        assert len(samples) == 3
+        assert samples.heart_rate.dtype == np.float64
+        assert samples.heart_rate[0] == 140
+        assert np.isnan(samples.heart_rate[1])
+        assert np.isnan(samples.power_w[0])
+        assert np.isnat(samples.timestamp[2])
+        assert samples.has_channel("power_w")
+        assert not samples.has_channel("air_power_w")
+
+    def test_timestamps_normalised_to_naive_utc(self):
+        samples = self._build()
+
+        assert samples[0].timestamp == datetime(2024, 1, 15, 10, 0, 0)
+        assert samples[2].timestamp is None
+
+    def test_record_view_restores_python_types(self):
+        record = self._build()[0]
+
+        assert isinstance(record, SampleData)
+        assert record.heart_rate == 140 and isinstance(record.heart_rate, int)
+        assert record.power_w is None
+
+    def test_to_rows_drops_rows_without_timestamp(self):
+        rows = self._build().to_rows(activity_id=7)
+
+        assert len(rows) == 2
+        assert rows[0]["activity_id"] == 7
+        assert rows[0]["heart_rate"] == 140
+        assert rows[1]["heart_rate"] is None
+        assert rows[1]["power_w"] == 250.5
+        assert type(rows[0]["elapsed_time_s"]) is int
+
+    def test_route_points_only_for_gps_fixes(self):
+        assert self._build().route_points() == [(52.52, 13.405, None)]
+
+    def test_from_samples_round_trip(self):
+        samples = SampleArrays.from_samples([SampleData(heart_rate=130, speed_mps=3.2)])
+
+        assert len(samples) == 1
+        assert samples[0].heart_rate == 130
+        assert samples[0].speed_mps == 3.2
+
+
 class TestLapData:
     """Test suite for LapData data transfer object."""
 